@@ -0,0 +1,491 @@
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+from app.core.config import settings
+
+
+def _next_version(current) -> str:
+    # Same string versions as InMemorySaver, so both backends are interchangeable.
+    if current is None:
+        current_v = 0
+    elif isinstance(current, int):
+        current_v = current
+    else:
+        current_v = int(current.split(".")[0])
+    return f"{current_v + 1:032}.{random.random():016}"
+
+
+class EvictionPolicy:
+    """
+    Idle-session eviction shared by both backends.
+    - ttl_seconds: threads not written to for this long are dropped (0 = never).
+    - max_threads: keep at most this many threads, least recently used go first (0 = unbounded).
+    Eviction runs at most once per `interval_seconds`, piggybacking on checkpoint writes.
+    """
+
+    def __init__(self, ttl_seconds: float = 0, max_threads: int = 0, interval_seconds: float = 30):
+        self.ttl_seconds = ttl_seconds
+        self.max_threads = max_threads
+        self.interval_seconds = interval_seconds
+        self.evicted_ttl = 0
+        self.evicted_lru = 0
+        self.last_run: Optional[float] = None
+
+    def due(self, now: float) -> bool:
+        if not self.ttl_seconds and not self.max_threads:
+            return False
+        return self.last_run is None or now - self.last_run >= self.interval_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ttl_seconds": self.ttl_seconds,
+            "max_threads": self.max_threads,
+            "evicted_ttl": self.evicted_ttl,
+            "evicted_lru": self.evicted_lru,
+            "last_eviction": self.last_run,
+        }
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    File-backed LangGraph checkpointer.
+    The database runs in WAL mode, so several uvicorn workers (processes) can
+    read and write the same file and any of them can serve a given session_id.
+    Only the latest `keep_per_thread` checkpoints of a thread are kept; older ones
+    are only needed for time travel, which the app does not use.
+    """
+
+    def __init__(self, path: str, policy: Optional[EvictionPolicy] = None, keep_per_thread: int = 20):
+        super().__init__()
+        self.path = path
+        self.policy = policy or EvictionPolicy()
+        self.keep_per_thread = keep_per_thread
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                type TEXT,
+                checkpoint BLOB,
+                metadata_type TEXT,
+                metadata BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT,
+                value BLOB,
+                task_path TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+            CREATE TABLE IF NOT EXISTS threads (
+                thread_id TEXT PRIMARY KEY,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_threads_last_access ON threads (last_access);
+            """
+        )
+
+    # --- Helpers ---
+    def _execute(self, sql: str, params: Sequence[Any] = ()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _build_tuple(self, row, pending_rows) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = row
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((w_type, value)))
+                for task_id, channel, w_type, value in pending_rows
+            ],
+        )
+
+    def _pending_rows(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str):
+        return self._execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    # --- Sync API ---
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        if checkpoint_id := get_checkpoint_id(config):
+            rows = self._execute(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+        else:
+            rows = self._execute(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            )
+        if not rows:
+            return None
+        row = rows[0]
+        return self._build_tuple(row, self._pending_rows(row[0], row[1], row[2]))
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._execute(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+            f"FROM checkpoints {where} ORDER BY checkpoint_id DESC",
+            params,
+        )
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            item = self._build_tuple(row, self._pending_rows(row[0], row[1], row[2]))
+            if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, serialized = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        now = time.time()
+        with self._lock:
+            cur = self.conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                cur.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                        type_, serialized, metadata_type, serialized_metadata,
+                    ),
+                )
+                cur.execute("INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, now))
+                self._prune_history(cur, thread_id, checkpoint_ns)
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        if self.policy.due(now):
+            self.evict(now)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def _prune_history(self, cur, thread_id: str, checkpoint_ns: str):
+        if not self.keep_per_thread:
+            return
+        stale = cur.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_per_thread),
+        ).fetchall()
+        if stale:
+            cutoff = stale[0][0]
+            cur.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id <= ?",
+                (thread_id, checkpoint_ns, cutoff),
+            )
+            cur.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id <= ?",
+                (thread_id, checkpoint_ns, cutoff),
+            )
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Special writes (errors, interrupts) replace earlier ones; regular writes are idempotent.
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, serialized = self.serde.dumps_typed(value)
+            rows.append((
+                thread_id, checkpoint_ns, checkpoint_id, task_id,
+                WRITES_IDX_MAP.get(channel, idx), channel, type_, serialized, task_path,
+            ))
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_threads([thread_id])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _delete_threads(self, thread_ids):
+        for table in ("checkpoints", "writes", "threads"):
+            self.conn.executemany(f"DELETE FROM {table} WHERE thread_id = ?", [(t,) for t in thread_ids])
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """Drops idle threads (TTL) and then the least recently used ones above max_threads."""
+        now = now or time.time()
+        policy = self.policy
+        policy.last_run = now
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired, overflow = [], []
+                if policy.ttl_seconds:
+                    expired = [r[0] for r in self.conn.execute(
+                        "SELECT thread_id FROM threads WHERE last_access < ?", (now - policy.ttl_seconds,)
+                    ).fetchall()]
+                    self._delete_threads(expired)
+                if policy.max_threads:
+                    overflow = [r[0] for r in self.conn.execute(
+                        "SELECT thread_id FROM threads ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+                        (policy.max_threads,),
+                    ).fetchall()]
+                    self._delete_threads(overflow)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        policy.evicted_ttl += len(expired)
+        policy.evicted_lru += len(overflow)
+        if expired or overflow:
+            print(f"DEBUG: Checkpointer evicted {len(expired)} idle + {len(overflow)} LRU sessions")
+        return len(expired) + len(overflow)
+
+    def get_next_version(self, current, channel) -> str:
+        return _next_version(current)
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {}
+        for table in ("threads", "checkpoints", "writes"):
+            counts[table] = self._execute(f"SELECT COUNT(*) FROM {table}")[0][0]
+        page_count = self._execute("PRAGMA page_count")[0][0]
+        page_size = self._execute("PRAGMA page_size")[0][0]
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            **counts,
+            "db_bytes": page_count * page_size,
+            "eviction": self.policy.stats(),
+        }
+
+    # --- Async API (SQLite work runs off the event loop) ---
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """
+    In-process checkpointer with the same TTL/LRU eviction as the SQLite backend.
+    State is not shared between workers, so only use it with a single worker.
+    """
+
+    def __init__(self, policy: Optional[EvictionPolicy] = None):
+        super().__init__()
+        self.policy = policy or EvictionPolicy()
+        self._last_access: "OrderedDict[str, float]" = OrderedDict()
+        self._evict_lock = threading.Lock()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        now = time.time()
+        with self._evict_lock:
+            thread_id = config["configurable"]["thread_id"]
+            self._last_access[thread_id] = now
+            self._last_access.move_to_end(thread_id)
+        if self.policy.due(now):
+            self.evict(now)
+        return result
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self._evict_lock:
+            self._last_access.pop(thread_id, None)
+
+    def evict(self, now: Optional[float] = None) -> int:
+        now = now or time.time()
+        policy = self.policy
+        policy.last_run = now
+        with self._evict_lock:
+            expired = []
+            if policy.ttl_seconds:
+                expired = [t for t, ts in self._last_access.items() if ts < now - policy.ttl_seconds]
+            remaining = len(self._last_access) - len(expired)
+            overflow = []
+            if policy.max_threads and remaining > policy.max_threads:
+                expired_set = set(expired)
+                candidates = [t for t in self._last_access if t not in expired_set]
+                overflow = candidates[:remaining - policy.max_threads]
+        for thread_id in expired + overflow:
+            self.delete_thread(thread_id)
+        policy.evicted_ttl += len(expired)
+        policy.evicted_lru += len(overflow)
+        if expired or overflow:
+            print(f"DEBUG: Checkpointer evicted {len(expired)} idle + {len(overflow)} LRU sessions")
+        return len(expired) + len(overflow)
+
+    def stats(self) -> Dict[str, Any]:
+        blob_bytes = sum(len(v[1]) for v in list(self.blobs.values()))
+        checkpoint_bytes = sum(
+            len(saved[0][1]) + len(saved[1][1])
+            for namespaces in list(self.storage.values())
+            for checkpoints in list(namespaces.values())
+            for saved in list(checkpoints.values())
+        )
+        write_bytes = sum(len(w[2][1]) for writes in list(self.writes.values()) for w in list(writes.values()))
+        return {
+            "backend": "memory",
+            "threads": len(self.storage),
+            "checkpoints": sum(len(c) for ns in list(self.storage.values()) for c in list(ns.values())),
+            "writes": sum(len(w) for w in list(self.writes.values())),
+            "serialized_bytes": blob_bytes + checkpoint_bytes + write_bytes,
+            "eviction": self.policy.stats(),
+        }
+
+
+def build_checkpointer():
+    """Creates the checkpointer selected by CHECKPOINT_BACKEND ("sqlite" or "memory")."""
+    policy = EvictionPolicy(
+        ttl_seconds=settings.CHECKPOINT_TTL_SECONDS,
+        max_threads=settings.CHECKPOINT_MAX_THREADS,
+    )
+    backend = settings.CHECKPOINT_BACKEND.lower()
+    if backend == "memory":
+        print("DEBUG: Using in-memory checkpointer (single worker only)")
+        return BoundedMemorySaver(policy)
+    if backend != "sqlite":
+        print(f"WARN: Unknown CHECKPOINT_BACKEND '{settings.CHECKPOINT_BACKEND}', using sqlite")
+    print(f"DEBUG: Using SQLite checkpointer at {settings.CHECKPOINT_DB_PATH}")
+    return SqliteCheckpointSaver(settings.CHECKPOINT_DB_PATH, policy)
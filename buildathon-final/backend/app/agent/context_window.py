@@ -0,0 +1,143 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Rough token count (~4 characters per token for English clinical text); good enough
+# for budgeting prompt sections without shipping a tokenizer.
+CHARS_PER_TOKEN = 4
+
+# Digest limits: asked questions kept (most recent), characters kept per message
+MAX_ASKED_QUESTIONS = 30
+MAX_LINE_CHARS = 240
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _clip(text: str, max_chars: int = MAX_LINE_CHARS) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= max_chars else text[: max_chars - 3] + "..."
+
+
+def new_digest() -> Dict[str, Any]:
+    return {"chief_complaint": None, "asked": [], "turns": 0, "message_count": 0}
+
+
+def update_digest(digest: Optional[Dict[str, Any]], messages: List[Any]) -> Dict[str, Any]:
+    """
+    Folds the messages added since the last update into the digest (O(new messages) per
+    turn, not O(history)): the first patient message is the chief complaint, every AI
+    question (a message ending in '?') is remembered as asked, patient messages are counted.
+    """
+    digest = dict(digest) if digest else new_digest()
+    start = digest["message_count"]
+    if start > len(messages):
+        # History was replaced (should not happen with add_messages); rebuild
+        digest, start = new_digest(), 0
+    asked = list(digest["asked"])
+    for message in messages[start:]:
+        if message.type == "human":
+            digest["turns"] += 1
+            if not digest["chief_complaint"]:
+                digest["chief_complaint"] = _clip(message.content)
+        elif message.type == "ai" and message.content.rstrip().endswith("?"):
+            question = _clip(message.content, 200)
+            if question not in asked:
+                asked.append(question)
+    digest["asked"] = asked[-MAX_ASKED_QUESTIONS:]
+    digest["message_count"] = len(messages)
+    return digest
+
+
+def select_window(messages: List[Any], budget_tokens: int) -> Tuple[List[str], int]:
+    """
+    Most recent messages that fit in `budget_tokens` (oldest first), and how many earlier
+    messages were left out. The latest message is always kept (clipped if needed).
+    """
+    lines: List[str] = []
+    used = 0
+    for message in reversed(messages):
+        line = f"{message.type}: {_clip(message.content)}"
+        cost = estimate_tokens(line) + 1
+        if lines and used + cost > budget_tokens:
+            break
+        if not lines and cost > budget_tokens:
+            line = line[: max(0, budget_tokens * CHARS_PER_TOKEN - 3)] + "..."
+            cost = budget_tokens
+        lines.append(line)
+        used += cost
+    lines.reverse()
+    return lines, len(messages) - len(lines)
+
+
+def render_context(
+    digest: Dict[str, Any],
+    facts: Optional[Dict[str, Any]],
+    messages: List[Any],
+    budget_tokens: int,
+    differential: Optional[List[str]] = None,
+    cap_facts: bool = True,
+) -> str:
+    """
+    The shared conversation context for every node's prompt, at most ~`budget_tokens`:
+    1. Digest: chief complaint, known facts (whole, up to half the budget; else the most
+       recent ones) and the current differential.
+    2. Recent turns: the latest messages that fit in 2/3 of the rest.
+    3. Questions already asked that are no longer visible in the recent turns (most recent
+       first to stay when space runs out).
+    With `cap_facts=False` every fact is kept and left out of the budget, which then only
+    caps the recent turns and earlier questions (final summaries must see every fact).
+    """
+    facts_json = json.dumps(facts, ensure_ascii=False) if facts else "None"
+    if cap_facts and estimate_tokens(facts_json) > budget_tokens // 2:
+        kept: Dict[str, Any] = {}
+        for key in reversed(list(facts)):
+            candidate = {key: facts[key], **kept}
+            if estimate_tokens(json.dumps(candidate, ensure_ascii=False)) > budget_tokens // 2:
+                break
+            kept = candidate
+        facts_json = json.dumps(kept, ensure_ascii=False)
+
+    header = [
+        f"CONVERSATION DIGEST ({digest.get('turns', 0)} patient turns so far):",
+        f"Chief complaint: {digest.get('chief_complaint') or 'Unknown'}",
+        f"Known facts: {facts_json}",
+    ]
+    if differential:
+        header.append(f"Current differential: {', '.join(differential)}")
+    budgeted = header if cap_facts else [line for line in header if not line.startswith("Known facts: ")]
+    remaining = max(1, budget_tokens - estimate_tokens("\n".join(budgeted)))
+
+    lines, omitted = select_window(messages, max(1, remaining * 2 // 3))
+    remaining -= sum(estimate_tokens(line) + 1 for line in lines)
+
+    window_text = "\n".join(lines)
+    earlier: List[str] = []
+    for question in reversed(digest.get("asked", [])):
+        if question in window_text:
+            continue
+        cost = estimate_tokens(question) + 2
+        if cost > remaining:
+            break
+        earlier.insert(0, question)
+        remaining -= cost
+    if earlier:
+        header.append(f"Questions asked earlier: {json.dumps(earlier, ensure_ascii=False)}")
+
+    title = f"RECENT TURNS (last {len(lines)} messages" + (f", {omitted} earlier ones summarized above):" if omitted else "):")
+    return "\n".join([*header, "", title, *lines])
+
+
+def cap_blocks(blocks: List[str], budget_tokens: int) -> List[str]:
+    """Leading (best ranked) blocks that fit in `budget_tokens`; the first one is clipped to fit."""
+    kept: List[str] = []
+    used = 0
+    for block in blocks:
+        cost = estimate_tokens(block) + 1
+        if used + cost > budget_tokens:
+            if not kept:
+                kept.append(block[: budget_tokens * CHARS_PER_TOKEN - 3] + "...")
+            break
+        kept.append(block)
+        used += cost
+    return kept
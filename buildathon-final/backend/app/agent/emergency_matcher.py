@@ -0,0 +1,301 @@
+import json
+import os
+import re
+from typing import Dict, Any, List, Optional
+
+from app.core.config import settings
+
+RULES_PATH = os.path.join(settings.project_root, "emergency_rules.json")
+
+# Verdicts
+EMERGENCY = "EMERGENCY"   # Acute red-flag phrase -> no LLM needed
+BENIGN = "BENIGN"         # No clinical content ("thanks", "2 days") -> no LLM needed
+AMBIGUOUS = "AMBIGUOUS"   # Everything else -> LLM scan
+
+# Lay-language synonyms, keyed by the rule phrase they expand (normalized form)
+SYNONYMS = {
+    "obstructed breathing": ["choking", "airway blocked", "something stuck in throat"],
+    "absent breathing": ["not breathing", "stopped breathing", "cant breathe", "cannot breathe", "unable to breathe", "apnea"],
+    "severe respiratory distress": ["gasping for air", "gasping for breath", "struggling to breathe", "severe breathlessness", "severe shortness of breath", "nasal flaring", "chest indrawing"],
+    "central cyanosis": ["blue lips", "blue tongue", "lips turning blue", "lips are blue", "turning blue", "bluish lips"],
+    "signs of shock": ["cold clammy skin", "cold hands and feet", "weak pulse"],
+    "coma": ["unconscious", "unresponsive", "not responding", "wont wake up", "cannot wake", "cant wake", "is unconscious", "went unconscious", "lost consciousness"],
+    "convulsions": ["convulsion", "seizure", "seizures", "fits", "fitting", "jerking movements", "having a seizure", "having seizures", "having convulsions"],
+    "unable to drink or breastfeed": ["unable to drink", "cannot drink", "cant drink", "not able to drink", "unable to breastfeed", "not breastfeeding", "refusing to feed"],
+    "vomiting everything": ["vomits everything", "cannot keep anything down", "cant keep anything down", "throwing up everything"],
+    "lethargy or unconsciousness": ["unconsciousness", "very drowsy", "hard to wake"],
+    "stridor in a calm child": ["stridor"],
+    "severe malnutrition": [],
+    "sunken eyes": [],
+    "skin pinch goes back very slowly": [],
+    "chest pain": ["pain in chest", "pain in my chest", "chest tightness", "tight chest", "pressure in chest", "pressure in my chest", "crushing chest"],
+    "chest pain with sweating": ["chest pain and sweating", "chest pain radiating", "crushing chest pain"],
+    "sudden weakness": ["one side weak", "face drooping", "face is drooping", "drooping face", "cannot move arm", "cant move my arm", "cant move my leg", "arm is numb", "paralysis"],
+    "sudden confusion or trouble speaking": ["slurred speech", "speech is slurred", "trouble speaking", "cant speak", "cannot speak properly"],
+    "sudden severe headache": ["thunderclap headache", "worst headache of my life", "worst headache ever"],
+    "sudden loss of vision": ["lost my vision", "cant see", "cannot see", "suddenly blind", "vision went black"],
+    "anaphylaxis": ["throat is closing", "throat closing", "tongue swelling", "swollen tongue", "face swelling and breathing"],
+    "hypothermia": [],
+    "hyperthermia": [],
+    "severe pallor": [],
+    "unconscious": [],
+    "severe bleeding": ["bleeding heavily", "wont stop bleeding", "cant stop the bleeding", "vomiting blood", "coughing up blood"],
+}
+
+# Single-word rule heads that are specific enough to be matched on their own
+SPECIFIC_SINGLE_WORDS = {"coma", "convulsions", "anaphylaxis", "stridor", "hypothermia", "hyperthermia", "cyanosis", "apnea"}
+
+# The only phrases decided without the LLM: multi-word, unambiguous and happening now.
+# Every other match ("chest pain", "seizure", "cant see") is sent to the LLM scan.
+ACUTE_PHRASES = {
+    "obstructed breathing", "absent breathing", "not breathing", "stopped breathing", "airway blocked",
+    "severe respiratory distress", "gasping for air", "gasping for breath", "struggling to breathe",
+    "severe breathlessness", "severe shortness of breath",
+    "central cyanosis", "blue lips", "blue tongue", "lips turning blue", "lips are blue", "bluish lips",
+    "signs of shock", "cold clammy skin",
+    "is unconscious", "went unconscious", "lost consciousness", "wont wake up", "cannot wake", "cant wake",
+    "having a seizure", "having seizures", "having convulsions",
+    "unable to drink or breastfeed", "vomiting everything", "vomits everything", "throwing up everything",
+    "stridor in a calm child", "skin pinch goes back very slowly",
+    "chest pain with sweating", "chest pain with nausea", "chest pain and sweating", "chest pain radiating",
+    "crushing chest pain", "crushing chest",
+    "sudden weakness", "one side weak", "face drooping", "face is drooping", "drooping face",
+    "sudden confusion or trouble speaking", "slurred speech", "speech is slurred",
+    "sudden severe headache", "thunderclap headache", "worst headache of my life", "worst headache ever",
+    "sudden loss of vision", "suddenly blind", "vision went black",
+    "throat is closing", "throat closing", "tongue swelling", "swollen tongue", "face swelling and breathing",
+    "severe bleeding", "bleeding heavily", "wont stop bleeding", "cant stop the bleeding", "vomiting blood", "coughing up blood",
+}
+
+# A match in a clause that talks about the past ("as a kid", "10 years ago", "ever ... before")
+HISTORY_CUES = re.compile(
+    r"\b(?:\w+ (?:weeks?|months?|years?) (?:ago|back)|last (?:week|month|year)|as a (?:kid|child|teen|teenager|baby)"
+    r"|when i was|used to|in the past|history of|previously|before|ever|childhood)\b"
+)
+# ... or about someone else's history ("my father had chest pain")
+OTHER_PERSON_CUES = {
+    "he", "she", "his", "her", "him", "they", "their", "father", "mother", "dad", "mom", "mum", "brother", "sister",
+    "son", "daughter", "husband", "wife", "uncle", "aunt", "grandfather", "grandmother", "grandpa", "grandma",
+    "friend", "family", "relative", "neighbour", "neighbor",
+}
+PAST_VERBS = {"had", "was", "were", "died", "suffered", "got"}
+
+# Clinical words that make a message "worth a look" without being a clear red flag
+WATCH_TERMS = {
+    "fever", "neck", "stiff", "stiffness", "sweating", "sweat", "headache", "vomiting", "vomit", "weakness",
+    "numb", "numbness", "confusion", "confused", "breath", "breathing", "breathless", "chest", "heart",
+    "pain", "bleeding", "blood", "faint", "fainted", "dizzy", "rash", "swelling", "drowsy", "pregnant",
+    "burn", "injury", "accident", "fall", "poison", "overdose", "suicide", "unwell", "severe", "sudden",
+    "drink", "feed", "breastfeed", "wake", "speak", "move", "see", "urine", "pee",
+}
+
+NEGATION_CUES = {"no", "not", "never", "without", "denies", "deny", "dont", "doesnt", "didnt", "isnt", "havent", "hasnt", "nor", "none"}
+AFFIRMATIONS = {"yes", "yeah", "yep", "yup", "ya", "haan", "han", "ha", "correct", "right", "true", "sure", "affirmative"}
+DENIALS = {"no", "nope", "nah", "nahi", "not", "never", "none", "negative"}
+ABILITY_CUES = {"able", "can", "could", "drinking", "feeding", "eating", "breathing", "walking"}
+
+# Vocabulary of messages that carry no clinical content on their own
+BENIGN_WORDS = {
+    "thanks", "thank", "you", "ok", "okay", "k", "sure", "fine", "alright", "great", "good", "cool", "hi", "hello", "hey",
+    "morning", "evening", "please", "welcome", "got", "it", "understood", "bye", "i", "im", "am", "its", "is", "was",
+    "for", "since", "about", "around", "almost", "nearly", "maybe", "a", "an", "the", "few", "couple", "of", "last", "past",
+    "minute", "minutes", "hour", "hours", "day", "days", "week", "weeks", "month", "months", "year", "years", "yesterday",
+    "today", "tonight", "night", "ago", "once", "twice", "times", "half", "and", "or", "more", "less", "than", "really",
+    "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "old", "male", "female",
+}
+
+# Words of a quantity / duration answer ("2 days", "about a week", "since yesterday")
+QUANTITY_WORDS = {
+    "minute", "minutes", "hour", "hours", "day", "days", "week", "weeks", "month", "months", "year", "years",
+    "yesterday", "today", "tonight", "night", "morning", "evening", "ago", "once", "twice", "times", "half", "few", "couple",
+    "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+}
+
+MAX_BENIGN_TOKENS = 8
+_CLAUSE_SPLIT = re.compile(r"[.,;!?\n]|\bbut\b|\bhowever\b")
+
+
+def normalize(text: str) -> str:
+    text = (text or "").lower().replace("'", "").replace("’", "")
+    return re.sub(r"[^a-z0-9ऀ-෿]+", " ", text).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    return normalize(text).split()
+
+
+def _head_phrases(symptom: str) -> List[str]:
+    """
+    'Severe respiratory distress (Grunting, ...)' -> ['severe respiratory distress']
+    'Anaphylaxis: Sudden breathing difficulty + ...' -> ['anaphylaxis']
+    'Chest pain with sweating/nausea' -> ['chest pain with sweating', 'chest pain with nausea']
+    """
+    head = re.split(r"[(:]", symptom)[0]
+    head = re.split(r"\s+-\s+", head)[0]
+    words = head.split()
+    phrases = [head]
+    for idx, word in enumerate(words):
+        if "/" in word:
+            # Expand "weakness/numbness" style alternatives in place
+            phrases = [" ".join(words[:idx] + [alt] + words[idx + 1:]) for alt in word.split("/") if alt]
+            break
+    return [normalize(p) for p in phrases if normalize(p)]
+
+
+class EmergencyMatcher:
+    """
+    Deterministic pre-filter for the Emergency Scan.
+    Compiles every symptom phrase in 'emergency_rules.json' (plus lay synonyms) once,
+    into a token trie (Aho-Corasick style, longest match per position).
+    - EMERGENCY: an acute red-flag phrase (ACUTE_PHRASES) that is not negated, about the past
+      or about someone else's history, or "Yes" to a question about one.
+    - BENIGN: short messages with no clinical content ("thanks", "2 days", "No" to a routine question).
+    - AMBIGUOUS: everything else, including every other red-flag match, which still goes to the LLM.
+    """
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None, rules_path: str = RULES_PATH):
+        if rules is None:
+            rules = []
+            if os.path.exists(rules_path):
+                with open(rules_path, "r") as f:
+                    rules = json.load(f)
+        self.rules = rules
+        self._trie: Dict[str, Any] = {}
+        self.phrase_count = 0
+        self.counters = {EMERGENCY: 0, BENIGN: 0, AMBIGUOUS: 0}
+
+        for rule in rules:
+            category = rule.get("category", "Emergency")
+            for symptom in rule.get("symptoms", []):
+                for phrase in _head_phrases(symptom):
+                    if " " not in phrase and phrase not in SPECIFIC_SINGLE_WORDS:
+                        continue
+                    self._add(phrase, category)
+                    for synonym in SYNONYMS.get(phrase, []):
+                        self._add(normalize(synonym), category)
+
+        # Synonym groups whose key is a shortened rule head (e.g. "sudden weakness")
+        for phrase, synonyms in SYNONYMS.items():
+            for p in [phrase] + synonyms:
+                self._add(normalize(p), "Red Flag (Synonym)", overwrite=False)
+
+        # Compact rules summary for the LLM prompt (all categories, built once)
+        self.rules_context = json.dumps([
+            {"category": r.get("category"), "symptoms": r.get("symptoms", []), "action": r.get("action")}
+            for r in rules
+        ])
+
+    def _add(self, phrase: str, category: str, overwrite: bool = True):
+        tokens = phrase.split()
+        if not tokens:
+            return
+        node = self._trie
+        for tok in tokens:
+            node = node.setdefault(tok, {})
+        if "$" not in node:
+            self.phrase_count += 1
+        if overwrite or "$" not in node:
+            node["$"] = (phrase, category)
+
+    def find(self, text: str, skip_negated: bool = True) -> List[Dict[str, Any]]:
+        """
+        Returns red-flag phrases found in text (longest match per position). `acute` is set
+        for ACUTE_PHRASES outside a clause about the past or about someone else's history.
+        """
+        hits = []
+        for clause in _CLAUSE_SPLIT.split(normalize(text)):
+            tokens = clause.split()
+            token_set = set(tokens)
+            history = bool(HISTORY_CUES.search(clause)) or bool(token_set & OTHER_PERSON_CUES and token_set & PAST_VERBS)
+            i = 0
+            while i < len(tokens):
+                node, j, match = self._trie, i, None
+                while j < len(tokens) and tokens[j] in node:
+                    node = node[tokens[j]]
+                    j += 1
+                    if "$" in node:
+                        match = (node["$"], j)
+                if match:
+                    (phrase, category), end = match
+                    negated = any(t in NEGATION_CUES for t in tokens[max(0, i - 4):i])
+                    if not (skip_negated and negated):
+                        hits.append({"phrase": phrase, "category": category, "acute": phrase in ACUTE_PHRASES and not history})
+                    i = end
+                else:
+                    i += 1
+        return hits
+
+    def classify(self, user_msg: str, last_ai_msg: str = "") -> Dict[str, Any]:
+        verdict = self._classify(user_msg, last_ai_msg or "")
+        self.counters[verdict["verdict"]] += 1
+        return verdict
+
+    def _classify(self, user_msg: str, last_ai_msg: str) -> Dict[str, Any]:
+        hits = self.find(user_msg)
+        acute = [h for h in hits if h["acute"]]
+        if acute:
+            return {"verdict": EMERGENCY, "matches": acute, "reason": f"Red flag reported: {acute[0]['phrase']} ({acute[0]['category']})"}
+        if hits:
+            return {"verdict": AMBIGUOUS, "matches": hits, "reason": f"Possible red flag, needs context: {hits[0]['phrase']}"}
+
+        tokens = tokenize(user_msg)
+        if not tokens:
+            return {"verdict": BENIGN, "matches": [], "reason": "Empty message"}
+        if len(tokens) > MAX_BENIGN_TOKENS or any(t in WATCH_TERMS for t in tokens):
+            return {"verdict": AMBIGUOUS, "matches": [], "reason": "Clinical content"}
+
+        # Short answers are judged against the question they answer
+        question_hits = self.find(last_ai_msg, skip_negated=False)
+        question_tokens = set(tokenize(last_ai_msg))
+        ability_question = bool(question_tokens & ABILITY_CUES)
+        affirm = any(t in AFFIRMATIONS for t in tokens)
+        deny = any(t in DENIALS for t in tokens)
+        content_tokens = [t for t in tokens if t not in AFFIRMATIONS and t not in DENIALS]
+
+        if affirm or deny:
+            if affirm and deny:
+                return {"verdict": AMBIGUOUS, "matches": [], "reason": "Mixed answer"}
+            if question_hits:
+                if ability_question:
+                    return {"verdict": AMBIGUOUS, "matches": question_hits, "reason": "Answer to ability question about a red flag"}
+                acute = [h for h in question_hits if h["acute"]]
+                if affirm and acute:
+                    return {"verdict": EMERGENCY, "matches": acute, "reason": f"Confirmed red flag: {acute[0]['phrase']} ({acute[0]['category']})"}
+                if affirm:
+                    return {"verdict": AMBIGUOUS, "matches": question_hits, "reason": "Confirmed possible red flag - needs context"}
+            elif affirm and question_tokens & WATCH_TERMS:
+                return {"verdict": AMBIGUOUS, "matches": [], "reason": "Confirmed symptom - needs context"}
+            elif deny and ability_question:
+                # "No" to "Is the child able to drink?" is a positive finding
+                return {"verdict": AMBIGUOUS, "matches": [], "reason": "Negative answer to ability question"}
+        elif (question_hits or question_tokens & WATCH_TERMS) and not any(t.isdigit() or t in QUANTITY_WORDS for t in content_tokens):
+            # "ok" to "Do you feel confused?" is neither a yes, a no nor a duration
+            return {"verdict": AMBIGUOUS, "matches": question_hits, "reason": "Unclear answer to a clinical question"}
+
+        if all(t in BENIGN_WORDS or t.isdigit() for t in content_tokens):
+            return {"verdict": BENIGN, "matches": [], "reason": "No clinical content"}
+        return {"verdict": AMBIGUOUS, "matches": [], "reason": "Unrecognized content"}
+
+    def has_clinical_content(self, text: str) -> bool:
+        """
+        False for bare answers that add nothing searchable on their own
+        ("yes", "no", "3 days", "ok thanks"). Used by retrieval to reuse the previous turn's protocols.
+        """
+        tokens = tokenize(text)
+        if len(tokens) > MAX_BENIGN_TOKENS or any(t in WATCH_TERMS for t in tokens) or self.find(text, skip_negated=False):
+            return True
+        return not all(t in BENIGN_WORDS or t in AFFIRMATIONS or t in DENIALS or t.isdigit() for t in tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(self.counters.values())
+        skipped = self.counters[EMERGENCY] + self.counters[BENIGN]
+        return {
+            "phrases": self.phrase_count,
+            "verdicts": dict(self.counters),
+            "llm_calls_avoided": skipped,
+            "llm_avoid_rate": round(skipped / total, 3) if total else 0.0,
+        }
+
+
+# Compiled once at startup
+emergency_matcher = EmergencyMatcher()
@@ -1,51 +1,94 @@
-
-from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph, START, END
+from app.agent.checkpointer import build_checkpointer
+from app.core.container import container
+from app.core.tracing import tracer
 
 from app.agent.state import TriageState
 from app.agent.nodes.retrieval import retrieval_node
 from app.agent.nodes.diagnostician import diagnostician_node
 from app.agent.nodes.strategist import strategist_node
 from app.agent.nodes.fact_extraction import fact_extraction_node
+from app.agent.nodes.triage_join import triage_join_node
+from app.agent.nodes.context import context_node
+from app.agent.nodes.reasoning import reasoning_node
+from app.core.config import settings
 
 from app.agent.nodes.emergency import emergency_scan_node
 
-def build_graph():
+# --- Staged branches ---
+# Fact Extraction and Retrieval run in parallel with the Emergency Scan, so they
+# write to staging keys. 'triage_join' commits them only if the turn is not an EMERGENCY.
+async def staged_fact_extraction_node(state):
+    result = await fact_extraction_node(state)
+    return {"staged_facts": result.get("investigated_facts")}
+
+def staged_retrieval_node(state):
+    # Sync (ONNX + Chroma): LangGraph runs it in its executor, off the event loop
+    result = retrieval_node(state)
+    return {"staged_protocols": result.get("retrieved_protocols")}
+
+def resolve_reasoning_mode(mode=None):
+    mode = (mode or settings.REASONING_MODE or "split").strip().lower()
+    if mode not in ("split", "fused"):
+        print(f"WARN: Unknown REASONING_MODE '{mode}', using 'split'")
+        mode = "split"
+    return mode
+
+def build_graph(checkpointer=None, reasoning_mode=None):
+    """
+    split: Fact Extraction runs in parallel with the scan, the Diagnostician after the join.
+    fused: a single Reasoning call after the join does both (one LLM call less per turn).
+    """
+    mode = resolve_reasoning_mode(reasoning_mode)
     workflow = StateGraph(TriageState)
     
     # Add Nodes
-    workflow.add_node("emergency_scan", emergency_scan_node)
-    workflow.add_node("retrieval", retrieval_node)
-    workflow.add_node("diagnostician", diagnostician_node)
-    workflow.add_node("strategist", strategist_node)
-    
-    workflow.add_node("fact_extraction", fact_extraction_node)
+    workflow.add_node("context", tracer.traced("node", "context")(context_node))
+    workflow.add_node("emergency_scan", tracer.traced("node", "emergency_scan")(emergency_scan_node))
+    workflow.add_node("retrieval", tracer.traced("node", "retrieval")(staged_retrieval_node))
+    workflow.add_node("triage_join", tracer.traced("node", "triage_join")(triage_join_node))
+    if mode == "fused":
+        workflow.add_node("reasoning", tracer.traced("node", "reasoning")(reasoning_node))
+        branches, next_node = ["emergency_scan", "retrieval"], "reasoning"
+    else:
+        workflow.add_node("fact_extraction", tracer.traced("node", "fact_extraction")(staged_fact_extraction_node))
+        workflow.add_node("diagnostician", tracer.traced("node", "diagnostician")(diagnostician_node))
+        branches, next_node = ["emergency_scan", "fact_extraction", "retrieval"], "diagnostician"
+    workflow.add_node("strategist", tracer.traced("node", "strategist")(strategist_node))
     
     # Define Edges
-    workflow.set_entry_point("emergency_scan")
+    # Digest + shared prompt context first (pure Python, well under a millisecond)
+    workflow.add_edge(START, "context")
+
+    # Fan-out: the branches only need the latest human/AI message pair and the shared context
+    for branch in branches:
+        workflow.add_edge("context", branch)
+    
+    # Fan-in: waits for all branches
+    workflow.add_edge(branches, "triage_join")
     
     def decide_after_scan(state):
         if state.get("triage_decision") == "EMERGENCY":
             return END
-        return "fact_extraction"
+        return next_node
 
     workflow.add_conditional_edges(
-        "emergency_scan",
+        "triage_join",
         decide_after_scan,
         {
             END: END,
-            "fact_extraction": "fact_extraction"
+            next_node: next_node
         }
     )
     
-    workflow.add_edge("fact_extraction", "retrieval")
-    workflow.add_edge("retrieval", "diagnostician")
-    workflow.add_edge("diagnostician", "strategist")
+    workflow.add_edge(next_node, "strategist")
     workflow.add_edge("strategist", END)
 
     
-    # Memory
-    memory = MemorySaver()
-    return workflow.compile(checkpointer=memory)
+    # Memory (persistent + bounded, see app/agent/checkpointer.py)
+    return workflow.compile(checkpointer=checkpointer)
 
-agent_graph = build_graph()
+container.register("checkpointer", build_checkpointer)
+# Needed to compile the graph, so it is created at import
+checkpointer = container.get("checkpointer")
+agent_graph = build_graph(checkpointer)
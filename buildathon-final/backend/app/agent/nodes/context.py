@@ -0,0 +1,38 @@
+from typing import Dict, Any, Optional
+from app.core.config import settings
+from app.agent.context_window import update_digest, render_context
+
+
+def shared_context(state: Dict[str, Any], facts: Optional[Dict[str, Any]] = None, cap_facts: bool = True) -> str:
+    """
+    The size-capped context string for node prompts. Uses the stored digest when the
+    'context' node has run, else builds one (nodes called directly, e.g. in tests).
+    """
+    messages = state.get("messages", [])
+    digest = state.get("conversation_digest") or update_digest(None, messages)
+    return render_context(
+        digest,
+        facts if facts is not None else state.get("investigated_facts"),
+        messages,
+        settings.CONTEXT_TOKEN_BUDGET,
+        state.get("differential_diagnosis"),
+        cap_facts=cap_facts,
+    )
+
+
+def summary_context(state: Dict[str, Any]) -> str:
+    """
+    Context for the final summary and the emergency payload: every investigated fact (the
+    symptoms reported / denied come from them), only the recent turns are capped.
+    """
+    return shared_context(state, cap_facts=False)
+
+
+async def context_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    First node of every turn: folds the new messages into the conversation digest and
+    renders the shared context, so prompt size stays bounded however long the chat gets.
+    """
+    digest = update_digest(state.get("conversation_digest"), state.get("messages", []))
+    context = shared_context({**state, "conversation_digest": digest})
+    return {"conversation_digest": digest, "conversation_context": context}
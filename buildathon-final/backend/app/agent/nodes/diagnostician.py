@@ -1,25 +1,98 @@
-from typing import Dict, Any
-from app.core.config import settings
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+from typing import Dict, Any, List
+import difflib
 
-# Using OpenAI Client for GPT-OSS-120b (as per original successful config)
-from groq import Groq
+# GPT-OSS-120b via the shared async gateway (as per original successful config)
+from app.core.llm_gateway import llm_gateway
 import json # [FIX] Add global import
+from app.core.config import settings
+from app.agent.context_window import cap_blocks
+from app.agent.nodes.context import shared_context
 
-client = Groq(api_key=settings.GROQ_API_KEY)
-
-def simple_invoke(prompt):
-    completion = client.chat.completions.create(
-        model="openai/gpt-oss-120b",
-        messages=[{"role": "user", "content": prompt}],
+async def simple_invoke(prompt):
+    return await llm_gateway.chat(
+        "openai/gpt-oss-120b",
+        [{"role": "user", "content": prompt}],
         response_format={"type": "json_object"},
         temperature=0
     )
-    return completion.choices[0].message.content
 
-def diagnostician_node(state: Dict[str, Any]) -> Dict[str, Any]:
+def is_similar(a, b, threshold=0.6):
+    """Check if strings are similar using SequenceMatcher"""
+    return difflib.SequenceMatcher(None, a.lower(), b.lower()).ratio() > threshold
+
+
+def initial_plan(messages, new_questions: List[str], differential: List[str]) -> Dict[str, Any]:
+    """State update of an INITIAL assessment (shared with the fused reasoning node)."""
+    # Deduplicate against history broadly (simple string check)
+    history_str = "\n".join(m.content for m in messages[-20:]).lower()
+    final_checklist = [q for q in new_questions if q.lower() not in history_str]
+    
+    return {
+        "differential_diagnosis": differential,
+        "safety_checklist": final_checklist,
+        "triage_decision": "PENDING"
+    }
+
+
+def follow_up_plan(state: Dict[str, Any], remaining_checklist: List[str], new_additions: List[str], differential: List[str], stop_asking: bool) -> Dict[str, Any]:
+    """State update of a FOLLOW-UP turn (shared with the fused reasoning node)."""
+    messages = state.get("messages", [])
+    
+    # ROBUST PYTHON DEDUPLICATION
+    # The LLM failed to follow the "Do not repeat" instruction.
+    # We must enforce this with code.
+
+    # Gather all "Forbidden" questions (History + Investigated List)
+    investigated = state.get("investigated_symptoms", [])
+    
+    # Also extract questions from recent AI messages in history
+    message_history_texts = [m.content for m in messages if m.type == 'ai']
+    
+    forbidden_list = investigated + message_history_texts
+    
+    cleaned_new_questions = []
+    
+    for new_q in new_additions:
+        # 1. Skip if empty
+        if not new_q or len(new_q) < 5: 
+            continue
+            
+        is_dup = False
+        for forbidden in forbidden_list:
+            # Check similarity
+            if is_similar(new_q, forbidden):
+                print(f"DEBUG: Deduped '{new_q}' vs '{forbidden}'")
+                is_dup = True
+                break
+        
+        # Double check against remaining checklist (don't add duplicates to current list)
+        for existing_planned in remaining_checklist:
+             if is_similar(new_q, existing_planned):
+                 is_dup = True
+                 break
+        
+        if not is_dup:
+            cleaned_new_questions.append(new_q)
+    
+    # Combine
+    updated_checklist = remaining_checklist + cleaned_new_questions
+    
+    # Check for completion
+    # If checklist empty and no valid new questions -> COMPLETE
+    status = "COMPLETE" if not updated_checklist and not remaining_checklist else "PENDING"
+    if stop_asking: status = "COMPLETE"
+    
+    if status == "COMPLETE":
+         updated_checklist = []
+    
+    return {
+        "differential_diagnosis": differential,
+        "safety_checklist": updated_checklist,
+        "triage_decision": status 
+    }
+
+
+async def diagnostician_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     The Diagnostician:
     1. Analyzes symptoms.
@@ -31,17 +104,9 @@ def diagnostician_node(state: Dict[str, Any]) -> Dict[str, Any]:
     current_checklist = state.get("safety_checklist", [])
     
     
-    # Context
-    history_list = [f"{m.type}: {m.content}" for m in messages[-20:]]
-    history_str = "\n".join(history_list)
-    knowledge = "\n\n".join(protocols)
-    
-    # Structured Memory
-    investigated = state.get("investigated_symptoms", [])
-    investigated_facts = state.get("investigated_facts", {})
-    
-    investigated_str = ", ".join(investigated)
-    facts_str = json.dumps(investigated_facts, indent=2) if investigated_facts else "None"
+    # Context: digest (facts, questions asked) + recent turns, capped (see app/agent/context_window.py)
+    context_str = state.get("conversation_context") or shared_context(state)
+    knowledge = "\n\n".join(cap_blocks(protocols, settings.CONTEXT_KNOWLEDGE_TOKENS))
     
     # --- LOGIC SPLIT ---
     if not current_checklist:
@@ -49,11 +114,8 @@ def diagnostician_node(state: Dict[str, Any]) -> Dict[str, Any]:
         prompt = f"""
         You are an Expert Diagnostic AI conducting a focused medical assessment.
         
-        PATIENT HISTORY:
-        {history_str}
-        
-        KNOWN CLINICAL FACTS (DO NOT ASK ABOUT THESE):
-        {facts_str}
+        PATIENT CONTEXT (known facts and questions already asked: DO NOT ASK ABOUT THESE):
+        {context_str}
         
         MEDICAL KNOWLEDGE (Guidelines):
         {knowledge}
@@ -65,7 +127,7 @@ def diagnostician_node(state: Dict[str, Any]) -> Dict[str, Any]:
         3. Ask questions that help rule out serious conditions.
         
         CRITICAL RULES:
-        - CHECK HISTORY & FACTS: Do NOT ask about questions already mentioned in HISTORY or EXISTING FACTS.
+        - CHECK CONTEXT: Do NOT ask about anything already in the KNOWN FACTS, the QUESTIONS ALREADY ASKED or the RECENT TURNS.
         - ONE SYMPTOM PER QUESTION: Do not group symptoms unless necessary.
         - PARTIAL KNOWLEDGE: If you want to ask "Do you have X or Y?", check if X is already known. If X is "Denied", ask ONLY "Do you have Y?".
         
@@ -77,19 +139,11 @@ def diagnostician_node(state: Dict[str, Any]) -> Dict[str, Any]:
         """
         try:
             # [FIX] Removed redundant local import
-            result_str = simple_invoke(prompt)
+            result_str = await simple_invoke(prompt)
             print(f"DEBUG: Initial Diagnosis Output:\n{result_str}")
             result = json.loads(result_str.replace("```json", "").replace("```", "").strip())
             
-            new_questions = result.get("new_questions", [])
-            # Deduplicate against history broadly (simple string check)
-            final_checklist = [q for q in new_questions if q.lower() not in history_str.lower()]
-            
-            return {
-                "differential_diagnosis": result.get("differential_diagnosis", []),
-                "safety_checklist": final_checklist,
-                "triage_decision": "PENDING"
-            }
+            return initial_plan(messages, result.get("new_questions", []), result.get("differential_diagnosis", []))
         except Exception as e:
             print(f"Error in Initial Diagnosis: {e}")
             return {}
@@ -104,26 +158,20 @@ def diagnostician_node(state: Dict[str, Any]) -> Dict[str, Any]:
         prompt = f"""
         You are an Expert Diagnostic AI.
         
-        PATIENT HISTORY:
-        {history_str}
-
-        KNOWN CLINICAL FACTS (DO NOT ASK ABOUT THESE):
-        {facts_str}
+        PATIENT CONTEXT (Read carefully; known facts and questions already asked: DO NOT ASK ABOUT THESE):
+        {context_str}
         
         MEDICAL KNOWLEDGE:
         {knowledge}
         
-        FULL CONVERSATION HISTORY (Read carefully):
-        {history_str}
-        
         PENDING CHECKLIST: {remaining_checklist}
         LAST QUESTION ASKED: "{just_asked}"
         
         TASK:
         The user answered the last question.
-        1. Review the HISTORY above carefully.
+        1. Review the PATIENT CONTEXT above carefully.
         2. Do you need to add CRITICAL questions to narrow the diagnosis? (Max 2-3).
-        3. CRITICAL: DO NOT ASK ANY QUESTION THAT HAS ALREADY BEEN ASKED IN THE HISTORY OR FACTS.
+        3. CRITICAL: DO NOT ASK ANY QUESTION THAT HAS ALREADY BEEN ASKED OR IS ANSWERED IN THE FACTS.
            - Example: If history says "User: No neck stiffness", DO NOT ask "Do you have neck stiffness?".
         4. PARTIAL KNOWLEDGE: If you want to ask "Do you have X or Y?", check if X is already known. 
            - If X is "Denied", ask ONLY "Do you have Y?".
@@ -138,70 +186,17 @@ def diagnostician_node(state: Dict[str, Any]) -> Dict[str, Any]:
         
         try:
             # [FIX] Removed redundant local import
-            result_str = simple_invoke(prompt)
+            result_str = await simple_invoke(prompt)
             print(f"DEBUG: Follow-up Output:\n{result_str}")
             result = json.loads(result_str.replace("```json", "").replace("```", "").strip())
             
-            new_additions = result.get("new_questions_to_add", [])
-            
-            # 3. ROBUST PYTHON DEDUPLICATION
-            # The LLM failed to follow the "Do not repeat" instruction.
-            # We must enforce this with code.
-            
-            import difflib
-            
-            def is_similar(a, b, threshold=0.6):
-                """Check if strings are similar using SequenceMatcher"""
-                return difflib.SequenceMatcher(None, a.lower(), b.lower()).ratio() > threshold
-
-            # Gather all "Forbidden" questions (History + Investigated List)
-            investigated = state.get("investigated_symptoms", [])
-            
-            # Also extract questions from recent AI messages in history
-            message_history_texts = [m.content for m in messages if m.type == 'ai']
-            
-            forbidden_list = investigated + message_history_texts
-            
-            cleaned_new_questions = []
-            
-            for new_q in new_additions:
-                # 1. Skip if empty
-                if not new_q or len(new_q) < 5: 
-                    continue
-                    
-                is_dup = False
-                for forbidden in forbidden_list:
-                    # Check similarity
-                    if is_similar(new_q, forbidden):
-                        print(f"DEBUG: Deduped '{new_q}' vs '{forbidden}'")
-                        is_dup = True
-                        break
-                
-                # Double check against remaining checklist (don't add duplicates to current list)
-                for existing_planned in remaining_checklist:
-                     if is_similar(new_q, existing_planned):
-                         is_dup = True
-                         break
-                
-                if not is_dup:
-                    cleaned_new_questions.append(new_q)
-            
-            # Combine
-            updated_checklist = remaining_checklist + cleaned_new_questions
-            
-            # Check for completion
-            # If checklist empty and no valid new questions -> COMPLETE
-            status = "COMPLETE" if not updated_checklist and not remaining_checklist else "PENDING"
-            if result.get("stop_asking"): status = "COMPLETE"
-            
-            if status == "COMPLETE":
-                 updated_checklist = []
-            
-            return {
-                "differential_diagnosis": result.get("differential_diagnosis", []),
-                "safety_checklist": updated_checklist,
-                "triage_decision": status 
-            }
+            return follow_up_plan(
+                state,
+                remaining_checklist,
+                result.get("new_questions_to_add", []),
+                result.get("differential_diagnosis", []),
+                result.get("stop_asking", False),
+            )
             
         except Exception as e:
             print(f"Error in Follow-up: {e}")
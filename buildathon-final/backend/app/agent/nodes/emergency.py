@@ -1,21 +1,17 @@
 from typing import Dict, Any
 import json
-import os
-from langchain_groq import ChatGroq
-from app.core.config import settings
-from langchain_core.messages import SystemMessage, HumanMessage
+from app.core.llm_gateway import llm_gateway
+from app.agent.emergency_matcher import emergency_matcher, EMERGENCY, BENIGN
+from app.agent.nodes.context import shared_context, summary_context
 
-# Initialize LLM for fast scanning
-llm_scanner = ChatGroq(
-    model="llama-3.3-70b-versatile",
-    api_key=settings.GROQ_API_KEY,
-    temperature=0
-)
+# LLM for fast scanning
+SCAN_MODEL = "llama-3.3-70b-versatile"
 
-def emergency_scan_node(state: Dict[str, Any]) -> Dict[str, Any]:
+async def emergency_scan_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Scans the LATEST user message for life-threatening keywords/conditions.
-    Uses 'emergency_rules.json' context and LLM judgment.
+    Clear red flags and obviously benign turns are decided by the compiled
+    'emergency_rules.json' matcher; only ambiguous turns pay for LLM judgment.
     """
     try:
         messages = state.get("messages", [])
@@ -24,18 +20,10 @@ def emergency_scan_node(state: Dict[str, Any]) -> Dict[str, Any]:
             
         last_user_msg = messages[-1].content
         
-        # 1. Load Custom Rules if available
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-        rules_path = os.path.join(base_dir, "emergency_rules.json")
-        rules_context = ""
-        
-        if os.path.exists(rules_path):
-             with open(rules_path, "r") as f:
-                emergency_rules = json.load(f)
-                # Summarize rules for prompt
-                rules_context = json.dumps(emergency_rules[:5]) 
+        # 1. Custom Rules (compiled once at startup, all categories)
+        rules_context = emergency_matcher.rules_context
 
-        # 3. Contextual Analysis (Fix for "Yes" answers)
+        # Contextual Analysis (Fix for "Yes" answers)
         # If user says "Yes", we MUST know what they are saying "Yes" to.
         # We grab the last AI message.
         last_ai_msg = ""
@@ -44,52 +32,65 @@ def emergency_scan_node(state: Dict[str, Any]) -> Dict[str, Any]:
                 last_ai_msg = m.content
                 break
         
-        context_prompt = f"LAST QUESTION ASKED: '{last_ai_msg}'\nUSER ANSWER: '{last_user_msg}'"
-        
-        # DEFINITION OF HISTORY_STR (Restored)
-        history_str = "\n".join([f"{m.type}: {m.content}" for m in messages[-5:]])
-        
-        prompt = f"""
-        You are an EMERGENCY TRIAGE NURSE.
-        Your Job: Scan the conversation for life-threatening emergencies.
-        
-        RULES (JSON):
-        {rules_context}
-        
-        CONVERSATION CONTEXT:
-        {context_prompt}
-
-        FULL HISTORY:
-        {history_str}
+        # Shared digest (known facts, questions asked) + recent turns, capped
+        history_str = state.get("conversation_context") or shared_context(state)
         
-        CRITICAL CHECKS:
-        1. **MENINGITIS:** Fever + Neck Stiffness = EMERGENCY.
-        2. **HEART ATTACK:** Chest pain + Sweating/Radiating pain = EMERGENCY.
-        3. **STROKE:** Slurred speech, weakness = EMERGENCY.
+        # 2. Deterministic Pre-filter: instant verdict for clear hits / obviously benign turns
+        verdict = emergency_matcher.classify(last_user_msg, last_ai_msg)
+        print(f"DEBUG: Emergency pre-filter verdict: {verdict['verdict']} ({verdict['reason']})")
         
-        TASK:
-        - Analyze the "USER ANSWER" in the context of "LAST QUESTION ASKED".
-        - If Last Question was "Do you have neck stiffness?" and User says "Yes", TRIGGER EMERGENCY immediately.
-        - Do not wait for further confirmation.
-        
-        OUTPUT JSON ONLY:
-        {{
-            "is_emergency": true/false,
-            "reason": "Explain why (e.g., 'Fever + Neck Stiffness suggests Meningitis')",
-            "action": "Immediate Action required"
-        }}
-        """
+        if verdict["verdict"] == BENIGN:
+            return {"triage_decision": "ROUTINE"}
         
+        if verdict["verdict"] == EMERGENCY:
+            result = {
+                "is_emergency": True,
+                "reason": verdict["reason"],
+                "action": "Immediate Consultation Recommended"
+            }
+        else:
+            # 3. LLM Scan (ambiguous turns only)
+            context_prompt = f"LAST QUESTION ASKED: '{last_ai_msg}'\nUSER ANSWER: '{last_user_msg}'"
+            
+            prompt = f"""
+            You are an EMERGENCY TRIAGE NURSE.
+            Your Job: Scan the conversation for life-threatening emergencies.
+            
+            RULES (JSON):
+            {rules_context}
+            
+            CONVERSATION CONTEXT:
+            {context_prompt}
 
-        
-        response = llm_scanner.invoke([
-            SystemMessage(content="You are a strict JSON output bot."),
-            HumanMessage(content=prompt)
-        ])
-        
-        result_str = response.content.replace("```json", "").replace("```", "").strip()
-        result = json.loads(result_str)
-        
+            PATIENT CONTEXT:
+            {history_str}
+            
+            CRITICAL CHECKS:
+            1. **MENINGITIS:** Fever + Neck Stiffness = EMERGENCY.
+            2. **HEART ATTACK:** Chest pain + Sweating/Radiating pain = EMERGENCY.
+            3. **STROKE:** Slurred speech, weakness = EMERGENCY.
+            
+            TASK:
+            - Analyze the "USER ANSWER" in the context of "LAST QUESTION ASKED".
+            - If Last Question was "Do you have neck stiffness?" and User says "Yes", TRIGGER EMERGENCY immediately.
+            - Do not wait for further confirmation.
+            
+            OUTPUT JSON ONLY:
+            {{
+                "is_emergency": true/false,
+                "reason": "Explain why (e.g., 'Fever + Neck Stiffness suggests Meningitis')",
+                "action": "Immediate Action required"
+            }}
+            """
+            
+            response = await llm_gateway.chat(SCAN_MODEL, [
+                {"role": "system", "content": "You are a strict JSON output bot."},
+                {"role": "user", "content": prompt}
+            ], temperature=0)
+            
+            result_str = response.replace("```json", "").replace("```", "").strip()
+            result = json.loads(result_str)
+            
         if result.get("is_emergency"):
             print(f"🚨 EMERGENCY SCAN DETECTED: {result.get('reason')}")
             
@@ -103,7 +104,7 @@ def emergency_scan_node(state: Dict[str, Any]) -> Dict[str, Any]:
                 TASK: Generate a structured JSON object for the Doctor's Emergency Dashboard.
                 
                 CONTEXT:
-                {history_str}
+                {summary_context(state)}
                 
                 OUTPUT JSON (Strictly this structure):
                 {{
@@ -127,12 +128,10 @@ def emergency_scan_node(state: Dict[str, Any]) -> Dict[str, Any]:
                 }}
                 """
                 
-                payload_response = llm_scanner.invoke([
-                    SystemMessage(content="You are a strict JSON output bot."),
-                    HumanMessage(content=payload_prompt)
-                ])
-                
-                payload_json = json.loads(payload_response.content.replace("```json", "").replace("```", "").strip())
+                payload_json = await llm_gateway.chat_json(SCAN_MODEL, [
+                    {"role": "system", "content": "You are a strict JSON output bot."},
+                    {"role": "user", "content": payload_prompt}
+                ], temperature=0)
                 full_summary = payload_json.get("pre_doctor_consultation_summary")
                 
             except Exception as payload_err:
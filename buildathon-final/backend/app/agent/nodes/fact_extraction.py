@@ -1,11 +1,8 @@
 from typing import Dict, Any, List
-from app.core.config import settings
-from groq import Groq
+from app.core.llm_gateway import llm_gateway
 import json
 
-client = Groq(api_key=settings.GROQ_API_KEY)
-
-def fact_extraction_node(state: Dict[str, Any]) -> Dict[str, Any]:
+async def fact_extraction_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Extracts structured facts from the latest user message to prevent repetitive questioning.
     Updates 'investigated_facts' with key-value pairs of what we know.
@@ -46,7 +43,7 @@ def fact_extraction_node(state: Dict[str, Any]) -> Dict[str, Any]:
     AI ASKED: "{last_ai_msg_content}"
     USER ANSWERED: "{last_user_msg.content}"
     
-    EXISTING FACTS: {json.dumps(current_facts, indent=2)}
+    EXISTING FACTS: {json.dumps(current_facts, ensure_ascii=False)}
     
     INSTRUCTIONS:
     1. Extract new facts based on the USER'S ANSWER to the AI'S QUESTION.
@@ -68,15 +65,13 @@ def fact_extraction_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     
     try:
-        completion = client.chat.completions.create(
-            model="openai/gpt-oss-120b", # Fast model
-            messages=[{"role": "user", "content": prompt}],
+        new_facts = await llm_gateway.chat_json(
+            "openai/gpt-oss-120b", # Fast model
+            [{"role": "user", "content": prompt}],
             response_format={"type": "json_object"},
             temperature=0
         )
         
-        new_facts = json.loads(completion.choices[0].message.content)
-        
         # Merge with existing facts
         updated_facts = {**current_facts, **new_facts}
         
@@ -1,20 +1,16 @@
 from typing import Dict, Any, List
-from app.core.config import settings
-from groq import Groq
+from app.core.llm_gateway import llm_gateway
 import json
 
-client = Groq(api_key=settings.GROQ_API_KEY)
-
-def simple_invoke(prompt):
-    completion = client.chat.completions.create(
-        model="openai/gpt-oss-120b", # Using the capable model for complex synthesis
-        messages=[{"role": "user", "content": prompt}],
+async def simple_invoke(prompt):
+    return await llm_gateway.chat(
+        "openai/gpt-oss-120b", # Using the capable model for complex synthesis
+        [{"role": "user", "content": prompt}],
         response_format={"type": "json_object"},
         temperature=0
     )
-    return completion.choices[0].message.content
 
-def medical_history_node(state: Dict[str, Any]) -> Dict[str, Any]:
+async def medical_history_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     The Medical History Agent:
     1. Reads existing patient history (if any).
@@ -107,7 +103,7 @@ def medical_history_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     
     try:
-        result_str = simple_invoke(prompt)
+        result_str = await simple_invoke(prompt)
         print(f"DEBUG: Medical History Agent Output:\n{result_str}")
         result = json.loads(result_str.replace("```json", "").replace("```", "").strip())
         
@@ -0,0 +1,165 @@
+import json
+from typing import Dict, Any, List, Optional, Type
+from pydantic import BaseModel, Field, ValidationError
+from app.core.config import settings
+from app.core.llm_gateway import llm_gateway, clean_json
+from app.agent.context_window import cap_blocks
+from app.agent.nodes.context import shared_context
+from app.agent.nodes.diagnostician import diagnostician_node, initial_plan, follow_up_plan
+from app.agent.nodes.fact_extraction import fact_extraction_node
+
+# Same model as the split Fact Extraction / Diagnostician calls
+REASONING_MODEL = "openai/gpt-oss-120b"
+
+
+class FactsOutput(BaseModel):
+    """Fact Extraction half of the fused reply."""
+    new_facts: Dict[str, Any] = Field(default_factory=dict)
+
+
+class PlanOutput(BaseModel):
+    """Diagnostician half of the fused reply."""
+    differential_diagnosis: List[str] = Field(default_factory=list)
+    new_questions: List[str] = Field(default_factory=list)
+    stop_asking: bool = False
+
+
+class ReasoningOutput(FactsOutput, PlanOutput):
+    """Schema of the fused call. Each half is validated on its own (see reasoning_node)."""
+
+
+def validate_stage(model: Type[BaseModel], reply: Any, stage: str) -> Optional[BaseModel]:
+    try:
+        return model.model_validate(reply)
+    except ValidationError as e:
+        print(f"WARN: Fused reasoning {stage} rejected ({e.error_count()} schema errors)")
+        return None
+
+
+async def plan_with_facts(state: Dict[str, Any], facts: Dict[str, Any]) -> Dict[str, Any]:
+    """The Diagnostician call, with this turn's facts in its context."""
+    return await diagnostician_node({
+        **state,
+        "investigated_facts": facts,
+        "conversation_context": shared_context(state, facts=facts),
+    })
+
+
+async def split_reasoning(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Fact Extraction, then the Diagnostician with the new facts (two calls)."""
+    facts_update = await fact_extraction_node(state)
+    facts = facts_update.get("investigated_facts", state.get("investigated_facts"))
+    plan = await plan_with_facts(state, facts)
+    return {**facts_update, **plan}
+
+
+async def reasoning_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fused Fact Extraction + Diagnostician (REASONING_MODE=fused):
+    one call returns the new facts, the differential, the checklist additions and
+    stop_asking. The state update is the same as the split path's (facts merged,
+    questions deduplicated by the diagnostician's rules).
+    The facts and the plan are validated separately; only a half that fails is redone
+    with its split call (a reply that is not JSON at all redoes both).
+    """
+    messages = state.get("messages", [])
+    if not messages or messages[-1].type != "human":
+        return await diagnostician_node(state)
+
+    last_ai_msg = "None (Start of conversation)"
+    for msg in reversed(messages[:-1]):
+        if msg.type == "ai":
+            last_ai_msg = msg.content
+            break
+
+    current_facts = state.get("investigated_facts") or {}
+    current_checklist = state.get("safety_checklist", [])
+    context_str = state.get("conversation_context") or shared_context(state)
+    knowledge = "\n\n".join(cap_blocks(state.get("retrieved_protocols", []), settings.CONTEXT_KNOWLEDGE_TOKENS))
+
+    if not current_checklist:
+        plan_task = """MODE: INITIAL ASSESSMENT
+        Based on the patient's SPECIFIC symptom, create a FOCUSED plan:
+        identify potential conditions and 2-3 TARGETED, SINGLE-TOPIC questions that help rule out serious conditions."""
+        just_asked, remaining_checklist = None, []
+    else:
+        just_asked, remaining_checklist = current_checklist[0], current_checklist[1:]
+        plan_task = f"""MODE: FOLLOW-UP
+        PENDING CHECKLIST: {remaining_checklist}
+        The user answered "{just_asked}". Add CRITICAL questions only if they are needed to narrow
+        the diagnosis (max 2-3, else []). Set "stop_asking" to true if enough is known."""
+
+    prompt = f"""
+    You are a Clinical Reasoning Engine: fact extraction and diagnosis in one step.
+
+    PATIENT CONTEXT (known facts and questions already asked: DO NOT ASK ABOUT THESE):
+    {context_str}
+
+    MEDICAL KNOWLEDGE (Guidelines):
+    {knowledge}
+
+    LATEST EXCHANGE:
+    AI ASKED: "{last_ai_msg}"
+    USER ANSWERED: "{messages[-1].content}"
+
+    TASK 1 - FACTS ("new_facts"): the NEW or UPDATED facts in the USER'S ANSWER to the AI'S QUESTION.
+    - IMPLIED CONTEXT: AI: "Do you have rash?" -> User: "No" -> "rash": "Denied"
+    - COMPOUND QUESTIONS: "Do you have rash OR chills?" -> "No" -> "rash": "Denied", "chills": "Denied"
+    - Keys in snake_case (e.g. "Neck Stiffness" -> "neck_stiffness").
+
+    TASK 2 - PLAN:
+    {plan_task}
+
+    CRITICAL RULES:
+    - Do NOT ask about anything in the KNOWN FACTS, the questions already asked, the RECENT TURNS or your "new_facts".
+    - ONE SYMPTOM PER QUESTION: Do not group symptoms unless necessary.
+    - PARTIAL KNOWLEDGE: If X is "Denied", ask ONLY "Do you have Y?" instead of "Do you have X or Y?".
+
+    OUTPUT JSON ONLY:
+    {{
+        "new_facts": {{"fever_duration": "3 days", "rash": "Denied"}},
+        "differential_diagnosis": ["Viral fever", "Malaria"],
+        "new_questions": ["Any neck stiffness?"],
+        "stop_asking": false
+    }}
+    """
+
+    try:
+        content = await llm_gateway.chat(
+            REASONING_MODEL,
+            [{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+            temperature=0
+        )
+        print(f"DEBUG: Fused Reasoning Output:\n{content}")
+    except Exception as e:
+        print(f"Error in Fused Reasoning: {e}")
+        return {"safety_checklist": remaining_checklist} if current_checklist else {}
+
+    try:
+        reply = json.loads(clean_json(content))
+    except (AttributeError, ValueError):
+        reply = None
+    facts_result = validate_stage(FactsOutput, reply, "facts")
+    plan_result = validate_stage(PlanOutput, reply, "plan")
+    if facts_result is None and plan_result is None:
+        print("WARN: Fused reasoning output unusable, using the split path")
+        return await split_reasoning(state)
+
+    if facts_result is None:
+        print("WARN: Re-running Fact Extraction only")
+        facts_update = await fact_extraction_node(state)
+        facts = facts_update.get("investigated_facts", current_facts)
+    else:
+        facts = {**current_facts, **facts_result.new_facts}
+
+    if plan_result is None:
+        print("WARN: Re-running the Diagnostician only")
+        return {"investigated_facts": facts, **await plan_with_facts(state, facts)}
+
+    updates = {"investigated_facts": facts}
+    if just_asked is None:
+        updates.update(initial_plan(messages, plan_result.new_questions, plan_result.differential_diagnosis))
+    else:
+        updates.update(follow_up_plan(state, remaining_checklist, plan_result.new_questions, plan_result.differential_diagnosis, plan_result.stop_asking))
+    return updates
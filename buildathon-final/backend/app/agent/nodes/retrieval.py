@@ -1,50 +1,177 @@
 
+import contextvars
 import os
-import chromadb
 from typing import Dict, Any, List
-from langchain_groq import ChatGroq
 from app.core.config import settings
+from app.core.container import container
+from app.agent.retrieval_cache import RetrievalCache, normalize_query
+from concurrent.futures import ThreadPoolExecutor
+from app.agent.emergency_matcher import emergency_matcher
 
-# Initialize Clients
-# Initialize Clients
-chroma_client = chromadb.PersistentClient(path=settings.DB_PATH)
+# Heavy clients are created on first use (or during startup warm-up), not at import.
+# chromadb alone takes ~0.6s to import, so it is imported inside the factories.
+def _create_chroma_client():
+    import chromadb
+    return chromadb.PersistentClient(path=settings.DB_PATH)
 
-# [FIX] Switch to ONNX/FastEmbed for lightweight execution
-from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
 
-print("⚡ Using FastEmbed (ONNX) for embeddings...")
-ef = ONNXMiniLM_L6_V2()
+def _create_embedding_function():
+    # [FIX] Switch to ONNX/FastEmbed for lightweight execution
+    from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+    print("⚡ Using FastEmbed (ONNX) for embeddings...")
+    return ONNXMiniLM_L6_V2()
+
+
+def _create_collection(name: str):
+    # [Safe Fix] Use new collection names to avoid conflict with old embeddings
+    return container.get("chroma_client").get_or_create_collection(
+        name, embedding_function=container.get("embedding_function")
+    )
+
+
+container.register("chroma_client", _create_chroma_client)
+# The first inference loads the ONNX session (the model download on a fresh machine)
+container.register("embedding_function", _create_embedding_function, warm=lambda ef: ef(["warm up"]))
+container.register("col_rules", lambda: _create_collection("decision_rules_v2"))
+container.register("col_summaries", lambda: _create_collection("protocol_summaries_v2"))
+# Embedding + result LRU in front of Chroma (see app/agent/retrieval_cache.py)
+container.register(
+    "retrieval_cache", lambda: RetrievalCache(container.get("embedding_function"), db_path=settings.DB_PATH)
+)
+
+retrieval_cache = container.proxy("retrieval_cache")
+
+# Both collections are queried in the same round
+_query_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="retrieval")
+
+# Fact values that mean the symptom is NOT present
+NEGATIVE_FACT_VALUES = {"denied", "absent", "no", "none", "false", "negative", "not present", "unknown", "n/a", ""}
+
+# Ranking: a chunk matched by several queries beats one matched by a single query at a similar distance
+MULTI_QUERY_BONUS = 0.05
+
+
+def build_queries(state: Dict[str, Any]) -> List[str]:
+    """
+    Retrieval queries for this turn:
+    1. The last message, if it has clinical content of its own.
+    2. The current differential diagnosis (one query per hypothesis).
+    3. One query per present symptom in the fact sheet, newest first.
+    Facts and differential come from the previous turn (this node runs in parallel with
+    fact extraction); the last message covers what is new in this turn. Each fact is its own
+    query, so the facts of earlier turns hit the cache and a new fact costs one miss.
+    """
+    queries = []
+    messages = state.get("messages", [])
+    if messages:
+        last_msg = messages[-1].content
+        if emergency_matcher.has_clinical_content(last_msg):
+            queries.append(last_msg)
+
+    for diagnosis in (state.get("differential_diagnosis") or [])[:3]:
+        queries.append(str(diagnosis))
+
+    facts = state.get("investigated_facts") or {}
+    present = []
+    for key, value in facts.items():
+        if str(value).strip().lower() in NEGATIVE_FACT_VALUES:
+            continue
+        name = key.replace("_", " ").strip()
+        present.append(name if str(value).lower() in ("present", "yes", "true") else f"{name} {value}")
+    queries.extend(reversed(present))
+
+    # Dedupe (normalized), keep order, cap the batch
+    seen, unique = set(), []
+    for q in queries:
+        key = normalize_query(q)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(q)
+    return unique[:settings.RETRIEVAL_MAX_QUERIES]
+
+
+def rerank_hits(results_by_collection: Dict[str, List[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+    """
+    Merges the per-query hits of every collection. Chunks are deduplicated by content
+    (the same text can be stored in both collections) and ranked by their best
+    distance, with a bonus for each additional query that retrieved them.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for collection_name, per_query in results_by_collection.items():
+        for query_idx, result in enumerate(per_query):
+            ids = (result.get("ids") or [[]])[0]
+            docs = (result.get("documents") or [[]])[0]
+            metas = (result.get("metadatas") or [[]])[0]
+            distances = (result.get("distances") or [[]])[0]
+            for i, doc in enumerate(docs):
+                if not doc:
+                    continue
+                key = " ".join(doc.split())
+                distance = distances[i] if i < len(distances) and distances[i] is not None else 1.0
+                hit = merged.get(key)
+                if hit is None:
+                    merged[key] = {
+                        "id": ids[i] if i < len(ids) else None,
+                        "collection": collection_name,
+                        "document": doc,
+                        "metadata": (metas[i] if i < len(metas) else None) or {},
+                        "distance": distance,
+                        "queries": {query_idx},
+                    }
+                else:
+                    hit["distance"] = min(hit["distance"], distance)
+                    hit["queries"].add(query_idx)
+
+    for hit in merged.values():
+        hit["score"] = hit["distance"] - MULTI_QUERY_BONUS * (len(hit["queries"]) - 1)
+    return sorted(merged.values(), key=lambda h: h["score"])[:top_k]
+
+
+def format_hit(hit: Dict[str, Any]) -> str:
+    meta = hit["metadata"]
+    return f"[PROTOCOL: {meta.get('protocol', 'Unknown')}] [SECTION: {meta.get('section', 'SUMMARY')}]\n{hit['document']}"
 
-# [Safe Fix] Use new collection names to avoid conflict with old embeddings
-col_rules = chroma_client.get_or_create_collection("decision_rules_v2", embedding_function=ef)
-col_summaries = chroma_client.get_or_create_collection("protocol_summaries_v2", embedding_function=ef)
 
 def retrieval_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Intelligent Retrieval:
     1. Checks if we need new data (Context Persistence).
-    2. Retrieves Protocol Summaries (Context).
-    3. Retrieves Decision Rules (Actionable Logic).
+    2. Builds several queries from the fact sheet, differential and last message.
+    3. Embeds them in one batch and queries Decision Rules + Protocol Summaries together.
+    4. Deduplicates and reranks the merged hits.
     """
     messages = state.get("messages", [])
     last_msg = messages[-1].content
+    queries = build_queries(state)
     
-
+    # 1. Context Persistence: nothing to search for ("yes", "no", "3 days" on the first turns)
+    previous = state.get("retrieved_protocols")
+    if not queries:
+        if previous:
+            retrieval_cache.record_reuse()
+            print(f"🔎 Reusing previous protocols for: {last_msg}")
+            return {"retrieved_protocols": previous}
+        queries = [last_msg]
         
-    print(f"🔎 Retrieving for: {last_msg}")
+    print(f"🔎 Retrieving for {len(queries)} queries: {queries}")
     
-    # 2. Retrieve Decision Rules (The most important part)
-    # We query for the user's symptoms
-    results = col_rules.query(
-        query_texts=[last_msg],
-        n_results=3
-    )
+    # 2. Embed once (shared by both collections), then query both collections in parallel
+    embeddings = retrieval_cache.embed(queries)
+    n_results = settings.RETRIEVAL_RESULTS_PER_QUERY
+    # Each query runs in a copy of this context, so its spans nest under the retrieval node
+    futures = {
+        col.name: _query_pool.submit(contextvars.copy_context().run, retrieval_cache.query_many, col, queries, n_results, embeddings)
+        for col in (container.get("col_rules"), container.get("col_summaries"))
+    }
+    results_by_collection = {}
+    for name, future in futures.items():
+        try:
+            results_by_collection[name] = future.result()
+        except Exception as e:
+            print(f"Retrieval Error ({name}): {e}")
     
-    # Format for LLM
-    docs = []
-    if results['documents']:
-        for i, doc in enumerate(results['documents'][0]):
-            meta = results['metadatas'][0][i]
-            docs.append(f"[PROTOCOL: {meta['protocol']}] [SECTION: {meta['section']}]\n{doc}")
+    # 3. Merge, dedupe, rerank and format for LLM
+    hits = rerank_hits(results_by_collection, settings.RETRIEVAL_TOP_K)
+    docs = [format_hit(hit) for hit in hits]
             
     return {"retrieved_protocols": docs}
@@ -1,17 +1,28 @@
 from typing import Dict, Any
-from langchain_core.messages import AIMessage, SystemMessage, HumanMessage
-from langchain_groq import ChatGroq
-from app.core.config import settings
+from langchain_core.messages import AIMessage
+from langgraph.config import get_stream_writer
+from app.core.llm_gateway import llm_gateway, clean_json, JsonFieldStreamer
+from app.agent.nodes.context import summary_context
 import json
 
-# Initialize LLM for Summary Generation
-llm_summary = ChatGroq(
-    model="llama-3.3-70b-versatile",
-    api_key=settings.GROQ_API_KEY,
-    temperature=0
-)
+# LLM for Summary Generation
+SUMMARY_MODEL = "llama-3.3-70b-versatile"
 
-def strategist_node(state: Dict[str, Any]) -> Dict[str, Any]:
+ADVICE_PREFIX = "Assessment Complete. \n\n**Advice:** "
+
+
+def _stream_writer():
+    """
+    Returns LangGraph's custom stream writer, or a no-op when the node runs outside
+    a streaming graph run (direct calls, tests).
+    """
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda payload: None
+
+
+async def strategist_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     The Strategist:
     1. Picks the next question from the Checklist.
@@ -21,27 +32,25 @@ def strategist_node(state: Dict[str, Any]) -> Dict[str, Any]:
     
     if not checklist:
         # --- ASSESSMENT COMPLETE: GENERATE SUMMARY ---
+        # Stream the summary so /chat/stream can show the advice while the rest
+        # of the JSON (red flags, symptom lists) is still being generated.
+        writer = _stream_writer()
+        advice_started = False
+        advice_parts = []
         try:
-            messages = state.get("messages", [])
-            history_list = [f"{m.type}: {m.content}" for m in messages[-20:]]
-            history_str = "\n".join(history_list)
+            # Every investigated fact + digest, only the recent turns capped (see app/agent/context_window.py)
+            context_str = summary_context(state)
             
             diagnosis = state.get("differential_diagnosis", [])
             diagnosis_str = ", ".join(diagnosis) if diagnosis else "Undetermined viral/bacterial infection"
-            
-            facts = state.get("investigated_facts", {})
-            facts_str = json.dumps(facts, indent=2)
 
             print("DEBUG: Generating Final Patient Summary...")
 
             prompt = f"""
             You are a Senior Medical AI. The triage interview is complete.
             
-            PATIENT HISTORY:
-            {history_str}
-            
-            CLINICAL FACTS:
-            {facts_str}
+            PATIENT CONTEXT (clinical facts and conversation):
+            {context_str}
             
             POTENTIAL DIAGNOSIS: {diagnosis_str}
             
@@ -66,16 +75,30 @@ def strategist_node(state: Dict[str, Any]) -> Dict[str, Any]:
             }}
             """
             
-            response = llm_summary.invoke([
-                SystemMessage(content="You are a strict JSON output bot."),
-                HumanMessage(content=prompt)
-            ])
-            
-            result_str = response.content.replace("```json", "").replace("```", "").strip()
-            summary_json = json.loads(result_str)
+            advice = JsonFieldStreamer("clinical_guidelines")
+            chunks = []
+            async for delta in llm_gateway.stream_chat(SUMMARY_MODEL, [
+                {"role": "system", "content": "You are a strict JSON output bot."},
+                {"role": "user", "content": prompt}
+            ], temperature=0):
+                chunks.append(delta)
+                text = advice.feed(delta)
+                if text:
+                    if not advice_started:
+                        writer({"type": "token", "text": ADVICE_PREFIX})
+                        advice_started = True
+                    advice_parts.append(text)
+                    writer({"type": "token", "text": text})
+
+            summary_json = json.loads(clean_json("".join(chunks)))
             
-            # Construct the final polite message
-            final_msg = f"Assessment Complete. \n\n**Advice:** {summary_json.get('clinical_guidelines')}\n\n**Monitor for:** {', '.join(summary_json.get('red_flags_to_watch_out_for', []))}. \n\nYou can view your full report in the Medical Files."
+            # Construct the final polite message (starting with the advice as it was streamed)
+            advice_text = "".join(advice_parts) if advice_started else str(summary_json.get('clinical_guidelines'))
+            final_msg = f"{ADVICE_PREFIX}{advice_text}\n\n**Monitor for:** {', '.join(summary_json.get('red_flags_to_watch_out_for', []))}. \n\nYou can view your full report in the Medical Files."
+            if advice_started:
+                writer({"type": "token", "text": final_msg[len(ADVICE_PREFIX) + len(advice_text):]})
+            else:
+                writer({"type": "token", "text": final_msg})
 
             return {
                 "triage_decision": "COMPLETE", 
@@ -90,7 +113,15 @@ def strategist_node(state: Dict[str, Any]) -> Dict[str, Any]:
 
         except Exception as e:
             print(f"Error generating summary: {e}")
-            fallback_msg = "Assessment Complete. Please consult a doctor."
+            if advice_started:
+                # The advice already reached the client: keep it, so the final message
+                # is the streamed text plus the closing line
+                advice_text = "".join(advice_parts)
+                fallback_msg = f"{ADVICE_PREFIX}{advice_text}\n\nPlease consult a doctor if your symptoms worsen."
+                writer({"type": "token", "text": fallback_msg[len(ADVICE_PREFIX) + len(advice_text):]})
+            else:
+                fallback_msg = "Assessment Complete. Please consult a doctor."
+                writer({"type": "token", "text": fallback_msg})
             return {
                 "triage_decision": "COMPLETE",
                 "final_response": fallback_msg,
@@ -104,6 +135,8 @@ def strategist_node(state: Dict[str, Any]) -> Dict[str, Any]:
     # LOGGING: Mark this as investigated so we don't ask again
     current_investigated = state.get("investigated_symptoms", [])
     current_investigated.append(next_task)
+
+    _stream_writer()({"type": "token", "text": next_task})
     
     return {
         "final_response": next_task,
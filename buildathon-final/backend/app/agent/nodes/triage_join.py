@@ -0,0 +1,29 @@
+from typing import Dict, Any
+from app.agent.nodes.context import shared_context
+
+def triage_join_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fan-in after the parallel Emergency Scan / Fact Extraction / Retrieval branches.
+    1. If the scan raised an EMERGENCY, the staged facts/protocols are discarded.
+    2. Otherwise they are committed to 'investigated_facts' and 'retrieved_protocols'
+       (and the shared conversation context is re-rendered with the new facts).
+    The staging keys are always cleared so they never leak into the next turn.
+    """
+    updates = {"staged_facts": None, "staged_protocols": None}
+
+    if state.get("triage_decision") == "EMERGENCY":
+        print("DEBUG: Emergency detected - discarding staged facts/protocols.")
+        return updates
+
+    staged_facts = state.get("staged_facts")
+    if staged_facts is not None:
+        updates["investigated_facts"] = staged_facts
+        if state.get("conversation_digest"):
+            # The diagnostician and strategist see this turn's facts
+            updates["conversation_context"] = shared_context(state, facts=staged_facts)
+
+    staged_protocols = state.get("staged_protocols")
+    if staged_protocols is not None:
+        updates["retrieved_protocols"] = staged_protocols
+
+    return updates
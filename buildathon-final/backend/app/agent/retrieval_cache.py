@@ -0,0 +1,219 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from app.agent.emergency_matcher import normalize
+from app.core.ingestion import read_content_versions
+from app.core.tracing import tracer
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for a retrieval query: lowercase, punctuation stripped, whitespace collapsed."""
+    return " ".join(normalize(text).split())
+
+
+class _LRU:
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self.items: "OrderedDict[Any, Any]" = OrderedDict()
+
+    def get(self, key):
+        if key not in self.items:
+            return None
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.max_items:
+            self.items.popitem(last=False)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class RetrievalCache:
+    """
+    Two LRU layers in front of Chroma:
+    - embeddings: normalized query text -> ONNX embedding (misses are embedded in one batch)
+    - results: (collection, normalized text, n_results) -> raw query result
+    Results of a collection are dropped when its content version changes. Versions come from
+    the marker the ingestion CLI writes into `db_path` (see app/core/ingestion.py), one small
+    file read at most every `version_check_seconds`; without `db_path` results are kept until
+    invalidate().
+    """
+
+    def __init__(
+        self,
+        embedding_function: Callable[[List[str]], List[Any]],
+        max_embeddings: int = 4096,
+        max_results: int = 2048,
+        version_check_seconds: float = 10.0,
+        db_path: Optional[str] = None,
+    ):
+        self.embedding_function = embedding_function
+        self.version_check_seconds = version_check_seconds
+        self.db_path = db_path
+        self._embeddings = _LRU(max_embeddings)
+        self._results = _LRU(max_results)
+        self._versions: Dict[str, Any] = {}
+        self._version_checked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.counters = {
+            "embedding_hits": 0, "embedding_misses": 0,
+            "result_hits": 0, "result_misses": 0,
+            "turns_reused": 0, "invalidations": 0,
+        }
+        self.onnx_seconds = 0.0
+        self.query_seconds = 0.0
+
+    # --- Timing averages (used to estimate the time saved by hits) ---
+    def _avg_embed_seconds(self) -> float:
+        misses = self.counters["embedding_misses"]
+        return self.onnx_seconds / misses if misses else 0.0
+
+    def _avg_query_seconds(self) -> float:
+        misses = self.counters["result_misses"]
+        return self.query_seconds / misses if misses else 0.0
+
+    # --- Embeddings ---
+    def embed(self, texts: List[str]) -> List[Any]:
+        keys = [normalize_query(t) for t in texts]
+        vectors: List[Any] = [None] * len(keys)
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._embeddings.get(key)
+                if cached is not None:
+                    vectors[i] = cached
+                    self.counters["embedding_hits"] += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+
+        if missing:
+            batch = list(missing.keys())
+            t0 = time.perf_counter()
+            with tracer.span("onnx", "embed", batch=len(batch)):
+                computed = self.embedding_function(batch)
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self.onnx_seconds += elapsed
+                self.counters["embedding_misses"] += len(batch)
+                for key, vector in zip(batch, computed):
+                    self._embeddings.put(key, vector)
+                    for i in missing[key]:
+                        vectors[i] = vector
+        return vectors
+
+    # --- Results ---
+    def _check_version(self, collection) -> None:
+        if self.db_path is None:
+            return
+        name = collection.name
+        now = time.monotonic()
+        if now - self._version_checked.get(name, float("-inf")) < self.version_check_seconds:
+            return
+        version = read_content_versions(self.db_path).get(name)
+        with self._lock:
+            self._version_checked[name] = now
+            known = name in self._versions
+            previous = self._versions.get(name)
+            self._versions[name] = version
+            if known and previous != version:
+                self._drop_collection(name)
+                self.counters["invalidations"] += 1
+                print(f"DEBUG: Retrieval cache invalidated for '{name}' (content version {previous} -> {version})")
+
+    def _drop_collection(self, name: str) -> None:
+        for key in [k for k in self._results.items if k[0] == name]:
+            del self._results.items[key]
+
+    def query(self, collection, text: str, n_results: int = 3, **kwargs) -> Dict[str, Any]:
+        """Cached equivalent of collection.query(query_texts=[text], n_results=n_results)."""
+        return self.query_many(collection, [text], n_results, **kwargs)[0]
+
+    def query_many(
+        self, collection, texts: List[str], n_results: int = 3, embeddings: Optional[List[Any]] = None, **kwargs
+    ) -> List[Dict[str, Any]]:
+        """
+        Cached multi-query lookup. Returns one single-query result per text.
+        All misses are embedded in one ONNX batch (unless `embeddings`, aligned with
+        `texts`, are passed in) and sent to Chroma in one query call.
+        """
+        self._check_version(collection)
+        extra = repr(sorted(kwargs.items()))
+        keys = [(collection.name, normalize_query(t), n_results, extra) for t in texts]
+        results: List[Any] = [None] * len(texts)
+        missing: Dict[Any, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._results.get(key)
+                if cached is not None:
+                    results[i] = cached
+                    self.counters["result_hits"] += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+
+        if missing:
+            batch_keys = list(missing.keys())
+            if embeddings is not None:
+                batch_embeddings = [embeddings[missing[k][0]] for k in batch_keys]
+            else:
+                batch_embeddings = self.embed([texts[missing[k][0]] for k in batch_keys])
+            t0 = time.perf_counter()
+            with tracer.span("chroma", collection.name, queries=len(batch_keys)):
+                raw = collection.query(query_embeddings=batch_embeddings, n_results=n_results, **kwargs)
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self.query_seconds += elapsed
+                self.counters["result_misses"] += len(batch_keys)
+                for j, key in enumerate(batch_keys):
+                    # Split the batched response back into single-query results
+                    single = {
+                        field: ([values[j]] if isinstance(values, list) and field != "included" else values)
+                        for field, values in raw.items()
+                    }
+                    self._results.put(key, single)
+                    for i in missing[key]:
+                        results[i] = single
+        return results
+
+    def record_reuse(self) -> None:
+        """A turn that reused the previous turn's protocols without querying at all."""
+        with self._lock:
+            self.counters["turns_reused"] += 1
+
+    def invalidate(self, collection_name: Optional[str] = None) -> None:
+        with self._lock:
+            if collection_name is None:
+                self._results.items.clear()
+                self._versions.clear()
+                self._version_checked.clear()
+            else:
+                self._drop_collection(collection_name)
+                self._versions.pop(collection_name, None)
+                self._version_checked.pop(collection_name, None)
+            self.counters["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self.counters)
+            embed_avg = self._avg_embed_seconds()
+            query_avg = self._avg_query_seconds()
+            embedding_lookups = c["embedding_hits"] + c["embedding_misses"]
+            result_lookups = c["result_hits"] + c["result_misses"]
+            # Embedding hits skip ONNX, result hits skip the Chroma query, reused turns skip both.
+            onnx_saved = (c["embedding_hits"] + c["turns_reused"]) * embed_avg
+            query_saved = (c["result_hits"] + c["turns_reused"]) * query_avg
+            return {
+                **c,
+                "embedding_hit_rate": round(c["embedding_hits"] / embedding_lookups, 3) if embedding_lookups else 0.0,
+                "result_hit_rate": round(c["result_hits"] / result_lookups, 3) if result_lookups else 0.0,
+                "cached_embeddings": len(self._embeddings),
+                "cached_results": len(self._results),
+                "onnx_ms_spent": round(self.onnx_seconds * 1000, 1),
+                "onnx_ms_saved": round(onnx_saved * 1000, 1),
+                "query_ms_saved": round(query_saved * 1000, 1),
+            }
@@ -25,6 +25,14 @@ class TriageState(TypedDict):
     safety_checklist: List[str] # The "Plan" ["Ask about fever", "Ask about stiffness"]
     investigated_symptoms: List[str] # Memory of what has been asked ["fever", "vomiting"]
     investigated_facts: Dict[str, Any] # [New] Structured memory of known facts {"fever_duration": "2 days"}
+
+    # Bounded prompt context (refreshed by the 'context' node at the start of every turn)
+    conversation_digest: Optional[Dict[str, Any]] # {"chief_complaint", "asked", "turns", "message_count"}
+    conversation_context: Optional[str] # Digest + recent turns, capped at CONTEXT_TOKEN_BUDGET
+    
+    # Fan-out staging (committed by 'triage_join' unless the scan returns EMERGENCY)
+    staged_facts: Optional[Dict[str, Any]]
+    staged_protocols: Optional[List[str]]
     
 
     # Decisions
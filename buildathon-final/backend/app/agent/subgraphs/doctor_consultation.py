@@ -1,6 +1,9 @@
 from langgraph.graph import StateGraph, END
 from app.agent.state import TriageState
-from app.core.firebase import firebase_service
+from app.core.tracing import tracer
+from app.core.dashboard_projection import dashboard_projection
+from app.core.availability import availability_service
+from app.core.booking_service import booking_service, slot_unavailable_reason
 import uuid
 from datetime import datetime
 
@@ -17,29 +20,13 @@ class DoctorConsultationSubgraph:
             print("WARN: No slot_id provided. Assuming Mock/Test Mode.")
             return {"booking_status": "checking"}
             
-        # V1.0: Real Slot Validation
-        slot = firebase_service.get_document("doctor_slots", slot_id)
-        if not slot:
-            print(f"ERROR: Slot {slot_id} not found.")
-            return {"booking_status": "failed", "final_advice": "Selected slot is invalid."}
-            
-        if slot.get("status") != "AVAILABLE":
-             print(f"ERROR: Slot {slot_id} is {slot.get('status')}")
-             return {"booking_status": "failed", "final_advice": "Selected slot is no longer available."}
-
-        # [NEW] Check for Expired Slots
-        try:
-            # Parse slot date and time (Assume format YYYY-MM-DD and HH:MM)
-            slot_date_str = slot.get("date")
-            slot_time_str = slot.get("start_time")
-            
-            if slot_date_str and slot_time_str:
-                slot_datetime = datetime.strptime(f"{slot_date_str} {slot_time_str}", "%Y-%m-%d %H:%M")
-                if slot_datetime < datetime.now():
-                    print(f"ERROR: Slot {slot_id} is in the past ({slot_datetime}).")
-                    return {"booking_status": "failed", "final_advice": "Selected slot has expired."}
-        except Exception as e:
-            print(f"WARN: Could not validate slot time: {e}")
+        # V1.0: Real Slot Validation (availability cache, Firestore on a miss).
+        # Fast rejection only: book_appointment_node re-checks inside the booking transaction.
+        slot = availability_service.get_slot(slot_id)
+        reason = slot_unavailable_reason(slot)
+        if reason:
+            print(f"ERROR: Slot {slot_id} rejected: {reason} ({slot.get('status') if slot else 'missing'})")
+            return {"booking_status": "failed", "final_advice": reason}
              
         return {"booking_status": "available"}
 
@@ -67,7 +54,7 @@ class DoctorConsultationSubgraph:
     def book_appointment_node(self, state: TriageState) -> dict:
         """
         Node 3: Book Appointment
-        Creates 'appointments' doc and updates 'doctor_slots' & 'cases'.
+        Creates 'appointments' doc and updates 'doctor_slots' & 'cases' (one transaction).
         """
         try:
             print("DEBUG: Executing book_appointment_node", flush=True)
@@ -114,25 +101,27 @@ class DoctorConsultationSubgraph:
                 "slot_time": state.get("appointment_time", datetime.utcnow().isoformat())
             }
             
-            firebase_service.save_record("appointments", appointment_record)
-            print(f"DEBUG: Appointment {appt_id} Created.")
-            
-            # 2. Lock the Slot (Atomic in prod, sequential here)
-            if slot_id:
-                firebase_service.update_document("doctor_slots", slot_id, {"status": "BOOKED"})
-                print(f"DEBUG: Slot {slot_id} Locked.")
-                
-            # 3. Update Case Status (Upsert to ensure case exists)
-            if case_id:
-                 # We don't have update_status in service yet, using generic update
-                 firebase_service.upsert_document("cases", case_id, {
-                     "status": "DOCTOR_ASSIGNED",
-                     "last_updated_at": datetime.utcnow().isoformat(),
-                     # Add basic case info if it's new
-                     "patient_id": profile_id, 
-                     "case_id": case_id
-                 })
-                 print(f"DEBUG: Case {case_id} Updated/Created as DOCTOR_ASSIGNED.")
+            # 2. Slot check + lock, appointment and case upsert as one unit
+            booking = booking_service.book(
+                slot_id,
+                appointment_record,
+                case_id=case_id,
+                case_patch={
+                    "status": "DOCTOR_ASSIGNED",
+                    "last_updated_at": datetime.utcnow().isoformat(),
+                    # Add basic case info if it's new
+                    "patient_id": profile_id,
+                    "case_id": case_id
+                },
+            )
+            if booking["status"] != "confirmed":
+                print(f"ERROR: Booking of slot {slot_id} failed: {booking['reason']}")
+                return {"booking_status": "failed", "final_advice": booking["reason"]}
+            appointment_doc_id = booking["appointment_doc_id"]
+            print(f"DEBUG: Appointment {appt_id} Created, Slot {slot_id} Locked, Case {case_id} DOCTOR_ASSIGNED.")
+
+            # 3. Doctor dashboard projection
+            dashboard_projection.on_appointment_booked(appointment_doc_id or appt_id, appointment_record)
             
             return {
                 "booking_status": "confirmed", 
@@ -145,9 +134,9 @@ class DoctorConsultationSubgraph:
     def build(self):
         workflow = StateGraph(TriageState)
         
-        workflow.add_node("check_availability", self.check_availability_node)
-        workflow.add_node("recommend_doctors", self.recommend_doctors_node)
-        workflow.add_node("book_appointment", self.book_appointment_node)
+        workflow.add_node("check_availability", tracer.traced("node", "check_availability")(self.check_availability_node))
+        workflow.add_node("recommend_doctors", tracer.traced("node", "recommend_doctors")(self.recommend_doctors_node))
+        workflow.add_node("book_appointment", tracer.traced("node", "book_appointment")(self.book_appointment_node))
         
         workflow.set_entry_point("check_availability")
         workflow.add_edge("check_availability", "recommend_doctors")
@@ -1,6 +1,8 @@
 from langgraph.graph import StateGraph, END
 from app.agent.state import TriageState
+from app.core.tracing import tracer
 from app.core.firebase import firebase_service
+from app.core.dashboard_projection import dashboard_projection
 import uuid
 from datetime import datetime
 
@@ -112,6 +114,7 @@ class MedicalRecordsSubgraph:
                 }
                 firebase_service.save_record("case_pre_doctor_summaries", doctor_summary_record)
                 print("DEBUG: Saved Doctor Summary")
+                dashboard_projection.on_summary_saved(case_id, doctor_summary_record)
                 
                 # Update Case Status
                 # In real app, we'd do a patch update. Here we rely on the service.
@@ -129,8 +132,8 @@ class MedicalRecordsSubgraph:
     def build(self):
         workflow = StateGraph(TriageState)
         
-        workflow.add_node("create_case", self.create_case_node)
-        workflow.add_node("save_summaries", self.save_summaries_node)
+        workflow.add_node("create_case", tracer.traced("node", "create_case")(self.create_case_node))
+        workflow.add_node("save_summaries", tracer.traced("node", "save_summaries")(self.save_summaries_node))
         
         workflow.set_entry_point("create_case")
         workflow.add_edge("create_case", "save_summaries")
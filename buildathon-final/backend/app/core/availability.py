@@ -0,0 +1,280 @@
+import bisect
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.firebase import firebase_service
+
+
+class DayTimeline:
+    """One doctor's AVAILABLE slots for one day as sorted interval arrays ("HH:MM" strings)."""
+
+    def __init__(self, slots: Iterable[Dict[str, Any]]):
+        ordered = sorted(slots, key=lambda s: (s.get("start_time", ""), s.get("end_time", ""), s.get("id", "")))
+        self.slots = ordered
+        self.starts = [s.get("start_time", "") for s in ordered]
+        # Slot with the latest end among those starting at or before i (slots may overlap)
+        self._max_end: List[str] = []
+        self._max_end_at: List[int] = []
+        for i, s in enumerate(ordered):
+            end = s.get("end_time", "")
+            if self._max_end and self._max_end[-1] >= end:
+                self._max_end.append(self._max_end[-1])
+                self._max_end_at.append(self._max_end_at[-1])
+            else:
+                self._max_end.append(end)
+                self._max_end_at.append(i)
+
+    def covering(self, hhmm: str) -> Optional[Dict[str, Any]]:
+        """A slot with start <= hhmm < end, if any."""
+        i = bisect.bisect_right(self.starts, hhmm)
+        if i and self._max_end[i - 1] > hhmm:
+            return self.slots[self._max_end_at[i - 1]]
+        return None
+
+    def next_after(self, hhmm: str) -> Optional[Dict[str, Any]]:
+        """First slot starting strictly after hhmm."""
+        i = bisect.bisect_right(self.starts, hhmm)
+        return self.slots[i] if i < len(self.slots) else None
+
+    def starting_between(self, start: str, end: str) -> List[Dict[str, Any]]:
+        """Slots with start <= start_time < end."""
+        return self.slots[bisect.bisect_left(self.starts, start):bisect.bisect_left(self.starts, end)]
+
+
+class AvailabilityService:
+    """
+    In-memory view of 'doctor_slots' for the availability hot paths (/get_slots, emergency doctors,
+    booking checks).
+    - A doctor's slots are loaded with one query (all dates); today's slots of all doctors with
+      one query (emergency ranking). Loads expire after `ttl` seconds.
+    - Slot create / delete / book keep it current (on_slot_* hooks), so reads don't go to Firestore.
+    - AVAILABLE slots are kept per (doctor, date) as a DayTimeline, answering "available now",
+      "next free slot" and "free slots in range" by binary search.
+    """
+
+    def __init__(self, firebase=None, ttl: float = 300.0):
+        self.firebase = firebase if firebase is not None else firebase_service
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._slots: Dict[str, Dict[str, Any]] = {}             # slot id -> slot (all statuses)
+        self._slot_seen: Dict[str, float] = {}                  # slot id -> last load / write
+        self._index: Dict[str, Dict[str, Set[str]]] = {}        # doctor -> date -> slot ids
+        self._timelines: Dict[Tuple[str, str], DayTimeline] = {}
+        self._doctor_loaded: Dict[str, float] = {}
+        self._date_loaded: Dict[str, float] = {}
+        self._writes = 0
+        self.version = 0  # bumped on every change (for callers caching derived results)
+
+    # --- Internal state ---
+    def _fresh(self, loaded_at: Optional[float]) -> bool:
+        return loaded_at is not None and time.monotonic() - loaded_at < self.ttl
+
+    def _put(self, slot_id: str, slot: Dict[str, Any]) -> None:
+        self._drop(slot_id)
+        slot = {**slot, "id": slot_id}
+        self._slots[slot_id] = slot
+        self._slot_seen[slot_id] = time.monotonic()
+        doctor_id, date = slot.get("doctor_id"), slot.get("date")
+        self._index.setdefault(doctor_id, {}).setdefault(date, set()).add(slot_id)
+        self._timelines.pop((doctor_id, date), None)
+
+    def _drop(self, slot_id: str) -> None:
+        slot = self._slots.pop(slot_id, None)
+        self._slot_seen.pop(slot_id, None)
+        if slot is None:
+            return
+        doctor_id, date = slot.get("doctor_id"), slot.get("date")
+        ids = self._index.get(doctor_id, {}).get(date)
+        if ids is not None:
+            ids.discard(slot_id)
+        self._timelines.pop((doctor_id, date), None)
+
+    def _changed(self) -> None:
+        self._writes += 1
+        self.version += 1
+
+    def _load(self, fetch, replaced) -> bool:
+        """Fetch outside the lock, then replace the cached slots matching `replaced(slot)`. False if a write raced."""
+        writes = self._writes
+        slots = fetch()
+        with self._lock:
+            clean = writes == self._writes
+            # Mock mode persists nothing: keep the slots written in this process
+            if clean and not getattr(self.firebase, "mock_mode", False):
+                for slot_id in [sid for sid, s in self._slots.items() if replaced(s)]:
+                    self._drop(slot_id)
+            for slot in slots:
+                # After a racing write the cached copy is newer than the fetched one
+                if slot.get("id") and (clean or slot["id"] not in self._slots):
+                    self._put(slot["id"], slot)
+            self.version += 1
+        return clean
+
+    def _ensure_doctor(self, doctor_id: str) -> None:
+        if self._fresh(self._doctor_loaded.get(doctor_id)):
+            return
+        if self._load(lambda: self.firebase.get_doctor_slots(doctor_id, status="ALL"),
+                      lambda s: s.get("doctor_id") == doctor_id):
+            self._doctor_loaded[doctor_id] = time.monotonic()
+
+    def _ensure_date(self, date: str) -> None:
+        if self._fresh(self._date_loaded.get(date)):
+            return
+        if self._load(lambda: self.firebase.get_slots_for_date(date, status="ALL"),
+                      lambda s: s.get("date") == date):
+            self._date_loaded[date] = time.monotonic()
+
+    def _timeline(self, doctor_id: str, date: str) -> Optional[DayTimeline]:
+        key = (doctor_id, date)
+        timeline = self._timelines.get(key)
+        if timeline is None:
+            ids = self._index.get(doctor_id, {}).get(date)
+            if not ids:
+                return None
+            timeline = DayTimeline(s for s in (self._slots[i] for i in ids) if s.get("status") == "AVAILABLE")
+            self._timelines[key] = timeline
+        return timeline
+
+    # --- Write hooks ---
+    def on_slot_created(self, slot_id: str, slot: Dict[str, Any]) -> None:
+        with self._lock:
+            self._put(slot_id, slot)
+            self._changed()
+
+    def on_slots_created(self, created: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        """Bulk form of on_slot_created: [(slot_id, slot)]."""
+        with self._lock:
+            for slot_id, slot in created:
+                self._put(slot_id, slot)
+            self._changed()
+
+    def on_slot_status(self, slot_id: str, status: str) -> None:
+        with self._lock:
+            slot = self._slots.get(slot_id)
+            if slot is not None:
+                self._put(slot_id, {**slot, "status": status})
+            self._changed()
+
+    def on_slot_deleted(self, slot_id: str) -> None:
+        with self._lock:
+            self._drop(slot_id)
+            self._changed()
+
+    def on_day_deleted(self, doctor_id: str, date: str) -> None:
+        with self._lock:
+            for slot_id in list(self._index.get(doctor_id, {}).get(date, ())):
+                self._drop(slot_id)
+            self._changed()
+
+    def on_all_deleted(self) -> None:
+        with self._lock:
+            for slot_id in list(self._slots):
+                self._drop(slot_id)
+            self._changed()
+
+    def invalidate_doctor(self, doctor_id: str) -> None:
+        """For bulk writes: the doctor's slots are reloaded on next use."""
+        with self._lock:
+            self._doctor_loaded.pop(doctor_id, None)
+            self._date_loaded.clear()
+            self._changed()
+
+    # --- Reads ---
+    def get_slot(self, slot_id: str) -> Optional[Dict[str, Any]]:
+        """A slot by ID; served from memory when loaded / written within `ttl`, else from Firestore."""
+        with self._lock:
+            if self._fresh(self._slot_seen.get(slot_id)):
+                return dict(self._slots[slot_id])
+        slot = self.firebase.get_document("doctor_slots", slot_id)
+        if slot and slot.get("doctor_id"):
+            with self._lock:
+                self._put(slot_id, slot)
+        return slot
+
+    def get_slots(self, doctor_id: str, status: str = "AVAILABLE") -> List[Dict[str, Any]]:
+        """Same result as FirebaseService.get_doctor_slots (status="ALL" for every slot)."""
+        self._ensure_doctor(doctor_id)
+        with self._lock:
+            slots = [
+                dict(self._slots[i]) for ids in self._index.get(doctor_id, {}).values() for i in ids
+                if status == "ALL" or self._slots[i].get("status") == status
+            ]
+        slots.sort(key=lambda s: (s.get("date", ""), s.get("start_time", "")))
+        return slots
+
+    def status(self, doctor_id: str, now: Optional[datetime] = None) -> Tuple[bool, Optional[str]]:
+        """(available now, start of the next free slot later today)"""
+        now = now or datetime.now()
+        date, hhmm = now.strftime("%Y-%m-%d"), now.strftime("%H:%M")
+        if not self._fresh(self._doctor_loaded.get(doctor_id)):
+            self._ensure_date(date)
+        with self._lock:
+            timeline = self._timeline(doctor_id, date)
+            if timeline is None:
+                return False, None
+            nxt = timeline.next_after(hhmm)
+            return timeline.covering(hhmm) is not None, (nxt.get("start_time") if nxt else None)
+
+    def available_now(self, doctor_id: str, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        now = now or datetime.now()
+        self._ensure_doctor(doctor_id)
+        with self._lock:
+            timeline = self._timeline(doctor_id, now.strftime("%Y-%m-%d"))
+            slot = timeline.covering(now.strftime("%H:%M")) if timeline else None
+            return dict(slot) if slot else None
+
+    def next_free_slot(self, doctor_id: str, after: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """First AVAILABLE slot starting after `after` (default now), on any later date."""
+        after = after or datetime.now()
+        today, hhmm = after.strftime("%Y-%m-%d"), after.strftime("%H:%M")
+        self._ensure_doctor(doctor_id)
+        with self._lock:
+            for date in sorted(d for d in self._index.get(doctor_id, {}) if d and d >= today):
+                timeline = self._timeline(doctor_id, date)
+                if timeline is None:
+                    continue
+                slot = timeline.next_after(hhmm) if date == today else (timeline.slots[0] if timeline.slots else None)
+                if slot:
+                    return dict(slot)
+        return None
+
+    def free_slots(self, doctor_id: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """AVAILABLE slots starting in [start, end)."""
+        first, last = start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+        self._ensure_doctor(doctor_id)
+        result: List[Dict[str, Any]] = []
+        with self._lock:
+            for date in sorted(d for d in self._index.get(doctor_id, {}) if d and first <= d <= last):
+                timeline = self._timeline(doctor_id, date)
+                if timeline is None:
+                    continue
+                lo = start.strftime("%H:%M") if date == first else ""
+                hi = end.strftime("%H:%M") if date == last else "~"  # "~" sorts after any "HH:MM"
+                result += [dict(s) for s in timeline.starting_between(lo, hi)]
+        return result
+
+    def doctors_available_now(self, now: Optional[datetime] = None) -> Set[str]:
+        """IDs of doctors with an AVAILABLE slot covering `now` (one query per day at most)."""
+        now = now or datetime.now()
+        date, hhmm = now.strftime("%Y-%m-%d"), now.strftime("%H:%M")
+        self._ensure_date(date)
+        with self._lock:
+            return {
+                doctor_id for doctor_id, by_date in self._index.items()
+                if by_date.get(date) and (tl := self._timeline(doctor_id, date)) is not None and tl.covering(hhmm)
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "slots": len(self._slots),
+                "doctors_loaded": len(self._doctor_loaded),
+                "dates_loaded": sorted(self._date_loaded),
+                "timelines": len(self._timelines),
+            }
+
+
+# Singleton Instance
+availability_service = AvailabilityService()
@@ -0,0 +1,120 @@
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core.availability import availability_service
+from app.core.firebase import firebase_service
+
+SLOT_NOT_FOUND = "Selected slot is invalid."
+SLOT_UNAVAILABLE = "Selected slot is no longer available."
+SLOT_EXPIRED = "Selected slot has expired."
+
+
+def slot_unavailable_reason(slot: Optional[Dict[str, Any]], now: Optional[datetime] = None) -> Optional[str]:
+    """Why a slot can't be booked (user-facing message), None if it can."""
+    if not slot:
+        return SLOT_NOT_FOUND
+    if slot.get("status") != "AVAILABLE":
+        return SLOT_UNAVAILABLE
+    try:
+        # Parse slot date and time (Assume format YYYY-MM-DD and HH:MM)
+        slot_date_str, slot_time_str = slot.get("date"), slot.get("start_time")
+        if slot_date_str and slot_time_str:
+            slot_datetime = datetime.strptime(f"{slot_date_str} {slot_time_str}", "%Y-%m-%d %H:%M")
+            if slot_datetime < (now or datetime.now()):
+                return SLOT_EXPIRED
+    except Exception as e:
+        print(f"WARN: Could not validate slot time: {e}")
+    return None
+
+
+class KeyedLock:
+    """One lock per key, dropped again when nobody holds or waits for it."""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks: Dict[str, list] = {}  # key -> [lock, users]
+
+    @contextmanager
+    def hold(self, key: str):
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def __len__(self) -> int:
+        with self._guard:
+            return len(self._locks)
+
+
+class BookingService:
+    """
+    Books a slot as one unit: slot check, slot -> BOOKED, appointment creation and case upsert.
+    - Firestore / local stand-in: a single transaction (re-reads the slot; retried on contention).
+    - Mock mode: the same steps under a per-slot lock.
+    Bookings of the same slot in this process are serialized by the per-slot lock either way,
+    so concurrent requests don't all pile into transaction retries.
+    """
+
+    def __init__(self, firebase=None, availability=None):
+        self.firebase = firebase if firebase is not None else firebase_service
+        self.availability = availability if availability is not None else availability_service
+        self._slot_locks = KeyedLock()
+
+    def book(
+        self,
+        slot_id: Optional[str],
+        appointment: Dict[str, Any],
+        case_id: Optional[str] = None,
+        case_patch: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Returns {"status": "confirmed", "appointment_doc_id": ...} or
+        {"status": "failed", "reason": <user-facing message>}.
+        """
+        if not slot_id:
+            return self._commit(None, appointment, case_id, case_patch)
+        with self._slot_locks.hold(slot_id):
+            return self._commit(slot_id, appointment, case_id, case_patch)
+
+    def _commit(self, slot_id, appointment, case_id, case_patch) -> Dict[str, Any]:
+        if self.firebase.mock_mode:
+            if slot_id:
+                reason = slot_unavailable_reason(self.availability.get_slot(slot_id))
+                if reason:
+                    return {"status": "failed", "reason": reason}
+            appointment_doc_id = self.firebase.save_record("appointments", appointment)
+            if slot_id:
+                self.firebase.update_document("doctor_slots", slot_id, {"status": "BOOKED"})
+            if case_id:
+                self.firebase.upsert_document("cases", case_id, case_patch or {})
+        else:
+            read: Dict[str, Any] = {}
+
+            def check(slot):
+                read["slot"] = slot
+                return slot_unavailable_reason(slot)
+
+            appointment_doc_id, reason = self.firebase.book_slot(slot_id, appointment, case_id, case_patch, check=check)
+            if reason:
+                # The cached copy let the request through: replace it with the slot the transaction read
+                if read.get("slot"):
+                    self.availability.on_slot_created(slot_id, read["slot"])
+                else:
+                    self.availability.on_slot_deleted(slot_id)
+                return {"status": "failed", "reason": reason}
+        if slot_id:
+            self.availability.on_slot_status(slot_id, "BOOKED")
+        return {"status": "confirmed", "appointment_doc_id": appointment_doc_id}
+
+
+# Singleton Instance
+booking_service = BookingService()
@@ -1,4 +1,3 @@
-
 import os
 from dotenv import load_dotenv
 
@@ -9,4 +8,80 @@ class Settings:
     project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     DB_PATH = os.path.join(project_root, "chroma_db_new")
 
+    # LLM Gateway (shared async Groq client)
+    LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    # Default in-flight cap per model; override per model with "model=limit,model=limit"
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+    LLM_MODEL_CONCURRENCY = os.getenv("LLM_MODEL_CONCURRENCY", "")
+    # OpenAI/Groq-compatible endpoint ("" = Groq); e.g. the load-test stub server
+    LLM_BASE_URL = os.getenv("LLM_BASE_URL", "")
+
+    # Conversation checkpointer ("sqlite" is shared by all workers, "memory" is single-process)
+    CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite")
+    CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", os.path.join(project_root, "data", "checkpoints.sqlite3"))
+    # Idle sessions are dropped after this many seconds (0 = keep forever)
+    CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", str(24 * 3600)))
+    # Least recently used sessions are dropped above this count (0 = unbounded)
+    CHECKPOINT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", "10000"))
+
+    # Protocol retrieval (multi-query over last message, differential and one query per fact)
+    RETRIEVAL_MAX_QUERIES = int(os.getenv("RETRIEVAL_MAX_QUERIES", "8"))
+    RETRIEVAL_RESULTS_PER_QUERY = int(os.getenv("RETRIEVAL_RESULTS_PER_QUERY", "3"))
+    RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+
+    # Prompt size caps (estimated tokens): the shared conversation context (digest + recent
+    # turns, see app/agent/context_window.py) and the retrieved protocols in the diagnostician
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "400"))
+    CONTEXT_KNOWLEDGE_TOKENS = int(os.getenv("CONTEXT_KNOWLEDGE_TOKENS", "1500"))
+    # "split": Fact Extraction (parallel to the scan) + Diagnostician, two LLM calls per turn.
+    # "fused": one Reasoning call after the scan (app/agent/nodes/reasoning.py)
+    REASONING_MODE = os.getenv("REASONING_MODE", "split")
+
+    # Startup warm-up of heavy clients (Chroma, ONNX model, Firebase). Comma-separated
+    # component names, "all" or "none" (everything is then created on first use).
+    STARTUP_WARM_UP = os.getenv("STARTUP_WARM_UP", "all")
+    # Event-loop lag sampling period for /loop_stats (0 = off)
+    LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100"))
+    # Latency spans (nodes, LLM, Chroma, Firestore) exported on /metrics; optional JSONL span log
+    TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+    TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "")
+
+    # Doctor dashboard document: active appointments plus the ended ones created in the last
+    # N days, at most this many of them (0 = no limit); older history is paged from `appointments`
+    DASHBOARD_HISTORY_DAYS = float(os.getenv("DASHBOARD_HISTORY_DAYS", "30"))
+    DASHBOARD_MAX_ENDED_APPOINTMENTS = int(os.getenv("DASHBOARD_MAX_ENDED_APPOINTMENTS", "200"))
+    # Each worker's live emergency feed re-reads the shared emergency board this often, to pick
+    # up writes made by other workers (0 = never, single worker only)
+    EMERGENCY_FEED_RESYNC_SECONDS = float(os.getenv("EMERGENCY_FEED_RESYNC_SECONDS", "30"))
+
+    # /create_slots_batch writes schedules above this many slots in a background job
+    SLOT_BATCH_ASYNC_THRESHOLD = int(os.getenv("SLOT_BATCH_ASYNC_THRESHOLD", "2000"))
+
+    # Prescription / lab report images: long edge and JPEG byte budget sent to the vision
+    # model, worker threads for decode/resize (0 = min(4, CPUs)), result cache by content hash
+    IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1600"))
+    IMAGE_TARGET_BYTES = int(os.getenv("IMAGE_TARGET_BYTES", str(400 * 1024)))
+    IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "0"))
+    IMAGE_CACHE_MAX_ITEMS = int(os.getenv("IMAGE_CACHE_MAX_ITEMS", "256"))
+    IMAGE_CACHE_TTL_SECONDS = float(os.getenv("IMAGE_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+    # /analyze_lab_report_batch: concurrent page extractions and max pages per request
+    LAB_REPORT_PAGE_CONCURRENCY = int(os.getenv("LAB_REPORT_PAGE_CONCURRENCY", "4"))
+    LAB_REPORT_MAX_PAGES = int(os.getenv("LAB_REPORT_MAX_PAGES", "20"))
+
+    # Translation memory: (segment hash, language) -> translation, shared by all workers
+    # ("" = in-process only), least recently used rows dropped above the max
+    TRANSLATION_MEMORY_PATH = os.getenv("TRANSLATION_MEMORY_PATH", os.path.join(project_root, "data", "translations.sqlite3"))
+    TRANSLATION_MEMORY_MAX_ITEMS = int(os.getenv("TRANSLATION_MEMORY_MAX_ITEMS", "50000"))
+
+    # Database: "auto" = Firestore when credentials are found, else the local stand-in;
+    # "local" always uses the stand-in; "mock" keeps the old canned responses
+    FIRESTORE_BACKEND = os.getenv("FIRESTORE_BACKEND", "auto")
+    # Local stand-in: SQLite file shared by workers ("" = in-memory, one process) and the
+    # round-trip latency injected per call, to reproduce production costs in benchmarks
+    LOCAL_FIRESTORE_PATH = os.getenv("LOCAL_FIRESTORE_PATH", "")
+    LOCAL_FIRESTORE_LATENCY_MS = float(os.getenv("LOCAL_FIRESTORE_LATENCY_MS", "0"))
+    LOCAL_FIRESTORE_JITTER_MS = float(os.getenv("LOCAL_FIRESTORE_JITTER_MS", "0"))
 settings = Settings()
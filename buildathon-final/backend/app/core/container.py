@@ -0,0 +1,138 @@
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class Container:
+    """
+    Registry of heavy, shared resources (Chroma client, ONNX model, collections, Firebase...).
+    - Each component is created once, on first use or during warm_up(), never at import.
+    - The owning module registers a factory; other modules call container.get(name)
+      or hold a LazyProxy that resolves on first attribute access.
+    - Creation and warm-up times are kept per component for the startup report.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._warmers: Dict[str, Callable[[Any], None]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._timings: Dict[str, Dict[str, Any]] = {}
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._phase = "on_demand"
+
+    def register(self, name: str, factory: Callable[[], Any], warm: Optional[Callable[[Any], None]] = None):
+        """`warm` runs on the created instance during warm_up() (e.g. one ONNX inference to load the model)."""
+        with self._lock:
+            self._factories[name] = factory
+            if warm is not None:
+                self._warmers[name] = warm
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name in self._instances:
+                return self._instances[name]
+            if name not in self._factories:
+                raise KeyError(f"Component '{name}' is not registered")
+            t0 = time.perf_counter()
+            instance = self._factories[name]()
+            self._timings.setdefault(name, {}).update({
+                "create_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "phase": self._phase,
+            })
+            self._instances[name] = instance
+            print(f"DEBUG: Container created '{name}' in {self._timings[name]['create_ms']} ms ({self._phase})")
+            return instance
+
+    def proxy(self, name: str, spec: Optional[type] = None) -> "LazyProxy":
+        return LazyProxy(self, name, spec)
+
+    def is_created(self, name: str) -> bool:
+        return name in self._instances
+
+    def override(self, name: str, instance: Any):
+        """Replaces a component (tests, benchmarks, offline tools)."""
+        with self._lock:
+            self._instances[name] = instance
+            self._timings.setdefault(name, {})["phase"] = "override"
+
+    def reset(self, name: str):
+        with self._lock:
+            self._instances.pop(name, None)
+            self._timings.pop(name, None)
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Creates (and warms) components up front so the first request does not pay for them.
+        Failures are recorded and do not stop the other components.
+        """
+        previous_phase, self._phase = self._phase, "warm_up"
+        try:
+            for name in list(names or self._factories):
+                try:
+                    instance = self.get(name)
+                    warm = self._warmers.get(name)
+                    if warm is not None:
+                        t0 = time.perf_counter()
+                        warm(instance)
+                        self._timings[name]["warm_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+                except Exception as e:
+                    self._timings.setdefault(name, {}).update({"phase": "warm_up", "error": str(e)})
+                    print(f"STARTUP WARNING: '{name}' failed to initialize: {e}")
+        finally:
+            self._phase = previous_phase
+        return self.report()
+
+    def record(self, name: str, seconds: float, **extra):
+        """Records a timing that is not a component (e.g. module import time)."""
+        self._records[name] = {"ms": round(seconds * 1000, 1), **extra}
+
+    def report(self) -> Dict[str, Any]:
+        components = {}
+        for name in sorted(set(self._factories) | set(self._timings)):
+            entry = {"created": name in self._instances}
+            entry.update(self._timings.get(name, {}))
+            components[name] = entry
+        total = sum(t.get("create_ms", 0) + t.get("warm_ms", 0) for t in self._timings.values())
+        return {"components": components, "total_init_ms": round(total, 1), "timings": dict(self._records)}
+
+
+class LazyProxy:
+    """
+    Stand-in for a module-level singleton; the component is created on first attribute access.
+    With a `spec` class, methods are looked up on the class until the component exists, so
+    introspection (LangGraph inspects the globals used by node functions when compiling)
+    does not create it.
+    """
+
+    def __init__(self, container: Container, name: str, spec: Optional[type] = None):
+        object.__setattr__(self, "_container", container)
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_spec", spec)
+
+    def __getattr__(self, attr):
+        if self._spec is not None and not self._container.is_created(self._name):
+            method = getattr(self._spec, attr, None)
+            if method is None and attr.startswith("__"):
+                raise AttributeError(attr)
+            if callable(method) and not attr.startswith("__"):
+                @functools.wraps(method)
+                def deferred(*args, **kwargs):
+                    return getattr(self._container.get(self._name), attr)(*args, **kwargs)
+                return deferred
+        return getattr(self._container.get(self._name), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._container.get(self._name), attr, value)
+
+    def __repr__(self):
+        state = "created" if self._container.is_created(self._name) else "not created"
+        return f"<LazyProxy '{self._name}' ({state})>"
+
+
+# Singleton Instance
+container = Container()
@@ -0,0 +1,404 @@
+import copy
+import functools
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.firebase import (
+    firebase_service,
+    enrich_appointment,
+    emergency_from_appointment,
+    emergency_from_medical_record,
+    ENDED_STATUSES,
+)
+from app.core.local_firestore import DELETE_FIELD, LocalFirestore
+from app.core.patient_list import build_patient_list, fetch_case_summaries, patients_from_appointments, summary_risk
+from app.core.records_service import decode_cursor, encode_cursor, sort_key
+
+DASHBOARD_COLLECTION = "doctor_dashboards"  # one document per doctor
+CASE_INDEX_COLLECTION = "dashboard_cases"   # case_id -> risk, status, linked doctors / emergencies
+APPOINTMENT_INDEX_COLLECTION = "dashboard_appointments"  # appointment id -> doctor, emergency flag
+EMERGENCIES_DOC = "_emergencies"            # shared emergency board (in DASHBOARD_COLLECTION)
+HISTORY_PAGE_SIZE = 500                     # appointments per query when reading pruned history
+
+
+def deep_merge(target: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Same semantics as Firestore set(..., merge=True): nested maps are merged, other values
+    replaced, and DELETE_FIELD removes the key.
+    """
+    for key, value in patch.items():
+        if value is DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict):
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            deep_merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+    return target
+
+
+def appointment_sort_key(apt: Dict[str, Any]) -> str:
+    # Same order as FirebaseService.get_appointments
+    return apt.get("slot_time", "") or apt.get("created_at", "")
+
+
+def stale_appointments(appointments: Dict[str, Dict[str, Any]], cutoff: str, max_ended: int) -> List[str]:
+    """
+    Ended appointments that no longer belong on the dashboard: created before `cutoff`, or
+    past the newest `max_ended` ended ones (0 = no limit). Active appointments always stay.
+    """
+    ended = sorted(
+        ((str(apt.get("created_at") or ""), apt_id) for apt_id, apt in appointments.items()
+         if apt.get("status") in ENDED_STATUSES),
+        reverse=True,
+    )
+    recent = [apt_id for created_at, apt_id in ended if not created_at or created_at >= cutoff]
+    stale = [apt_id for created_at, apt_id in ended if created_at and created_at < cutoff]
+    return stale + (recent[max_ended:] if max_ended > 0 else [])
+
+
+def is_active_emergency(entry: Dict[str, Any]) -> bool:
+    return entry.get("status") not in ENDED_STATUSES and entry.get("case_status") not in ENDED_STATUSES
+
+
+def emergency_sort_key(entry: Dict[str, Any]) -> str:
+    return str(entry.get("created_at") or "")
+
+
+def best_effort(method):
+    """Projection updates never fail the write that triggered them; a rebuild repairs the document."""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        except Exception as e:
+            print(f"Dashboard Projection Error ({method.__name__}): {e}")
+    return wrapper
+
+
+class LocalDashboardStore:
+    """In-process projection store (mock mode / tests)."""
+
+    def __init__(self):
+        self._docs: Dict[tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            doc = self._docs.get((collection, doc_id))
+            return copy.deepcopy(doc) if doc is not None else None
+
+    def merge(self, collection: str, doc_id: str, patch: Dict[str, Any]) -> None:
+        with self._lock:
+            deep_merge(self._docs.setdefault((collection, doc_id), {}), patch)
+
+
+class FirestoreDashboardStore:
+    """Projection documents in Firestore, patched with set(merge=True) (no read-modify-write)."""
+
+    def __init__(self, firebase):
+        self.firebase = firebase
+
+    def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        doc = self.firebase.get_document(collection, doc_id)
+        if doc is not None:
+            doc.pop("id", None)
+        return doc
+
+    def merge(self, collection: str, doc_id: str, patch: Dict[str, Any]) -> None:
+        if not self.firebase.upsert_document(collection, doc_id, self._with_deletes(patch)):
+            raise RuntimeError(f"Projection write failed ({collection}/{doc_id})")
+
+    def _with_deletes(self, patch: Dict[str, Any]) -> Dict[str, Any]:
+        """The local stand-in understands DELETE_FIELD; Firestore needs its own sentinel."""
+        if isinstance(self.firebase.db, LocalFirestore):
+            return patch
+        from firebase_admin import firestore
+
+        def convert(value):
+            if value is DELETE_FIELD:
+                return firestore.DELETE_FIELD
+            if isinstance(value, dict):
+                return {k: convert(v) for k, v in value.items()}
+            return value
+        return convert(patch)
+
+
+class DashboardProjection:
+    """
+    Write-side projection of the doctor dashboard.
+    - doctor_dashboards/{doctor_id}: the doctor's active and recently ended appointments
+      (already enriched for the doctor view) and the risk / condition of their cases. Older
+      appointments are pruned on read and paged from the source collection (get_history).
+    - doctor_dashboards/_emergencies: the emergency board.
+    - dashboard_cases/{case_id} and dashboard_appointments/{id}: where a case / appointment appears,
+      so summary and status changes can be pushed to the right documents.
+    The booking, summary and status write paths patch these documents; a dashboard read is one
+    document fetch (the patient list is derived in memory). A missing document is rebuilt
+    once from the source collections.
+    """
+
+    def __init__(self, firebase=None, store=None, history_days: Optional[float] = None, max_ended: Optional[int] = None):
+        self.firebase = firebase if firebase is not None else firebase_service
+        self._store = store
+        self.history_days = history_days if history_days is not None else settings.DASHBOARD_HISTORY_DAYS
+        self.max_ended = max_ended if max_ended is not None else settings.DASHBOARD_MAX_ENDED_APPOINTMENTS
+        self._emergency_listeners: List[Callable[[Dict[str, Dict[str, Any]]], None]] = []
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = LocalDashboardStore() if self.firebase.mock_mode else FirestoreDashboardStore(self.firebase)
+        return self._store
+
+    def _now(self) -> str:
+        return datetime.utcnow().isoformat()
+
+    def _cutoff(self) -> str:
+        if self.history_days <= 0:
+            return ""
+        return (datetime.utcnow() - timedelta(days=self.history_days)).isoformat()
+
+    def _case(self, case_id: Optional[str]) -> Dict[str, Any]:
+        return (self.store.get(CASE_INDEX_COLLECTION, case_id) if case_id else None) or {}
+
+    def add_emergency_listener(self, listener: Callable[[Dict[str, Dict[str, Any]]], None]) -> None:
+        """`listener(patches)` is called (from the writing thread) after every emergency board change."""
+        self._emergency_listeners.append(listener)
+
+    def _patch_emergencies(self, patches: Dict[str, Dict[str, Any]]) -> None:
+        """patches: emergency id -> full entry (new emergency), partial update or DELETE_FIELD (ended)."""
+        if not patches:
+            return
+        self.store.merge(DASHBOARD_COLLECTION, EMERGENCIES_DOC, {"emergencies": patches, "updated_at": self._now()})
+        for listener in self._emergency_listeners:
+            try:
+                listener(copy.deepcopy(patches))
+            except Exception as e:
+                print(f"Emergency Listener Error: {e}")
+
+    # --- Write side ---
+    @best_effort
+    def on_appointment_booked(self, appointment_id: str, appointment: Dict[str, Any]) -> None:
+        doctor_id = appointment.get("doctor_id")
+        if not doctor_id:
+            return
+        view = enrich_appointment({**copy.deepcopy(appointment), "id": appointment_id})
+        case_id = appointment.get("case_id")
+        case = self._case(case_id)
+
+        doctor_patch: Dict[str, Any] = {"appointments": {appointment_id: view}, "updated_at": self._now()}
+        if case_id and case.get("risk"):
+            doctor_patch["case_risk"] = {case_id: {"risk": case["risk"], "condition": case.get("condition")}}
+        self.store.merge(DASHBOARD_COLLECTION, doctor_id, doctor_patch)
+
+        if appointment.get("is_emergency") is True:
+            entry = emergency_from_appointment(appointment_id, copy.deepcopy(appointment))
+            if case.get("risk"):
+                entry.update({"risk": case["risk"], "condition": case.get("condition")})
+            self._patch_emergencies({appointment_id: entry})
+        if case_id:
+            case_patch = {"doctors": {doctor_id: True}}
+            if appointment.get("is_emergency") is True:
+                case_patch["emergencies"] = {appointment_id: True}
+            self.store.merge(CASE_INDEX_COLLECTION, case_id, case_patch)
+        self.store.merge(APPOINTMENT_INDEX_COLLECTION, appointment_id, {
+            "doctor_id": doctor_id, "case_id": case_id, "is_emergency": appointment.get("is_emergency") is True,
+        })
+
+    @best_effort
+    def on_summary_saved(self, case_id: str, summary: Dict[str, Any]) -> None:
+        """Pre-doctor summary saved: refresh the case risk on every dashboard showing the case."""
+        if not case_id:
+            return
+        risk, condition = summary_risk(summary)
+        self.store.merge(CASE_INDEX_COLLECTION, case_id, {"risk": risk, "condition": condition})
+        case = self._case(case_id)
+        for doctor_id in case.get("doctors", {}):
+            self.store.merge(DASHBOARD_COLLECTION, doctor_id, {
+                "case_risk": {case_id: {"risk": risk, "condition": condition}},
+                "updated_at": self._now(),
+            })
+        self._patch_emergencies({eid: {"risk": risk, "condition": condition} for eid in case.get("emergencies", {})})
+
+    @best_effort
+    def on_case_status(self, case_id: str, status: str) -> None:
+        case = self._case(case_id)
+        emergencies = case.get("emergencies", {})
+        if status in ENDED_STATUSES:
+            # Ending the consultation closes the case's emergencies: they leave the board
+            self.store.merge(CASE_INDEX_COLLECTION, case_id, {
+                "status": status, "emergencies": {eid: DELETE_FIELD for eid in emergencies},
+            })
+            self._patch_emergencies({eid: DELETE_FIELD for eid in emergencies})
+        else:
+            self.store.merge(CASE_INDEX_COLLECTION, case_id, {"status": status})
+            self._patch_emergencies({eid: {"case_status": status} for eid in emergencies})
+
+    @best_effort
+    def on_appointment_status(self, appointment_id: str, status: str) -> None:
+        # Appointments booked before the projection existed are looked up in the source collection
+        appointment = (
+            self.store.get(APPOINTMENT_INDEX_COLLECTION, appointment_id)
+            or self.firebase.get_document("appointments", appointment_id)
+            or {}
+        )
+        doctor_id = appointment.get("doctor_id")
+        if doctor_id:
+            self.store.merge(DASHBOARD_COLLECTION, doctor_id, {
+                "appointments": {appointment_id: {"status": status}},
+                "updated_at": self._now(),
+            })
+        if appointment.get("is_emergency") is not True:
+            return
+        if status in ENDED_STATUSES:
+            self._patch_emergencies({appointment_id: DELETE_FIELD})
+            if appointment.get("case_id"):
+                self.store.merge(CASE_INDEX_COLLECTION, appointment["case_id"], {"emergencies": {appointment_id: DELETE_FIELD}})
+        else:
+            self._patch_emergencies({appointment_id: {"status": status, "appointment_details": {"status": status}}})
+
+    @best_effort
+    def on_medical_record_saved(self, record_id: str, record: Dict[str, Any]) -> None:
+        """Legacy AI_SUMMARY_DOCTOR uploads with a high severity appear on the emergency board."""
+        if record.get("type") != "AI_SUMMARY_DOCTOR":
+            return
+        entry = emergency_from_medical_record(record_id, copy.deepcopy(record))
+        if entry:
+            self._patch_emergencies({record_id: entry})
+
+    # --- Read side ---
+    def _prune(self, doctor_id: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Deletes stale ended appointments (and the risk of cases no longer shown) from the document."""
+        appointments = doc.get("appointments", {})
+        stale = stale_appointments(appointments, self._cutoff(), self.max_ended)
+        if not stale:
+            return doc
+        for apt_id in stale:
+            del appointments[apt_id]
+        shown = {apt.get("case_id") for apt in appointments.values()}
+        unused = [case_id for case_id in doc.get("case_risk", {}) if case_id not in shown]
+        for case_id in unused:
+            del doc["case_risk"][case_id]
+        doc["has_history"] = True
+        self.store.merge(DASHBOARD_COLLECTION, doctor_id, {
+            "appointments": {apt_id: DELETE_FIELD for apt_id in stale},
+            "case_risk": {case_id: DELETE_FIELD for case_id in unused},
+            "has_history": True,
+        })
+        # Summaries of those cases are no longer pushed to this dashboard
+        for case_id in unused:
+            self.store.merge(CASE_INDEX_COLLECTION, case_id, {"doctors": {doctor_id: DELETE_FIELD}})
+        print(f"DEBUG: Pruned {len(stale)} ended appointments from the dashboard of {doctor_id}")
+        return doc
+
+    def rebuild(self, doctor_id: str) -> Dict[str, Any]:
+        """Builds a doctor's dashboard document from the source collections (full scan)."""
+        appointments = self.firebase.get_appointments(doctor_id=doctor_id)
+        by_id = {a["id"]: a for a in appointments if a.get("id")}
+        stale = stale_appointments(by_id, self._cutoff(), self.max_ended)
+        for apt_id in stale:
+            del by_id[apt_id]
+        case_ids = list(dict.fromkeys(a.get("case_id") for a in by_id.values() if a.get("case_id")))
+        summaries = fetch_case_summaries(case_ids, self.firebase) if case_ids else {}
+        doc = {
+            "appointments": by_id,
+            "case_risk": {},
+            "has_history": bool(stale),  # some appointments are only in the source collection
+            "built_at": self._now(),
+            "updated_at": self._now(),
+        }
+        for case_id, summary in summaries.items():
+            risk, condition = summary_risk(summary)
+            doc["case_risk"][case_id] = {"risk": risk, "condition": condition}
+        self.store.merge(DASHBOARD_COLLECTION, doctor_id, doc)
+        for case_id in case_ids:
+            self.store.merge(CASE_INDEX_COLLECTION, case_id, {"doctors": {doctor_id: True}})
+        print(f"DEBUG: Rebuilt dashboard projection for {doctor_id} ({len(by_id)} of {len(appointments)} appointments)")
+        return doc
+
+    def _older_appointments(self, doctor_id: str, doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """The appointments pruned from the document, paged from the source collection."""
+        if not doc.get("has_history"):
+            return []
+        kept = set(doc.get("appointments", {}))
+        older: List[Dict[str, Any]] = []
+        after = None
+        while True:
+            page = self.firebase.get_records_page("appointments", doctor_id=doctor_id, limit=HISTORY_PAGE_SIZE, after=after)
+            older.extend(enrich_appointment(apt) for apt in page if apt.get("id") not in kept)
+            if len(page) < HISTORY_PAGE_SIZE:
+                return older
+            after = sort_key(page[-1])
+
+    def get_dashboard(self, doctor_id: str, refresh: bool = False, full_history: bool = False) -> Dict[str, Any]:
+        """
+        Appointments and patients of a doctor. The document holds the active and recently ended
+        appointments; `full_history` adds the older ones from the source collection (as the
+        /get_appointments and /get_patients endpoints always returned them).
+        """
+        doc = None if refresh else self.store.get(DASHBOARD_COLLECTION, doctor_id)
+        if not doc or "built_at" not in doc:
+            # Never built (writes before the first read only hold part of the history)
+            doc = self.rebuild(doctor_id)
+        else:
+            doc = self._prune(doctor_id, doc)
+        appointments = list(doc.get("appointments", {}).values())
+        older = self._older_appointments(doctor_id, doc) if full_history else []
+        appointments.extend(older)
+        appointments.sort(key=appointment_sort_key, reverse=True)
+        risk_by_case = {
+            case_id: (entry.get("risk", "Medium"), entry.get("condition"))
+            for case_id, entry in doc.get("case_risk", {}).items()
+        }
+        if older:
+            # Risks of the cases no longer in the document are fetched in one batch
+            patients = build_patient_list(appointments, self.firebase, risk_by_case)
+        else:
+            patients = patients_from_appointments(appointments, risk_by_case)
+        return {
+            "appointments": appointments,
+            "patients": patients,
+            "updated_at": doc.get("updated_at"),
+        }
+
+    def get_history(self, doctor_id: str, limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        All of a doctor's appointments (including the ones pruned from the dashboard), newest
+        first by created_at, paged from the source collection: {"appointments", "next_cursor"}.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        page = self.firebase.get_records_page("appointments", doctor_id=doctor_id, limit=limit + 1, after=after)
+        has_more = len(page) > limit
+        page = page[:limit]
+        return {
+            "appointments": [enrich_appointment(apt) for apt in page],
+            "next_cursor": encode_cursor(page[-1]) if has_more and page else None,
+        }
+
+    def get_emergencies(self, refresh: bool = False) -> List[Dict[str, Any]]:
+        stored = self.store.get(DASHBOARD_COLLECTION, EMERGENCIES_DOC) or {}
+        stored_ids = set(stored.get("emergencies", {}))
+        doc = None if refresh else stored
+        if not doc or "built_at" not in doc:
+            entries = [e for e in self.firebase.get_emergencies() if is_active_emergency(e)]
+            doc = {"emergencies": {e["id"]: e for e in entries if e.get("id")}, "built_at": self._now()}
+            stale = {eid: DELETE_FIELD for eid in stored_ids - set(doc["emergencies"])}
+            self.store.merge(DASHBOARD_COLLECTION, EMERGENCIES_DOC, {**doc, "emergencies": {**stale, **doc["emergencies"]}})
+            for e in entries:
+                if e.get("case_id") and e.get("id"):
+                    self.store.merge(CASE_INDEX_COLLECTION, e["case_id"], {"emergencies": {e["id"]: True}})
+        else:
+            # Ended entries are deleted as they end; ones left by older writes are dropped here
+            ended = [eid for eid, e in doc.get("emergencies", {}).items() if not is_active_emergency(e)]
+            if ended:
+                self.store.merge(DASHBOARD_COLLECTION, EMERGENCIES_DOC, {"emergencies": {eid: DELETE_FIELD for eid in ended}})
+        active = [e for e in doc.get("emergencies", {}).values() if is_active_emergency(e)]
+        active.sort(key=emergency_sort_key, reverse=True)
+        return active
+
+# Singleton Instance
+dashboard_projection = DashboardProjection()
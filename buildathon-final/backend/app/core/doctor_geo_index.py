@@ -0,0 +1,160 @@
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.neighbors import BallTree
+
+from app.core.availability import availability_service
+from app.core.firebase import firebase_service
+
+EARTH_RADIUS_KM = 6371.0
+# Seed data might not have a location
+DEFAULT_LOCATION = (28.6139, 77.2090)  # Connaught Place
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Vectorized great-circle distance from one point to many (degrees in, km out)."""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class DoctorGeoIndex:
+    """
+    In-memory nearest-doctor index for /get_emergency_doctors.
+    - Doctor locations live in a BallTree (haversine metric); rebuilt when doctors change
+      (invalidate_doctors) or after `doctors_ttl` seconds.
+    - Slot availability comes from the availability service (kept current by slot writes).
+    - The set of doctors available now gets its own small tree, cached per minute and
+      availability version, so "k nearest doctors available now" is a single tree query.
+    Ranking matches the previous endpoint: available now first, then distance.
+    """
+
+    def __init__(self, firebase=None, availability=None, doctors_ttl: float = 600.0):
+        self.firebase = firebase if firebase is not None else firebase_service
+        self.availability = availability if availability is not None else availability_service
+        self.doctors_ttl = doctors_ttl
+        self._lock = threading.RLock()
+        self._doctors: List[Dict[str, Any]] = []
+        self._coords = np.empty((0, 2))
+        self._tree: Optional[BallTree] = None
+        self._doctors_loaded = float("-inf")
+        self._available_key: Optional[tuple] = None
+        self._available: Tuple[np.ndarray, Optional[BallTree]] = (np.empty(0, dtype=int), None)
+        self._version = 0
+
+    def invalidate_doctors(self) -> None:
+        with self._lock:
+            self._doctors_loaded = float("-inf")
+
+    # --- Refresh ---
+    def _ensure_doctors(self) -> None:
+        if time.monotonic() - self._doctors_loaded < self.doctors_ttl:
+            return
+        doctors = self.firebase.get_doctors()
+        coords = np.array([
+            [float(d.get("latitude", DEFAULT_LOCATION[0])), float(d.get("longitude", DEFAULT_LOCATION[1]))]
+            for d in doctors
+        ]).reshape(-1, 2)
+        self._doctors = doctors
+        self._coords = coords
+        self._tree = BallTree(np.radians(coords), metric="haversine") if len(doctors) else None
+        self._doctors_loaded = time.monotonic()
+        self._version += 1
+        print(f"DEBUG: Doctor geo index rebuilt ({len(doctors)} doctors)")
+
+    def _available_now(self, now: datetime) -> Tuple[np.ndarray, Optional[BallTree]]:
+        key = (self._version, self.availability.version, now.strftime("%Y-%m-%d %H:%M"))
+        if self._available_key != key:
+            available = self.availability.doctors_available_now(now)
+            idx = np.array([i for i, d in enumerate(self._doctors) if d.get("id") in available], dtype=int)
+            tree = BallTree(np.radians(self._coords[idx]), metric="haversine") if len(idx) else None
+            self._available = (idx, tree)
+            self._available_key = key
+        return self._available
+
+    # --- Queries ---
+    @staticmethod
+    def _query(tree: Optional[BallTree], point: np.ndarray, k: int, radius_km: Optional[float]):
+        """(indices, distances_km) in distance order, at most k, within radius_km if given."""
+        if tree is None or k <= 0:
+            return np.empty(0, dtype=int), np.empty(0)
+        if radius_km is not None:
+            ind, dist = tree.query_radius(point, r=radius_km / EARTH_RADIUS_KM, return_distance=True, sort_results=True)
+            return ind[0][:k], dist[0][:k] * EARTH_RADIUS_KM
+        dist, ind = tree.query(point, k=min(k, tree.data.shape[0]))
+        return ind[0], dist[0] * EARTH_RADIUS_KM
+
+    def _count(self, tree: Optional[BallTree], point: np.ndarray, radius_km: Optional[float]) -> int:
+        if tree is None:
+            return 0
+        if radius_km is None:
+            return tree.data.shape[0]
+        return int(tree.query_radius(point, r=radius_km / EARTH_RADIUS_KM, count_only=True)[0])
+
+    def _entry(self, i: int, distance: float, now: datetime) -> Dict[str, Any]:
+        doc = dict(self._doctors[i])
+        doc["distance"] = round(float(distance), 1)  # km
+        is_available, next_start = self.availability.status(doc.get("id"), now)
+        if is_available:
+            doc["availableTime"] = "Available Now"
+        elif next_start:
+            doc["availableTime"] = f"Today, {next_start}"
+        else:
+            doc["availableTime"] = "Next Available: Tomorrow"
+        doc["is_available_now"] = is_available
+        return doc
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        radius_km: Optional[float] = None,
+        available_only: bool = False,
+        now: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """
+        Doctors ranked by (available now first, distance), paginated with offset/limit.
+        Returns {"doctors": [...], "total": matches, "next_offset": int | None}.
+        """
+        now = now or datetime.now()
+        point = np.radians([[lat, lon]])
+        with self._lock:
+            self._ensure_doctors()
+            available_idx, available_tree = self._available_now(now)
+
+            total_available = self._count(available_tree, point, radius_km)
+            total = total_available if available_only else self._count(self._tree, point, radius_km)
+            need = total if limit is None else min(total, offset + limit)
+
+            # 1. Nearest doctors available now
+            ind, dist = self._query(available_tree, point, need, radius_km)
+            ranked = list(zip(available_idx[ind].tolist(), dist.tolist()))
+
+            # 2. Then everyone else by distance (the available ones are skipped)
+            if len(ranked) < need:
+                available_set = set(available_idx.tolist())
+                ind, dist = self._query(self._tree, point, need - len(ranked) + len(available_set), radius_km)
+                ranked += [(i, d) for i, d in zip(ind.tolist(), dist.tolist()) if i not in available_set]
+
+            page = ranked[offset:need]
+            doctors = [self._entry(i, d, now) for i, d in page]
+
+        next_offset = offset + len(page) if offset + len(page) < total else None
+        return {"doctors": doctors, "total": total, "next_offset": next_offset}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "doctors": len(self._doctors),
+                "available_now": int(len(self._available[0])),
+            }
+
+
+# Singleton Instance
+doctor_geo_index = DoctorGeoIndex()
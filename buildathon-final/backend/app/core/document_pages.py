@@ -0,0 +1,74 @@
+import io
+from dataclasses import dataclass
+from typing import List, Optional
+
+# A PDF page with at least this much text has a usable text layer (no vision call needed)
+MIN_TEXT_LAYER_CHARS = 40
+
+
+class TooManyPagesError(ValueError):
+    """The file has more pages than the caller's budget (raised before any page is parsed)."""
+
+    def __init__(self, filename: str, pages: int, max_pages: int):
+        super().__init__(f"{filename} has {pages} pages (limit {max_pages})")
+        self.pages = pages
+
+
+@dataclass
+class DocumentPage:
+    source: str                          # uploaded file name
+    page_number: int                     # 1-based, within the source file
+    image_bytes: Optional[bytes] = None  # page image for the vision model
+    text: Optional[str] = None           # text layer of a digital PDF page
+    note: Optional[str] = None           # why the page could not be read
+
+    @property
+    def mode(self) -> str:
+        if self.text:
+            return "text_layer"
+        return "vision" if self.image_bytes else "skipped"
+
+
+def is_pdf(filename: Optional[str], content_type: Optional[str], data: bytes) -> bool:
+    return data[:5] == b"%PDF-" or (content_type or "") == "application/pdf" or (filename or "").lower().endswith(".pdf")
+
+
+def pdf_pages(filename: str, data: bytes, max_pages: Optional[int] = None) -> List[DocumentPage]:
+    """
+    Splits a PDF locally with pypdf. Digital reports keep their text layer; scanned pages
+    (no text) use their largest embedded image. Vector-only pages without either can't be
+    read without a rasterizer and are reported as skipped.
+    The page count (from the page tree) is checked against `max_pages` before any page is read.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    if max_pages is not None and len(reader.pages) > max_pages:
+        raise TooManyPagesError(filename, len(reader.pages), max_pages)
+
+    pages = []
+    for number, page in enumerate(reader.pages, start=1):
+        text = (page.extract_text() or "").strip()
+        if len("".join(text.split())) >= MIN_TEXT_LAYER_CHARS:
+            pages.append(DocumentPage(filename, number, text=text))
+            continue
+        try:
+            images = list(page.images)
+        except Exception as e:
+            print(f"WARN: Could not read images of {filename} page {number}: {e}")
+            images = []
+        if images:
+            largest = max(images, key=lambda img: len(img.data))
+            pages.append(DocumentPage(filename, number, image_bytes=largest.data))
+        else:
+            pages.append(DocumentPage(filename, number, note="No text layer or scanned image on this page"))
+    return pages
+
+
+def split_document(filename: str, content_type: Optional[str], data: bytes, max_pages: Optional[int] = None) -> List[DocumentPage]:
+    """One upload -> its pages (a photo is a single page). Raises TooManyPagesError past `max_pages`."""
+    if is_pdf(filename, content_type, data):
+        return pdf_pages(filename, data, max_pages)
+    if max_pages is not None and max_pages < 1:
+        raise TooManyPagesError(filename, 1, max_pages)
+    return [DocumentPage(filename, 1, image_bytes=data)]
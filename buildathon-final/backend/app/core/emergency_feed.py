@@ -0,0 +1,195 @@
+import asyncio
+import copy
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.dashboard_projection import (
+    DELETE_FIELD,
+    dashboard_projection,
+    deep_merge,
+    emergency_sort_key,
+    is_active_emergency,
+)
+
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue_size: int):
+        self.loop = loop
+        self.queue: "asyncio.Queue[Tuple[str, Any]]" = asyncio.Queue(maxsize=queue_size)
+        self.resync = False  # set when the client fell behind; it gets a fresh snapshot
+
+    def push(self, event: Tuple[str, Any]) -> None:
+        # Runs on the subscriber's event loop
+        if self.resync:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.resync = True
+
+
+class EmergencyFeed:
+    """
+    In-memory set of active emergencies, pushed to connected doctor portals.
+    - Seeded from the shared emergency board of the dashboard projection.
+    - Kept current by the projection's emergency patches (booking, summary, status changes),
+      which can arrive from any thread.
+    - Patches only reach the worker that made the write, so the set is also re-read from the
+      board every `resync_seconds` (checked on connect and on each heartbeat); differences go
+      out as events.
+    - Each subscriber gets a snapshot, then `upsert` / `remove` events.
+    """
+
+    def __init__(self, projection=None, queue_size: int = 256, heartbeat_seconds: float = 15.0,
+                 resync_seconds: Optional[float] = None):
+        self.projection = projection if projection is not None else dashboard_projection
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.resync_seconds = settings.EMERGENCY_FEED_RESYNC_SECONDS if resync_seconds is None else resync_seconds
+        self._active: Dict[str, Dict[str, Any]] = {}
+        self._pending: Optional[List[Dict[str, Dict[str, Any]]]] = None  # patches received while syncing
+        self._seeded = False
+        self._synced_at = 0.0
+        self._seed_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._subscribers: List[_Subscriber] = []
+        self.projection.add_emergency_listener(self.apply)
+
+    async def ensure_seeded(self) -> None:
+        if not self._seeded:
+            await asyncio.to_thread(self._sync, False)
+
+    async def ensure_fresh(self) -> None:
+        """Seeds the set, or re-reads it from the board when the last read is too old."""
+        if self._stale():
+            await asyncio.to_thread(self._sync, True)
+
+    def _stale(self) -> bool:
+        if not self._seeded:
+            return True
+        return self.resync_seconds > 0 and time.monotonic() - self._synced_at >= self.resync_seconds
+
+    def _sync(self, resync: bool) -> None:
+        with self._seed_lock:
+            if not (self._stale() if resync else not self._seeded):
+                return  # another caller synced while we waited
+            with self._lock:
+                self._pending = []
+            try:
+                entries = self.projection.get_emergencies()
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+            events = []
+            with self._lock:
+                current = {e["id"]: e for e in entries if e.get("id")}
+                if self._seeded:
+                    events = [("remove", {"id": eid}) for eid in self._active if eid not in current]
+                    events += [
+                        ("upsert", copy.deepcopy(e)) for eid, e in current.items() if self._active.get(eid) != e
+                    ]
+                seeding = not self._seeded
+                self._active = current
+                pending, self._pending = self._pending, None
+                self._seeded = True
+                self._synced_at = time.monotonic()
+                subscribers = list(self._subscribers)
+            self._notify(events, subscribers)
+            for patches in pending:
+                self.apply(patches)
+            if seeding:
+                print(f"DEBUG: Emergency feed seeded with {len(self._active)} active emergencies")
+            elif events:
+                print(f"DEBUG: Emergency feed resync found {len(events)} changes from other workers")
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return sorted(self._active.values(), key=emergency_sort_key, reverse=True)
+
+    def apply(self, patches: Dict[str, Dict[str, Any]]) -> None:
+        """Projection listener: merges the patches and notifies subscribers (thread-safe)."""
+        events = []
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(patches)
+                return
+            if not self._seeded:
+                return  # the seed will read the projection, which already holds the change
+            for emergency_id, patch in patches.items():
+                if patch is DELETE_FIELD:
+                    if self._active.pop(emergency_id, None) is not None:
+                        events.append(("remove", {"id": emergency_id}))
+                    continue
+                entry = self._active.get(emergency_id)
+                if entry is None:
+                    if "id" not in patch:
+                        continue  # update of an emergency that is not active
+                    entry = {}
+                deep_merge(entry, patch)
+                if is_active_emergency(entry):
+                    self._active[emergency_id] = entry
+                    events.append(("upsert", copy.deepcopy(entry)))
+                elif emergency_id in self._active:
+                    del self._active[emergency_id]
+                    events.append(("remove", {"id": emergency_id}))
+            subscribers = list(self._subscribers)
+        self._notify(events, subscribers)
+
+    @staticmethod
+    def _notify(events: List[Tuple[str, Any]], subscribers: List[_Subscriber]) -> None:
+        for event in events:
+            for sub in subscribers:
+                try:
+                    sub.loop.call_soon_threadsafe(sub.push, event)
+                except RuntimeError:
+                    pass  # the subscriber's loop is closed; it is removed when its stream ends
+
+    async def events(self) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        ("snapshot", {"emergencies": [...]}) first, then ("upsert", entry) / ("remove", {"id"}),
+        and ("heartbeat", None) when idle.
+        """
+        await self.ensure_fresh()
+        sub = _Subscriber(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.append(sub)
+        try:
+            yield "snapshot", {"emergencies": self.snapshot()}
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    try:
+                        await self.ensure_fresh()
+                    except Exception as e:
+                        print(f"WARN: Emergency feed resync failed: {e}")
+                    if sub.queue.empty():  # the resync's own events already keep the stream alive
+                        yield "heartbeat", None
+                    continue
+                if sub.resync:
+                    # Fell behind: drop the backlog and start over from the current set
+                    while not sub.queue.empty():
+                        sub.queue.get_nowait()
+                    sub.resync = False
+                    yield "snapshot", {"emergencies": self.snapshot()}
+                    continue
+                yield event
+        finally:
+            with self._lock:
+                self._subscribers.remove(sub)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "seeded": self._seeded,
+                "active": len(self._active),
+                "subscribers": len(self._subscribers),
+                "synced_seconds_ago": round(time.monotonic() - self._synced_at, 1) if self._seeded else None,
+            }
+
+
+# Singleton Instance
+emergency_feed = EmergencyFeed()
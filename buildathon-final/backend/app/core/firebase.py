@@ -1,17 +1,97 @@
 import os
+import uuid
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-try:
-    import firebase_admin
-    from firebase_admin import credentials, firestore
-    FIREBASE_AVAILABLE = True
-except ImportError:
-    FIREBASE_AVAILABLE = False
+from app.core.config import settings
+from app.core.container import container
+from app.core.local_firestore import LocalFirestore
+from app.core.tracing import tracer
+
+# firebase_admin (with the Firestore/gRPC stack) takes ~0.5s to import, so it is
+# only imported when the service is created.
+FIREBASE_AVAILABLE = importlib.util.find_spec("firebase_admin") is not None
+if not FIREBASE_AVAILABLE:
     print("WARNING: firebase-admin not installed.")
 
+# Firestore accepts at most 30 values in an 'in' filter
+IN_QUERY_LIMIT = 30
+# ... and at most 500 operations in a WriteBatch
+WRITE_BATCH_SIZE = 450
+
+# Appointment / case statuses that close an emergency
+ENDED_STATUSES = ["CONSULTATION_ENDED", "COMPLETED"]
+
+# Pharmacy catalogue used in mock mode and to seed the local Firestore stand-in
+SAMPLE_MEDICINES = [
+    {"id": "m1", "name": "Amoxicillin 500mg", "price": 12.50, "category": "Prescription", "in_stock": True, "description": "Antibiotic for bacterial infections."},
+    {"id": "m2", "name": "Cetirizine 10mg", "price": 5.00, "category": "OTC", "in_stock": True, "description": "Antihistamine for allergies."},
+    {"id": "m3", "name": "Vitamin C 1000mg", "price": 8.00, "category": "Wellness", "in_stock": True, "description": "Immunity booster supplement."},
+    {"id": "m4", "name": "Ibuprofen 400mg", "price": 6.50, "category": "OTC", "in_stock": True, "description": "Pain reliever and anti-inflammatory."},
+    {"id": "m5", "name": "Paracetamol 500mg", "price": 3.00, "category": "OTC", "in_stock": True, "description": "Fever reducer and mild pain reliever."},
+    {"id": "m6", "name": "Baby Diapers (Pack of 12)", "price": 15.00, "category": "Baby Care", "in_stock": True, "description": "Soft and absorbent diapers."}
+]
+
+
+def enrich_appointment(apt, for_doctor=True):
+    """Patient details from the snapshot (doctor view) and the dashboard severity colour."""
+    if for_doctor:
+        snapshot = apt.get("patient_snapshot", {})
+        apt["patient_name"] = snapshot.get("name") or apt.get("patient_name") or "Unknown"
+        apt["patient_age"] = snapshot.get("age") or apt.get("patient_age")
+        apt["patient_gender"] = snapshot.get("gender") or apt.get("patient_gender")
+
+    # [FIX] Injection of calculated fields for Doctor Dashboard
+    apt["severity"] = "red" if apt.get("is_emergency") is True else "green"
+    return apt
+
+
+def emergency_from_medical_record(doc_id, data):
+    """Emergency entry for a legacy AI_SUMMARY_DOCTOR record, None if its severity is not high."""
+    # Check inside the nested JSON structure
+    summary = data.get("data", {}).get("pre_doctor_consultation_summary", {})
+    severity = summary.get("assessment", {}).get("severity", "LOW")
+    if severity in ["CRITICAL", "HIGH", "RED"]:
+        return {**data, "id": doc_id, "severity": severity, "source_type": "medical_record"}
+    return None
+
+
+def emergency_from_appointment(doc_id, apt_data):
+    """Emergency entry for an is_emergency appointment, shaped like a summary for the frontend."""
+    summary_payload = {
+        "trigger_reason": "Emergency Appointment Booking",
+        "assessment": {
+            "severity": "HIGH",
+            "severity_score": 99
+        },
+        "vitals_reported": {}
+    }
+
+    patient_profile = apt_data.get("patient_snapshot", {})
+    if not patient_profile.get("name"):
+        patient_profile["name"] = apt_data.get("patient_name", "Unknown")
+
+    return {
+        "id": doc_id,
+        "patient_id": apt_data.get("patient_id"),
+        "profile_id": apt_data.get("profile_id"),
+        "case_id": apt_data.get("case_id"),
+        "created_at": apt_data.get("created_at"),
+        "data": {
+            "patient_profile": patient_profile,
+            "pre_doctor_consultation_summary": summary_payload
+        },
+        "source_type": "appointment",
+        "status": apt_data.get("status"), # [FIX] Lift status for filtering
+        "appointment_details": apt_data # Keep original data
+    }
+
 class FirebaseService:
     def __init__(self):
         self.db = None
         self.mock_mode = True
+        self.backend = "mock"
+        backend = settings.FIRESTORE_BACKEND.lower()
         
         # Check for credentials in multiple locations
         potential_paths = [
@@ -29,8 +109,11 @@ class FirebaseService:
                 print(f"INFO: Found Firebase credentials at: {cred_path}")
                 break
         
-        if FIREBASE_AVAILABLE and cred_path:
+        if backend in ("auto", "firestore") and FIREBASE_AVAILABLE and cred_path:
             try:
+                import firebase_admin
+                from firebase_admin import credentials, firestore
+
                 # [FIX] Check if already initialized to avoid "Default app already exists" error
                 if not firebase_admin._apps:
                     cred = credentials.Certificate(cred_path)
@@ -41,15 +124,39 @@ class FirebaseService:
                 
                 self.db = firestore.client()
                 self.mock_mode = False
+                self.backend = "firestore"
             except Exception as e:
-                print(f"ERROR: Firebase init failed: {e}. Switching to MOCK mode.")
-        else:
-            print("INFO: No Firebase credentials found. Running in MOCK mode.")
+                print(f"ERROR: Firebase init failed: {e}. Switching to LOCAL mode.")
+        elif backend != "mock":
+            print("INFO: No Firebase credentials found. Running on the LOCAL Firestore stand-in.")
+
+        if self.db is None and backend != "mock":
+            self._use_local_firestore()
+        elif self.db is None:
+            print("INFO: Running in MOCK mode.")
+
+    def _use_local_firestore(self):
+        path = settings.LOCAL_FIRESTORE_PATH or None
+        self.db = LocalFirestore(
+            path,
+            latency_ms=settings.LOCAL_FIRESTORE_LATENCY_MS,
+            jitter_ms=settings.LOCAL_FIRESTORE_JITTER_MS,
+        )
+        self.mock_mode = False
+        self.backend = "local"
+        print(f"INFO: Local Firestore ({path or 'in-memory'}, {settings.LOCAL_FIRESTORE_LATENCY_MS} ms per call)")
+        # The pharmacy catalogue is static data: start from the sample catalogue
+        medicines = self.db.collection("medicines")
+        if not medicines.limit(1).get():
+            batch = self.db.batch()
+            for medicine in SAMPLE_MEDICINES:
+                batch.set(medicines.document(medicine["id"]), {k: v for k, v in medicine.items() if k != "id"})
+            batch.commit()
 
     def save_record(self, collection, data):
         if self.mock_mode:
             print(f"[MOCK FIREBASE] Saving to '{collection}': {data}")
-            return "mock_id_123"
+            return f"mock_{uuid.uuid4().hex[:12]}"
         else:
             # Real implementation
             try:
@@ -91,6 +198,54 @@ class FirebaseService:
                 print(f"Firebase Fetch Error: {e}")
                 return []
 
+    def get_records_page(self, collection, patient_id=None, case_id=None, limit=50, after=None, doctor_id=None):
+        """
+        Up to `limit` records of a case / patient / doctor, newest first by (created_at, document id),
+        after the sort key `after` = (created_at, id). Records without created_at are left out
+        (ordered Firestore queries skip them). Needs a composite index on
+        (case_id, patient_id or doctor_id, created_at desc, __name__ desc). Raises on query errors.
+        """
+        if self.mock_mode:
+            print(f"[MOCK FIREBASE] Fetching a page of {limit} from '{collection}'.")
+            return []
+        query = self.db.collection(collection)
+        if case_id:
+            query = query.where("case_id", "==", case_id)
+        elif patient_id:
+            query = query.where("patient_id", "==", patient_id)
+        elif doctor_id:
+            query = query.where("doctor_id", "==", doctor_id)
+        query = query.order_by("created_at", direction="DESCENDING").order_by("__name__", direction="DESCENDING")
+        if after is not None:
+            query = query.start_after({"created_at": after[0], "__name__": self.db.collection(collection).document(after[1])})
+        return [{**doc.to_dict(), "id": doc.id} for doc in query.limit(limit).stream()]
+
+    def get_records_in(self, collection, field, values, chunk_size=IN_QUERY_LIMIT):
+        """
+        Fetches every document whose `field` is one of `values` with chunked 'in' queries
+        (run concurrently) instead of one query per value.
+        """
+        values = list(dict.fromkeys(v for v in values if v))
+        if self.mock_mode:
+            print(f"[MOCK FIREBASE] Fetching from '{collection}' where {field} in {len(values)} values.")
+            return []
+        chunks = [values[i:i + chunk_size] for i in range(0, len(values), chunk_size)]
+        if not chunks:
+            return []
+
+        def fetch(chunk):
+            docs = self.db.collection(collection).where(field, "in", chunk).stream()
+            return [{**doc.to_dict(), "id": doc.id} for doc in docs]
+
+        records = []
+        with ThreadPoolExecutor(max_workers=min(8, len(chunks))) as pool:
+            for chunk, future in zip(chunks, [pool.submit(fetch, c) for c in chunks]):
+                try:
+                    records.extend(future.result())
+                except Exception as e:
+                    print(f"Firebase Batched Fetch Error ({collection}, {len(chunk)} values): {e}")
+        return records
+
     def get_appointments(self, doctor_id=None, patient_id=None, user_id=None):
         """
         Fetch appointments with V1.0 enrichment.
@@ -159,19 +314,8 @@ class FirebaseService:
 
             enriched = []
             for apt in appointments:
-                # 1. Enlighten Patient Info (for Doctors)
-                if doctor_id:
-                    snapshot = apt.get("patient_snapshot", {})
-                    apt["patient_name"] = snapshot.get("name") or apt.get("patient_name") or "Unknown"
-                    apt["patient_age"] = snapshot.get("age") or apt.get("patient_age")
-                    apt["patient_age"] = snapshot.get("age") or apt.get("patient_age")
-                    apt["patient_gender"] = snapshot.get("gender") or apt.get("patient_gender")
-
-                # [FIX] Injection of calculated fields for Doctor Dashboard
-                if apt.get("is_emergency") is True:
-                    apt["severity"] = "red"
-                else:
-                    apt["severity"] = "green"
+                # 1. Enlighten Patient Info (for Doctors) + severity for the Doctor Dashboard
+                enrich_appointment(apt, for_doctor=bool(doctor_id))
 
                 # 2. Enlighten Doctor Info (for Patients)
                 if patient_id:
@@ -241,13 +385,9 @@ class FirebaseService:
                     query = self.db.collection("medical_records").where("type", "==", "AI_SUMMARY_DOCTOR")
                     docs = query.stream()
                     for doc in docs:
-                        data = doc.to_dict()
-                        # Check inside the nested JSON structure
-                        summary = data.get("data", {}).get("pre_doctor_consultation_summary", {})
-                        severity = summary.get("assessment", {}).get("severity", "LOW")
-                        
-                        if severity in ["CRITICAL", "HIGH", "RED"]:
-                             emergencies.append({**data, "id": doc.id, "severity": severity, "source_type": "medical_record"})
+                        entry = emergency_from_medical_record(doc.id, doc.to_dict())
+                        if entry:
+                            emergencies.append(entry)
                 except Exception as e:
                     print(f"Error fetching medical records: {e}")
 
@@ -257,37 +397,7 @@ class FirebaseService:
                     apt_docs = apt_query.stream()
                     
                     for doc in apt_docs:
-                        apt_data = doc.to_dict()
-                        # Normalize to match expected structure or mark as appointment
-                        # Construct a mock "summary" for the frontend to consume easily
-                        
-                        summary_payload = {
-                            "trigger_reason": "Emergency Appointment Booking",
-                            "assessment": {
-                                "severity": "HIGH",
-                                "severity_score": 99
-                            },
-                            "vitals_reported": {} 
-                        }
-                        
-                        patient_profile = apt_data.get("patient_snapshot", {})
-                        if not patient_profile.get("name"):
-                             patient_profile["name"] = apt_data.get("patient_name", "Unknown")
-
-                        emergencies.append({
-                            "id": doc.id,
-                            "patient_id": apt_data.get("patient_id"),
-                            "profile_id": apt_data.get("profile_id"),
-                            "case_id": apt_data.get("case_id"),
-                            "created_at": apt_data.get("created_at"),
-                            "data": {
-                                "patient_profile": patient_profile,
-                                "pre_doctor_consultation_summary": summary_payload
-                            },
-                            "source_type": "appointment",
-                            "status": apt_data.get("status"), # [FIX] Lift status for filtering
-                            "appointment_details": apt_data # Keep original data
-                        })
+                        emergencies.append(emergency_from_appointment(doc.id, doc.to_dict()))
                         
                 except Exception as e:
                     print(f"Error fetching emergency appointments: {e}")
@@ -295,7 +405,7 @@ class FirebaseService:
                 # [FIX] Filter out completed/ended emergencies
                 active_emergencies = [
                     e for e in emergencies 
-                    if e.get("status") not in ["CONSULTATION_ENDED", "COMPLETED"]
+                    if e.get("status") not in ENDED_STATUSES
                 ]
                 
                 return active_emergencies
@@ -439,7 +549,7 @@ class FirebaseService:
 
         if self.mock_mode:
             print(f"[MOCK FIREBASE] Creating slot: {slot_data}")
-            return "mock_slot_id"
+            return f"mock_slot_{uuid.uuid4().hex[:12]}"
         else:
             try:
                 # Basic validation: Check for overlap? (Skipping for MVP)
@@ -449,6 +559,44 @@ class FirebaseService:
                 print(f"Firebase Create Slot Error: {e}")
                 return None
 
+    def book_slot(self, slot_id, appointment: dict, case_id=None, case_patch=None, check=None):
+        """
+        Books a slot in ONE Firestore transaction: re-reads the slot, runs `check(slot)` (returns a
+        failure reason or None), then marks the slot BOOKED, creates the appointment and upserts
+        the case. Firestore retries the whole transaction if the slot changes concurrently.
+        Returns (appointment_doc_id, None) or (None, reason).
+        """
+        if self.mock_mode:
+            raise RuntimeError("book_slot needs a database; mock bookings go through BookingService")
+
+        if isinstance(self.db, LocalFirestore):
+            transactional = self.db.transactional
+        else:
+            from firebase_admin import firestore
+            transactional = firestore.transactional
+
+        appointment_ref = self.db.collection("appointments").document()
+        slot_ref = self.db.collection("doctor_slots").document(slot_id) if slot_id else None
+        case_ref = self.db.collection("cases").document(case_id) if case_id else None
+
+        @transactional
+        def run(transaction):
+            # All reads before any write (Firestore transaction rule)
+            if slot_ref is not None:
+                snapshot = slot_ref.get(transaction=transaction)
+                slot = {**snapshot.to_dict(), "id": snapshot.id} if snapshot.exists else None
+                reason = check(slot) if check else (None if slot else "Slot not found")
+                if reason:
+                    return reason
+                transaction.update(slot_ref, {"status": "BOOKED", "appointment_id": appointment_ref.id})
+            transaction.set(appointment_ref, appointment)
+            if case_ref is not None:
+                transaction.set(case_ref, case_patch or {}, merge=True)
+            return None
+
+        reason = run(self.db.transaction())
+        return (None, reason) if reason else (appointment_ref.id, None)
+
     def delete_slot(self, slot_id: str):
         """
         Deletes a slot by ID.
@@ -570,185 +718,56 @@ class FirebaseService:
                 print(f"Global Delete Error: {e}")
                 return False
 
-    def create_batch_slots(self, doctor_id, start_date, end_date, selected_days, start_time, end_time, break_start, break_end, slot_duration=30, time_gap=0):
+    def create_slots(self, slots, chunk_size=WRITE_BATCH_SIZE, max_parallel=4):
         """
-        Creates slots in batch for a date range.
-        Inputs: strings "YYYY-MM-DD", "HH:MM", list ["Mon", "Tue"]
+        Creates many slots with chunked WriteBatches (committed concurrently) instead of one
+        add() per slot. Returns ([(slot_id, slot_data)] of the committed chunks,
+        [{"slots": n, "error": str}] of the chunks that failed).
         """
-        created_count = 0
-        try:
-            curr_date = datetime.strptime(start_date, "%Y-%m-%d")
-            end_dt = datetime.strptime(end_date, "%Y-%m-%d")
-            
-            # Parse times
-            start_tm = datetime.strptime(start_time, "%H:%M")
-            end_tm = datetime.strptime(end_time, "%H:%M")
-            break_start_tm = datetime.strptime(break_start, "%H:%M")
-            break_end_tm = datetime.strptime(break_end, "%H:%M")
-            
-            # Extract time components for slot generation logic
-            start_h, start_m = start_tm.hour, start_tm.minute
-            end_h, end_m = end_tm.hour, end_tm.minute
-            break_s_h, break_s_m = break_start_tm.hour, break_start_tm.minute
-            break_e_h, break_e_m = break_end_tm.hour, break_end_tm.minute
-            
-            while curr_date <= end_dt:
-                day_name = curr_date.strftime("%a") # Mon, Tue...
-                if day_name in selected_days:
-                    # Current Day Start/End as full datetime
-                    day_start_dt = curr_date.replace(hour=start_h, minute=start_m, second=0, microsecond=0)
-                    day_end_dt = curr_date.replace(hour=end_h, minute=end_m, second=0, microsecond=0)
-                    
-                    # Current Day Break
-                    day_break_start = curr_date.replace(hour=break_s_h, minute=break_s_m, second=0, microsecond=0)
-                    day_break_end = curr_date.replace(hour=break_e_h, minute=break_e_m, second=0, microsecond=0)
-                    
-                    # Generate Slots
-                    slot_start = day_start_dt
-                    while slot_start + timedelta(minutes=slot_duration) <= day_end_dt:
-                        slot_end = slot_start + timedelta(minutes=slot_duration)
-                        
-                        # Check Overlap: (SlotEnd > BreakStart) AND (SlotStart < BreakEnd)
-                        is_overlap = (slot_end > day_break_start) and (slot_start < day_break_end)
-                        
-                        if not is_overlap:
-                            slot_data = {
-                                "doctor_id": doctor_id,
-                                "date": curr_date.strftime("%Y-%m-%d"),
-                                "start_time": slot_start.strftime("%H:%M"),
-                                "end_time": slot_end.strftime("%H:%M"),
-                                "status": "AVAILABLE"
-                            }
-                            self.create_slot(slot_data)
-                            created_count += 1
-                        
-                        # Add Duration + GAP for next start
-                        slot_start = slot_end + timedelta(minutes=time_gap)
-
-                curr_date += timedelta(days=1)
-                
-            return created_count
-
-            return created_count
-        except Exception as e:
-            print(f"Batch Create Error: {e}")
-            return 0
+        if self.mock_mode:
+            print(f"[MOCK FIREBASE] Creating {len(slots)} slots in batches.")
+            return [(f"mock_slot_{uuid.uuid4().hex[:12]}", slot) for slot in slots], []
+        chunks = [slots[i:i + chunk_size] for i in range(0, len(slots), chunk_size)]
+        if not chunks:
+            return [], []
+
+        def commit(chunk):
+            batch = self.db.batch()
+            created = []
+            for slot in chunk:
+                doc_ref = self.db.collection("doctor_slots").document()
+                batch.set(doc_ref, slot)
+                created.append((doc_ref.id, slot))
+            batch.commit()
+            return created
+
+        created, failed = [], []
+        with ThreadPoolExecutor(max_workers=min(max_parallel, len(chunks))) as pool:
+            for chunk, future in zip(chunks, [pool.submit(commit, c) for c in chunks]):
+                try:
+                    created.extend(future.result())
+                except Exception as e:
+                    print(f"Firebase Batch Write Error (doctor_slots, {len(chunk)} slots): {e}")
+                    failed.append({"slots": len(chunk), "error": str(e)})
+        return created, failed
 
-    def get_doctors_with_availability(self, lat: float, lon: float):
+    def get_slots_for_date(self, date: str, status: str = "AVAILABLE"):
         """
-        Fetches all doctors, calculates distance, and checks immediate availability.
-        Returns list sorted by: Available Now (Priority) -> Distance (Ascending).
+        Fetch the slots of ALL doctors for one date (YYYY-MM-DD).
+        If status="ALL", returns all slots.
         """
         if self.mock_mode:
-            print("[MOCK FIREBASE] returning mock emergency doctors")
+            print(f"[MOCK FIREBASE] Fetching slots for {date}.")
             return []
-
-        try:
-            # 1. Fetch all doctors
-            doctors = self.get_doctors()
-            
-            # 2. Fetch ALL slots for TODAY for ALL doctors (Optimization: Query all slots for today date)
-            today_str = datetime.now().strftime("%Y-%m-%d")
-            
-            # In a huge DB, we'd query by doctor. For MVP, one query for today's slots is efficient enough.
-            slots_ref = self.db.collection("doctor_slots")
-            slots_query = slots_ref.where("date", "==", today_str).where("status", "==", "AVAILABLE")
-            slots_docs = slots_query.stream()
-            
-            # Organize slots by doctor_id
-            doctor_slots_map = {}
-            current_time = datetime.now()
-            
-            for doc in slots_docs:
-                data = doc.to_dict()
-                doc_id = data.get("doctor_id")
-                if doc_id not in doctor_slots_map:
-                    doctor_slots_map[doc_id] = []
-                
-                # Check if slot is in the future (or strictly "now" if we want immediate)
-                # For "Available Now", allow slots that started within last 15 mins or start in next 30 mins
-                # For simplicity MVP: If slot.end_time > current_time AND slot.start_time <= current_time + buffer
-                doctor_slots_map[doc_id].append(data)
-
-            # 3. Process Doctors
-            enriched_doctors = []
-            
-            for doc in doctors:
-                # Calculate Distance
-                # Default doc location if missing (Seed data might not have it)
-                doc_lat = doc.get("latitude", 28.6139) # Default Connaught Place
-                doc_lon = doc.get("longitude", 77.2090)
-                
-                dist = self._calculate_distance(lat, lon, doc_lat, doc_lon)
-                doc["distance"] = round(dist, 1) # km
-                
-                # Check Availability
-                is_available = False
-                doc_slots = doctor_slots_map.get(doc["id"], [])
-                
-                current_time_str = current_time.strftime("%H:%M")
-                
-                for slot in doc_slots:
-                    # Simple check: Is current time within slot start/end?
-                    # OR is there a slot starting very soon?
-                    
-                    # Using string comparison for "HH:MM" works for same day
-                    if slot["start_time"] <= current_time_str < slot["end_time"]:
-                        is_available = True
-                        break
-                    
-                    # Also consider "Available" if slot starts in next 20 mins
-                    # (Skipping complex time math for MVP, just strict "Now" or "Future today")
-                    if slot["start_time"] > current_time_str:
-                         # It's available later today
-                         pass
-
-                doc["availableTime"] = "Available Now" if is_available else "Next Available: Tomorrow" 
-                # If not available now but has slots later today?
-                if not is_available and doc_slots:
-                     # Find next slot
-                     doc_slots.sort(key=lambda x: x["start_time"])
-                     next_slot = None
-                     for s in doc_slots:
-                         if s["start_time"] > current_time_str:
-                             next_slot = s
-                             break
-                     if next_slot:
-                         doc["availableTime"] = f"Today, {next_slot['start_time']}"
-
-                # Prioritize Available Now
-                doc["is_available_now"] = is_available
-                
-                enriched_doctors.append(doc)
-            
-            # 4. Sort
-            # Primary: Available Now (True first)
-            # Secondary: Distance (Low first)
-            enriched_doctors.sort(key=lambda x: (not x["is_available_now"], x["distance"]))
-            
-            return enriched_doctors
-
-        except Exception as e:
-            print(f"Emergency Doctor Fetch Error: {e}")
-            return []
-
-    def _calculate_distance(self, lat1, lon1, lat2, lon2):
-        # Haversine formula
-        import math
-        R = 6371  # Earth radius in km
-
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = math.sin(dlat / 2) * math.sin(dlat / 2) + \
-            math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * \
-            math.sin(dlon / 2) * math.sin(dlon / 2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        distance = R * c
-        return distance
-
-
-
-
+        else:
+            try:
+                query = self.db.collection("doctor_slots").where("date", "==", date)
+                if status != "ALL":
+                    query = query.where("status", "==", status)
+                return [{**doc.to_dict(), "id": doc.id} for doc in query.stream()]
+            except Exception as e:
+                print(f"Firebase Slots Error: {e}")
+                return []
 
     # --- PHARMACY MODULE ---
     def get_medicines(self):
@@ -757,14 +776,7 @@ class FirebaseService:
         """
         if self.mock_mode:
             print("[MOCK FIREBASE] Fetching all medicines.")
-            return [
-                {"id": "m1", "name": "Amoxicillin 500mg", "price": 12.50, "category": "Prescription", "in_stock": True, "description": "Antibiotic for bacterial infections."},
-                {"id": "m2", "name": "Cetirizine 10mg", "price": 5.00, "category": "OTC", "in_stock": True, "description": "Antihistamine for allergies."},
-                {"id": "m3", "name": "Vitamin C 1000mg", "price": 8.00, "category": "Wellness", "in_stock": True, "description": "Immunity booster supplement."},
-                {"id": "m4", "name": "Ibuprofen 400mg", "price": 6.50, "category": "OTC", "in_stock": True, "description": "Pain reliever and anti-inflammatory."},
-                {"id": "m5", "name": "Paracetamol 500mg", "price": 3.00, "category": "OTC", "in_stock": True, "description": "Fever reducer and mild pain reliever."},
-                {"id": "m6", "name": "Baby Diapers (Pack of 12)", "price": 15.00, "category": "Baby Care", "in_stock": True, "description": "Soft and absorbent diapers."}
-            ]
+            return [dict(m) for m in SAMPLE_MEDICINES]
         else:
             try:
                 docs = self.db.collection("medicines").stream()
@@ -893,7 +905,13 @@ class FirebaseService:
                 print(f"Firebase History Update Error: {e}")
                 return False
 
-# Singleton Instance
-firebase_service = FirebaseService()
+# Every public call (one or more Firestore round trips) is a "firestore" span
+tracer.trace_methods(FirebaseService, "firestore", [
+    name for name, value in vars(FirebaseService).items() if callable(value) and not name.startswith("_")
+])
+
+# Singleton Instance (created on first use or during startup warm-up)
+container.register("firebase", FirebaseService)
+firebase_service = container.proxy("firebase", spec=FirebaseService)
 
 
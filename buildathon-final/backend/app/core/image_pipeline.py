@@ -0,0 +1,156 @@
+import asyncio
+import base64
+import copy
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from PIL import Image, ImageOps
+
+from app.core.config import settings
+
+# Encoder qualities tried in order until the JPEG fits the byte budget
+QUALITY_STEPS = (85, 75, 65)
+
+
+@dataclass
+class PreparedImage:
+    jpeg_bytes: bytes
+    width: int
+    height: int
+    quality: Optional[int]  # None when the original bytes are passed through
+    original_size: int
+
+    def data_url(self) -> str:
+        return f"data:image/jpeg;base64,{base64.b64encode(self.jpeg_bytes).decode('utf-8')}"
+
+
+def prepare_image(image_bytes: bytes, max_edge: Optional[int] = None, target_bytes: Optional[int] = None) -> PreparedImage:
+    """
+    Vision-model input for a document photo: EXIF-rotated, RGB, long edge bounded to
+    `max_edge` (plenty for OCR), and JPEG quality lowered step by step until it fits
+    `target_bytes`. Undecodable input is passed through unchanged.
+    """
+    max_edge = max_edge or settings.IMAGE_MAX_EDGE
+    target_bytes = target_bytes or settings.IMAGE_TARGET_BYTES
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image = ImageOps.exif_transpose(image)
+        # Convert to RGB to handle PNG/AVIF/RGBA
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if max(image.size) > max_edge:
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        for quality in QUALITY_STEPS:
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=quality, optimize=True)
+            if buffer.tell() <= target_bytes:
+                break
+        return PreparedImage(buffer.getvalue(), image.width, image.height, quality, len(image_bytes))
+    except Exception as img_err:
+        print(f"Image Conversion Error: {img_err}")
+        # Fallback to original bytes if PIL fails
+        return PreparedImage(image_bytes, 0, 0, None, len(image_bytes))
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _image_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = settings.IMAGE_WORKERS or min(4, os.cpu_count() or 1)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image")
+        return _executor
+
+
+async def prepare_image_async(image_bytes: bytes, **kwargs) -> PreparedImage:
+    """prepare_image on the image worker pool (decode / resize / encode never block the event loop)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_image_executor(), lambda: prepare_image(image_bytes, **kwargs))
+
+
+class AnalysisCache:
+    """
+    Document analysis results (vision + reasoning) by content hash, so a re-uploaded file is
+    answered without any model call. Concurrent uploads of the same file share one analysis.
+    Only successful analyses are stored (the analysis function raises on failure).
+    """
+
+    def __init__(self, max_items: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.max_items = max_items if max_items is not None else settings.IMAGE_CACHE_MAX_ITEMS
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.IMAGE_CACHE_TTL_SECONDS
+        self._items: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (stored_at, result)
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "shared": 0}
+
+    @staticmethod
+    def key(kind: str, image_bytes: bytes) -> tuple:
+        return kind, hashlib.sha256(image_bytes).hexdigest()
+
+    def get(self, key: tuple) -> Optional[Any]:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            if self.ttl_seconds and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: tuple, result: Any) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic(), result)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    async def get_or_compute(self, kind: str, image_bytes: bytes, compute: Callable[[bytes], Awaitable[Any]]) -> Any:
+        key = self.key(kind, image_bytes)
+        cached = self.get(key)
+        if cached is not None:
+            self.counters["hits"] += 1
+            print(f"DEBUG: {kind} analysis cache hit ({key[1][:12]})")
+            return copy.deepcopy(cached)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.counters["shared"] += 1
+            return copy.deepcopy(await asyncio.shield(inflight))
+
+        self.counters["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await compute(image_bytes)
+            self.put(key, result)
+            future.set_result(result)
+            return copy.deepcopy(result)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved: nobody may be waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counters, "items": len(self._items)}
+
+
+# Singleton Instance
+analysis_cache = AnalysisCache()
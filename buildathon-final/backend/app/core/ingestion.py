@@ -0,0 +1,396 @@
+"""
+Offline ingestion of NHSRC guideline PDFs into the retrieval collections.
+
+Usage (from backend/):
+    python -m app.core.ingestion data/nhsrc_guidelines.pdf [--workers 2] [--batch-size 32]
+
+- Pages are streamed one at a time with pypdf and chunked by protocol (numbered
+  guideline headings such as "3.1 FEVER") and section (REFERENCE / MANAGEMENT / RED_FLAGS).
+- MANAGEMENT and RED_FLAGS chunks go to decision_rules_v2, REFERENCE chunks to protocol_summaries_v2.
+- Chunk ids are stable (source + protocol + section + ordinal) and each chunk stores a
+  content hash, so a re-run only embeds and upserts chunks whose text changed, and
+  deletes chunks of the same source that no longer exist.
+- Embedding runs on a worker pool with a bounded number of batches in flight, which
+  caps peak memory regardless of the PDF size.
+- After each run the content version of every collection is written to
+  `<db path>/content_versions.json`; the retrieval cache reads this marker to drop
+  results of a re-ingested collection.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import resource  # Unix only; peak RSS is not reported on Windows
+except ImportError:
+    resource = None
+
+RULES_COLLECTION = "decision_rules_v2"
+SUMMARIES_COLLECTION = "protocol_summaries_v2"
+
+REFERENCE = "REFERENCE"
+MANAGEMENT = "MANAGEMENT"
+RED_FLAGS = "RED_FLAGS"
+SECTION_COLLECTIONS = {
+    REFERENCE: SUMMARIES_COLLECTION,
+    MANAGEMENT: RULES_COLLECTION,
+    RED_FLAGS: RULES_COLLECTION,
+}
+
+DEFAULT_PROTOCOL = "General Introduction"
+
+# "3.1 FEVER", "4.2 Impetigo or Pyoderma:", "CHAPTER 7: REFERRAL", "Annexure 1 : Evaluation of febrile illnesses"
+PROTOCOL_HEADING = re.compile(
+    r"^(?:\d{1,2}\.\d{1,2}\s+(?P<sub>[A-Za-z][^\d]{2,80}?)"
+    r"|CHAPTER\s*\d+\s*:\s*(?P<chapter>[A-Za-z][^\d]{2,80}?)"
+    r"|Annexure\s*\d+\s*:\s*(?P<annex>[A-Za-z][^\d]{2,80}?))\s*:?\s*$",
+    re.IGNORECASE,
+)
+# Short lines that open a section inside a protocol
+SECTION_HEADINGS = [
+    (RED_FLAGS, re.compile(r"^(when to (refer|consult)|refer(ral)?\b|danger signs|red flags?|warning signs)", re.IGNORECASE)),
+    (MANAGEMENT, re.compile(r"^(table \d+\s*:\s*action points|what (can )?you (can )?do|treatment|management|rehydration|other measures)", re.IGNORECASE)),
+    (REFERENCE, re.compile(r"^(definitions?|causes|types?\b|clinical (features|evaluation)|history|physical examination|table \d+\s*:\s*assessment)", re.IGNORECASE)),
+]
+MAX_HEADING_CHARS = 60
+# A table-of-contents page has many lines ending with a page number
+TOC_LINE = re.compile(r"\D\s\d{1,3}\s*$")
+TOC_MIN_LINES = 5
+
+# Content version marker, read by the retrieval cache (app/agent/retrieval_cache.py)
+VERSIONS_FILE = "content_versions.json"
+
+
+@dataclass
+class Chunk:
+    id: str
+    collection: str
+    protocol: str
+    section: str
+    text: str
+    page: int
+    source: str
+
+    @property
+    def document(self) -> str:
+        # Same layout as the original collections
+        return f"PROTOCOL: {self.protocol}\nSECTION: {self.section}\nCONTENT:\n{self.text}"
+
+    @property
+    def content_hash(self) -> str:
+        return hashlib.sha256(self.document.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def metadata(self) -> Dict[str, str]:
+        return {
+            "protocol": self.protocol,
+            "section": self.section,
+            "symptoms": self.protocol,
+            "type": "decision_rules" if self.collection == RULES_COLLECTION else "protocol_summaries",
+            "source": self.source,
+            "page": self.page,
+            "content_hash": self.content_hash,
+        }
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+def _clean_title(title: str) -> str:
+    title = " ".join(title.replace("\t", " ").split()).strip(" :")
+    return title.title() if title.isupper() else title
+
+
+def iter_pages(pdf_path: str) -> Iterator[tuple]:
+    """Yields (page_number, text) one page at a time; pypdf parses pages lazily."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    for number, page in enumerate(reader.pages, start=1):
+        yield number, page.extract_text() or ""
+
+
+class GuidelineChunker:
+    """
+    Splits streamed page text into chunks of at most `max_chars`, never mixing two
+    protocols or two sections in one chunk.
+    """
+
+    def __init__(self, source: str, max_chars: int = 1200):
+        self.source = source
+        self.max_chars = max_chars
+        self.protocol = DEFAULT_PROTOCOL
+        self.section = REFERENCE
+        self._lines: List[str] = []
+        self._size = 0
+        self._page = 1
+        self._ordinals: Dict[tuple, int] = {}
+
+    def _flush(self) -> Optional[Chunk]:
+        text = "\n".join(self._lines).strip()
+        self._lines, self._size = [], 0
+        if len(text) < 40:  # page numbers, stray headers
+            return None
+        key = (self.protocol, self.section)
+        ordinal = self._ordinals.get(key, 0)
+        self._ordinals[key] = ordinal + 1
+        return Chunk(
+            id=f"{_slug(self.source)}:{_slug(self.protocol)}:{self.section.lower()}:{ordinal}",
+            collection=SECTION_COLLECTIONS[self.section],
+            protocol=self.protocol,
+            section=self.section,
+            text=text,
+            page=self._page,
+            source=self.source,
+        )
+
+    def feed_page(self, page_number: int, text: str) -> Iterator[Chunk]:
+        lines = [l.strip() for l in text.split("\n")]
+        is_toc = sum(1 for l in lines if TOC_LINE.search(l)) >= TOC_MIN_LINES
+        for line in lines:
+            if not line:
+                continue
+            if not is_toc and len(line) <= MAX_HEADING_CHARS * 2:
+                match = PROTOCOL_HEADING.match(line)
+                if match:
+                    title = _clean_title(match.group("sub") or match.group("chapter") or match.group("annex"))
+                    # Headings are capitalised; this skips dosage lines like "2.5 mg/ml"
+                    if title and title[0].isupper() and title != self.protocol:
+                        chunk = self._flush()
+                        if chunk:
+                            yield chunk
+                        self.protocol, self.section = title, REFERENCE
+            if len(line) <= MAX_HEADING_CHARS:
+                for section, pattern in SECTION_HEADINGS:
+                    if pattern.match(line):
+                        if section != self.section:
+                            chunk = self._flush()
+                            if chunk:
+                                yield chunk
+                            self.section = section
+                        break
+            if not self._lines:
+                self._page = page_number
+            if self._size + len(line) > self.max_chars and self._lines:
+                chunk = self._flush()
+                if chunk:
+                    yield chunk
+                self._page = page_number
+            self._lines.append(line)
+            self._size += len(line) + 1
+
+    def finish(self) -> Iterator[Chunk]:
+        chunk = self._flush()
+        if chunk:
+            yield chunk
+
+
+def _peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+@dataclass
+class IngestionReport:
+    pages: int = 0
+    chunks: int = 0
+    unchanged: int = 0
+    embedded: int = 0
+    deleted: int = 0
+    seconds: float = 0.0
+    peak_rss_mb: float = 0.0
+    per_collection: Dict[str, int] = field(default_factory=dict)
+
+    def print(self):
+        seconds = self.seconds or 1e-9
+        print("=" * 60)
+        print("GUIDELINE INGESTION")
+        print("=" * 60)
+        print(f"Pages:          {self.pages} ({self.pages / seconds:.1f} pages/s)")
+        print(f"Chunks:         {self.chunks} ({self.chunks / seconds:.1f} chunks/s)")
+        print(f"  unchanged:    {self.unchanged}")
+        print(f"  embedded:     {self.embedded} {self.per_collection}")
+        print(f"  deleted:      {self.deleted}")
+        print(f"Elapsed:        {self.seconds:.2f} s")
+        print(f"Peak RSS:       {self.peak_rss_mb:.0f} MB")
+
+
+class GuidelineIngestor:
+    """
+    Streams chunks -> hash check against the collection -> embedding on a worker
+    pool -> upsert. At most `max_inflight` batches are held in memory at a time.
+    """
+
+    def __init__(self, collections: Dict[str, object], embedding_function, workers: int = 2,
+                 batch_size: int = 32, max_inflight: Optional[int] = None):
+        self.collections = collections
+        self.embedding_function = embedding_function
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_inflight = max_inflight or self.workers * 2
+        self._upsert_lock = threading.Lock()
+
+    def _changed(self, collection, chunks: List[Chunk]) -> List[Chunk]:
+        with self._upsert_lock:
+            existing = collection.get(ids=[c.id for c in chunks], include=["metadatas"])
+        hashes = {
+            id_: (meta or {}).get("content_hash")
+            for id_, meta in zip(existing.get("ids", []), existing.get("metadatas") or [])
+        }
+        return [c for c in chunks if hashes.get(c.id) != c.content_hash]
+
+    def _embed_and_upsert(self, collection, chunks: List[Chunk]) -> int:
+        embeddings = self.embedding_function([c.document for c in chunks])
+        with self._upsert_lock:
+            collection.upsert(
+                ids=[c.id for c in chunks],
+                embeddings=embeddings,
+                documents=[c.document for c in chunks],
+                metadatas=[c.metadata for c in chunks],
+            )
+        return len(chunks)
+
+    def run(self, pages: Iterator[tuple], source: str, max_chars: int = 1200) -> IngestionReport:
+        report = IngestionReport(per_collection={name: 0 for name in self.collections})
+        chunker = GuidelineChunker(source, max_chars=max_chars)
+        pending: Dict[str, List[Chunk]] = {name: [] for name in self.collections}
+        seen_ids: Dict[str, set] = {name: set() for name in self.collections}
+        inflight = {}
+        t0 = time.perf_counter()
+
+        def drain(limit):
+            # Block until fewer than `limit` batches are in flight (backpressure)
+            while len(inflight) >= limit:
+                done, _ = wait(list(inflight), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = inflight.pop(future)
+                    count = future.result()
+                    report.embedded += count
+                    report.per_collection[name] += count
+
+        def submit(name, batch):
+            changed = self._changed(self.collections[name], batch)
+            report.unchanged += len(batch) - len(changed)
+            if changed:
+                drain(self.max_inflight)
+                inflight[pool.submit(self._embed_and_upsert, self.collections[name], changed)] = name
+
+        def add(chunk: Chunk):
+            report.chunks += 1
+            seen_ids[chunk.collection].add(chunk.id)
+            batch = pending[chunk.collection]
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                pending[chunk.collection] = []
+                submit(chunk.collection, batch)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embed") as pool:
+            for page_number, text in pages:
+                report.pages += 1
+                for chunk in chunker.feed_page(page_number, text):
+                    add(chunk)
+            for chunk in chunker.finish():
+                add(chunk)
+            for name, batch in pending.items():
+                if batch:
+                    submit(name, batch)
+            drain(1)
+
+        # Chunks of this source that disappeared in the new edition
+        for name, collection in self.collections.items():
+            stored = collection.get(where={"source": source}, include=[])
+            stale = [id_ for id_ in stored.get("ids", []) if id_ not in seen_ids[name]]
+            if stale:
+                collection.delete(ids=stale)
+                report.deleted += len(stale)
+
+        report.seconds = time.perf_counter() - t0
+        report.peak_rss_mb = _peak_rss_mb()
+        return report
+
+
+def content_version(collection) -> str:
+    """
+    Hash of the collection's (id, content_hash) pairs. Changed chunks are upserted under
+    stable ids with a new content_hash, so an edit changes the version even when the
+    document count stays the same (chunks without a hash count by id only).
+    """
+    stored = collection.get(include=["metadatas"])
+    pairs = sorted(
+        f"{id_}:{(meta or {}).get('content_hash', '')}"
+        for id_, meta in zip(stored.get("ids") or [], stored.get("metadatas") or [])
+    )
+    return hashlib.sha256("\n".join(pairs).encode("utf-8")).hexdigest()[:16]
+
+
+def versions_path(db_path: str) -> str:
+    return os.path.join(db_path, VERSIONS_FILE)
+
+
+def read_content_versions(db_path: str) -> Dict[str, str]:
+    """{collection name: content version}; empty when no ingestion has written the marker."""
+    try:
+        with open(versions_path(db_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_content_versions(db_path: str, collections) -> Dict[str, str]:
+    """Records the content version of each collection (atomic replace of the marker file)."""
+    versions = read_content_versions(db_path)
+    versions.update({collection.name: content_version(collection) for collection in collections})
+    path = versions_path(db_path)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(versions, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+    return versions
+
+
+def main(argv: Optional[List[str]] = None) -> IngestionReport:
+    parser = argparse.ArgumentParser(description="Index NHSRC guideline PDFs into Chroma.")
+    parser.add_argument("pdf", help="Path to the guideline PDF")
+    parser.add_argument("--db-path", default=None, help="Chroma directory (default: settings.DB_PATH)")
+    parser.add_argument("--workers", type=int, default=2, help="Parallel embedding workers")
+    parser.add_argument("--batch-size", type=int, default=32, help="Chunks per embedding batch")
+    parser.add_argument("--max-inflight", type=int, default=None, help="Batches held in memory at once (default: 2 x workers)")
+    parser.add_argument("--chunk-chars", type=int, default=1200, help="Maximum characters per chunk")
+    args = parser.parse_args(argv)
+
+    import chromadb
+    from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+    from app.core.config import settings
+
+    ef = ONNXMiniLM_L6_V2()
+    db_path = args.db_path or settings.DB_PATH
+    client = chromadb.PersistentClient(path=db_path)
+    collections = {
+        name: client.get_or_create_collection(name, embedding_function=ef)
+        for name in (RULES_COLLECTION, SUMMARIES_COLLECTION)
+    }
+    source = os.path.basename(args.pdf)
+    print(f"🚀 Ingesting {source} into {list(collections)} with {args.workers} workers...")
+    ingestor = GuidelineIngestor(collections, ef, workers=args.workers, batch_size=args.batch_size,
+                                 max_inflight=args.max_inflight)
+    report = ingestor.run(iter_pages(args.pdf), source, max_chars=args.chunk_chars)
+    report.print()
+    versions = write_content_versions(db_path, collections.values())
+    print(f"Content versions: {versions}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
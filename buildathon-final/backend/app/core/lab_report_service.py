@@ -1,126 +1,201 @@
-import base64
+import asyncio
 import json
-import os
-import io
 import sys
+import time
 import traceback
-from PIL import Image
-from groq import Groq
+from typing import List, Optional, Tuple
 from app.core.config import settings
+from app.core.llm_gateway import llm_gateway
+from app.core.image_pipeline import analysis_cache, prepare_image_async
+from app.core.document_pages import DocumentPage, TooManyPagesError, split_document
 
-client = Groq(api_key=settings.GROQ_API_KEY)
 
 # Model Constants
 VISION_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct" 
 REASONING_MODEL = "openai/gpt-oss-120b" 
 
+async def extract_lab_report_text(image_bytes: bytes) -> str:
+    """Step 1: Vision model transcription of one lab report image / page."""
+    # Step 0: Bounded, compressed JPEG (decoded / resized on the image worker pool)
+    prepared = await prepare_image_async(image_bytes)
+    print(f"DEBUG: Lab report image {prepared.original_size} -> {len(prepared.jpeg_bytes)} bytes "
+          f"({prepared.width}x{prepared.height}, quality={prepared.quality})")
+
+    vision_prompt = """
+    Analyze this image. It is a medical Lab Report. 
+    Extract ALL text exactly as written.
+    Identify the Patient Name, Date, and Test Name.
+    List all the medical tests performed, their Results, Units, and Reference Ranges if visible.
+    Flag any results that are explicitly marked as High, Low, or Abnormal.
+    """
+
+    chat_completion = await llm_gateway.create(
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": vision_prompt},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": prepared.data_url(), 
+                        },
+                    },
+                ],
+            }
+        ],
+        model=VISION_MODEL,
+    )
+
+    raw_text_extraction = chat_completion.choices[0].message.content
+    print(f"DEBUG: Vision extraction complete. Length: {len(raw_text_extraction)}")
+    return raw_text_extraction
+
+
+async def structure_lab_report(raw_text_extraction: str, page_count: int = 1) -> dict:
+    """Step 2: Reasoning model turns the extracted text (of all pages) into the report JSON."""
+    source = "a Lab Report image" if page_count == 1 else f"a {page_count}-page Lab Report (pages are marked)"
+    reasoning_prompt = f"""
+    You are a medical data structuring assistant.
+    I will provide you with text extracted from {source}.
+    Your job is to convert this text into a strictly structured JSON object.
+
+    RAW TEXT:
+    {raw_text_extraction}
+
+    REQUIRED JSON STRUCTURE:
+    {{
+        "patient_name": "string or null",
+        "date": "string or null",
+        "lab_name": "string or null",
+        "tests": [
+            {{
+                "name": "Test Name (e.g. Hemoglobin)",
+                "result": "Value (e.g. 13.5)",
+                "units": "Units (e.g. g/dL)",
+                "reference_range": "Range (e.g. 12.0-15.5)",
+                "status": "Normal | High | Low | Abnormal (derive from text or range)"
+            }}
+        ],
+        "summary": "A patient-friendly summary (4-5 lines). Explain what the results mean in simple terms, skipping technical jargon. Focus on what is good and what needs attention."
+    }}
+
+    Return ONLY the JSON. Do not include markdown formatting like ```json.
+    """
+
+    completion = await llm_gateway.create(
+        messages=[
+            {"role": "system", "content": "You are a helpful API that outputs strict JSON."},
+            {"role": "user", "content": reasoning_prompt}
+        ],
+        model=REASONING_MODEL,
+        temperature=0.1, 
+    )
+
+    structured_response = completion.choices[0].message.content
+
+    # Clean cleanup
+    structured_response = structured_response.replace("```json", "").replace("```", "").strip()
+
+    return json.loads(structured_response)
+
+
+async def _analyze_lab_report_image(image_bytes: bytes) -> dict:
+    """Vision extraction + reasoning for one image. Raises on failure (failures are not cached)."""
+    return await structure_lab_report(await extract_lab_report_text(image_bytes))
+
+
+def _fallback_report() -> dict:
+    return {
+        "patient_name": None,
+        "date": None,
+        "tests": [],
+        "summary": "Error analyzing report. Please try again."
+    }
+
+
+async def _read_page(page: DocumentPage, index: int, semaphore: asyncio.Semaphore) -> Tuple[Optional[str], dict]:
+    """Text of one page (text layer, or vision extraction under the semaphore) + its timing entry."""
+    info = {"page": index, "source": page.source, "source_page": page.page_number, "mode": page.mode, "cached": False}
+    started = time.perf_counter()
+    text = page.text
+    if page.image_bytes:
+        key = analysis_cache.key("lab_report_page", page.image_bytes)
+        info["cached"] = analysis_cache.get(key) is not None
+        try:
+            async with semaphore:
+                text = await analysis_cache.get_or_compute("lab_report_page", page.image_bytes, extract_lab_report_text)
+        except Exception as e:
+            print(f"Error extracting {page.source} page {page.page_number}: {e}", file=sys.stderr)
+            info["mode"], info["error"] = "failed", str(e)
+    elif page.note:
+        info["note"] = page.note
+    info["seconds"] = round(time.perf_counter() - started, 3)
+    info["chars"] = len(text or "")
+    return text, info
+
+
+async def analyze_lab_report_batch(files: List[Tuple[str, Optional[str], bytes]]) -> dict:
+    """
+    Several photos and/or a PDF of one lab report -> one structured report.
+
+    Files are split into pages locally (digital PDF pages keep their text layer), page
+    images go to the vision model concurrently (LAB_REPORT_PAGE_CONCURRENCY at a time),
+    and a single reasoning pass merges all pages. Raises ValueError for too many pages
+    (checked per file against the remaining page budget, before its pages are parsed).
+    """
+    started = time.perf_counter()
+    limit = settings.LAB_REPORT_MAX_PAGES
+    pages: List[DocumentPage] = []
+    for filename, content_type, data in files:
+        try:
+            pages.extend(await asyncio.to_thread(split_document, filename, content_type, data, limit - len(pages)))
+        except TooManyPagesError as e:
+            raise ValueError(f"Too many pages ({len(pages) + e.pages}), the limit is {limit}")
+        except Exception as e:
+            raise ValueError(f"Could not read {filename}: {e}")
+    if not pages:
+        raise ValueError("No pages found in the uploaded files")
+    split_seconds = time.perf_counter() - started
+
+    semaphore = asyncio.Semaphore(max(1, settings.LAB_REPORT_PAGE_CONCURRENCY))
+    results = await asyncio.gather(*[_read_page(page, i, semaphore) for i, page in enumerate(pages, start=1)])
+    extract_seconds = time.perf_counter() - started - split_seconds
+
+    sections = [f"--- Page {info['page']} ({info['source']}) ---\n{text}" for text, info in results if text]
+    report_started = time.perf_counter()
+    if sections:
+        try:
+            report = await structure_lab_report("\n\n".join(sections), page_count=len(sections))
+        except Exception as e:
+            print(f"Error in analyze_lab_report_batch: {e}", file=sys.stderr)
+            traceback.print_exc(file=sys.stderr)
+            report = _fallback_report()
+    else:
+        report = _fallback_report()
+
+    print(f"DEBUG: Lab report batch: {len(pages)} pages, {len(sections)} read")
+    report["pages"] = [info for _, info in results]
+    report["timing"] = {
+        "split_seconds": round(split_seconds, 3),
+        "extract_seconds": round(extract_seconds, 3),
+        "reasoning_seconds": round(time.perf_counter() - report_started, 3),
+        "total_seconds": round(time.perf_counter() - started, 3),
+    }
+    return report
+
+
 async def analyze_lab_report_image(image_bytes: bytes) -> dict:
     """
     Analyzes a lab report image using a Vision LLM to extract text/structure,
     then uses a Reasoning LLM to structure it into a medical JSON format.
+
+    Results are cached by file content, so re-uploads return without model calls.
     """
     try:
-        # Step 0: Robust Image Processing (Convert to JPEG)
-        try:
-            image = Image.open(io.BytesIO(image_bytes))
-            # Convert to RGB to handle PNG/AVIF/RGBA
-            if image.mode != "RGB":
-                image = image.convert("RGB")
-            
-            # Save to JPEG buffer
-            buffer = io.BytesIO()
-            image.save(buffer, format="JPEG", quality=95)
-            jpeg_bytes = buffer.getvalue()
-        except Exception as img_err:
-            print(f"Image Conversion Error: {img_err}")
-            # Fallback to original bytes if PIL fails (unlikely if Pillow installed)
-            jpeg_bytes = image_bytes
-
-        # Step 1: Vision Model - Extract Raw Text & visual structure
-        # Encode image to base64
-        base64_image = base64.b64encode(jpeg_bytes).decode('utf-8')
-        
-        vision_prompt = """
-        Analyze this image. It is a medical Lab Report. 
-        Extract ALL text exactly as written.
-        Identify the Patient Name, Date, and Test Name.
-        List all the medical tests performed, their Results, Units, and Reference Ranges if visible.
-        Flag any results that are explicitly marked as High, Low, or Abnormal.
-        """
-
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": vision_prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}", 
-                            },
-                        },
-                    ],
-                }
-            ],
-            model=VISION_MODEL,
-        )
-
-        raw_text_extraction = chat_completion.choices[0].message.content
-        print(f"DEBUG: Vision extraction complete. Length: {len(raw_text_extraction)}")
-
-        # Step 2: Reasoning Model - Structure Data
-        reasoning_prompt = f"""
-        You are a medical data structuring assistant.
-        I will provide you with text extracted from a Lab Report image.
-        Your job is to convert this text into a strictly structured JSON object.
-
-        RAW TEXT:
-        {raw_text_extraction}
-
-        REQUIRED JSON STRUCTURE:
-        {{
-            "patient_name": "string or null",
-            "date": "string or null",
-            "lab_name": "string or null",
-            "tests": [
-                {{
-                    "name": "Test Name (e.g. Hemoglobin)",
-                    "result": "Value (e.g. 13.5)",
-                    "units": "Units (e.g. g/dL)",
-                    "reference_range": "Range (e.g. 12.0-15.5)",
-                    "status": "Normal | High | Low | Abnormal (derive from text or range)"
-                }}
-            ],
-            "summary": "A patient-friendly summary (4-5 lines). Explain what the results mean in simple terms, skipping technical jargon. Focus on what is good and what needs attention."
-        }}
-
-        Return ONLY the JSON. Do not include markdown formatting like ```json.
-        """
-
-        completion = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": "You are a helpful API that outputs strict JSON."},
-                {"role": "user", "content": reasoning_prompt}
-            ],
-            model=REASONING_MODEL,
-            temperature=0.1, 
-        )
-
-        structured_response = completion.choices[0].message.content
-        
-        # Clean cleanup
-        structured_response = structured_response.replace("```json", "").replace("```", "").strip()
-        
-        return json.loads(structured_response)
-
+        return await analysis_cache.get_or_compute("lab_report", image_bytes, _analyze_lab_report_image)
     except Exception as e:
         print(f"Error in analyze_lab_report_image: {e}", file=sys.stderr)
         traceback.print_exc(file=sys.stderr)
         # Return a fallback error structure
-        return {
-            "patient_name": None,
-            "date": None,
-            "tests": [],
-            "summary": "Error analyzing report. Please try again."
-        }
+        return _fallback_report()
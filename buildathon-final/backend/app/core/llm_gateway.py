@@ -0,0 +1,275 @@
+import asyncio
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from groq import AsyncGroq
+
+from app.core.config import settings
+from app.core.tracing import tracer
+
+
+def _parse_model_limits(spec: str) -> Dict[str, int]:
+    """
+    Parses "model=limit,model=limit" into a dict.
+    Example: "openai/gpt-oss-120b=16,llama-3.3-70b-versatile=24"
+    """
+    limits = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        model, limit = item.rsplit("=", 1)
+        try:
+            limits[model.strip()] = int(limit)
+        except ValueError:
+            print(f"WARN: Ignoring invalid LLM concurrency entry '{item}'")
+    return limits
+
+
+def clean_json(content: str) -> str:
+    """Strips markdown fences that some models wrap around JSON output."""
+    return content.replace("```json", "").replace("```", "").strip()
+
+
+_JSON_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", '"': '"', "\\": "\\", "/": "/"}
+
+
+class JsonFieldStreamer:
+    """
+    Incrementally extracts one string field from a streamed JSON object, so the
+    human-readable part of a structured answer (e.g. "clinical_guidelines") can be
+    forwarded token by token while the rest of the JSON is still being generated.
+    """
+
+    def __init__(self, field: str):
+        self._pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._pos: Optional[int] = None
+        self.started = False
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        """Adds a chunk and returns the newly decoded text of the field (may be empty)."""
+        self._buffer += chunk
+        if self.done:
+            return ""
+        if self._pos is None:
+            match = self._pattern.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+            self.started = True
+
+        out = []
+        i = self._pos
+        buf = self._buffer
+        while i < len(buf):
+            c = buf[i]
+            if c == "\\":
+                if i + 1 >= len(buf):
+                    break  # wait for the rest of the escape
+                esc = buf[i + 1]
+                if esc == "u":
+                    if i + 6 > len(buf):
+                        break
+                    try:
+                        out.append(chr(int(buf[i + 2:i + 6], 16)))
+                    except ValueError:
+                        pass
+                    i += 6
+                    continue
+                out.append(_JSON_ESCAPES.get(esc, esc))
+                i += 2
+                continue
+            if c == '"':
+                self.done = True
+                i += 1
+                break
+            out.append(c)
+            i += 1
+        self._pos = i
+        return "".join(out)
+
+
+class LLMGateway:
+    """
+    Shared async gateway for every Groq call.
+    - One pooled httpx.AsyncClient (keep-alive connections are reused across requests).
+    - Per-model semaphores cap in-flight completions so one model cannot starve the others.
+    - Timeouts and retries (429 / 5xx / connection errors, with backoff) are handled by the SDK.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        max_connections: Optional[int] = None,
+        default_concurrency: Optional[int] = None,
+        model_concurrency: Optional[Dict[str, int]] = None,
+        base_url: Optional[str] = None,
+    ):
+        self.api_key = api_key if api_key is not None else settings.GROQ_API_KEY
+        self.base_url = base_url if base_url is not None else (settings.LLM_BASE_URL or None)
+        self.timeout = timeout if timeout is not None else settings.LLM_TIMEOUT_SECONDS
+        self.max_retries = max_retries if max_retries is not None else settings.LLM_MAX_RETRIES
+        self.max_connections = max_connections or settings.LLM_MAX_CONNECTIONS
+        self.default_concurrency = default_concurrency or settings.LLM_MAX_CONCURRENCY
+        self.model_concurrency = model_concurrency if model_concurrency is not None else _parse_model_limits(settings.LLM_MODEL_CONCURRENCY)
+
+        # httpx connections and asyncio semaphores are bound to a loop: one pool per loop
+        self._clients: Dict[asyncio.AbstractEventLoop, AsyncGroq] = {}
+        self._closers: Dict[asyncio.AbstractEventLoop, AsyncIterator[None]] = {}
+        self._semaphores: Dict[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]] = {}
+        self._in_flight: Dict[str, int] = {}
+
+    # --- Lifecycle ---
+    def _get_client(self) -> AsyncGroq:
+        """
+        Lazily builds the pooled client of the running event loop.
+        Each loop (e.g. a test calling asyncio.run twice) gets its own pool, which is
+        closed when that loop shuts down.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            self._forget_closed_loops()
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                timeout=self.timeout,
+            )
+            client = AsyncGroq(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=http_client,
+                timeout=self.timeout,
+                max_retries=self.max_retries,
+            )
+            self._clients[loop] = client
+            self._closers[loop] = self._close_at_shutdown(loop, client)
+        return client
+
+    def _close_at_shutdown(self, loop: asyncio.AbstractEventLoop, client: AsyncGroq) -> AsyncIterator[None]:
+        """
+        asyncio.run() (and uvicorn) finalize the loop's open async generators before closing
+        it. This one is started here and left suspended, so its cleanup closes the pool then,
+        while its connections can still be awaited.
+        """
+        async def closer():
+            try:
+                yield
+            finally:
+                if self._clients.get(loop) is client:
+                    del self._clients[loop]
+                    self._semaphores.pop(loop, None)
+                self._closers.pop(loop, None)
+                await client.close()
+
+        gen = closer()
+        try:
+            gen.asend(None).send(None)  # runs up to the yield; nothing is awaited before it
+        except StopIteration:
+            pass
+        return gen  # the loop only keeps a weak reference
+
+    def _forget_closed_loops(self):
+        # Loops closed without finalizing their async generators: the pool cannot be awaited anymore
+        for loop in [l for l in {*self._clients, *self._semaphores} if l.is_closed()]:
+            self._clients.pop(loop, None)
+            self._closers.pop(loop, None)
+            self._semaphores.pop(loop, None)
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        if model not in semaphores:
+            limit = self.model_concurrency.get(model, self.default_concurrency)
+            semaphores[model] = asyncio.Semaphore(limit)
+        return semaphores[model]
+
+    async def aclose(self):
+        """Closes the running loop's pool (app shutdown)."""
+        closer = self._closers.get(asyncio.get_running_loop())
+        if closer is not None:
+            await closer.aclose()
+
+    # --- Calls ---
+    async def create(self, model: str, messages: List[Dict[str, Any]], **kwargs):
+        """Raw chat completion (returns the SDK response object)."""
+        client = self._get_client()
+        with tracer.span("llm", model) as span:
+            queued = time.perf_counter()
+            async with self._semaphore(model):
+                span.set(queue_ms=round((time.perf_counter() - queued) * 1000, 2))
+                self._in_flight[model] = self._in_flight.get(model, 0) + 1
+                try:
+                    completion = await client.chat.completions.create(model=model, messages=messages, **kwargs)
+                finally:
+                    self._in_flight[model] -= 1
+            usage = getattr(completion, "usage", None)
+            if usage is not None:
+                span.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+            return completion
+
+    async def chat(self, model: str, messages: List[Dict[str, Any]], **kwargs) -> str:
+        """Chat completion returning the message text."""
+        completion = await self.create(model, messages, **kwargs)
+        return completion.choices[0].message.content
+
+    async def chat_json(self, model: str, messages: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+        """Chat completion parsed as JSON (markdown fences are stripped)."""
+        content = await self.chat(model, messages, **kwargs)
+        return json.loads(clean_json(content))
+
+    async def stream_chat(self, model: str, messages: List[Dict[str, Any]], **kwargs) -> AsyncIterator[str]:
+        """
+        Streaming chat completion yielding text deltas as they arrive.
+        The model's concurrency slot is held until the stream is fully consumed.
+        """
+        client = self._get_client()
+        # Not activated: the generator body runs in the consumer's context
+        with tracer.span("llm", model, activate=False, stream=True) as span:
+            queued = time.perf_counter()
+            async with self._semaphore(model):
+                started = time.perf_counter()
+                span.set(queue_ms=round((started - queued) * 1000, 2))
+                self._in_flight[model] = self._in_flight.get(model, 0) + 1
+                try:
+                    stream = await client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs)
+                    first = True
+                    async for chunk in stream:
+                        usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                        if usage is not None:
+                            span.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            if first:
+                                span.set(ttft_ms=round((time.perf_counter() - started) * 1000, 2))
+                                first = False
+                            yield delta
+                finally:
+                    self._in_flight[model] -= 1
+
+    async def transcribe(self, file, model: str = "whisper-large-v3", **kwargs):
+        """Audio transcription through the same pooled client."""
+        client = self._get_client()
+        with tracer.span("llm", model):
+            async with self._semaphore(model):
+                return await client.audio.transcriptions.create(file=file, model=model, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": dict(self._in_flight),
+            "limits": {m: self.model_concurrency.get(m, self.default_concurrency) for m in self._semaphores},
+            "default_limit": self.default_concurrency,
+        }
+
+
+# Singleton Instance
+llm_gateway = LLMGateway()
@@ -0,0 +1,456 @@
+import copy
+import json
+import os
+import random
+import sqlite3
+import string
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Same limit as Firestore
+MAX_BATCH_WRITES = 500
+_ID_ALPHABET = string.ascii_letters + string.digits
+
+
+class NotFound(Exception):
+    """update() of a missing document (google.api_core.exceptions.NotFound in Firestore)."""
+
+
+class TransactionConflict(Exception):
+    """A document read by the transaction changed before it committed (the transaction is retried)."""
+
+
+class _DeleteField:
+    """firestore.DELETE_FIELD: removes the field in set(..., merge=True) and update()."""
+
+    def __repr__(self) -> str:
+        return "DELETE_FIELD"
+
+    def __deepcopy__(self, memo) -> "_DeleteField":
+        return self
+
+
+DELETE_FIELD = _DeleteField()
+
+
+def auto_id() -> str:
+    return "".join(random.choices(_ID_ALPHABET, k=20))
+
+
+def _get_field(data: Dict[str, Any], path: str) -> Tuple[bool, Any]:
+    value: Any = data
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return False, None
+        value = value[part]
+    return True, value
+
+
+def _set_field(data: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        if not isinstance(data.get(part), dict):
+            data[part] = {}
+        data = data[part]
+    if value is DELETE_FIELD:
+        data.pop(parts[-1], None)
+    else:
+        data[parts[-1]] = copy.deepcopy(value)
+
+
+def _merge(target: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    """set(..., merge=True): nested maps are merged, other values replaced."""
+    for key, value in patch.items():
+        if value is DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict):
+            # A new map is merged into {} so that nested DELETE_FIELDs are dropped
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            _merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+    return target
+
+
+def _compare(op: str, field_value: Any, value: Any) -> bool:
+    try:
+        if op == "==":
+            return field_value == value
+        if op == "!=":
+            return field_value != value
+        if op == "<":
+            return field_value < value
+        if op == "<=":
+            return field_value <= value
+        if op == ">":
+            return field_value > value
+        if op == ">=":
+            return field_value >= value
+        if op == "in":
+            return field_value in value
+        if op == "not-in":
+            return field_value not in value
+        if op == "array-contains":
+            return isinstance(field_value, list) and value in field_value
+        if op == "array-contains-any":
+            return isinstance(field_value, list) and any(v in field_value for v in value)
+    except TypeError:
+        # Firestore never matches values of different types
+        return False
+    raise ValueError(f"Unsupported operator '{op}'")
+
+
+# --- Storage ---
+class MemoryStore:
+    """Documents as {collection: {id: (version, data)}} (one process)."""
+
+    def __init__(self):
+        self._docs: Dict[str, Dict[str, Tuple[int, Dict[str, Any]]]] = {}
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def locked(self):
+        with self._lock:
+            yield
+
+    def get(self, collection: str, doc_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        with self._lock:
+            entry = self._docs.get(collection, {}).get(doc_id)
+            return (entry[0], copy.deepcopy(entry[1])) if entry else None
+
+    def scan(self, collection: str) -> List[Tuple[str, int, Dict[str, Any]]]:
+        with self._lock:
+            return [(doc_id, v, copy.deepcopy(d)) for doc_id, (v, d) in self._docs.get(collection, {}).items()]
+
+    def put(self, collection: str, doc_id: str, version: int, data: Optional[Dict[str, Any]]) -> None:
+        # Called inside locked()
+        if data is None:
+            self._docs.get(collection, {}).pop(doc_id, None)
+        else:
+            self._docs.setdefault(collection, {})[doc_id] = (version, copy.deepcopy(data))
+
+
+class SqliteStore:
+    """
+    Documents as JSON rows in one SQLite file (WAL), so several workers share the data and it
+    survives restarts. Values that are not JSON types (datetime...) are stored as strings.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "collection TEXT NOT NULL, id TEXT NOT NULL, version INTEGER NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (collection, id))"
+        )
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def locked(self):
+        # BEGIN IMMEDIATE also serializes writers in other processes
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def get(self, collection: str, doc_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT version, data FROM documents WHERE collection = ? AND id = ?", (collection, doc_id)
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def scan(self, collection: str) -> List[Tuple[str, int, Dict[str, Any]]]:
+        with self._lock:
+            rows = self.conn.execute("SELECT id, version, data FROM documents WHERE collection = ?", (collection,)).fetchall()
+        return [(doc_id, version, json.loads(data)) for doc_id, version, data in rows]
+
+    def put(self, collection: str, doc_id: str, version: int, data: Optional[Dict[str, Any]]) -> None:
+        if data is None:
+            self.conn.execute("DELETE FROM documents WHERE collection = ? AND id = ?", (collection, doc_id))
+        else:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents (collection, id, version, data) VALUES (?, ?, ?, ?)",
+                (collection, doc_id, version, json.dumps(data, default=str)),
+            )
+
+
+# --- Client API (the subset of google.cloud.firestore that FirebaseService uses) ---
+class DocumentSnapshot:
+    def __init__(self, reference: "DocumentReference", data: Optional[Dict[str, Any]], version: int = 0):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+        self._version = version
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data)
+
+    def get(self, field_path: str) -> Any:
+        return _get_field(self._data or {}, field_path)[1]
+
+
+class DocumentReference:
+    def __init__(self, db: "LocalFirestore", collection: str, doc_id: str):
+        self._db = db
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def path(self) -> str:
+        return f"{self._collection}/{self.id}"
+
+    def get(self, transaction: Optional["Transaction"] = None) -> DocumentSnapshot:
+        self._db._rpc("reads")
+        entry = self._db.store.get(self._collection, self.id)
+        version, data = entry if entry else (0, None)
+        if transaction is not None:
+            transaction._record_read(self, version)
+        return DocumentSnapshot(self, data, version)
+
+    def set(self, document_data: Dict[str, Any], merge: bool = False):
+        return self._db._commit([("set", self, document_data, merge)])
+
+    def update(self, field_updates: Dict[str, Any]):
+        return self._db._commit([("update", self, field_updates, False)])
+
+    def delete(self):
+        return self._db._commit([("delete", self, None, False)])
+
+
+class Query:
+    ASCENDING = "ASCENDING"
+    DESCENDING = "DESCENDING"
+
+    def __init__(self, db: "LocalFirestore", collection: str, filters=(), orders=(), limit_to: Optional[int] = None,
+                 start_after: Optional[Dict[str, Any]] = None):
+        self._db = db
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit_to
+        self._start_after = start_after
+
+    def _copy(self, **changes) -> "Query":
+        state = {"filters": self._filters, "orders": self._orders, "limit_to": self._limit,
+                 "start_after": self._start_after, **changes}
+        return Query(self._db, self._collection, **state)
+
+    @staticmethod
+    def _order_value(match: tuple, field_path: str) -> Tuple[bool, Any]:
+        # "__name__" orders by document id, like Firestore
+        return (True, match[0]) if field_path == "__name__" else _get_field(match[2], field_path)
+
+    def _is_after_cursor(self, match: tuple) -> bool:
+        for field_path, direction in self._orders:
+            cursor = self._start_after.get(field_path)
+            if field_path == "__name__" and isinstance(cursor, DocumentReference):
+                cursor = cursor.id
+            value = self._order_value(match, field_path)[1]
+            if value != cursor:
+                return value < cursor if direction == self.DESCENDING else value > cursor
+        return False
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None, value: Any = None, *, filter=None) -> "Query":
+        if filter is not None:  # FieldFilter(field_path, op_string, value)
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING) -> "Query":
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int) -> "Query":
+        return self._copy(limit_to=count)
+
+    def start_after(self, document_fields: Dict[str, Any]) -> "Query":
+        """Cursor as {order field: value} (DocumentSnapshot cursors are not supported)."""
+        return self._copy(start_after=dict(document_fields))
+
+    def stream(self, transaction: Optional["Transaction"] = None) -> Iterator[DocumentSnapshot]:
+        self._db._rpc("queries")
+        matches = []
+        for doc_id, version, data in self._db.store.scan(self._collection):
+            if all(_get_field(data, f)[0] and _compare(op, _get_field(data, f)[1], v) for f, op, v in self._filters):
+                matches.append((doc_id, version, data))
+        # Like Firestore: ordering by a field excludes documents without it
+        for field_path, direction in reversed(self._orders):
+            matches = [m for m in matches if self._order_value(m, field_path)[0]]
+            matches.sort(key=lambda m: self._order_value(m, field_path)[1], reverse=direction == self.DESCENDING)
+        if self._start_after is not None:
+            matches = [m for m in matches if self._is_after_cursor(m)]
+        if self._limit is not None:
+            matches = matches[: self._limit]
+        for doc_id, version, data in matches:
+            reference = DocumentReference(self._db, self._collection, doc_id)
+            if transaction is not None:
+                transaction._record_read(reference, version)
+            yield DocumentSnapshot(reference, data, version)
+
+    def get(self, transaction: Optional["Transaction"] = None) -> List[DocumentSnapshot]:
+        return list(self.stream(transaction=transaction))
+
+
+class CollectionReference(Query):
+    def __init__(self, db: "LocalFirestore", collection: str):
+        super().__init__(db, collection)
+        self.id = collection
+
+    def document(self, document_id: Optional[str] = None) -> DocumentReference:
+        return DocumentReference(self._db, self._collection, document_id or auto_id())
+
+    def add(self, document_data: Dict[str, Any], document_id: Optional[str] = None):
+        reference = self.document(document_id)
+        update_time = reference.set(document_data)
+        return update_time, reference
+
+
+class WriteBatch:
+    def __init__(self, db: "LocalFirestore"):
+        self._db = db
+        self._ops: List[tuple] = []
+
+    def _add(self, op: tuple):
+        if len(self._ops) >= MAX_BATCH_WRITES:
+            raise ValueError(f"maximum {MAX_BATCH_WRITES} writes allowed per request")
+        self._ops.append(op)
+
+    def set(self, reference: DocumentReference, document_data: Dict[str, Any], merge: bool = False):
+        self._add(("set", reference, document_data, merge))
+
+    def update(self, reference: DocumentReference, field_updates: Dict[str, Any]):
+        self._add(("update", reference, field_updates, False))
+
+    def delete(self, reference: DocumentReference):
+        self._add(("delete", reference, None, False))
+
+    def commit(self):
+        ops, self._ops = self._ops, []
+        return self._db._commit(ops)
+
+
+class Transaction(WriteBatch):
+    """Reads are recorded; the commit fails with TransactionConflict if any of them changed."""
+
+    def __init__(self, db: "LocalFirestore"):
+        super().__init__(db)
+        self._reads: Dict[Tuple[str, str], int] = {}
+
+    def _record_read(self, reference: DocumentReference, version: int):
+        if self._ops:
+            raise ValueError("Firestore transactions require all reads to be executed before all writes.")
+        self._reads.setdefault((reference._collection, reference.id), version)
+
+    def _reset(self):
+        self._ops, self._reads = [], {}
+
+    def commit(self):
+        ops, self._ops = self._ops, []
+        return self._db._commit(ops, reads=self._reads)
+
+
+class LocalFirestore:
+    """
+    Firestore stand-in for running offline: the same collection / document / where / stream /
+    batch / transaction semantics FirebaseService relies on, over an in-memory or SQLite store.
+    Every round trip sleeps `latency_ms` (+/- `jitter_ms`) so benchmarks can reproduce
+    production costs. Transactions are optimistic and retried on conflict, like Firestore.
+    """
+
+    def __init__(self, path: Optional[str] = None, latency_ms: float = 0.0, jitter_ms: float = 0.0, max_attempts: int = 5):
+        self.store = SqliteStore(path) if path else MemoryStore()
+        self.path = path
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.max_attempts = max_attempts
+        self.counters = {"reads": 0, "queries": 0, "commits": 0, "writes": 0, "conflicts": 0}
+        self._counter_lock = threading.Lock()
+
+    def _rpc(self, kind: str, count: int = 1):
+        with self._counter_lock:
+            self.counters[kind] += count
+        if self.latency_ms or self.jitter_ms:
+            delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+            if delay > 0:
+                time.sleep(delay / 1000)
+
+    def collection(self, collection_id: str) -> CollectionReference:
+        return CollectionReference(self, collection_id)
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def transaction(self) -> Transaction:
+        return Transaction(self)
+
+    def transactional(self, to_wrap: Callable[..., Any]) -> Callable[..., Any]:
+        """Same contract as firestore.transactional: to_wrap(transaction, ...) is retried on conflict."""
+        def wrapper(transaction: Transaction, *args, **kwargs):
+            for attempt in range(1, self.max_attempts + 1):
+                transaction._reset()
+                result = to_wrap(transaction, *args, **kwargs)
+                try:
+                    transaction.commit()
+                    return result
+                except TransactionConflict:
+                    with self._counter_lock:
+                        self.counters["conflicts"] += 1
+                    if attempt == self.max_attempts:
+                        raise
+                    time.sleep(random.uniform(0, 0.002 * attempt))
+        return wrapper
+
+    def _commit(self, ops: List[tuple], reads: Optional[Dict[Tuple[str, str], int]] = None):
+        """Applies all writes atomically (nothing is written if one fails). Returns the update time."""
+        self._rpc("commits")
+        with self.store.locked():
+            for (collection, doc_id), version in (reads or {}).items():
+                entry = self.store.get(collection, doc_id)
+                if (entry[0] if entry else 0) != version:
+                    raise TransactionConflict(f"{collection}/{doc_id} changed during the transaction")
+
+            staged: Dict[Tuple[str, str], Tuple[int, Optional[Dict[str, Any]]]] = {}
+            for kind, reference, data, merge in ops:
+                key = (reference._collection, reference.id)
+                if key in staged:
+                    version, current = staged[key]
+                else:
+                    entry = self.store.get(*key)
+                    version, current = entry if entry else (0, None)
+                if kind == "set":
+                    current = _merge(current or {}, data) if merge else copy.deepcopy(data)
+                elif kind == "update":
+                    if current is None:
+                        raise NotFound(f"No document to update: {reference.path}")
+                    for path, value in data.items():
+                        _set_field(current, path, value)
+                else:
+                    current = None
+                staged[key] = (version + 1, current)
+
+            for (collection, doc_id), (version, data) in staged.items():
+                self.store.put(collection, doc_id, version, data)
+        with self._counter_lock:
+            self.counters["writes"] += len(ops)
+        return datetime.now(timezone.utc)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._counter_lock:
+            return {
+                **self.counters,
+                "storage": "sqlite" if self.path else "memory",
+                "latency_ms": self.latency_ms,
+                "jitter_ms": self.jitter_ms,
+            }
@@ -0,0 +1,79 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from app.core.config import settings
+
+
+def percentile(ordered, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence (0.0 when empty)."""
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag: a task sleeps `interval_ms` and records how late it wakes up.
+    Lag means something blocked the loop (sync I/O, CPU work) and every in-flight request
+    waited for it. Keeps the last `max_samples` samples.
+    """
+
+    def __init__(self, interval_ms: Optional[float] = None, max_samples: int = 10000):
+        self.interval_ms = interval_ms if interval_ms is not None else settings.LOOP_MONITOR_INTERVAL_MS
+        self._samples: Deque[float] = deque(maxlen=max_samples)
+        self._task: Optional[asyncio.Task] = None
+        self.max_lag_ms = 0.0
+        self.since = time.time()
+
+    def start(self):
+        """Starts sampling on the running loop (no-op if disabled or already running)."""
+        if self.interval_ms <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        interval = self.interval_ms / 1000
+        while True:
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            self.record((time.perf_counter() - expected) * 1000)
+
+    def record(self, lag_ms: float):
+        lag_ms = max(0.0, lag_ms)
+        self._samples.append(lag_ms)
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+
+    def reset(self):
+        self._samples.clear()
+        self.max_lag_ms = 0.0
+        self.since = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        ordered = sorted(self._samples)
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_ms": self.interval_ms,
+            "samples": len(ordered),
+            "since": self.since,
+            "mean_ms": round(sum(ordered) / len(ordered), 2) if ordered else 0.0,
+            "p50_ms": round(percentile(ordered, 50), 2),
+            "p95_ms": round(percentile(ordered, 95), 2),
+            "p99_ms": round(percentile(ordered, 99), 2),
+            "max_ms": round(self.max_lag_ms, 2),
+        }
+
+
+# Singleton Instance
+loop_monitor = LoopLagMonitor()
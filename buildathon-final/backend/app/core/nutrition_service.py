@@ -1,8 +1,6 @@
 import json
-from groq import Groq
-from app.core.config import settings
+from app.core.llm_gateway import llm_gateway
 
-client = Groq(api_key=settings.GROQ_API_KEY)
 
 async def analyze_meal_text(description: str):
     """
@@ -27,7 +25,7 @@ async def analyze_meal_text(description: str):
     """
     
     try:
-        completion = client.chat.completions.create(
+        completion = await llm_gateway.create(
             model="llama-3.2-90b-vision-preview", # Using a strong text model
             messages=[
                 {"role": "system", "content": "You are an expert nutritionist AI. Return JSON only."},
@@ -83,7 +81,7 @@ async def get_nutrition_suggestion(profile: dict, current_log: dict):
     """
     
     try:
-        completion = client.chat.completions.create(
+        completion = await llm_gateway.create(
             model="llama-3.2-90b-vision-preview",
             messages=[
                 {"role": "system", "content": "You are a personalized nutrition coach. Return JSON only."},
@@ -140,7 +138,7 @@ async def generate_diet_plan(profile: dict):
     """
     
     try:
-        completion = client.chat.completions.create(
+        completion = await llm_gateway.create(
             model="llama-3.2-90b-vision-preview",
             messages=[
                 {"role": "system", "content": "You are an expert nutritionist. Create a practical, culturally appropriate meal plan. Return JSON only."},
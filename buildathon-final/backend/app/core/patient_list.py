@@ -0,0 +1,107 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.firebase import firebase_service
+
+SUMMARY_COLLECTION = "case_pre_doctor_summaries"
+
+
+def risk_from_severity(severity_score) -> str:
+    """High: 70-100, Medium: 40-69, Low: 0-39"""
+    try:
+        score = float(severity_score)
+    except (TypeError, ValueError):
+        return "Medium"
+    if score >= 70:
+        return "High"
+    if score >= 40:
+        return "Medium"
+    return "Low"
+
+
+def summary_risk(summary: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+    """(risk level, condition) from a pre-doctor summary; condition is None when no symptoms are listed."""
+    assessment = summary.get("assessment") or {}
+    history = summary.get("history") or {}
+    symptoms = history.get("symptoms") or []
+    return risk_from_severity(assessment.get("severity_score", 50)), (", ".join(symptoms[:2]) if symptoms else None)
+
+
+def patient_id_of(apt: Dict[str, Any]) -> Optional[str]:
+    # Priority: profile_id (V1) > patient_snapshot.id > patient_id (Legacy)
+    snapshot = apt.get("patient_snapshot") or {}
+    return apt.get("profile_id") or snapshot.get("profile_id") or snapshot.get("id") or apt.get("patient_id")
+
+
+def group_appointments(appointments: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Unique patients in appointment order: the first appointment of each and whether one is in progress."""
+    patients: Dict[str, Dict[str, Any]] = {}
+    for apt in appointments:
+        pid = patient_id_of(apt)
+        if not pid:
+            continue
+        if pid not in patients:
+            patients[pid] = {"appointment": apt, "in_progress": False}
+        elif apt.get("status") == "APPOINTMENT_IN_PROGRESS":
+            patients[pid]["in_progress"] = True
+    return patients
+
+
+def fetch_case_summaries(case_ids: List[str], firebase=None) -> Dict[str, Dict[str, Any]]:
+    """First pre-doctor summary of each case, fetched with chunked 'in' queries."""
+    firebase = firebase if firebase is not None else firebase_service
+    summaries: Dict[str, Dict[str, Any]] = {}
+    for summary in firebase.get_records_in(SUMMARY_COLLECTION, "case_id", case_ids):
+        summaries.setdefault(summary.get("case_id"), summary)
+    return summaries
+
+
+def patients_from_appointments(
+    appointments: List[Dict[str, Any]], risk_by_case: Dict[str, Tuple[str, Optional[str]]]
+) -> List[Dict[str, Any]]:
+    """Dashboard patient entries; `risk_by_case` maps case_id -> (risk, condition) from its summary."""
+    result = []
+    for pid, entry in group_appointments(appointments).items():
+        apt = entry["appointment"]
+        snapshot = apt.get("patient_snapshot") or {}
+        risk_level = "Medium"  # Default fallback
+        condition = apt.get("reason") or "Routine Checkup"
+        case_risk = risk_by_case.get(apt.get("case_id"))
+        if case_risk:
+            risk_level, summary_condition = case_risk
+            condition = summary_condition or condition
+
+        result.append({
+            "id": pid,
+            "name": apt.get("patient_name") or snapshot.get("name") or "Unknown",
+            "age": apt.get("patient_age") or snapshot.get("age") or "?",
+            "gender": apt.get("patient_gender") or snapshot.get("gender") or "?",
+            "lastVisit": apt.get("appointment_time") or apt.get("slot_time") or "Recently",
+            "condition": condition,
+            "risk": risk_level,
+            "type": "Active",
+            "status": "In Progress" if entry["in_progress"] else apt.get("status", "SCHEDULED"),
+            "caseId": apt.get("case_id"),
+            "appointmentId": apt.get("id"),
+        })
+    return result
+
+
+def build_patient_list(
+    appointments: List[Dict[str, Any]],
+    firebase=None,
+    risk_by_case: Optional[Dict[str, Tuple[str, Optional[str]]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Dashboard patient list for a doctor's appointments. Risk and condition come from the
+    case summaries, which are fetched for all patients at once (not one query per patient);
+    cases already in `risk_by_case` (e.g. from the dashboard projection) are not fetched.
+    """
+    risk_by_case = dict(risk_by_case or {})
+    patients = group_appointments(appointments)
+    case_ids = [
+        p["appointment"].get("case_id") for p in patients.values()
+        if p["appointment"].get("case_id") and p["appointment"].get("case_id") not in risk_by_case
+    ]
+    summaries = fetch_case_summaries(case_ids, firebase) if case_ids else {}
+    risk_by_case.update({case_id: summary_risk(summary) for case_id, summary in summaries.items()})
+    return patients_from_appointments(appointments, risk_by_case)
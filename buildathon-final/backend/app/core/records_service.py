@@ -0,0 +1,156 @@
+import asyncio
+import base64
+import heapq
+import json
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.firebase import firebase_service
+
+# Collections merged into a patient's medical history, with the record type each one holds
+# (None = mixed / legacy records, the `type` field of the record is used).
+RECORD_COLLECTIONS = {
+    "case_ai_patient_summaries": "AI_SUMMARY",
+    "case_pre_doctor_summaries": "DOCTOR_SUMMARY",
+    "pre_doctor_consultation_summaries": None,
+    # Completed consultation data
+    "case_prescriptions": "PRESCRIPTION_MEDICINES",
+    "case_doctor_remarks": "DOCTOR_REMARKS",
+    "prescriptions": None,
+    "lab_reports": None,
+    "medication_logs": None,
+}
+
+
+def sort_key(record: Dict[str, Any]) -> Tuple[str, str]:
+    """Newest first by created_at (records without it last), document id breaks ties."""
+    return (str(record.get("created_at") or ""), str(record.get("id") or ""))
+
+
+def encode_cursor(record: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(sort_key(record)).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (str(created_at), str(record_id))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class RecordsService:
+    """
+    Aggregated medical history of a patient / case:
+    - every record collection is queried concurrently (one thread each, the Firestore client is blocking)
+    - each result is sorted, then the sorted streams are merged (newest first)
+    - `types` filters by record type or collection name; collections that cannot match are not queried
+    - `limit` + `cursor` page through the merged history (the cursor is the sort key of the last record);
+      each collection is then read with a paged query (order_by + start_after + limit), so a page
+      costs about `limit` reads per collection instead of the whole history
+    """
+
+    def __init__(self, firebase=None, collections: Optional[Dict[str, Optional[str]]] = None):
+        self.firebase = firebase if firebase is not None else firebase_service
+        self.collections = collections or RECORD_COLLECTIONS
+
+    def _matches_whole(self, collection: str, types: Set[str]) -> bool:
+        return collection.upper() in types or self.collections[collection] in types
+
+    def _collections_for(self, types: Set[str]) -> List[str]:
+        if not types:
+            return list(self.collections)
+        return [
+            name for name, record_type in self.collections.items()
+            if record_type is None or self._matches_whole(name, types)
+        ]
+
+    def _keep(self, collection: str, record: Dict[str, Any], types: Set[str]) -> bool:
+        return not types or self._matches_whole(collection, types) or str(record.get("type") or "").upper() in types
+
+    def _fetch(self, collection: str, patient_id: Optional[str], case_id: Optional[str]) -> List[Dict[str, Any]]:
+        records = self.firebase.get_records(collection, patient_id, case_id)
+        records.sort(key=sort_key, reverse=True)
+        return records
+
+    def _fetch_page(
+        self, collection: str, patient_id: Optional[str], case_id: Optional[str],
+        limit: int, after: Optional[Tuple[str, str]], types: Set[str],
+    ) -> List[Dict[str, Any]]:
+        """
+        The newest `limit` records of one collection after the cursor (type filter applied).
+        Mixed collections filtered by type read further pages until `limit` records match.
+        Records without created_at sort last and can't be paged by Firestore: they are read
+        (one full query) only once the dated records of the collection are exhausted.
+        """
+        try:
+            page: List[Dict[str, Any]] = []
+            position = after
+            if after is None or after[0]:
+                while True:
+                    batch = self.firebase.get_records_page(collection, patient_id, case_id, limit, position)
+                    if batch:
+                        position = (batch[-1].get("created_at"), batch[-1]["id"])
+                    page += [r for r in batch if r.get("created_at") and self._keep(collection, r, types)]
+                    if len(page) >= limit:
+                        return page[:limit]
+                    if len(batch) < limit:
+                        break
+            undated = [
+                r for r in self.firebase.get_records(collection, patient_id, case_id)
+                if not r.get("created_at") and self._keep(collection, r, types)
+                and (after is None or sort_key(r) < after)
+            ]
+            undated.sort(key=sort_key, reverse=True)
+            return (page + undated)[:limit]
+        except Exception as e:
+            # e.g. the composite index is missing: same result from the full history
+            print(f"WARN: Paged read of '{collection}' failed ({e}), reading it in full")
+            return self._fetch(collection, patient_id, case_id)
+
+    async def get_records(
+        self,
+        patient_id: Optional[str] = None,
+        case_id: Optional[str] = None,
+        types: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        wanted = {t.strip().upper() for t in (types or []) if t and t.strip()}
+        after = decode_cursor(cursor) if cursor else None
+
+        collections = self._collections_for(wanted)
+        if limit is None:
+            reads = [asyncio.to_thread(self._fetch, name, patient_id, case_id) for name in collections]
+        else:
+            # One record more than the page tells whether there is a next page
+            reads = [
+                asyncio.to_thread(self._fetch_page, name, patient_id, case_id, limit + 1, after, wanted)
+                for name in collections
+            ]
+        results = await asyncio.gather(*reads, return_exceptions=True)
+
+        streams = []
+        for name, result in zip(collections, results):
+            if isinstance(result, Exception):
+                print(f"Records Fetch Error ({name}): {result}")
+                continue
+            streams.append([r for r in result if self._keep(name, r, wanted)])
+
+        page: List[Dict[str, Any]] = []
+        has_more = False
+        for record in heapq.merge(*streams, key=sort_key, reverse=True):
+            if after is not None and sort_key(record) >= after:
+                continue
+            if limit is not None and len(page) >= limit:
+                has_more = True
+                break
+            page.append(record)
+
+        return {
+            "records": page,
+            "next_cursor": encode_cursor(page[-1]) if has_more and page else None,
+        }
+
+
+# Singleton Instance
+records_service = RecordsService()
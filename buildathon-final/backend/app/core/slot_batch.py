@@ -0,0 +1,169 @@
+import bisect
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.availability import availability_service
+from app.core.config import settings
+from app.core.firebase import firebase_service
+
+
+def generate_slots(
+    doctor_id: str,
+    start_date: str,
+    end_date: str,
+    selected_days: List[str],
+    start_time: str,
+    end_time: str,
+    break_start: str,
+    break_end: str,
+    slot_duration: int = 30,
+    time_gap: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    All slots of a weekly schedule over a date range, computed in memory.
+    Inputs: strings "YYYY-MM-DD", "HH:MM", list ["Mon", "Tue"]
+    """
+    if slot_duration <= 0 or time_gap < 0:
+        raise ValueError("slot_duration must be positive and time_gap not negative")
+    curr_date = datetime.strptime(start_date, "%Y-%m-%d")
+    end_dt = datetime.strptime(end_date, "%Y-%m-%d")
+    start_tm, end_tm = datetime.strptime(start_time, "%H:%M"), datetime.strptime(end_time, "%H:%M")
+    break_start_tm, break_end_tm = datetime.strptime(break_start, "%H:%M"), datetime.strptime(break_end, "%H:%M")
+    created_at = datetime.utcnow().isoformat()
+
+    slots = []
+    while curr_date <= end_dt:
+        if curr_date.strftime("%a") in selected_days:  # Mon, Tue...
+            day_end = curr_date.replace(hour=end_tm.hour, minute=end_tm.minute)
+            day_break_start = curr_date.replace(hour=break_start_tm.hour, minute=break_start_tm.minute)
+            day_break_end = curr_date.replace(hour=break_end_tm.hour, minute=break_end_tm.minute)
+
+            slot_start = curr_date.replace(hour=start_tm.hour, minute=start_tm.minute)
+            while slot_start + timedelta(minutes=slot_duration) <= day_end:
+                slot_end = slot_start + timedelta(minutes=slot_duration)
+                # Skip slots overlapping the break: (SlotEnd > BreakStart) AND (SlotStart < BreakEnd)
+                if not (slot_end > day_break_start and slot_start < day_break_end):
+                    slots.append({
+                        "doctor_id": doctor_id,
+                        "date": curr_date.strftime("%Y-%m-%d"),
+                        "start_time": slot_start.strftime("%H:%M"),
+                        "end_time": slot_end.strftime("%H:%M"),
+                        "status": "AVAILABLE",
+                        "created_at": created_at,
+                    })
+                # Add Duration + GAP for next start
+                slot_start = slot_end + timedelta(minutes=time_gap)
+        curr_date += timedelta(days=1)
+    return slots
+
+
+def drop_overlapping(slots: List[Dict[str, Any]], existing: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Removes new slots overlapping an existing slot of the same day (any status).
+    Returns (slots to create, number skipped).
+    """
+    by_date: Dict[str, List[Tuple[str, str]]] = {}
+    for slot in existing:
+        by_date.setdefault(slot.get("date"), []).append((slot.get("start_time", ""), slot.get("end_time", "")))
+    # Per day: starts sorted, with the latest end among the intervals up to each index
+    days = {}
+    for date, intervals in by_date.items():
+        intervals.sort()
+        max_end, ends = "", []
+        for _, end in intervals:
+            max_end = max(max_end, end)
+            ends.append(max_end)
+        days[date] = ([start for start, _ in intervals], ends)
+
+    kept = []
+    for slot in slots:
+        day = days.get(slot["date"])
+        if day:
+            # Existing intervals starting before the new end; one of them overlaps if it ends after the new start
+            i = bisect.bisect_left(day[0], slot["end_time"])
+            if i and day[1][i - 1] > slot["start_time"]:
+                continue
+        kept.append(slot)
+    return kept, len(slots) - len(kept)
+
+
+class SlotBatchService:
+    """
+    /create_slots_batch: generates the schedule in memory, drops slots overlapping the doctor's
+    existing ones, and writes the rest with chunked WriteBatches. Schedules above
+    `async_threshold` slots are written by a background job the client can poll.
+    """
+
+    def __init__(self, firebase=None, availability=None, async_threshold: Optional[int] = None, max_jobs: int = 100):
+        self.firebase = firebase if firebase is not None else firebase_service
+        self.availability = availability if availability is not None else availability_service
+        self.async_threshold = async_threshold if async_threshold is not None else settings.SLOT_BATCH_ASYNC_THRESHOLD
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def create(self, doctor_id: str, *schedule, **options) -> Dict[str, Any]:
+        """Same arguments as generate_slots (after doctor_id)."""
+        slots = generate_slots(doctor_id, *schedule, **options)
+        slots, skipped = drop_overlapping(slots, self.availability.get_slots(doctor_id, status="ALL"))
+        if len(slots) <= self.async_threshold:
+            created, failed = self._write(slots)
+            if not failed:
+                return {"status": "success", "slots_created": created, "slots_skipped": skipped}
+            return {"status": "partial", "slots_created": created, "slots_skipped": skipped, **self._failure(failed)}
+
+        job_id = f"slotjob_{uuid.uuid4().hex[:12]}"
+        job = {
+            "job_id": job_id,
+            "doctor_id": doctor_id,
+            "status": "running",
+            "slots_planned": len(slots),
+            "slots_skipped": skipped,
+            "slots_created": 0,
+            "started_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="slot-batch")
+        self._executor.submit(self._run, job, slots)
+        print(f"DEBUG: Slot batch job {job_id} started ({len(slots)} slots)")
+        return {"status": "accepted", "job_id": job_id, "slots_planned": len(slots), "slots_skipped": skipped}
+
+    def _write(self, slots: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+        """(slots created, failed chunks)."""
+        created, failed = self.firebase.create_slots(slots)
+        self.availability.on_slots_created(created)
+        return len(created), failed
+
+    @staticmethod
+    def _failure(failed: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {"slots_failed": sum(f["slots"] for f in failed), "error": failed[0]["error"]}
+
+    def _run(self, job: Dict[str, Any], slots: List[Dict[str, Any]]) -> None:
+        try:
+            created, failed = self._write(slots)
+            job.update(slots_created=created, status="partial" if failed else "completed")
+            if failed:
+                job.update(self._failure(failed))
+        except Exception as e:
+            print(f"Slot Batch Job Error ({job['job_id']}): {e}")
+            job.update(status="failed", error=str(e))
+        job["finished_at"] = datetime.utcnow().isoformat()
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+
+# Singleton Instance
+slot_batch_service = SlotBatchService()
@@ -0,0 +1,283 @@
+import asyncio
+import functools
+import json
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Histogram buckets (seconds) shared by every span kind: sub-ms Firestore reads up to slow LLM turns
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def _new_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+def current_span() -> Optional["Span"]:
+    return _current_span.get()
+
+
+class Span:
+    """
+    One timed operation. Used as a context manager; nested spans (in the same task, or in
+    tasks/threads started with a copy of its context) become its children.
+    """
+    __slots__ = ("tracer", "kind", "name", "attrs", "trace_id", "span_id", "parent_id",
+                 "started_at", "start", "duration", "error", "_activate", "_token")
+
+    def __init__(self, tracer: "Tracer", kind: str, name: str, attrs: Dict[str, Any], activate: bool = True):
+        self.tracer = tracer
+        self.kind = kind
+        self.name = name
+        self.attrs = attrs
+        self.error: Optional[str] = None
+        self.duration = 0.0
+        self._activate = activate
+        self._token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.trace_id = parent.trace_id if parent is not None else _new_id()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.span_id = _new_id()
+        if self._activate:
+            self._token = _current_span.set(self)
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        if self._token is not None:
+            try:
+                _current_span.reset(self._token)
+            except ValueError:
+                # An async generator closed from another task/context
+                pass
+        if exc_type is not None and exc_type is not GeneratorExit:
+            self.error = exc_type.__name__
+        self.tracer._finish(self)
+        return False
+
+
+class _NoopSpan:
+    """Returned when tracing is disabled: no clock reads, no context switch, no aggregation."""
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Histogram:
+    __slots__ = ("buckets", "sum", "count", "errors", "max")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.sum = 0.0
+        self.count = 0
+        self.errors = 0
+        self.max = 0.0
+
+
+def _label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Tracer:
+    """
+    Latency tracing for the request path.
+    - Spans by kind: "http" (request), "node" (LangGraph node), "llm" (Groq call, name = model),
+      "onnx" (embedding batch), "chroma" (collection query), "firestore" (FirebaseService call),
+      "translation".
+    - Every finished span is aggregated into a per (kind, name) histogram, rendered as
+      Prometheus text for /metrics; LLM token usage is counted per model.
+    - With a log path, every span is also appended as one JSON line (trace_id / parent_id
+      rebuild the tree of a single /chat turn).
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, log_path: Optional[str] = None, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.enabled = enabled if enabled is not None else settings.TRACING_ENABLED
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], _Histogram] = {}
+        self._tokens: Dict[Tuple[str, str], int] = {}
+        self._log = None
+        self.log_path = log_path if log_path is not None else settings.TRACE_LOG_PATH
+        if self.log_path:
+            self._log = open(self.log_path, "a", encoding="utf-8")
+        self.since = time.time()
+
+    # --- Recording ---
+    def span(self, kind: str, name: str, activate: bool = True, **attrs):
+        """
+        Context manager timing one operation. `activate=False` keeps it out of the context
+        (for async generators, whose body runs inside the consumer's context).
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, kind, name, attrs, activate)
+
+    def _finish(self, span: Span):
+        key = (span.kind, span.name)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram(len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if span.duration <= bound:
+                    hist.buckets[i] += 1
+                    break
+            hist.sum += span.duration
+            hist.count += 1
+            hist.max = max(hist.max, span.duration)
+            if span.error:
+                hist.errors += 1
+            for token_type in ("prompt_tokens", "completion_tokens"):
+                if span.attrs.get(token_type):
+                    token_key = (span.name, token_type[:-7])
+                    self._tokens[token_key] = self._tokens.get(token_key, 0) + span.attrs[token_type]
+            if self._log is not None:
+                self._log.write(json.dumps({
+                    "trace_id": span.trace_id, "span_id": span.span_id, "parent_id": span.parent_id,
+                    "kind": span.kind, "name": span.name, "start": round(span.started_at, 6),
+                    "duration_ms": round(span.duration * 1000, 3), "error": span.error, "attrs": span.attrs,
+                }, default=str) + "\n")
+                self._log.flush()
+
+    def traced(self, kind: str, name: Optional[str] = None) -> Callable:
+        """Decorator: runs a (sync or async) function inside a span."""
+        def decorator(fn):
+            span_name = name or fn.__name__
+
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await fn(*args, **kwargs)
+                    with Span(self, kind, span_name, {}):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with Span(self, kind, span_name, {}):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def trace_methods(self, cls: type, kind: str, names: Iterable[str]):
+        """Wraps the named methods of a class in place (span name = method name)."""
+        for name in names:
+            setattr(cls, name, self.traced(kind, name)(getattr(cls, name)))
+
+    # --- Export ---
+    def render_prometheus(self, gauges: Optional[Dict[str, Tuple[str, float]]] = None) -> str:
+        """Prometheus text exposition (format 0.0.4). `gauges`: {metric: (help, value)}."""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            rows = [(key, list(h.buckets), h.sum, h.count, h.errors) for key, h in histograms]
+            tokens = sorted(self._tokens.items())
+
+        lines = [
+            "# HELP docai_span_duration_seconds Latency of traced operations by kind and name.",
+            "# TYPE docai_span_duration_seconds histogram",
+        ]
+        for (kind, name), buckets, total, count, _ in rows:
+            labels = f'kind="{_label(kind)}",name="{_label(name)}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets, buckets):
+                cumulative += n
+                lines.append(f'docai_span_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'docai_span_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"docai_span_duration_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"docai_span_duration_seconds_count{{{labels}}} {count}")
+
+        lines += [
+            "# HELP docai_span_errors_total Traced operations that raised.",
+            "# TYPE docai_span_errors_total counter",
+        ]
+        for (kind, name), _, _, _, errors in rows:
+            lines.append(f'docai_span_errors_total{{kind="{_label(kind)}",name="{_label(name)}"}} {errors}')
+
+        lines += [
+            "# HELP docai_llm_tokens_total LLM tokens reported by the API, by model and type.",
+            "# TYPE docai_llm_tokens_total counter",
+        ]
+        for (model, token_type), count in tokens:
+            lines.append(f'docai_llm_tokens_total{{model="{_label(model)}",type="{token_type}"}} {count}')
+
+        for metric, (help_text, value) in (gauges or {}).items():
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def stats(self) -> Dict[str, Any]:
+        """JSON summary: per kind/name count, errors, mean and max (ms)."""
+        with self._lock:
+            spans: List[Dict[str, Any]] = [
+                {
+                    "kind": kind, "name": name, "count": h.count, "errors": h.errors,
+                    "mean_ms": round(h.sum / h.count * 1000, 2) if h.count else 0.0,
+                    "max_ms": round(h.max * 1000, 2),
+                }
+                for (kind, name), h in sorted(self._histograms.items())
+            ]
+            tokens = {f"{model}:{t}": n for (model, t), n in sorted(self._tokens.items())}
+        return {"enabled": self.enabled, "since": self.since, "spans": spans, "llm_tokens": tokens}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._tokens.clear()
+            self.since = time.time()
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root "http" span of each request. The span is named after
+    the matched route template (e.g. "/items/{item_id}", known once routing ran), so
+    the metric labels stay bounded; requests that match no route are named "unmatched".
+    """
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            return await self.app(scope, receive, send)
+
+        with self.tracer.span("http", "unmatched", method=scope["method"], path=scope["path"]) as span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set(status=message["status"])
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # The router stores the matched route in the (shared) scope
+                route = scope.get("route")
+                span.name = getattr(route, "path", None) or "unmatched"
+
+
+# Singleton Instance
+tracer = Tracer()
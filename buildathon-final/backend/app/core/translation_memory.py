@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.container import container
+
+# Paragraph breaks: responses are built from fixed blocks ("Assessment Complete.", the
+# EMERGENCY banner, "You can view your full report...") and generated ones
+_SEGMENT_BREAK = re.compile(r"(\s*\n\s*\n\s*)")
+_HAS_LETTERS = re.compile(r"[^\W\d_]")
+
+
+def split_segments(text: str) -> List[Tuple[str, str]]:
+    """Text -> [(segment, separator that follows it)]. Joining all pairs gives the text back."""
+    parts = _SEGMENT_BREAK.split(text)
+    parts.append("")
+    return [(parts[i], parts[i + 1]) for i in range(0, len(parts) - 1, 2)]
+
+
+def segment_key(segment: str) -> str:
+    return hashlib.sha256(segment.strip().encode("utf-8")).hexdigest()
+
+
+def needs_model(segment: str) -> bool:
+    """Blank / numbers-only / punctuation-only segments are kept as they are."""
+    return bool(_HAS_LETTERS.search(segment))
+
+
+class TranslationMemory:
+    """
+    Translations by (segment hash, target language), so fixed UI / system text is only ever
+    sent to the model once. A small in-process LRU sits in front of a SQLite table that is
+    shared by all workers and survives restarts; the table keeps the `max_items` most
+    recently used rows (pruned every `prune_every` writes). path=None keeps it in memory.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_items: int = 50000, memory_items: int = 2048, prune_every: int = 200):
+        self.max_items = max_items
+        self.memory_items = memory_items
+        self.prune_every = prune_every
+        self._memory: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counters = {"hits": 0, "misses": 0, "skipped": 0, "model_calls": 0, "stored": 0}
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path or ":memory:", check_same_thread=False, timeout=30, isolation_level=None)
+        if path:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+                key TEXT NOT NULL,
+                language TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (key, language)
+            );
+            CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used);
+            """
+        )
+
+    # --- Storage ---
+    def _remember(self, key: Tuple[str, str], translation: str):
+        self._memory[key] = translation
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: List[str], language: str) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                cached = self._memory.get((key, language))
+                if cached is None:
+                    missing.append(key)
+                else:
+                    self._memory.move_to_end((key, language))
+                    found[key] = cached
+            if missing:
+                placeholders = ",".join("?" * len(missing))
+                rows = self.conn.execute(
+                    f"SELECT key, translation FROM translations WHERE language = ? AND key IN ({placeholders})",
+                    [language, *missing],
+                ).fetchall()
+                if rows:
+                    self.conn.executemany(
+                        "UPDATE translations SET last_used = ? WHERE key = ? AND language = ?",
+                        [(time.time(), key, language) for key, _ in rows],
+                    )
+                for key, translation in rows:
+                    self._remember((key, language), translation)
+                    found[key] = translation
+        return found
+
+    def put_many(self, items: Dict[str, str], language: str):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO translations (key, language, translation, last_used) VALUES (?, ?, ?, ?)",
+                [(key, language, translation, now) for key, translation in items.items()],
+            )
+            for key, translation in items.items():
+                self._remember((key, language), translation)
+            self.counters["stored"] += len(items)
+            self._writes += len(items)
+            if self._writes >= self.prune_every:
+                self._writes = 0
+                self._prune()
+
+    def _prune(self):
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM translations").fetchone()
+        if count > self.max_items:
+            self.conn.execute(
+                "DELETE FROM translations WHERE rowid IN "
+                "(SELECT rowid FROM translations ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_items,),
+            )
+
+    def get(self, text: str, language: str) -> Optional[str]:
+        key = segment_key(text)
+        return self.get_many([key], language).get(key)
+
+    def put(self, text: str, language: str, translation: str):
+        self.put_many({segment_key(text): translation}, language)
+
+    # --- Segment-level translation ---
+    def plan(self, text: str, language: str) -> List[Dict[str, Any]]:
+        """
+        Segments of `text` in order: {"source", "separator", "key", "translation"}.
+        `translation` is None for segments the model still has to translate.
+        """
+        segments = split_segments(text)
+        keys = [segment_key(s) if needs_model(s) else None for s, _ in segments]
+        found = self.get_many([k for k in keys if k], language)
+        plan = []
+        for (source, separator), key in zip(segments, keys):
+            if key is None:
+                translation = source
+                self.counters["skipped"] += 1
+            else:
+                translation = found.get(key)
+                self.counters["hits" if translation is not None else "misses"] += 1
+            plan.append({"source": source, "separator": separator, "key": key, "translation": translation})
+        return plan
+
+    async def translate(self, text: str, language: str, translate_many: Callable[[List[str], str], Awaitable[List[str]]]) -> str:
+        """
+        Translates `text`, sending only the segments missing from the memory to the model
+        in one `translate_many(segments, language)` call. Raises what translate_many raises.
+        SQLite lookups/writes run in a worker thread (the store may wait on other workers' locks).
+        """
+        plan = await asyncio.to_thread(self.plan, text, language)
+        missing = {p["key"]: p["source"].strip() for p in plan if p["translation"] is None}
+        if missing:
+            self.counters["model_calls"] += 1
+            translations = await translate_many(list(missing.values()), language)
+            if len(translations) != len(missing):
+                raise ValueError(f"Expected {len(missing)} translations, got {len(translations)}")
+            learned = dict(zip(missing, translations))
+            await asyncio.to_thread(self.put_many, learned, language)
+            for p in plan:
+                if p["translation"] is None:
+                    p["translation"] = learned[p["key"]]
+        return join_plan(plan)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (rows,) = self.conn.execute("SELECT COUNT(*) FROM translations").fetchone()
+            return {**self.counters, "memory_items": len(self._memory), "stored_items": rows}
+
+
+def join_plan(plan: List[Dict[str, Any]]) -> str:
+    """Reassembles translated segments, keeping the original whitespace around them."""
+    out = []
+    for p in plan:
+        source = p["source"]
+        if p["key"] is None:
+            out.append(source)
+        else:
+            leading = source[: len(source) - len(source.lstrip())]
+            trailing = source[len(source.rstrip()):]
+            out.append(f"{leading}{p['translation'].strip()}{trailing}")
+        out.append(p["separator"])
+    return "".join(out)
+
+
+def build_translation_memory() -> TranslationMemory:
+    path = settings.TRANSLATION_MEMORY_PATH
+    print(f"DEBUG: Using translation memory at {path or ':memory:'}")
+    return TranslationMemory(path or None, max_items=settings.TRANSLATION_MEMORY_MAX_ITEMS)
+
+
+container.register("translation_memory", build_translation_memory)
+translation_memory = container.proxy("translation_memory", spec=TranslationMemory)
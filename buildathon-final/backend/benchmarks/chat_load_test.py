@@ -0,0 +1,293 @@
+"""
+End-to-end load test: replays scripted multi-turn triage conversations against /chat,
+then /save_summary and /book_appointment, with N conversations in flight, and reports
+throughput, per-endpoint latency percentiles and the server's event-loop lag.
+
+Usage (from backend/):
+    # Everything local: starts the LLM stub server and the app (local Firestore stand-in)
+    python -m benchmarks.chat_load_test --spawn --concurrency 16 --conversations 64
+
+    # Against a running app (started with LLM_BASE_URL pointing at benchmarks.llm_stub_server)
+    python -m benchmarks.chat_load_test --base-url http://127.0.0.1:8000 --stub-url http://127.0.0.1:8900
+
+Conversations come from benchmarks/data/triage_conversations.json. Each one books its own
+slot (created up front with /create_slots_batch on a load-test doctor), so booking latency
+includes the real slot transaction. --language Hindi exercises the translation path.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from app.core.loop_monitor import percentile
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "triage_conversations.json")
+LOAD_DOCTOR = "load_test_doctor"
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.outcomes: Dict[str, int] = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, endpoint: str, method: str, path: str, **kwargs) -> Optional[Dict[str, Any]]:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                self.errors[endpoint] += 1
+                return None
+            self.latencies[endpoint].append(elapsed)
+            return response.json()
+        except httpx.HTTPError as e:
+            self.errors[endpoint] += 1
+            print(f"ERROR: {endpoint}: {type(e).__name__}: {e}")
+            return None
+
+
+async def seed_slots(client: httpx.AsyncClient, count: int) -> List[str]:
+    """Enough AVAILABLE slots for every conversation to book its own."""
+    days = max(1, -(-count // 16))  # 16 half-hour slots per day (09:00-17:00)
+    start = date.today() + timedelta(days=30)
+    response = await client.post("/create_slots_batch", json={
+        "doctor_id": LOAD_DOCTOR,
+        "start_date": start.isoformat(),
+        "end_date": (start + timedelta(days=days - 1)).isoformat(),
+        "selected_days": ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"],
+        "start_time": "09:00", "end_time": "17:00",
+        "break_start": "00:00", "break_end": "00:00",
+        "slot_duration_minutes": 30,
+    })
+    response.raise_for_status()
+    if response.json().get("job_id"):
+        job_id = response.json()["job_id"]
+        while (await client.get("/get_slots_batch_job", params={"job_id": job_id})).json().get("status") == "running":
+            await asyncio.sleep(0.2)
+    slots = (await client.get("/get_slots", params={"doctor_id": LOAD_DOCTOR})).json().get("slots", [])
+    return [s["id"] for s in slots]
+
+
+async def run_conversation(client: httpx.AsyncClient, recorder: Recorder, conversation: Dict[str, Any], slot_id: Optional[str], language: str, index: int):
+    session = await recorder.call(client, "/init_session", "GET", "/init_session")
+    if session is None:
+        return
+    case_id = session["case_id"]
+    profile_id = f"load_profile_{index}"
+    last = None
+    for turn in conversation["turns"]:
+        last = await recorder.call(client, "/chat", "POST", "/chat", json={
+            "message": turn["user"], "session_id": case_id, "target_language": language,
+            "case_id": case_id, "profile_id": profile_id,
+        })
+        if last is None:
+            return
+        if last.get("decision") == "EMERGENCY":
+            recorder.outcomes["emergency"] += 1
+            break
+
+    summary = (last or {}).get("summary_payload") or {}
+    await recorder.call(client, "/save_summary", "POST", "/save_summary", json={
+        "profile_id": profile_id, "user_id": f"load_user_{index}", "case_id": case_id,
+        "patient_summary": summary.get("patient_summary", {}),
+        "pre_doctor_consultation_summary": summary.get("pre_doctor_consultation_summary", {}),
+    })
+    booking = await recorder.call(client, "/book_appointment", "POST", "/book_appointment", json={
+        "profile_id": profile_id, "user_id": f"load_user_{index}", "doctor_id": LOAD_DOCTOR,
+        "slot_id": slot_id, "session_id": case_id, "patient_name": f"Load Patient {index}",
+    })
+    if booking is not None:
+        recorder.outcomes[f"booking_{booking.get('booking_status', 'unknown')}"] += 1
+    recorder.outcomes["conversations"] += 1
+
+
+async def run_load(args) -> Dict[str, Any]:
+    with open(args.corpus, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        slots = await seed_slots(client, args.conversations)
+        if len(slots) < args.conversations:
+            print(f"WARN: only {len(slots)} slots for {args.conversations} conversations")
+        await client.get("/loop_stats", params={"reset": "true"})
+        if args.stub_url:
+            async with httpx.AsyncClient() as stub:
+                await stub.post(f"{args.stub_url}/reset")
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(args.conversations):
+            queue.put_nowait(i)
+
+        async def worker():
+            while True:
+                try:
+                    i = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                slot_id = slots[i] if i < len(slots) else None
+                await run_conversation(client, recorder, rng.choice(corpus), slot_id, args.language, i)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+        wall = time.perf_counter() - started
+
+        loop_stats = (await client.get("/loop_stats")).json()
+        stub_stats = None
+        if args.stub_url:
+            async with httpx.AsyncClient() as stub:
+                stub_stats = (await stub.get(f"{args.stub_url}/stats")).json()
+
+    return {"wall_seconds": wall, "recorder": recorder, "loop": loop_stats, "stub": stub_stats}
+
+
+def report(args, result: Dict[str, Any]) -> Dict[str, Any]:
+    recorder: Recorder = result["recorder"]
+    wall = result["wall_seconds"]
+    total_requests = sum(len(v) for v in recorder.latencies.values())
+    endpoints = {}
+    print("=" * 78)
+    print("CHAT LOAD TEST")
+    print("=" * 78)
+    print(f"Concurrency:     {args.concurrency} conversations in flight")
+    print(f"Conversations:   {recorder.outcomes['conversations']} / {args.conversations} in {wall:.1f} s "
+          f"({recorder.outcomes['conversations'] / wall:.2f} conv/s)")
+    print(f"Requests:        {total_requests} ok, {sum(recorder.errors.values())} errors ({total_requests / wall:.1f} req/s)")
+    print(f"Outcomes:        {dict((k, v) for k, v in recorder.outcomes.items() if k != 'conversations')}")
+    print("-" * 78)
+    print(f"{'endpoint':<20}{'count':>7}{'err':>5}{'req/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for endpoint in ["/init_session", "/chat", "/save_summary", "/book_appointment"]:
+        ms = sorted(t * 1000 for t in recorder.latencies.get(endpoint, []))
+        endpoints[endpoint] = {
+            "count": len(ms), "errors": recorder.errors.get(endpoint, 0), "rps": round(len(ms) / wall, 2),
+            "mean_ms": round(statistics.mean(ms), 1) if ms else 0.0,
+            "p50_ms": round(percentile(ms, 50), 1), "p95_ms": round(percentile(ms, 95), 1),
+            "p99_ms": round(percentile(ms, 99), 1), "max_ms": round(ms[-1], 1) if ms else 0.0,
+        }
+        e = endpoints[endpoint]
+        print(f"{endpoint:<20}{e['count']:>7}{e['errors']:>5}{e['rps']:>8}{e['p50_ms']:>10}{e['p95_ms']:>10}{e['p99_ms']:>10}{e['max_ms']:>10}")
+    loop = result["loop"]
+    print("-" * 78)
+    print(f"Event-loop lag:  p50 {loop['p50_ms']} ms | p95 {loop['p95_ms']} ms | p99 {loop['p99_ms']} ms | "
+          f"max {loop['max_ms']} ms ({loop['samples']} samples every {loop['interval_ms']} ms)")
+    if result["stub"]:
+        stub = result["stub"]
+        print(f"LLM stub:        {stub['calls']} calls ({stub['streamed']} streamed), mean simulated latency {stub['mean_simulated_ms']} ms")
+        print(f"                 {stub['by_kind']}")
+    print("=" * 78)
+    return {
+        "concurrency": args.concurrency, "conversations": recorder.outcomes["conversations"],
+        "wall_seconds": round(wall, 2), "requests_per_second": round(total_requests / wall, 2),
+        "endpoints": endpoints, "outcomes": dict(recorder.outcomes), "loop_lag": loop, "llm_stub": result["stub"],
+    }
+
+
+# --- Local stack (--spawn) ---
+def _spawn(cmd: List[str], env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def _wait_ready(url: str, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode}")
+            try:
+                await client.get(url, timeout=1)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} not ready after {timeout} s")
+
+
+def spawn_stack(args) -> List[subprocess.Popen]:
+    env = {**os.environ, "PYTHONPATH": BACKEND_DIR}
+    stub_cmd = [sys.executable, "-m", "benchmarks.llm_stub_server", "--port", str(args.stub_port), "--seed", str(args.seed)]
+    for spec in args.latency:
+        stub_cmd += ["--latency", spec]
+    stub = _spawn(stub_cmd, env, os.path.join(args.log_dir, "llm_stub.log"))
+
+    app_env = {
+        **env,
+        "LLM_BASE_URL": f"http://127.0.0.1:{args.stub_port}",
+        "GROQ_API_KEY": env.get("GROQ_API_KEY") or "load-test",
+        "FIRESTORE_BACKEND": "local",
+        "LOCAL_FIRESTORE_LATENCY_MS": str(args.db_latency_ms),
+        "CHECKPOINT_BACKEND": "memory",
+        "TRANSLATION_MEMORY_PATH": "",
+    }
+    app_cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.app_port),
+               "--workers", str(args.workers), "--log-level", "warning"]
+    app = _spawn(app_cmd, app_env, os.path.join(args.log_dir, "app.log"))
+    args.base_url = f"http://127.0.0.1:{args.app_port}"
+    args.stub_url = f"http://127.0.0.1:{args.stub_port}"
+    return [stub, app]
+
+
+async def main_async(args):
+    processes = []
+    try:
+        if args.spawn:
+            processes = spawn_stack(args)
+            await _wait_ready(f"{args.stub_url}/stats", processes[0], 30)
+            await _wait_ready(f"{args.base_url}/", processes[1], args.startup_timeout)
+            print(f"Local stack up (logs in {args.log_dir})")
+        result = await run_load(args)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    summary = report(args, result)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Wrote {args.json_out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--stub-url", default=None, help="LLM stub server, for its call counts")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--conversations", type=int, default=32)
+    parser.add_argument("--language", default="English", help='target_language sent to /chat (e.g. "Hindi")')
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json-out", default=None)
+    spawn = parser.add_argument_group("local stack")
+    spawn.add_argument("--spawn", action="store_true", help="start the LLM stub server and the app")
+    spawn.add_argument("--app-port", type=int, default=8810)
+    spawn.add_argument("--stub-port", type=int, default=8900)
+    spawn.add_argument("--workers", type=int, default=1)
+    spawn.add_argument("--latency", action="append", default=[], help='LLM latency "model=dist" (see llm_stub_server)')
+    spawn.add_argument("--db-latency-ms", type=float, default=0, help="round trip injected by the local Firestore stand-in")
+    spawn.add_argument("--startup-timeout", type=float, default=180)
+    spawn.add_argument("--log-dir", default=os.path.join(BACKEND_DIR, "data"))
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Replays the triage conversation corpus through the Emergency pre-filter and reports
+how many LLM scan calls it avoids.
+
+Usage (from backend/):
+    python -m benchmarks.emergency_prefilter_benchmark [path/to/corpus.json]
+
+Before the pre-filter every turn paid one llama-3.3-70b scan call.
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.agent.emergency_matcher import EmergencyMatcher, EMERGENCY, BENIGN, AMBIGUOUS
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "triage_conversations.json")
+
+
+def run(corpus_path=DEFAULT_CORPUS):
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        conversations = json.load(f)
+
+    t0 = time.perf_counter()
+    matcher = EmergencyMatcher()
+    compile_ms = (time.perf_counter() - t0) * 1000
+
+    turns = 0
+    verdicts = {EMERGENCY: 0, BENIGN: 0, AMBIGUOUS: 0}
+    missed = []        # expected emergency, pre-filter said BENIGN (would skip the LLM)
+    false_alarms = []  # pre-filter said EMERGENCY, corpus says routine
+    classify_time = 0.0
+
+    for conv in conversations:
+        for turn in conv["turns"]:
+            turns += 1
+            t = time.perf_counter()
+            result = matcher.classify(turn["user"], turn.get("ai", ""))
+            classify_time += time.perf_counter() - t
+            verdict = result["verdict"]
+            verdicts[verdict] += 1
+
+            if turn.get("expect_emergency") and verdict == BENIGN:
+                missed.append((conv["id"], turn["user"]))
+            if not turn.get("expect_emergency") and verdict == EMERGENCY:
+                false_alarms.append((conv["id"], turn["user"], result["reason"]))
+
+    avoided = verdicts[EMERGENCY] + verdicts[BENIGN]
+    print("=" * 60)
+    print("EMERGENCY PRE-FILTER BENCHMARK")
+    print("=" * 60)
+    print(f"Corpus:               {os.path.basename(corpus_path)} ({len(conversations)} conversations)")
+    print(f"Rule phrases:         {matcher.phrase_count} (compiled in {compile_ms:.2f} ms)")
+    print(f"Turns replayed:       {turns}")
+    print(f"LLM scans (before):   {turns}")
+    print(f"LLM scans (after):    {verdicts[AMBIGUOUS]}")
+    print(f"LLM scans avoided:    {avoided} ({avoided / turns:.0%})")
+    print(f"  - deterministic EMERGENCY: {verdicts[EMERGENCY]}")
+    print(f"  - benign short-circuit:    {verdicts[BENIGN]}")
+    print(f"Pre-filter cost:      {classify_time / turns * 1e6:.1f} us/turn")
+    print(f"Missed emergencies:   {len(missed)}")
+    for conv_id, msg in missed:
+        print(f"  ! {conv_id}: {msg!r}")
+    print(f"False alarms:         {len(false_alarms)}")
+    for conv_id, msg, reason in false_alarms:
+        print(f"  ? {conv_id}: {msg!r} ({reason})")
+    return {"turns": turns, "verdicts": verdicts, "missed": missed, "false_alarms": false_alarms}
+
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CORPUS)
@@ -0,0 +1,262 @@
+"""
+OpenAI/Groq-compatible stub server for load tests: answers the triage prompts with
+well-formed JSON after a simulated model latency, so /chat can be driven end to end
+without calling (or paying for) Groq.
+
+Usage (from backend/):
+    python -m benchmarks.llm_stub_server --port 8900 \
+        --latency "openai/gpt-oss-120b=lognormal:900:0.35" --latency "default=lognormal:500:0.3"
+
+Then start the app with LLM_BASE_URL=http://127.0.0.1:8900 (any GROQ_API_KEY).
+
+Latency distributions (milliseconds), per model or "default":
+    fixed:MS | uniform:LO:HI | normal:MEAN:SD | lognormal:MEDIAN:SIGMA
+Streamed responses send the first chunk after --ttft-fraction of the sampled latency and
+spread the remaining chunks over the rest.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_LATENCY = {
+    "openai/gpt-oss-120b": "lognormal:900:0.35",
+    "llama-3.3-70b-versatile": "lognormal:450:0.3",
+    "default": "lognormal:600:0.35",
+}
+
+
+class LatencyDistribution:
+    def __init__(self, spec: str):
+        kind, *params = spec.split(":")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if expected.get(kind) != len(self.params):
+            raise ValueError(f"Invalid latency '{spec}' (fixed:MS | uniform:LO:HI | normal:MEAN:SD | lognormal:MEDIAN:SIGMA)")
+
+    def sample_ms(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = rng.gauss(p[0], p[1])
+        else:
+            value = rng.lognormvariate(math.log(p[0]), p[1])
+        return max(0.0, value)
+
+
+def parse_latencies(specs: List[str]) -> Dict[str, LatencyDistribution]:
+    """["model=dist", "default=dist"] on top of DEFAULT_LATENCY."""
+    merged = dict(DEFAULT_LATENCY)
+    for spec in specs or []:
+        model, _, dist = spec.rpartition("=")
+        merged[model or "default"] = dist
+    return {model: LatencyDistribution(dist) for model, dist in merged.items()}
+
+
+# --- Canned answers ---
+def _between(text: str, start: str, end: str) -> str:
+    i = text.find(start)
+    if i < 0:
+        return ""
+    i += len(start)
+    j = text.find(end, i)
+    return text[i:j] if j >= 0 else text[i:]
+
+
+def _snake(text: str) -> str:
+    words = re.findall(r"[a-z]+", text.lower())[:3]
+    return "_".join(words) or "answer"
+
+
+def respond(prompt: str) -> Tuple[str, str]:
+    """Returns (kind, content) for a prompt, based on the markers of the app's prompts."""
+    if "Clinical Reasoning Engine" in prompt:
+        answer = _between(prompt, 'USER ANSWERED: "', '"')
+        initial = "MODE: INITIAL ASSESSMENT" in prompt
+        return "reasoning", json.dumps({
+            "new_facts": {_snake(answer): answer or "Present"},
+            "differential_diagnosis": ["Viral fever", "Dengue", "Typhoid"] if initial else ["Viral fever", "Dengue"],
+            "new_questions": [
+                "How many days have you had these symptoms?",
+                "Have you noticed a rash anywhere on your body?",
+                "Have you travelled anywhere recently?",
+            ] if initial else [],
+            "stop_asking": False,
+        })
+    if "Clinical Fact Extractor" in prompt:
+        answer = _between(prompt, 'USER ANSWERED: "', '"')
+        return "fact_extraction", json.dumps({_snake(answer): answer or "Present"})
+    if "FOCUSED assessment plan" in prompt:
+        return "diagnosis", json.dumps({
+            "differential_diagnosis": ["Viral fever", "Dengue", "Typhoid"],
+            "new_questions": [
+                "How many days have you had these symptoms?",
+                "Have you noticed a rash anywhere on your body?",
+                "Have you travelled anywhere recently?",
+            ],
+        })
+    if "The user answered the last question" in prompt:
+        return "diagnosis_follow_up", json.dumps({
+            "differential_diagnosis": ["Viral fever", "Dengue"],
+            "new_questions_to_add": [],
+            "stop_asking": False,
+        })
+    if "EMERGENCY TRIAGE NURSE" in prompt:
+        return "emergency_scan", json.dumps({"is_emergency": False, "reason": "No red flags reported", "action": "Continue assessment"})
+    if "Emergency Medical Scribe" in prompt:
+        return "emergency_summary", json.dumps({
+            "pre_doctor_consultation_summary": {
+                "trigger_reason": "Red flag reported",
+                "assessment": {"likely_diagnosis": "Emergency Condition (Triage)", "severity_level": "CRITICAL", "severity_score": 95},
+                "history": {"symptoms": ["Chest pain"], "duration": "Acute", "negatives": []},
+                "vitals_reported": {"bp": None},
+                "red_flags": ["Life Threatening Condition Detected"],
+                "plan": {"immediate_actions": ["ER Admission"], "referral_needed": True},
+            },
+            "patient_summary": "EMERGENCY DETECTED. Please go to the nearest hospital immediately.",
+        })
+    if "FINAL PATIENT SUMMARY" in prompt:
+        return "final_summary", json.dumps({
+            "triage_level": "Green",
+            "clinical_guidelines": "Rest, drink plenty of fluids and take paracetamol for fever above 100F.",
+            "red_flags_to_watch_out_for": ["Difficulty breathing", "Persistent high fever > 3 days", "Confusion"],
+            "symptoms_reported": ["Fever"],
+            "symptoms_denied": ["Rash"],
+            "follow_up": "Monitor for 24 hours. Consult if symptoms worsen.",
+        })
+    if "Detect the language" in prompt:
+        return "detect_language", json.dumps({"language": "English"})
+    if "ITEMS:" in prompt and "'translations'" in prompt:
+        language = _between(prompt, "paragraphs to ", ".")
+        items = json.loads(_between(prompt, "ITEMS: ", "\n").strip() or "[]")
+        return "translate_segments", json.dumps({"translations": [f"[{language}] {item}" for item in items]}, ensure_ascii=False)
+    if "Translate this medical response" in prompt:
+        language = _between(prompt, "response to ", ".")
+        text = _between(prompt, 'TEXT: "', '"\n')
+        return "translate", json.dumps({"translation": f"[{language}] {text}"}, ensure_ascii=False)
+    if "Translate the following medical text to English" in prompt:
+        text = _between(prompt, 'TEXT: "', '"\n')
+        return "translate_to_english", json.dumps({"english_text": text, "detected_language": "English"}, ensure_ascii=False)
+    if "chronic_conditions" in prompt:
+        return "medical_history", json.dumps({"chronic_conditions": [], "allergies": [], "past_consultations": [], "surgical_history": [], "family_history": []})
+    return "unknown", "{}"
+
+
+def prompt_text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            parts.extend(p.get("text", "") for p in content if isinstance(p, dict))
+        elif content:
+            parts.append(str(content))
+    return "\n".join(parts)
+
+
+# --- Server ---
+def create_app(latencies: Optional[Dict[str, LatencyDistribution]] = None, ttft_fraction: float = 0.3, chunk_chars: int = 12, seed: Optional[int] = None) -> FastAPI:
+    latencies = latencies or parse_latencies([])
+    rng = random.Random(seed)
+    app = FastAPI(title="LLM stub")
+    state = {"calls": Counter(), "kinds": Counter(), "prompt_tokens": Counter(), "streamed": 0, "simulated_ms": 0.0, "since": time.time()}
+
+    def completion_id() -> str:
+        return f"chatcmpl-{uuid.uuid4().hex[:24]}"
+
+    @app.post("/openai/v1/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "unknown")
+        prompt = prompt_text(body.get("messages", []))
+        kind, content = respond(prompt)
+        prompt_tokens = len(prompt) // 4  # ~4 characters per token
+        latency_ms = (latencies.get(model) or latencies["default"]).sample_ms(rng)
+        state["calls"][model] += 1
+        state["kinds"][kind] += 1
+        state["prompt_tokens"][kind] += prompt_tokens
+        state["simulated_ms"] += latency_ms
+        created = int(time.time())
+        cid = completion_id()
+
+        if not body.get("stream"):
+            await asyncio.sleep(latency_ms / 1000)
+            return JSONResponse({
+                "id": cid, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4, "total_tokens": prompt_tokens + len(content) // 4},
+            })
+
+        state["streamed"] += 1
+        pieces = [content[i:i + chunk_chars] for i in range(0, len(content), chunk_chars)] or [""]
+        gap = latency_ms * (1 - ttft_fraction) / 1000 / max(1, len(pieces))
+
+        def chunk(delta: Dict[str, Any], finish: Optional[str] = None) -> str:
+            payload = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                       "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def events():
+            await asyncio.sleep(latency_ms * ttft_fraction / 1000)
+            yield chunk({"role": "assistant", "content": ""})
+            for piece in pieces:
+                yield chunk({"content": piece})
+                await asyncio.sleep(gap)
+            yield chunk({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        total = sum(state["calls"].values())
+        return {
+            "calls": total,
+            "by_model": dict(state["calls"]),
+            "by_kind": dict(state["kinds"]),
+            "prompt_tokens_by_kind": dict(state["prompt_tokens"]),
+            "streamed": state["streamed"],
+            "mean_simulated_ms": round(state["simulated_ms"] / total, 1) if total else 0.0,
+            "latency": {model: dist.spec for model, dist in latencies.items()},
+            "since": state["since"],
+        }
+
+    @app.post("/reset")
+    async def reset():
+        state.update({"calls": Counter(), "kinds": Counter(), "prompt_tokens": Counter(), "streamed": 0, "simulated_ms": 0.0, "since": time.time()})
+        return {"status": "ok"}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", action="append", default=[], help='"model=dist" or "default=dist" (repeatable)')
+    parser.add_argument("--ttft-fraction", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app(parse_latencies(args.latency), ttft_fraction=args.ttft_fraction, seed=args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Replays the triage conversation corpus through the agent graph and reports the prompt
+tokens sent to the LLM per turn, per node, to show how prompt size grows (or stays
+bounded) as a conversation gets longer.
+
+Usage (from backend/):
+    python -m benchmarks.prompt_tokens_benchmark [--turns 12] [--json-out tokens.json]
+
+The LLM is not called: the gateway answers with the canned replies of
+benchmarks/llm_stub_server.py and records each prompt (~4 characters per token).
+Retrieval is real (ONNX + Chroma). Conversations shorter than --turns are extended by
+cycling their non-emergency answers, so every session reaches the same length.
+Run it on two commits to compare before/after.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import uuid
+from collections import defaultdict
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CHECKPOINT_BACKEND", "memory")
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from langchain_core.messages import HumanMessage
+
+from app.agent.graph import agent_graph
+from app.core.llm_gateway import llm_gateway
+from app.core.tracing import tracer, current_span
+from benchmarks.llm_stub_server import prompt_text, respond
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "triage_conversations.json")
+
+
+class PromptRecorder:
+    """Stands in for the Groq client: canned answers, prompt tokens recorded per graph node."""
+
+    def __init__(self):
+        self.turn_tokens = defaultdict(int)
+
+    def _record(self, messages):
+        prompt = prompt_text(messages)
+        span = current_span()
+        self.turn_tokens[span.name if span is not None else "other"] += len(prompt) // 4
+        return respond(prompt)[1]
+
+    async def create(self, model, messages, **kwargs):
+        content = self._record(messages)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+    async def stream_chat(self, model, messages, **kwargs):
+        content = self._record(messages)
+        for i in range(0, len(content), 16):
+            yield content[i:i + 16]
+
+    def take_turn(self):
+        tokens, self.turn_tokens = dict(self.turn_tokens), defaultdict(int)
+        return tokens
+
+
+def session_answers(conversation, turns):
+    answers = [t["user"] for t in conversation["turns"]]
+    filler = [t["user"] for t in conversation["turns"][1:] if not t.get("expect_emergency")] or ["no"]
+    while len(answers) < turns:
+        answers.append(filler[(len(answers) - 1) % len(filler)])
+    return answers[:turns]
+
+
+async def replay(conversations, turns, recorder):
+    """per_turn[i][node] -> prompt tokens of turn i+1, one entry per conversation."""
+    per_turn = [defaultdict(list) for _ in range(turns)]
+    for conversation in conversations:
+        config = {"configurable": {"thread_id": f"bench-{conversation['id']}-{uuid.uuid4().hex[:6]}"}}
+        for i, answer in enumerate(session_answers(conversation, turns)):
+            await agent_graph.ainvoke({"messages": [HumanMessage(content=answer)], "session_id": config["configurable"]["thread_id"]}, config=config)
+            tokens = recorder.take_turn()
+            for node, count in tokens.items():
+                per_turn[i][node].append(count)
+            per_turn[i]["total"].append(sum(tokens.values()))
+    return per_turn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--turns", type=int, default=12)
+    parser.add_argument("--json-out", default=None)
+    args = parser.parse_args()
+
+    with open(args.corpus, "r", encoding="utf-8") as f:
+        conversations = json.load(f)
+
+    tracer.enabled = True  # node spans label the recorded prompts
+    recorder = PromptRecorder()
+    llm_gateway.create = recorder.create
+    llm_gateway.stream_chat = recorder.stream_chat
+
+    per_turn = asyncio.run(replay(conversations, args.turns, recorder))
+
+    nodes = sorted({node for turn in per_turn for node in turn if node != "total"})
+    rows = []
+    for i, turn in enumerate(per_turn, 1):
+        # Mean over conversations (a node that did not call the LLM counts as 0)
+        row = {node: sum(turn.get(node, [])) / len(conversations) for node in nodes + ["total"]}
+        rows.append({"turn": i, **{k: round(v, 1) for k, v in row.items()}})
+
+    print("=" * 78)
+    print("PROMPT TOKENS PER TURN (mean per conversation, ~4 chars/token)")
+    print("=" * 78)
+    print(f"Corpus: {os.path.basename(args.corpus)} ({len(conversations)} conversations x {args.turns} turns)")
+    print(f"{'turn':>4}" + "".join(f"{n[:14]:>15}" for n in nodes) + f"{'total':>10}")
+    for row in rows:
+        print(f"{row['turn']:>4}" + "".join(f"{row[n]:>15}" for n in nodes) + f"{row['total']:>10}")
+    totals = [row["total"] for row in rows]
+    print("-" * 78)
+    print(f"Mean per turn: {statistics.mean(totals):.0f} tokens | turn 1: {totals[0]:.0f} | turn {args.turns}: {totals[-1]:.0f} "
+          f"| last 3 turns: {statistics.mean(totals[-3:]):.0f}")
+    print("=" * 78)
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"turns": args.turns, "conversations": len(conversations), "per_turn": rows}, f, indent=2)
+        print(f"Wrote {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Compares the split (Fact Extraction + Diagnostician) and fused (single Reasoning call)
+graph paths: per-turn latency, LLM calls and token spend on the same conversations.
+
+Usage (from backend/):
+    python -m benchmarks.reasoning_mode_benchmark [--turns 8] [--json-out modes.json] \
+        [--latency "openai/gpt-oss-120b=lognormal:900:0.35"] [--ms-per-output-token 2]
+
+The LLM is not called: the gateway answers with the canned replies of
+benchmarks/llm_stub_server.py after a simulated latency (the stub's distributions, plus
+--ms-per-output-token for each completion token), and records prompt/completion tokens
+(~4 characters per token). Retrieval is real (ONNX + Chroma). Both modes replay the same
+answers with the same latency seed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CHECKPOINT_BACKEND", "memory")
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from app.agent.graph import build_graph
+from app.core.llm_gateway import llm_gateway
+from app.core.loop_monitor import percentile
+from benchmarks.llm_stub_server import parse_latencies, prompt_text, respond
+from benchmarks.prompt_tokens_benchmark import DEFAULT_CORPUS, session_answers
+
+MODES = ("split", "fused")
+
+
+class SimulatedLLM:
+    """Stands in for the Groq client: canned answers after a sampled latency, usage recorded."""
+
+    def __init__(self, latencies, ms_per_output_token, seed):
+        self.latencies = latencies
+        self.ms_per_output_token = ms_per_output_token
+        self.rng = random.Random(seed)
+        self.calls = self.prompt_tokens = self.completion_tokens = 0
+
+    def _call(self, model, messages):
+        prompt = prompt_text(messages)
+        content = respond(prompt)[1]
+        completion_tokens = len(content) // 4
+        self.calls += 1
+        self.prompt_tokens += len(prompt) // 4
+        self.completion_tokens += completion_tokens
+        dist = self.latencies.get(model) or self.latencies["default"]
+        delay_ms = dist.sample_ms(self.rng) + completion_tokens * self.ms_per_output_token
+        return content, delay_ms / 1000
+
+    async def create(self, model, messages, **kwargs):
+        content, delay = self._call(model, messages)
+        await asyncio.sleep(delay)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+    async def stream_chat(self, model, messages, **kwargs):
+        content, delay = self._call(model, messages)
+        await asyncio.sleep(delay)
+        for i in range(0, len(content), 16):
+            yield content[i:i + 16]
+
+    def take_turn(self):
+        usage = {"calls": self.calls, "prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens}
+        self.calls = self.prompt_tokens = self.completion_tokens = 0
+        return usage
+
+
+async def run_mode(mode, conversations, turns, llm):
+    """One record per turn: wall latency (ms), LLM calls and tokens."""
+    graph = build_graph(MemorySaver(), reasoning_mode=mode)
+    records = []
+    for conversation in conversations:
+        thread_id = f"bench-{mode}-{conversation['id']}-{uuid.uuid4().hex[:6]}"
+        config = {"configurable": {"thread_id": thread_id}}
+        for answer in session_answers(conversation, turns):
+            llm.take_turn()
+            start = time.perf_counter()
+            await graph.ainvoke({"messages": [HumanMessage(content=answer)], "session_id": thread_id}, config=config)
+            records.append({"latency_ms": (time.perf_counter() - start) * 1000, **llm.take_turn()})
+    return records
+
+
+def summarize(records):
+    latencies = sorted(r["latency_ms"] for r in records)
+    return {
+        "turns": len(records),
+        "latency_mean_ms": round(statistics.mean(latencies), 1),
+        "latency_p50_ms": round(percentile(latencies, 50), 1),
+        "latency_p95_ms": round(percentile(latencies, 95), 1),
+        **{key: round(statistics.mean(r[key] for r in records), 2) for key in ("calls", "prompt_tokens", "completion_tokens")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--latency", action="append", default=[], help="MODEL=DIST, see llm_stub_server")
+    parser.add_argument("--ms-per-output-token", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json-out", default=None)
+    args = parser.parse_args()
+
+    with open(args.corpus, "r", encoding="utf-8") as f:
+        conversations = json.load(f)
+
+    results = {}
+    for mode in MODES:
+        llm = SimulatedLLM(parse_latencies(args.latency), args.ms_per_output_token, args.seed)
+        llm_gateway.create = llm.create
+        llm_gateway.stream_chat = llm.stream_chat
+        results[mode] = summarize(asyncio.run(run_mode(mode, conversations, args.turns, llm)))
+
+    print("=" * 78)
+    print("REASONING MODE: split (Fact Extraction + Diagnostician) vs fused (Reasoning)")
+    print("=" * 78)
+    print(f"Corpus: {os.path.basename(args.corpus)} ({len(conversations)} conversations x {args.turns} turns)")
+    columns = ["latency_mean_ms", "latency_p50_ms", "latency_p95_ms", "calls", "prompt_tokens", "completion_tokens"]
+    print(f"{'per turn':<20}" + "".join(f"{mode:>12}" for mode in MODES) + f"{'fused/split':>14}")
+    for column in columns:
+        split, fused = results["split"][column], results["fused"][column]
+        ratio = f"{fused / split:.2f}x" if split else "-"
+        print(f"{column:<20}{split:>12}{fused:>12}{ratio:>14}")
+    print("=" * 78)
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"turns": args.turns, "conversations": len(conversations), "modes": results}, f, indent=2)
+        print(f"Wrote {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Replays the triage conversation corpus through protocol retrieval and compares
+per-turn latency of:
+  - single: the previous path, decision rules queried with the last message only (n_results=3)
+  - multi:  retrieval_node (fact/differential/message queries, one ONNX batch,
+            both collections, dedupe + rerank, retrieval cache)
+
+Usage (from backend/):
+    python -m benchmarks.retrieval_benchmark [--rules decision_rules_v2] [--summaries protocol_summaries_v2]
+
+Facts and differential are taken from the corpus annotations and lag one turn behind,
+as they do in the graph (retrieval runs in parallel with fact extraction).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.agent.nodes import retrieval
+from app.agent.retrieval_cache import RetrievalCache
+from app.core.container import container
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "triage_conversations.json")
+
+
+def replay_states(conversations):
+    """Yields the retrieval input state for every turn of the corpus."""
+    for conv in conversations:
+        messages, facts = [], {}
+        previous_protocols = None
+        for turn_idx, turn in enumerate(conv["turns"]):
+            if turn.get("ai"):
+                messages.append(AIMessage(content=turn["ai"]))
+            messages.append(HumanMessage(content=turn["user"]))
+            state = {
+                "messages": list(messages),
+                "investigated_facts": dict(facts),
+                "differential_diagnosis": conv.get("differential", []) if turn_idx > 0 else [],
+                "retrieved_protocols": previous_protocols,
+            }
+            yield conv["id"], turn, state
+            facts.update(turn.get("new_facts", {}))
+            previous_protocols = state.get("_result")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def summarize(label, timings):
+    ms = [t * 1000 for t in timings]
+    print(f"{label:<8} mean {statistics.mean(ms):7.2f} ms | p50 {percentile(ms, 50):7.2f} ms | p95 {percentile(ms, 95):7.2f} ms | total {sum(ms):8.1f} ms")
+
+
+def run(corpus_path=DEFAULT_CORPUS, rules_name="decision_rules_v2", summaries_name="protocol_summaries_v2"):
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        conversations = json.load(f)
+
+    # Queries are embedded by the node's ONNX function, so the persisted one is not needed here
+    chroma_client = container.get("chroma_client")
+    rules = chroma_client.get_collection(rules_name)
+    summaries = chroma_client.get_collection(summaries_name)
+    container.override("col_rules", rules)
+    container.override("col_summaries", summaries)
+
+    # Load the ONNX model before timing anything
+    ef = container.get("embedding_function")
+    ef(["warm up"])
+
+    # --- Previous single-query path ---
+    single_times = []
+    for _, turn, _ in replay_states(conversations):
+        t0 = time.perf_counter()
+        rules.query(query_embeddings=ef([turn["user"]]), n_results=3)
+        single_times.append(time.perf_counter() - t0)
+
+    # --- Multi-query path (cold cache) ---
+    container.override("retrieval_cache", RetrievalCache(ef))
+    multi_times, query_counts = [], []
+    for _, _, state in replay_states(conversations):
+        query_counts.append(len(retrieval.build_queries(state)))
+        t0 = time.perf_counter()
+        result = retrieval.retrieval_node(state)
+        multi_times.append(time.perf_counter() - t0)
+        state["_result"] = result["retrieved_protocols"]
+
+    print("=" * 72)
+    print("PROTOCOL RETRIEVAL BENCHMARK")
+    print("=" * 72)
+    print(f"Corpus:       {os.path.basename(corpus_path)} ({len(conversations)} conversations, {len(single_times)} turns)")
+    print(f"Collections:  {rules_name} ({rules.count()} docs), {summaries_name} ({summaries.count()} docs)")
+    print(f"Queries/turn: {statistics.mean(query_counts):.2f} (multi)")
+    summarize("single", single_times)
+    summarize("multi", multi_times)
+    print(f"Cache:        {retrieval.retrieval_cache.stats()}")
+    return {"single": single_times, "multi": multi_times}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS)
+    parser.add_argument("--rules", default="decision_rules_v2")
+    parser.add_argument("--summaries", default="protocol_summaries_v2")
+    args = parser.parse_args()
+    run(args.corpus, args.rules, args.summaries)
@@ -1,4 +1,7 @@
 
+import time
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from pydantic import BaseModel
 from typing import List, Optional
@@ -18,28 +21,45 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Root "http" span of every request (see app/core/tracing.py)
+from app.core.tracing import tracer, TracingMiddleware
+app.add_middleware(TracingMiddleware, tracer=tracer)
+
 @app.get("/")
 async def root():
     return {"status": "ok", "message": "Agentic Doctor Backend Running"}
 
-from chromadb.utils import embedding_functions
+from app.core.container import container
+from app.core.loop_monitor import loop_monitor
 
 @app.on_event("startup")
 async def startup_event():
-    print("STARTUP: Pre-loading ChromaDB Embedding Model (FastEmbed)...")
-    try:
-        # Load lightweight FastEmbed model (uses ONNX, no PyTorch)
-        # It downloads a small ~22MB quantized model automatically
-        from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
-        ef = ONNXMiniLM_L6_V2()
-        ef(["test"])
-        print("STARTUP: FastEmbed Model loaded successfully.")
-    except Exception as e:
-        print(f"STARTUP WARNING: FastEmbed load failed: {e}")
+    loop_monitor.start()
+    # Heavy clients (Chroma, ONNX model, collections, Firebase) are created once here,
+    # off the event loop, instead of at import. See app/core/container.py.
+    warm_up = settings.STARTUP_WARM_UP.strip().lower()
+    if warm_up == "none":
+        print("STARTUP: Warm-up disabled, components will be created on first use.")
+        return
+    names = None if warm_up == "all" else [n.strip() for n in warm_up.split(",") if n.strip()]
+    print("STARTUP: Warming up shared components...")
+    report = await asyncio.to_thread(container.warm_up, names)
+    print(f"STARTUP: Components ready in {report['total_init_ms']} ms")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await loop_monitor.stop()
+    # Release pooled LLM connections
+    await llm_gateway.aclose()
 async def root():
     return {"status": "ok", "message": "Agentic Doctor Backend Running"}
 
 from datetime import datetime
+import asyncio
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from app.core.llm_gateway import llm_gateway, clean_json, JsonFieldStreamer
+from app.core.config import settings
+from app.core.translation_memory import translation_memory, join_plan, split_segments
 
 class ChatRequest(BaseModel):
     message: str
@@ -54,6 +74,170 @@ class ChatResponse(BaseModel):
     detected_language: Optional[str] = None
     summary_payload: Optional[dict] = None
 
+# --- Chat language helpers (shared by /chat and /chat/stream) ---
+TRANSLATION_MODEL = "openai/gpt-oss-120b"
+
+@tracer.traced("translation")
+async def detect_language(message: str) -> Optional[str]:
+    """Returns the detected language if it is not English, else None."""
+    try:
+        detect_prompt = f"""
+        Detect the language of this text. Return JSON with key 'language'.
+        TEXT: "{message}"
+        """
+        detect_result = await llm_gateway.chat_json(
+            TRANSLATION_MODEL,
+            [{"role": "user", "content": detect_prompt}],
+            response_format={"type": "json_object"},
+            temperature=0
+        )
+        detected = detect_result.get("language", "English")
+        if detected != "English":
+            return detected
+    except Exception as e:
+        print(f"Auto-detect Error: {e}")
+        # Keep target_lang as is (English/Auto) on error
+    return None
+
+def start_language_detection(req: ChatRequest) -> Optional[asyncio.Task]:
+    """
+    Auto-detect only runs when no explicit target language is given. It does not
+    depend on the graph output, so it is started alongside the graph run.
+    """
+    if req.target_language == "Auto" or req.target_language == "English":  # [MODIFIED] Check even if English
+        return asyncio.create_task(detect_language(req.message))
+    return None
+
+async def resolve_target_language(req: ChatRequest, detect_task: Optional[asyncio.Task]):
+    """Returns (target_lang, detected_lang_out) once detection (if any) has finished."""
+    if detect_task is None:
+        return req.target_language, None
+    detected = await detect_task
+    if detected:
+        return detected, detected
+    return req.target_language, None
+
+def needs_translation(target_lang: Optional[str]) -> bool:
+    return bool(target_lang) and target_lang != "English" and target_lang != "Auto"
+
+def _translation_prompt(text: str, target_lang: str) -> str:
+    return f"""
+    Translate this medical response to {target_lang}.
+    Return JSON with key 'translation' only.
+    
+    TEXT: "{text}"
+    """
+
+async def translate_segments(segments: List[str], target_lang: str) -> List[str]:
+    """Model call for the segments missing from the translation memory."""
+    if len(segments) == 1:
+        translation = await llm_gateway.chat_json(
+            TRANSLATION_MODEL,
+            [{"role": "user", "content": _translation_prompt(segments[0], target_lang)}],
+            response_format={"type": "json_object"},
+            temperature=0
+        )
+        return [translation["translation"]]
+    prompt = f"""
+    Translate each item of this JSON list of medical response paragraphs to {target_lang}.
+    Keep the markdown formatting and the order.
+    Return JSON with key 'translations' only: a list with exactly {len(segments)} strings.
+
+    ITEMS: {json.dumps(segments, ensure_ascii=False)}
+    """
+    translation = await llm_gateway.chat_json(
+        TRANSLATION_MODEL,
+        [{"role": "user", "content": prompt}],
+        response_format={"type": "json_object"},
+        temperature=0
+    )
+    return translation["translations"]
+
+@tracer.traced("translation")
+async def translate_response(text: str, target_lang: str) -> str:
+    try:
+        return await translation_memory.translate(text, target_lang, translate_segments)
+    except Exception as e:
+        print(f"Translation Error in Chat: {e}")
+        # Fallback to English
+        return text
+
+async def stream_translated_response(text: str, target_lang: str):
+    """
+    Streams the translation as it is generated. Yields ("token", str) deltas and
+    finally ("done", full_translation). JSON mode is not used here because it cannot
+    be combined with streaming; the 'translation' field is extracted incrementally.
+    Segments found in the translation memory are emitted directly; each run of
+    consecutive unknown segments is streamed from the model and then remembered.
+    """
+    try:
+        # SQLite (shared WAL file) off the event loop, as in /translate_text
+        plan = await asyncio.to_thread(translation_memory.plan, text, target_lang)
+        parts = []
+        i = 0
+        while i < len(plan):
+            if plan[i]["translation"] is not None:
+                parts.append(join_plan([plan[i]]))
+                yield "token", parts[-1]
+                i += 1
+                continue
+
+            run_end = i
+            while run_end < len(plan) and plan[run_end]["translation"] is None:
+                run_end += 1
+            run = plan[i:run_end]
+            run_text = "".join(p["source"] + p["separator"] for p in run[:-1]) + run[-1]["source"]
+            leading = run_text[: len(run_text) - len(run_text.lstrip())]
+            trailing = run_text[len(run_text.rstrip()):] + run[-1]["separator"]
+
+            field = JsonFieldStreamer("translation")
+            chunks = []
+            translation_memory.counters["model_calls"] += 1
+            if leading:
+                yield "token", leading
+            async for delta in llm_gateway.stream_chat(
+                TRANSLATION_MODEL,
+                [{"role": "user", "content": _translation_prompt(run_text.strip(), target_lang)}],
+                temperature=0
+            ):
+                chunks.append(delta)
+                piece = field.feed(delta)
+                if piece:
+                    yield "token", piece
+            translation = json.loads(clean_json("".join(chunks)))["translation"]
+            if trailing:
+                yield "token", trailing
+            parts.append(f"{leading}{translation}{trailing}")
+
+            # Remember the run segment by segment when the paragraph structure survived
+            translated = [segment for segment, _ in split_segments(translation.strip())]
+            if len(translated) == len(run):
+                await asyncio.to_thread(translation_memory.put_many, {p["key"]: t for p, t in zip(run, translated)}, target_lang)
+            i = run_end
+        yield "done", "".join(parts)
+    except Exception as e:
+        print(f"Translation Error in Chat Stream: {e}")
+        # Fallback to English
+        yield "done", text
+
+def build_initial_state(req: ChatRequest) -> dict:
+    # [FIX] Pass case_id and profile_id to state
+    return {
+        "messages": [HumanMessage(content=req.message)],
+        "case_id": req.case_id,
+        "profile_id": req.profile_id,
+        "user_id": req.profile_id, # Fallback/Assumption for user_id too if needed
+        "session_id": req.session_id
+    }
+
+def _log_chat_call(req: ChatRequest, endpoint: str):
+    # Safe logging to prevent encoding crashes on Windows
+    try:
+        safe_msg = req.message[:20].encode('utf-8', 'ignore').decode('utf-8')
+        print(f"DEBUG: {endpoint} called. Target: '{req.target_language}', Message: '{safe_msg}...'", flush=True)
+    except Exception as log_err:
+        print(f"DEBUG: {endpoint} called (logging failed: {log_err})", flush=True)
+
 # Add explicit OPTIONS handler for CORS preflight
 @app.options("/chat")
 async def chat_options():
@@ -61,75 +245,22 @@ async def chat_options():
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(req: ChatRequest):
-    # Safe logging to prevent encoding crashes on Windows
-    try:
-        safe_msg = req.message[:20].encode('utf-8', 'ignore').decode('utf-8')
-        print(f"DEBUG: Chat endpoint called. Target: '{req.target_language}', Message: '{safe_msg}...'", flush=True)
-    except Exception as log_err:
-        print(f"DEBUG: Chat endpoint called (logging failed: {log_err})", flush=True)
+    _log_chat_call(req, "Chat endpoint")
+    detect_task = None
     try:
         config = {"configurable": {"thread_id": req.session_id}}
         
-        # Invoke Graph
-        # [FIX] Pass case_id and profile_id to state
-        initial_state = {
-            "messages": [HumanMessage(content=req.message)],
-            "case_id": req.case_id,
-            "profile_id": req.profile_id,
-            "user_id": req.profile_id, # Fallback/Assumption for user_id too if needed
-            "session_id": req.session_id
-        }
-        
-        result = await agent_graph.ainvoke(initial_state, config=config)
+        # Language detection runs concurrently with the graph
+        detect_task = start_language_detection(req)
+        result = await agent_graph.ainvoke(build_initial_state(req), config=config)
         
         raw_response = result.get("final_response", "Error generating response.")
         final_response = raw_response
         
         # Output Translation Logic
-        target_lang = req.target_language
-        detected_lang_out = None
-        
-        # logic for Auto-detect: Detect language from input message if not specified
-        if target_lang == "Auto" or target_lang == "English":  # [MODIFIED] Check even if English
-            try:
-                detect_prompt = f"""
-                Detect the language of this text. Return JSON with key 'language'.
-                TEXT: "{req.message}"
-                """
-                detect_completion = client.chat.completions.create(
-                    model="openai/gpt-oss-120b",
-                    messages=[{"role": "user", "content": detect_prompt}],
-                    response_format={"type": "json_object"},
-                    temperature=0
-                )
-                detected = json.loads(detect_completion.choices[0].message.content).get("language", "English")
-                if detected != "English":
-                    target_lang = detected
-                    detected_lang_out = detected
-            except Exception as e:
-                print(f"Auto-detect Error: {e}")
-                # Keep target_lang as is (English/Auto) on error
-
-        # Perform Translation if needed
-        if target_lang and target_lang != "English" and target_lang != "Auto":
-            try:
-                prompt = f"""
-                Translate this medical response to {target_lang}.
-                Return JSON with key 'translation' only.
-                
-                TEXT: "{raw_response}"
-                """
-                completion = client.chat.completions.create(
-                    model="openai/gpt-oss-120b",
-                    messages=[{"role": "user", "content": prompt}],
-                    response_format={"type": "json_object"},
-                    temperature=0
-                )
-                final_response = json.loads(completion.choices[0].message.content)["translation"]
-            except Exception as e:
-                print(f"Translation Error in Chat: {e}")
-                # Fallback to English
-                pass
+        target_lang, detected_lang_out = await resolve_target_language(req, detect_task)
+        if needs_translation(target_lang):
+            final_response = await translate_response(raw_response, target_lang)
 
         return ChatResponse(
             response=final_response,
@@ -139,20 +270,89 @@ async def chat_endpoint(req: ChatRequest):
         )
             
     except Exception as e:
+        if detect_task is not None:
+            detect_task.cancel()
         print(f"Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(req: ChatRequest):
+    """
+    Server-sent events version of /chat.
+    Events:
+      start  - sent immediately
+      node   - {"node": name} as each graph node completes
+      token  - {"text": delta} strategist question/summary text, or the translation when translating
+      final  - the same payload /chat returns
+      error  - {"detail": str}
+    """
+    _log_chat_call(req, "Chat stream endpoint")
+    config = {"configurable": {"thread_id": req.session_id}}
+
+    async def event_stream():
+        yield _sse("start", {"session_id": req.session_id})
+        detect_task = start_language_detection(req)
+        stream_tokens = None  # decided on the first token, once the output language is known
+        try:
+            async for mode, payload in agent_graph.astream(
+                build_initial_state(req), config=config, stream_mode=["updates", "custom"]
+            ):
+                if mode == "updates":
+                    for node in payload:
+                        yield _sse("node", {"node": node})
+                elif mode == "custom" and payload.get("type") == "token":
+                    if stream_tokens is None:
+                        target_lang, _ = await resolve_target_language(req, detect_task)
+                        stream_tokens = not needs_translation(target_lang)
+                    if stream_tokens:
+                        yield _sse("token", {"text": payload["text"]})
+
+            result = (await agent_graph.aget_state(config)).values
+            raw_response = result.get("final_response", "Error generating response.")
+            final_response = raw_response
+
+            target_lang, detected_lang_out = await resolve_target_language(req, detect_task)
+            if needs_translation(target_lang):
+                async for kind, text in stream_translated_response(raw_response, target_lang):
+                    if kind == "token":
+                        yield _sse("token", {"text": text})
+                    else:
+                        final_response = text
+
+            response = ChatResponse(
+                response=final_response,
+                decision=result.get("triage_decision", "PENDING"),
+                detected_language=detected_lang_out,
+                summary_payload=result.get("full_summary_payload")
+            )
+            yield _sse("final", response.model_dump())
+        except Exception as e:
+            if detect_task is not None:
+                detect_task.cancel()
+            print(f"Error in chat stream: {e}")
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
 
 # --- ADDING MISSING ENDPOINTS ---
 from fastapi import UploadFile, File, Form
-from groq import Groq
 from app.core.config import settings
 import shutil
 import os
 import json
+import sys
+import traceback
 from app.core.prescription_service import analyze_prescription_image
-from app.core.lab_report_service import analyze_lab_report_image
+from app.core.lab_report_service import analyze_lab_report_image, analyze_lab_report_batch
 
 # ISO-639-1 Codes for Whisper
 LANGUAGE_CODES = {
@@ -167,8 +367,6 @@ LANGUAGE_CODES = {
     "English": "en"
 }
 
-client = Groq(api_key=settings.GROQ_API_KEY)
-
 class TranslationRequest(BaseModel):
     message: str
     session_id: str
@@ -177,10 +375,18 @@ class SummaryRequest(BaseModel):
     history: List[dict]
     target_language: str
 
+# Translation memory "language" for /translate_text results ({english_text, detected_language})
+TO_ENGLISH_WITH_DETECTION = "English+detected_language"
+
 @app.post("/translate_text")
 async def translate_text(req: TranslationRequest):
     print(f"DEBUG: Translate Text called. Message: '{req.message[:20]}...'")
     try:
+        # Repeated messages (quick replies, fixed UI strings) come from the translation memory
+        cached = await asyncio.to_thread(translation_memory.get, req.message, TO_ENGLISH_WITH_DETECTION)
+        if cached is not None:
+            return json.loads(cached)
+
         # Detect and Translate to English
         prompt = f"""
         Translate the following medical text to English.
@@ -195,14 +401,15 @@ async def translate_text(req: TranslationRequest):
             "detected_language": "..."
         }}
         """
-        completion = client.chat.completions.create(
-            model="openai/gpt-oss-120b",
-            messages=[{"role": "user", "content": prompt}],
+        res = await llm_gateway.chat_json(
+            "openai/gpt-oss-120b",
+            [{"role": "user", "content": prompt}],
             response_format={"type": "json_object"},
             temperature=0
         )
-        res = json.loads(completion.choices[0].message.content)
         print(f"DEBUG: Translation Result: {res}")
+        if res.get("english_text"):
+            await asyncio.to_thread(translation_memory.put, req.message, TO_ENGLISH_WITH_DETECTION, json.dumps(res, ensure_ascii=False))
         return res
     except Exception as e:
         print(f"Translation Error: {e}")
@@ -237,6 +444,23 @@ async def analyze_lab_report_endpoint(file: UploadFile = File(...)):
         traceback.print_exc(file=sys.stderr)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/analyze_lab_report_batch")
+async def analyze_lab_report_batch_endpoint(files: List[UploadFile] = File(...)):
+    """
+    Analyzes a multi-page lab report (several images and/or PDFs) into one report,
+    with per-page timing.
+    """
+    print(f"DEBUG: Analyze Lab Report Batch called. Files: {[f.filename for f in files]}")
+    uploads = [(f.filename, f.content_type, await f.read()) for f in files]
+    try:
+        return await analyze_lab_report_batch(uploads)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Lab Report Batch Analysis Error: {e}", file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+        raise HTTPException(status_code=500, detail=str(e))
+
 # --- NUTRITION AI ENDPOINTS ---
 from app.core.nutrition_service import analyze_meal_text, get_nutrition_suggestion
 
@@ -284,7 +508,7 @@ async def process_audio(
             
         # Transcribe
         with open(temp_filename, "rb") as file:
-            transcription = client.audio.transcriptions.create(
+            transcription = await llm_gateway.transcribe(
                 file=(temp_filename, file.read()),
                 model="whisper-large-v3",
                 language=LANGUAGE_CODES.get(language_hint, None)
@@ -336,13 +560,12 @@ async def process_audio(
             """
 
         try:
-            completion = client.chat.completions.create(
-                model="openai/gpt-oss-120b",
-                messages=[{"role": "user", "content": prompt}],
+            data = await llm_gateway.chat_json(
+                "openai/gpt-oss-120b",
+                [{"role": "user", "content": prompt}],
                 response_format={"type": "json_object"},
                 temperature=0
             )
-            data = json.loads(completion.choices[0].message.content)
             
             # Unpack based on logic
             repaired_text = data.get("native_text", original_text)
@@ -425,14 +648,12 @@ async def generate_summary(req: SummaryRequest):
         }}
         """
         
-        completion = client.chat.completions.create(
-            model="openai/gpt-oss-120b",
-            messages=[{"role": "user", "content": output_prompt}],
+        res_json = await llm_gateway.chat_json(
+            "openai/gpt-oss-120b",
+            [{"role": "user", "content": output_prompt}],
             response_format={"type": "json_object"},
             temperature=0
         )
-        
-        res_json = json.loads(completion.choices[0].message.content)
         print(f"DEBUG: Full LLM Response Keys: {list(res_json.keys())}")
         print(f"DEBUG: Full LLM Response: {res_json}")
         
@@ -503,6 +724,73 @@ async def init_session_endpoint():
         print(f"Init Session Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/checkpointer_stats")
+async def checkpointer_stats_endpoint():
+    """
+    Conversation-state footprint (sessions, checkpoints, bytes) and eviction counters.
+    """
+    from app.agent.graph import checkpointer
+    try:
+        return await asyncio.to_thread(checkpointer.stats)
+    except Exception as e:
+        print(f"Checkpointer Stats Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/retrieval_stats")
+async def retrieval_stats_endpoint():
+    """
+    Protocol retrieval cache hit rates and the ONNX embedding time they saved.
+    """
+    from app.agent.nodes.retrieval import retrieval_cache
+    return retrieval_cache.stats()
+
+@app.get("/translation_stats")
+async def translation_stats_endpoint():
+    """
+    Translation memory hits / misses and how many segments it holds.
+    """
+    return await asyncio.to_thread(translation_memory.stats)
+
+@app.get("/loop_stats")
+async def loop_stats_endpoint(reset: bool = False):
+    """
+    Event-loop lag percentiles since startup (or the last ?reset=true, which clears them).
+    """
+    stats = loop_monitor.stats()
+    if reset:
+        loop_monitor.reset()
+    return stats
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Prometheus text: latency histograms per traced operation (http, node, llm, onnx,
+    chroma, firestore, translation), LLM token counters and event-loop lag.
+    """
+    loop = loop_monitor.stats()
+    text = tracer.render_prometheus(gauges={
+        "docai_event_loop_lag_p99_ms": ("Event-loop lag p99 since start or last /loop_stats reset.", loop["p99_ms"]),
+        "docai_event_loop_lag_max_ms": ("Event-loop lag max since start or last /loop_stats reset.", loop["max_ms"]),
+    })
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/trace_stats")
+async def trace_stats_endpoint(reset: bool = False):
+    """
+    JSON view of the traced spans (count, errors, mean/max ms per kind and name).
+    """
+    stats = tracer.stats()
+    if reset:
+        tracer.reset()
+    return stats
+
+@app.get("/startup_report")
+async def startup_report_endpoint():
+    """
+    Creation / warm-up time of each shared component and the module import time.
+    """
+    return container.report()
+
 @app.post("/book_appointment")
 async def book_appointment_endpoint(booking_req: dict):
     print(f"DEBUG: book_appointment_endpoint received: {booking_req}", flush=True)
@@ -538,39 +826,36 @@ async def book_appointment_endpoint(booking_req: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 from app.core.firebase import firebase_service
+from app.core.records_service import records_service
+from app.core.dashboard_projection import dashboard_projection
+from app.core.emergency_feed import emergency_feed
+from app.core.doctor_geo_index import doctor_geo_index
+from app.core.availability import availability_service
+from app.core.slot_batch import slot_batch_service
 
 @app.get("/get_records")
-async def get_records_endpoint(patient_id: Optional[str] = None, profile_id: Optional[str] = None, case_id: Optional[str] = None):
+async def get_records_endpoint(
+    patient_id: Optional[str] = None,
+    profile_id: Optional[str] = None,
+    case_id: Optional[str] = None,
+    types: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+):
     """
     Retrieves medical records for a specific profile (V1.0).
-    Aggregates from: Summaries, Prescriptions, Lab Reports.
+    Aggregates from: Summaries, Prescriptions, Lab Reports (all collections queried concurrently).
+    Optional paging: `limit` + `cursor` (the `next_cursor` of the previous page),
+    `types` = comma-separated record types or collection names (e.g. "AI_SUMMARY,lab_reports").
     """
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
     try:
         target_id = profile_id or patient_id
-        
-        # Fetch from multiple V1.0 collections
-        # Fetch from multiple V1.0 collections
-        summaries = firebase_service.get_records("case_ai_patient_summaries", target_id, case_id)
-        doctor_summaries = firebase_service.get_records("case_pre_doctor_summaries", target_id, case_id)
-        legacy_summaries = firebase_service.get_records("pre_doctor_consultation_summaries", target_id, case_id)
-        
-        # [NEW] Fetch Completed Consultation Data
-        case_prescriptions = firebase_service.get_records("case_prescriptions", target_id, case_id)
-        case_remarks = firebase_service.get_records("case_doctor_remarks", target_id, case_id)
-        
-        prescriptions = firebase_service.get_records("prescriptions", target_id, case_id)
-        lab_reports = firebase_service.get_records("lab_reports", target_id, case_id)
-        medication_logs = firebase_service.get_records("medication_logs", target_id, case_id)
-        
-        # Compatibility: Allow fetching old 'medical_records' too if needed, or just merge
-        # For V1.0 migration, we prioritize the new ones.
-        
-        all_records = summaries + doctor_summaries + legacy_summaries + case_prescriptions + case_remarks + prescriptions + lab_reports + medication_logs
-        
-        # Sort by created_at desc
-        all_records.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-        
-        return {"records": all_records}
+        type_filter = types.split(",") if types else None
+        return await records_service.get_records(target_id, case_id, type_filter, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Get Records Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -719,6 +1004,7 @@ async def upload_record_endpoint(record_data: dict):
             rid = firebase_service.save_record("medical_records", new_record)
             if not rid:
                 raise HTTPException(status_code=500, detail="Database Save Failed")
+            dashboard_projection.on_medical_record_saved(rid, new_record)
                 
             return {"status": "success", "record_id": new_record["record_id"]}
     except Exception as e:
@@ -751,7 +1037,13 @@ async def get_location_endpoint(lat: float, lon: float):
 async def get_appointments_endpoint(doctor_id: Optional[str] = None, patient_id: Optional[str] = None, user_id: Optional[str] = None):
     try:
         print(f"DEBUG get_appointments: doctor_id={doctor_id}, patient_id={patient_id}, user_id={user_id}")
-        result = firebase_service.get_appointments(doctor_id, patient_id, user_id)
+        if doctor_id and not (patient_id or user_id):
+            # Doctor dashboard: the projection document (active and recent appointments),
+            # plus the older ones paged from the source collection
+            dashboard = await asyncio.to_thread(dashboard_projection.get_dashboard, doctor_id, False, True)
+            result = dashboard["appointments"]
+        else:
+            result = firebase_service.get_appointments(doctor_id, patient_id, user_id)
         print(f"DEBUG get_appointments: returning {len(result)} appointments")
         return result
     except Exception as e:
@@ -762,123 +1054,103 @@ async def get_appointments_endpoint(doctor_id: Optional[str] = None, patient_id:
 async def get_patients_endpoint(doctor_id: str):
     """
     Retrieves a list of unique patients for a doctor based on their appointments.
+    Served from the doctor's dashboard projection (app/core/dashboard_projection.py), plus the
+    appointments pruned from it, so patients seen only long ago are still listed.
     """
     try:
-        # 1. Get all appointments for this doctor
-        appointments = firebase_service.get_appointments(doctor_id=doctor_id)
-        
-        # 2. Extract Unique Patients
-        patients_map = {}
-        for apt in appointments:
-            # 1. Resolve Patient ID
-            # Priority: profile_id (V1) > patient_snapshot.id > patient_id (Legacy)
-            snapshot = apt.get("patient_snapshot", {})
-            pid = apt.get("profile_id") or snapshot.get("profile_id") or snapshot.get("id") or apt.get("patient_id")
-            
-            if not pid:
-                continue
-                
-            # If already exists, maybe update 'lastVisit' if this apt is newer
-            # For now, just ensure we have the patient details
-            if pid not in patients_map:
-                # 2. Resolve Patient Details
-                name =  apt.get("patient_name") or snapshot.get("name") or "Unknown"
-                age = apt.get("patient_age") or snapshot.get("age") or "?"
-                gender = apt.get("patient_gender") or snapshot.get("gender") or "?"
-                
-                # 3. [FIXED] Calculate Real AI Risk from Severity Score
-                risk_level = "Medium"  # Default fallback
-                condition = apt.get("reason") or "Routine Checkup"
-                
-                case_id = apt.get("case_id")
-                if case_id:
-                    try:
-                        # Query pre_doctor_consultation_summaries by case_id
-                        # [FIX] Correct collection name found via debug
-                        summaries = firebase_service.db.collection("case_pre_doctor_summaries").where("case_id", "==", case_id).limit(1).stream()
-                        
-
-                        
-                        for summary_doc in summaries:
-                            summary_data = summary_doc.to_dict()
-                            
-                            # [FIX] Extract from nested 'assessment' object
-                            assessment = summary_data.get("assessment", {})
-                            severity_score = assessment.get("severity_score", 50)
-                            
-                            # Map severity score to risk level
-                            # High: 70-100, Medium: 40-69, Low: 0-39
-                            if severity_score >= 70:
-                                risk_level = "High"
-                            elif severity_score >= 40:
-                                risk_level = "Medium"
-                            else:
-                                risk_level = "Low"
-                            
-                            # [FIX] Extract symptoms from 'history' object
-                            history = summary_data.get("history", {})
-                            symptoms = history.get("symptoms", [])
-                            if symptoms:
-                                condition = ", ".join(symptoms[:2])  # First 2 symptoms
-                            break  # Only use first summary
-                    except Exception as e:
-                        print(f"Error fetching risk for case {case_id}: {e}")
-                        # Keep default "Medium" risk
-                
-                patients_map[pid] = {
-                    "id": pid,
-                    "name": name,
-                    "age": age,
-                    "gender": gender,
-                    "lastVisit": apt.get("appointment_time") or apt.get("slot_time") or "Recently",
-                    "condition": condition,
-                    "risk": risk_level,  # [FIXED] Now uses real AI risk analysis
-                    "type": "Active",
-                    "status": apt.get("status", "SCHEDULED"),
-                    "caseId": apt.get("case_id"),
-                    "appointmentId": apt.get("id")
-                }
-            else:
-                 # Update status if this appointment is more recent or critical?
-                 if apt.get("status") == "APPOINTMENT_IN_PROGRESS":
-                     patients_map[pid]["status"] = "In Progress"
-        
-        return list(patients_map.values())
+        dashboard = await asyncio.to_thread(dashboard_projection.get_dashboard, doctor_id, False, True)
+        return dashboard["patients"]
 
     except Exception as e:
         print(f"Get Patients Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/doctor_dashboard")
+async def doctor_dashboard_endpoint(doctor_id: str, refresh: bool = False):
+    """
+    Appointments, patients and emergencies of the doctor dashboard in one call.
+    `refresh=true` rebuilds the doctor's projection from the source collections.
+    """
+    try:
+        dashboard, emergencies = await asyncio.gather(
+            asyncio.to_thread(dashboard_projection.get_dashboard, doctor_id, refresh),
+            asyncio.to_thread(dashboard_projection.get_emergencies),
+        )
+        return {**dashboard, "emergencies": emergencies}
+    except Exception as e:
+        print(f"Doctor Dashboard Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/doctor_appointment_history")
+async def doctor_appointment_history_endpoint(doctor_id: str, limit: int = 50, cursor: Optional[str] = None):
+    """
+    Pages through all of a doctor's appointments, newest first by creation time. The dashboard
+    only keeps active and recently ended ones (DASHBOARD_HISTORY_DAYS).
+    """
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+    try:
+        return await asyncio.to_thread(dashboard_projection.get_history, doctor_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Doctor Appointment History Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/debug/firebase_status")
 async def debug_firebase_status():
     """Debug endpoint to check Firebase initialization status"""
-    return {
+    status = {
         "mock_mode": firebase_service.mock_mode,
+        "backend": firebase_service.backend,
         "db_initialized": firebase_service.db is not None
     }
+    if firebase_service.backend == "local":
+        status["local_firestore"] = firebase_service.db.stats()
+    return status
 
 
 
 @app.get("/get_emergencies")
 async def get_emergencies_endpoint():
+    """
+    Active emergencies, read from the shared emergency board of the dashboard projection
+    (one document read, the same in every worker). Doctor portals use /emergencies/stream.
+    """
     try:
-        raw_emergencies = firebase_service.get_emergencies()
-        # [FIX] Force filter in main.py to ensure completed cases are removed
-        emergencies = []
-        for e in raw_emergencies:
-            # Check top-level status or nested appointment status
-            status = e.get("status") or e.get("appointment_details", {}).get("status")
-            if status not in ["CONSULTATION_ENDED", "COMPLETED"]:
-                emergencies.append(e)
-            else:
-                 print(f"DEBUG MAIN: Filtered out {e.get('id')} with status {status}")
-                 
-        return emergencies
+        return await asyncio.to_thread(dashboard_projection.get_emergencies)
     except Exception as e:
         # [FORCE RELOAD 4]
         print(f"Get Emergencies Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/emergencies/stream")
+async def emergencies_stream_endpoint():
+    """
+    Server-sent events feed of active emergencies for doctor portals (replaces polling /get_emergencies).
+    Events:
+      snapshot - {"emergencies": [...]} on connect (and again if the client falls behind)
+      upsert   - a new or updated active emergency
+      remove   - {"id": ...} an emergency that ended
+    A keep-alive comment is sent when idle.
+    """
+    async def event_stream():
+        try:
+            async for event, data in emergency_feed.events():
+                if event == "heartbeat":
+                    yield ": keep-alive\n\n"
+                else:
+                    yield _sse(event, data)
+        except Exception as e:
+            print(f"Emergency Stream Error: {e}")
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
 @app.get("/get_doctors")
 async def get_doctors_endpoint():
@@ -895,14 +1167,26 @@ async def get_doctors_endpoint():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/get_emergency_doctors")
-async def get_emergency_doctors_endpoint(lat: float, lon: float):
+async def get_emergency_doctors_endpoint(
+    lat: float,
+    lon: float,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    radius_km: Optional[float] = None,
+    available_only: bool = False,
+):
     """
     Returns list of doctors sorted by availability and distance.
+    Optional: limit/offset (paging), radius_km, available_only (only doctors with a slot now).
     """
+    if (limit is not None and limit < 1) or offset < 0 or (radius_km is not None and radius_km <= 0):
+        raise HTTPException(status_code=400, detail="Invalid limit, offset or radius_km")
     try:
         print(f"DEBUG: /get_emergency_doctors called with lat={lat}, lon={lon}")
-        doctors = firebase_service.get_doctors_with_availability(lat, lon)
-        return {"doctors": doctors}
+        return await asyncio.to_thread(
+            doctor_geo_index.nearest, lat, lon,
+            limit=limit, offset=offset, radius_km=radius_km, available_only=available_only,
+        )
     except Exception as e:
         print(f"Get Emergency Doctors Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -936,6 +1220,7 @@ async def update_doctor_endpoint(doctor_data: dict):
              raise HTTPException(status_code=400, detail="doctor_id is required")
 
         success = firebase_service.update_doctor(doctor_id, updates)
+        doctor_geo_index.invalidate_doctors()
         if success:
             return {"status": "success", "message": "Doctor profile updated"}
         else:
@@ -952,6 +1237,7 @@ async def update_case_status_endpoint(case_id: str, status: str, background_task
     try:
         print(f"DEBUG: Updating case {case_id} status to {status}")
         result = firebase_service.update_case_status(case_id, status)
+        dashboard_projection.on_case_status(case_id, status)
         
         # [NEW] Trigger Medical History Agent
         if status == "CONSULTATION_ENDED":
@@ -1011,7 +1297,7 @@ async def run_medical_history_agent(case_id: str):
         }
         
         # 5. Invoke Agent
-        output = medical_history_node(state)
+        output = await medical_history_node(state)
         updated_history = output.get("updated_patient_history")
         
         if updated_history:
@@ -1051,6 +1337,7 @@ async def create_slot_endpoint(slot_data: dict):
     try:
         slot_id = firebase_service.create_slot(slot_data)
         if slot_id:
+            availability_service.on_slot_created(slot_id, slot_data)
             return {"status": "success", "slot_id": slot_id}
         else:
             raise HTTPException(status_code=500, detail="Failed to create slot")
@@ -1067,6 +1354,7 @@ async def delete_slot_endpoint(slot_id: str):
     try:
         success = firebase_service.delete_slot(slot_id)
         if success:
+            availability_service.on_slot_deleted(slot_id)
             return {"status": "success", "message": "Slot deleted"}
         else:
             raise HTTPException(status_code=500, detail="Failed to delete slot")
@@ -1083,6 +1371,7 @@ async def delete_slots_for_day_endpoint(doctor_id: str, date: str):
     try:
         success = firebase_service.delete_slots_for_day(doctor_id, date)
         if success:
+            availability_service.on_day_deleted(doctor_id, date)
             return {"status": "success", "message": f"All slots for {date} deleted"}
         else:
             raise HTTPException(status_code=500, detail="Failed to delete slots")
@@ -1099,6 +1388,7 @@ async def delete_all_slots_globally_endpoint():
     try:
         success = firebase_service.delete_all_slots_globally()
         if success:
+            availability_service.on_all_deleted()
             return {"status": "success", "message": "All slots in database deleted"}
         else:
             raise HTTPException(status_code=500, detail="Failed to delete slots")
@@ -1123,26 +1413,40 @@ class BatchSlotRequest(BaseModel):
 @app.post("/create_slots_batch")
 async def create_slots_batch_endpoint(req: BatchSlotRequest):
     """
-    Creates multiple slots based on a schedule.
+    Creates multiple slots based on a schedule (slots overlapping existing ones are skipped).
+    Large schedules are written in the background: the response then has a job_id for
+    /get_slots_batch_job.
     """
     try:
-        count = firebase_service.create_batch_slots(
-            req.doctor_id, 
-            req.start_date, 
-            req.end_date, 
-            req.selected_days, 
-            req.start_time, 
-            req.end_time, 
-            req.break_start, 
-            req.break_end, 
-            req.slot_duration_minutes,
-            req.time_gap_minutes # NEW
+        return await asyncio.to_thread(
+            slot_batch_service.create,
+            req.doctor_id,
+            req.start_date,
+            req.end_date,
+            req.selected_days,
+            req.start_time,
+            req.end_time,
+            req.break_start,
+            req.break_end,
+            slot_duration=req.slot_duration_minutes,
+            time_gap=req.time_gap_minutes,
         )
-        return {"status": "success", "slots_created": count}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Batch Slot Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/get_slots_batch_job")
+async def get_slots_batch_job_endpoint(job_id: str):
+    """
+    Progress of a background /create_slots_batch job (running / completed / partial / failed).
+    """
+    job = slot_batch_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @app.get("/get_slots")
 async def get_slots_endpoint(doctor_id: str, status: Optional[str] = "AVAILABLE"):
     """
@@ -1150,7 +1454,7 @@ async def get_slots_endpoint(doctor_id: str, status: Optional[str] = "AVAILABLE"
     Pass status="ALL" to get booked/expired slots too.
     """
     try:
-        slots = firebase_service.get_doctor_slots(doctor_id, status=status)
+        slots = await asyncio.to_thread(availability_service.get_slots, doctor_id, status)
         return {"slots": slots}
     except Exception as e:
         print(f"Get Slots Error: {e}")
@@ -1169,6 +1473,7 @@ async def update_appointment_status_endpoint(appointment_id: str, status: str):
         success = firebase_service.update_record("appointments", appointment_id, {"status": status})
         
         if success:
+            dashboard_projection.on_appointment_status(appointment_id, status)
             return {"status": "success", "message": "Appointment status updated"}
         else:
             raise HTTPException(status_code=500, detail="Failed to update appointment in Firebase")
@@ -1177,6 +1482,8 @@ async def update_appointment_status_endpoint(appointment_id: str, status: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+container.record("main_import", time.perf_counter() - _import_started, phase="import")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8004, reload=True)
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+from app.core.availability import AvailabilityService, DayTimeline
+
+
+def slot(slot_id, date, start, end, status="AVAILABLE", doctor_id="doc_1"):
+    return {"id": slot_id, "doctor_id": doctor_id, "date": date, "start_time": start, "end_time": end, "status": status}
+
+
+class FakeFirebase:
+    def __init__(self, slots):
+        self.slots = slots
+        self.queries = 0
+
+    def get_doctor_slots(self, doctor_id, status="AVAILABLE"):
+        self.queries += 1
+        return [dict(s) for s in self.slots if s["doctor_id"] == doctor_id and status in ("ALL", s["status"])]
+
+    def get_slots_for_date(self, date, status="AVAILABLE"):
+        self.queries += 1
+        return [dict(s) for s in self.slots if s["date"] == date and status in ("ALL", s["status"])]
+
+    def get_document(self, collection, doc_id):
+        self.queries += 1
+        return next((dict(s) for s in self.slots if s["id"] == doc_id), None)
+
+
+def test_day_timeline_lookups():
+    timeline = DayTimeline([
+        slot("b", "d", "10:00", "10:30"),
+        slot("a", "d", "09:00", "11:00"),  # long slot overlapping the next ones
+        slot("c", "d", "13:00", "13:30"),
+    ])
+    assert timeline.covering("10:45")["id"] == "a"
+    assert timeline.covering("11:00") is None
+    assert timeline.covering("08:59") is None
+    assert timeline.next_after("10:00")["id"] == "c"
+    assert timeline.next_after("13:00") is None
+    assert [s["id"] for s in timeline.starting_between("09:30", "13:00")] == ["b"]
+
+
+def test_queries_are_served_from_memory_after_one_load():
+    firebase = FakeFirebase([
+        slot("s1", "2026-03-02", "09:00", "09:30"),
+        slot("s2", "2026-03-02", "10:00", "10:30"),
+        slot("s3", "2026-03-02", "11:00", "11:30", status="BOOKED"),
+        slot("s4", "2026-03-03", "09:00", "09:30"),
+    ])
+    service = AvailabilityService(firebase)
+    now = datetime(2026, 3, 2, 10, 10)
+
+    assert service.available_now("doc_1", now)["id"] == "s2"
+    assert service.next_free_slot("doc_1", now)["id"] == "s4"
+    assert [s["id"] for s in service.free_slots("doc_1", datetime(2026, 3, 2, 9, 30), datetime(2026, 3, 3, 12))] == ["s2", "s4"]
+    assert [s["id"] for s in service.get_slots("doc_1")] == ["s1", "s2", "s4"]
+    assert len(service.get_slots("doc_1", status="ALL")) == 4
+    assert service.get_slot("s3")["status"] == "BOOKED"
+    assert firebase.queries == 1
+
+
+def test_write_hooks_keep_the_timelines_current():
+    firebase = FakeFirebase([slot("s1", "2026-03-02", "10:00", "10:30")])
+    service = AvailabilityService(firebase)
+    now = datetime(2026, 3, 2, 10, 10)
+    assert service.status("doc_1", now) == (True, None)
+
+    service.on_slot_status("s1", "BOOKED")
+    service.on_slot_created("s2", slot("s2", "2026-03-02", "12:00", "12:30"))
+    assert service.status("doc_1", now) == (False, "12:00")
+    assert service.doctors_available_now(now) == set()
+
+    service.on_slot_created("s3", slot("s3", "2026-03-02", "10:00", "11:00", doctor_id="doc_2"))
+    assert service.doctors_available_now(now) == {"doc_2"}
+    service.on_day_deleted("doc_2", "2026-03-02")
+    service.on_slot_deleted("s2")
+    assert service.doctors_available_now(now) == set()
+    assert service.status("doc_1", now) == (False, None)
+    assert firebase.queries == 1
@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.availability import AvailabilityService
+from app.core.booking_service import SLOT_UNAVAILABLE, BookingService, slot_unavailable_reason
+from app.core.firebase import FirebaseService
+from app.core.local_firestore import LocalFirestore
+
+SLOT = {"doctor_id": "doc_1", "date": "2099-01-01", "start_time": "10:00", "end_time": "10:30", "status": "AVAILABLE"}
+
+
+class FakeFirebase:
+    mock_mode = True
+
+    def __init__(self):
+        self.appointments = []
+        self.slot_updates = []
+        self.cases = {}
+        self._lock = threading.Lock()
+
+    def save_record(self, collection, data):
+        time.sleep(0.001)  # widen the race window
+        with self._lock:
+            self.appointments.append(data)
+            return f"apt_{len(self.appointments)}"
+
+    def update_document(self, collection, doc_id, data):
+        self.slot_updates.append((doc_id, data))
+        return True
+
+    def upsert_document(self, collection, doc_id, data):
+        self.cases.setdefault(doc_id, {}).update(data)
+        return True
+
+    def get_document(self, collection, doc_id):
+        return None
+
+
+def make_service(firebase):
+    availability = AvailabilityService(firebase)
+    availability.on_slot_created("slot_1", SLOT)
+    return BookingService(firebase, availability)
+
+
+def test_hundreds_of_concurrent_bookings_get_one_slot():
+    firebase = FakeFirebase()
+    service = make_service(firebase)
+    start = threading.Barrier(50)
+
+    def book(i):
+        if i < 50:
+            start.wait()
+        return service.book("slot_1", {"profile_id": f"p{i}"}, case_id=f"case_{i}", case_patch={"status": "DOCTOR_ASSIGNED"})
+
+    with ThreadPoolExecutor(max_workers=50) as pool:
+        results = list(pool.map(book, range(300)))
+
+    confirmed = [r for r in results if r["status"] == "confirmed"]
+    assert len(confirmed) == 1
+    assert all(r["reason"] == SLOT_UNAVAILABLE for r in results if r["status"] != "confirmed")
+    assert len(firebase.appointments) == 1 and len(firebase.cases) == 1
+    assert firebase.slot_updates == [("slot_1", {"status": "BOOKED"})]
+    assert service.availability.get_slot("slot_1")["status"] == "BOOKED"
+    assert len(service._slot_locks) == 0
+
+
+@pytest.mark.parametrize("storage", ["memory", "sqlite"])
+def test_hundreds_of_concurrent_bookings_on_the_local_firestore(storage, tmp_path):
+    # The real transactional book_slot; separate services = separate workers (own slot locks)
+    firebase = FirebaseService.__new__(FirebaseService)
+    firebase.mock_mode, firebase.backend = False, "local"
+    firebase.db = LocalFirestore(str(tmp_path / "firestore.sqlite3") if storage == "sqlite" else None)
+    firebase.db.collection("doctor_slots").document("slot_1").set(SLOT)
+    services = [BookingService(firebase, AvailabilityService(firebase)) for _ in range(6)]
+    start = threading.Barrier(50)
+
+    def book(i):
+        if i < 50:
+            start.wait()
+        return services[i % len(services)].book("slot_1", {"profile_id": f"p{i}"}, case_id=f"case_{i}", case_patch={"status": "DOCTOR_ASSIGNED"})
+
+    with ThreadPoolExecutor(max_workers=50) as pool:
+        results = list(pool.map(book, range(300)))
+
+    confirmed = [r for r in results if r["status"] == "confirmed"]
+    assert len(confirmed) == 1
+    assert all(r["reason"] == SLOT_UNAVAILABLE for r in results if r["status"] != "confirmed")
+    assert len(firebase.db.collection("appointments").get()) == 1
+    assert len(firebase.db.collection("cases").get()) == 1
+    slot = firebase.db.collection("doctor_slots").document("slot_1").get().to_dict()
+    assert slot["status"] == "BOOKED" and slot["appointment_id"] == confirmed[0]["appointment_doc_id"]
+
+
+def test_booking_without_slot_and_slot_checks():
+    firebase = FakeFirebase()
+    service = make_service(firebase)
+    assert service.book(None, {"profile_id": "p1"}, case_id="c1", case_patch={"status": "DOCTOR_ASSIGNED"})["status"] == "confirmed"
+    assert service.book("missing", {"profile_id": "p2"})["status"] == "failed"
+    assert slot_unavailable_reason({**SLOT, "date": "2000-01-01"}) == "Selected slot has expired."
+    assert len(firebase.appointments) == 1
+
+
+def test_transaction_rejection_corrects_the_cached_slot():
+    class FirestoreBackend(FakeFirebase):
+        mock_mode = False
+
+        def book_slot(self, slot_id, appointment, case_id=None, case_patch=None, check=None):
+            # Another process booked the slot: the transaction reads it as BOOKED
+            reason = check({**SLOT, "id": slot_id, "status": "BOOKED"})
+            return (None, reason) if reason else ("apt_1", None)
+
+    service = make_service(FirestoreBackend())
+    assert service.book("slot_1", {"profile_id": "p1"}) == {"status": "failed", "reason": SLOT_UNAVAILABLE}
+    assert service.availability.get_slot("slot_1")["status"] == "BOOKED"
@@ -0,0 +1,71 @@
+import asyncio
+import operator
+from typing import Annotated, List, TypedDict
+
+from langgraph.graph import StateGraph, START, END
+
+from app.agent.checkpointer import BoundedMemorySaver, EvictionPolicy, SqliteCheckpointSaver
+
+
+class CounterState(TypedDict, total=False):
+    turns: Annotated[List[str], operator.add]
+
+
+def build(checkpointer):
+    builder = StateGraph(CounterState)
+    builder.add_node("echo", lambda state: {"turns": ["ai"]})
+    builder.add_edge(START, "echo")
+    builder.add_edge("echo", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def test_sqlite_state_is_shared_between_savers(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    worker_a = build(SqliteCheckpointSaver(path))
+    worker_b = build(SqliteCheckpointSaver(path))
+
+    async def run():
+        await worker_a.ainvoke({"turns": ["user-1"]}, config("s1"))
+        return await worker_b.ainvoke({"turns": ["user-2"]}, config("s1"))
+
+    result = asyncio.run(run())
+    assert result["turns"] == ["user-1", "ai", "user-2", "ai"]
+
+
+def test_sqlite_keeps_only_recent_history(tmp_path):
+    saver = SqliteCheckpointSaver(str(tmp_path / "c.sqlite3"), keep_per_thread=3)
+    graph = build(saver)
+    for i in range(5):
+        graph.invoke({"turns": [f"user-{i}"]}, config("s1"))
+    assert saver.stats()["checkpoints"] == 3
+    assert len(graph.get_state(config("s1")).values["turns"]) == 10
+
+
+def test_sqlite_eviction(tmp_path):
+    saver = SqliteCheckpointSaver(str(tmp_path / "c.sqlite3"), EvictionPolicy(max_threads=2, interval_seconds=3600))
+    graph = build(saver)
+    for thread in ("a", "b", "c"):
+        graph.invoke({"turns": ["hi"]}, config(thread))
+    assert saver.evict() == 1
+    assert graph.get_state(config("a")).values == {}
+    assert graph.get_state(config("c")).values["turns"] == ["hi", "ai"]
+
+    saver.policy = EvictionPolicy(ttl_seconds=60)
+    saver._execute("UPDATE threads SET last_access = 0 WHERE thread_id = 'b'")
+    assert saver.evict() == 1
+    assert saver.stats()["threads"] == 1
+
+
+def test_memory_saver_lru_eviction():
+    saver = BoundedMemorySaver(EvictionPolicy(max_threads=2, interval_seconds=0))
+    graph = build(saver)
+    for thread in ("a", "b", "c"):
+        graph.invoke({"turns": ["hi"]}, config(thread))
+    stats = saver.stats()
+    assert stats["threads"] == 2
+    assert stats["eviction"]["evicted_lru"] == 1
+    assert graph.get_state(config("a")).values == {}
@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+from app.core.container import Container
+
+
+def test_components_are_created_once_and_lazily():
+    container = Container()
+    created = []
+    container.register("client", lambda: created.append(1) or object())
+    assert created == []
+
+    threads = [threading.Thread(target=container.get, args=("client",)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert created == [1]
+    assert container.get("client") is container.get("client")
+    assert container.report()["components"]["client"]["phase"] == "on_demand"
+
+
+def test_warm_up_records_timings_and_survives_failures():
+    container = Container()
+    warmed = []
+    container.register("model", lambda: "model", warm=warmed.append)
+    container.register("broken", lambda: 1 / 0)
+
+    report = container.warm_up()
+    assert warmed == ["model"]
+    model = report["components"]["model"]
+    assert model["created"] and model["phase"] == "warm_up"
+    assert "create_ms" in model and "warm_ms" in model
+    assert not report["components"]["broken"]["created"]
+    assert "division by zero" in report["components"]["broken"]["error"]
+
+
+def test_proxy_resolves_on_first_access_and_override():
+    container = Container()
+
+    class Service:
+        mock_mode = True
+
+        def get_doctors(self):
+            return ["doc_1"]
+
+    container.register("firebase", Service)
+    proxy = container.proxy("firebase", spec=Service)
+    # Method lookups (e.g. graph compilation introspecting node globals) do not create it
+    get_doctors = proxy.get_doctors
+    assert not container.is_created("firebase")
+    assert get_doctors() == ["doc_1"]
+    assert container.is_created("firebase")
+    assert proxy.mock_mode is True
+
+    replacement = Service()
+    replacement.mock_mode = False
+    container.override("firebase", replacement)
+    assert proxy.mock_mode is False
+
+    with pytest.raises(KeyError):
+        container.get("missing")
@@ -0,0 +1,98 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.agent.context_window import cap_blocks, estimate_tokens, render_context, update_digest
+from app.agent.nodes import diagnostician, emergency, strategist
+from app.agent.nodes.context import shared_context
+
+QUESTIONS = ["How many days have you had the fever?", "Any rash?", "Any neck stiffness?", "Have you travelled recently?"]
+
+
+def conversation(turns):
+    messages = [HumanMessage(content="I have had fever and body ache")]
+    for i in range(turns):
+        messages.append(AIMessage(content=QUESTIONS[i % len(QUESTIONS)].replace("?", f" (#{i})?")))
+        messages.append(HumanMessage(content=f"answer number {i}, nothing else to add"))
+    return messages
+
+
+def test_digest_is_updated_incrementally():
+    messages = conversation(3)
+    digest = update_digest(None, messages[:3])
+    digest = update_digest(digest, messages)
+    assert digest == update_digest(None, messages)
+    assert digest["chief_complaint"] == "I have had fever and body ache"
+    assert digest["turns"] == 4 and digest["message_count"] == 7
+    assert digest["asked"][0] == "How many days have you had the fever (#0)?"
+
+    summary = messages + [AIMessage(content="Assessment Complete. Rest and fluids.")]
+    assert update_digest(digest, summary)["asked"] == digest["asked"]
+
+
+def test_context_stays_within_budget_however_long_the_chat():
+    facts = {"fever": "Present", "rash": "Denied"}
+    sizes = []
+    for turns in (2, 20, 200):
+        messages = conversation(turns)
+        context = render_context(update_digest(None, messages), facts, messages, 400, ["Viral fever"])
+        sizes.append(estimate_tokens(context))
+        assert '"rash": "Denied"' in context
+        assert messages[-1].content in context
+    assert sizes[0] < sizes[1] <= 420 and sizes[2] <= 420
+
+    # Recent questions that scrolled out of the window are still listed, each once
+    assert "Any neck stiffness (#182)?" in context
+    assert context.count("Any neck stiffness (#198)?") == 1
+
+
+def test_knowledge_blocks_are_capped():
+    blocks = ["a" * 400, "b" * 400, "c" * 400]
+    assert cap_blocks(blocks, 250) == blocks[:2]
+    assert len(cap_blocks(["x" * 4000], 100)[0]) == 400
+
+
+def test_diagnostician_prompt_has_history_once(monkeypatch):
+    prompts = []
+
+    async def fake_invoke(prompt):
+        prompts.append(prompt)
+        return '{"differential_diagnosis": ["Viral fever"], "new_questions_to_add": [], "stop_asking": false}'
+
+    monkeypatch.setattr(diagnostician, "simple_invoke", fake_invoke)
+    messages = conversation(30)
+    state = {"messages": messages, "safety_checklist": ["Any rash?", "Any cough?"], "retrieved_protocols": [], "investigated_facts": {"fever": "Present"}}
+    asyncio.run(diagnostician.diagnostician_node(state))
+    assert prompts[0].count(messages[-1].content) == 1
+    assert estimate_tokens(prompts[0]) < 800
+
+
+def test_final_summary_and_emergency_payload_see_every_fact(monkeypatch):
+    facts = {"chest_pain": "Denied", "neck_stiffness": "Denied"}
+    facts.update({f"detail_{i}": f"answer number {i}, nothing else to add" for i in range(60)})
+    messages = conversation(40) + [HumanMessage(content="I am having chest pain and sweating")]
+    state = {"messages": messages, "investigated_facts": facts, "safety_checklist": []}
+    state["conversation_context"] = shared_context(state)
+    assert '"chest_pain": "Denied"' not in state["conversation_context"]
+
+    prompts = []
+
+    async def fake_stream(model, messages, **kwargs):
+        prompts.append(messages[-1]["content"])
+        yield '{"clinical_guidelines": "Rest", "red_flags_to_watch_out_for": []}'
+
+    async def fake_chat_json(model, messages, **kwargs):
+        prompts.append(messages[-1]["content"])
+        return {"pre_doctor_consultation_summary": {}}
+
+    monkeypatch.setattr(strategist.llm_gateway, "stream_chat", fake_stream)
+    monkeypatch.setattr(emergency.llm_gateway, "chat_json", fake_chat_json)
+    asyncio.run(strategist.strategist_node(state))
+    asyncio.run(emergency.emergency_scan_node(state))
+
+    assert len(prompts) == 2
+    for prompt in prompts:
+        assert '"chest_pain": "Denied"' in prompt and '"detail_59"' in prompt
+        assert prompt.count(messages[-1].content) == 1
+        # Only the recent turns are capped
+        assert "answer number 0, nothing else" not in prompt.split("RECENT TURNS")[1]
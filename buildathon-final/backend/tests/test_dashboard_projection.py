@@ -0,0 +1,199 @@
+from datetime import datetime, timedelta
+
+from app.core.dashboard_projection import (
+    CASE_INDEX_COLLECTION,
+    DASHBOARD_COLLECTION,
+    EMERGENCIES_DOC,
+    DashboardProjection,
+    FirestoreDashboardStore,
+    LocalDashboardStore,
+    deep_merge,
+)
+from app.core.firebase import FirebaseService
+from app.core.local_firestore import DELETE_FIELD, LocalFirestore
+
+
+class FakeFirebase:
+    mock_mode = True
+
+    def __init__(self, appointments=None, summaries=None, emergencies=None):
+        self.appointments = appointments or []
+        self.summaries = summaries or []
+        self.emergencies = emergencies or []
+        self.scans = 0
+
+    def get_appointments(self, doctor_id=None, patient_id=None, user_id=None):
+        self.scans += 1
+        return [dict(a) for a in self.appointments if a.get("doctor_id") == doctor_id]
+
+    def get_records_in(self, collection, field, values):
+        return [s for s in self.summaries if s.get(field) in values]
+
+    def get_emergencies(self):
+        self.scans += 1
+        return list(self.emergencies)
+
+    def get_document(self, collection, doc_id):
+        return next((dict(a) for a in self.appointments if a.get("id") == doc_id), None)
+
+    def get_records_page(self, collection, doctor_id=None, limit=50, after=None, **filters):
+        rows = sorted(
+            (dict(a) for a in self.appointments if a.get("doctor_id") == doctor_id),
+            key=lambda a: (a["created_at"], a["id"]), reverse=True,
+        )
+        return [a for a in rows if after is None or (a["created_at"], a["id"]) < after][:limit]
+
+
+def booking(case_id, profile_id, slot_time, is_emergency=False):
+    return {
+        "case_id": case_id,
+        "profile_id": profile_id,
+        "doctor_id": "doc_1",
+        "status": "SCHEDULED",
+        "is_emergency": is_emergency,
+        "patient_snapshot": {"name": f"Patient {profile_id}", "age": 30, "gender": "F"},
+        "created_at": slot_time,
+        "slot_time": slot_time,
+    }
+
+
+def test_deep_merge_matches_firestore_merge():
+    doc = {"appointments": {"a1": {"status": "SCHEDULED", "slot_time": "t1"}}, "updated_at": "x"}
+    deep_merge(doc, {"appointments": {"a1": {"status": "COMPLETED"}, "a2": {"status": "SCHEDULED"}}, "updated_at": "y"})
+    assert doc == {
+        "appointments": {"a1": {"status": "COMPLETED", "slot_time": "t1"}, "a2": {"status": "SCHEDULED"}},
+        "updated_at": "y",
+    }
+    deep_merge(doc, {"appointments": {"a1": DELETE_FIELD, "a3": DELETE_FIELD}, "new": {"x": DELETE_FIELD}})
+    assert doc["appointments"] == {"a2": {"status": "SCHEDULED"}} and doc["new"] == {}
+
+
+def test_dashboard_is_built_once_then_maintained_by_writes():
+    firebase = FakeFirebase(
+        appointments=[{**booking("c1", "p1", "2026-01-01T09:00"), "id": "a1"}],
+        summaries=[{"case_id": "c1", "assessment": {"severity_score": 20}, "history": {"symptoms": ["cough"]}}],
+    )
+    projection = DashboardProjection(firebase, LocalDashboardStore())
+
+    first = projection.get_dashboard("doc_1")
+    assert firebase.scans == 1
+    assert [p["risk"] for p in first["patients"]] == ["Low"]
+
+    # Summary saved before booking, then the booking: both reach the dashboard without a rescan
+    projection.on_summary_saved("c2", {"assessment": {"severity_score": 85}, "history": {"symptoms": ["chest pain"]}})
+    projection.on_appointment_booked("a2", booking("c2", "p2", "2026-01-02T09:00", is_emergency=True))
+    projection.on_summary_saved("c1", {"assessment": {"severity_score": 75}, "history": {"symptoms": ["fever"]}})
+    projection.on_appointment_status("a1", "APPOINTMENT_IN_PROGRESS")
+
+    dashboard = projection.get_dashboard("doc_1")
+    assert firebase.scans == 1
+    assert [a["id"] for a in dashboard["appointments"]] == ["a2", "a1"]
+    assert dashboard["appointments"][0]["severity"] == "red"
+    assert dashboard["appointments"][0]["patient_name"] == "Patient p2"
+    patients = {p["id"]: p for p in dashboard["patients"]}
+    assert patients["p2"]["risk"] == "High" and patients["p2"]["condition"] == "chest pain"
+    assert patients["p1"]["risk"] == "High" and patients["p1"]["status"] == "APPOINTMENT_IN_PROGRESS"
+
+
+def test_emergency_board_follows_status_changes():
+    firebase = FakeFirebase(emergencies=[{"id": "m1", "case_id": "c9", "created_at": "2026-01-01", "status": None}])
+    projection = DashboardProjection(firebase, LocalDashboardStore())
+
+    assert [e["id"] for e in projection.get_emergencies()] == ["m1"]
+    projection.on_appointment_booked("a5", booking("c5", "p5", "2026-01-03T09:00", is_emergency=True))
+    assert [e["id"] for e in projection.get_emergencies()] == ["a5", "m1"]
+    assert firebase.scans == 1
+
+    projection.on_appointment_status("a5", "CONSULTATION_ENDED")
+    projection.on_case_status("c9", "CONSULTATION_ENDED")
+    assert projection.get_emergencies() == []
+
+
+def test_ended_emergencies_are_deleted_from_the_board():
+    firebase = FirebaseService.__new__(FirebaseService)
+    firebase.mock_mode, firebase.backend, firebase.db = False, "local", LocalFirestore()
+    store = FirestoreDashboardStore(firebase)
+    projection = DashboardProjection(FakeFirebase(), store)
+    projection.get_emergencies()
+
+    for i in range(50):
+        projection.on_appointment_booked(f"a{i}", booking(f"c{i}", f"p{i}", f"2026-01-01T09:{i:02d}", is_emergency=True))
+    for i in range(0, 50, 2):
+        projection.on_appointment_status(f"a{i}", "COMPLETED")
+    for i in range(1, 50, 2):
+        projection.on_case_status(f"c{i}", "CONSULTATION_ENDED")
+
+    board = store.get(DASHBOARD_COLLECTION, EMERGENCIES_DOC)
+    assert board["emergencies"] == {}
+    assert store.get(CASE_INDEX_COLLECTION, "c1")["emergencies"] == {}
+    assert store.get(CASE_INDEX_COLLECTION, "c2")["emergencies"] == {}
+
+
+def test_ended_entries_left_by_older_writes_are_pruned_on_read():
+    store = LocalDashboardStore()
+    store.merge(DASHBOARD_COLLECTION, EMERGENCIES_DOC, {"built_at": "x", "emergencies": {
+        "old": {"id": "old", "status": "COMPLETED"}, "live": {"id": "live", "status": "SCHEDULED"},
+    }})
+    projection = DashboardProjection(FakeFirebase(), store)
+    assert [e["id"] for e in projection.get_emergencies()] == ["live"]
+    assert list(store.get(DASHBOARD_COLLECTION, EMERGENCIES_DOC)["emergencies"]) == ["live"]
+
+
+def test_projection_errors_do_not_fail_the_write():
+    class BrokenStore(LocalDashboardStore):
+        def merge(self, collection, doc_id, patch):
+            raise RuntimeError("unavailable")
+
+    projection = DashboardProjection(FakeFirebase(), BrokenStore())
+    projection.on_appointment_booked("a1", booking("c1", "p1", "2026-01-01T09:00"))
+
+
+def days_ago(days):
+    return (datetime.utcnow() - timedelta(days=days)).isoformat()
+
+
+def test_dashboard_keeps_active_and_recently_ended_appointments():
+    def apt(apt_id, case_id, days, status):
+        return {**booking(case_id, apt_id, days_ago(days)), "id": apt_id, "status": status}
+
+    firebase = FakeFirebase(
+        appointments=[
+            apt("old_done", "c_old", 60, "COMPLETED"),
+            apt("old_open", "c1", 60, "SCHEDULED"),
+            apt("r1", "c1", 1, "COMPLETED"),
+            apt("r2", "c2", 2, "CONSULTATION_ENDED"),
+            apt("r3", "c3", 3, "COMPLETED"),
+        ],
+        summaries=[{"case_id": c, "assessment": {"severity_score": 20}} for c in ("c_old", "c1", "c2", "c3")],
+    )
+    store = LocalDashboardStore()
+    projection = DashboardProjection(firebase, store, history_days=30, max_ended=2)
+
+    dashboard = projection.get_dashboard("doc_1")
+    assert {a["id"] for a in dashboard["appointments"]} == {"old_open", "r1", "r2"}
+
+    # A newly ended appointment pushes the oldest ended one out of the stored document
+    projection.on_appointment_booked("r0", booking("c4", "p4", days_ago(0)))
+    projection.on_appointment_status("r0", "COMPLETED")
+    assert {a["id"] for a in projection.get_dashboard("doc_1")["appointments"]} == {"old_open", "r0", "r1"}
+    doc = store.get(DASHBOARD_COLLECTION, "doc_1")
+    assert set(doc["appointments"]) == {"old_open", "r0", "r1"}
+    assert set(doc["case_risk"]) == {"c1"}
+    assert "doc_1" not in store.get(CASE_INDEX_COLLECTION, "c2")["doctors"]
+    assert firebase.scans == 1
+
+    # /get_appointments and /get_patients still see every appointment and patient
+    full = projection.get_dashboard("doc_1", full_history=True)
+    assert {a["id"] for a in full["appointments"]} == {"old_done", "old_open", "r0", "r1", "r2", "r3"}
+    patients = {p["id"]: p for p in full["patients"]}
+    assert set(patients) == {"old_done", "old_open", "p4", "r1", "r2", "r3"}
+    assert patients["old_done"]["risk"] == "Low" and patients["old_done"]["status"] == "COMPLETED"
+    assert firebase.scans == 1
+
+    # Older history is paged from the source collection
+    first = projection.get_history("doc_1", limit=3)
+    assert [a["id"] for a in first["appointments"]] == ["r1", "r2", "r3"]
+    assert first["appointments"][0]["patient_name"] == "Patient r1"
+    second = projection.get_history("doc_1", limit=3, cursor=first["next_cursor"])
+    assert [a["id"] for a in second["appointments"]] == ["old_open", "old_done"]
+    assert second["next_cursor"] is None
@@ -0,0 +1,113 @@
+import random
+from datetime import datetime
+
+import numpy as np
+
+from app.core.availability import AvailabilityService
+from app.core.doctor_geo_index import DoctorGeoIndex, haversine_km
+
+NOW = datetime(2026, 3, 2, 10, 15)
+
+
+class FakeFirebase:
+    def __init__(self, doctors, slots):
+        self.doctors = doctors
+        self.slots = slots
+        self.doctor_fetches = 0
+        self.slot_fetches = 0
+
+    def get_doctors(self):
+        self.doctor_fetches += 1
+        return [dict(d) for d in self.doctors]
+
+    def get_slots_for_date(self, date, status="AVAILABLE"):
+        self.slot_fetches += 1
+        return [dict(s) for s in self.slots if s["date"] == date and status in ("ALL", s["status"])]
+
+
+def make_index(firebase):
+    return DoctorGeoIndex(firebase, AvailabilityService(firebase))
+
+
+def make_world(n=300, seed=7):
+    rng = random.Random(seed)
+    doctors = [
+        {"id": f"d{i}", "name": f"Dr {i}", "latitude": 28.4 + rng.random() * 0.5, "longitude": 76.9 + rng.random() * 0.5}
+        for i in range(n)
+    ]
+    slots = []
+    for d in doctors:
+        for _ in range(rng.randint(0, 3)):
+            hour = rng.randint(8, 12)
+            slots.append({
+                "id": f"s{len(slots)}", "doctor_id": d["id"], "date": "2026-03-02", "status": "AVAILABLE",
+                "start_time": f"{hour:02d}:00", "end_time": f"{hour:02d}:30",
+            })
+    return doctors, slots
+
+
+def brute_force(doctors, slots, lat, lon):
+    """The ranking the endpoint used before the index."""
+    now = NOW.strftime("%H:%M")
+    ranked = []
+    for d in doctors:
+        own = [s for s in slots if s["doctor_id"] == d["id"]]
+        available = any(s["start_time"] <= now < s["end_time"] for s in own)
+        dist = float(haversine_km(lat, lon, np.array([d["latitude"]]), np.array([d["longitude"]]))[0])
+        ranked.append((not available, dist, d["id"]))
+    ranked.sort()
+    return ranked
+
+
+def test_nearest_matches_full_scan_ranking():
+    doctors, slots = make_world()
+    index = make_index(FakeFirebase(doctors, slots))
+    expected = brute_force(doctors, slots, 28.6, 77.2)
+
+    result = index.nearest(28.6, 77.2, now=NOW)
+    assert result["total"] == len(doctors)
+    assert [d["id"] for d in result["doctors"]] == [r[2] for r in expected]
+    assert [d["is_available_now"] for d in result["doctors"]] == [not r[0] for r in expected]
+
+
+def test_pagination_radius_and_available_only():
+    doctors, slots = make_world()
+    index = make_index(FakeFirebase(doctors, slots))
+    expected = brute_force(doctors, slots, 28.6, 77.2)
+
+    pages, offset = [], 0
+    while offset is not None:
+        page = index.nearest(28.6, 77.2, limit=25, offset=offset, now=NOW)
+        pages += [d["id"] for d in page["doctors"]]
+        offset = page["next_offset"]
+    assert pages == [r[2] for r in expected]
+
+    nearby = index.nearest(28.6, 77.2, radius_km=10, now=NOW)
+    assert [d["id"] for d in nearby["doctors"]] == [r[2] for r in expected if r[1] <= 10]
+
+    available = index.nearest(28.6, 77.2, limit=5, available_only=True, now=NOW)
+    assert [d["id"] for d in available["doctors"]] == [r[2] for r in expected if not r[0]][:5]
+    assert all(d["availableTime"] == "Available Now" for d in available["doctors"])
+
+
+def test_index_follows_slot_writes_without_refetching():
+    doctors = [{"id": "d1", "latitude": 28.6, "longitude": 77.2}, {"id": "d2"}]
+    slots = [{"id": "s1", "doctor_id": "d2", "date": "2026-03-02", "status": "AVAILABLE", "start_time": "11:00", "end_time": "11:30"}]
+    firebase = FakeFirebase(doctors, slots)
+    index = make_index(firebase)
+
+    first = index.nearest(28.6, 77.2, now=NOW)
+    assert [d["availableTime"] for d in first["doctors"]] == ["Next Available: Tomorrow", "Today, 11:00"]
+    index.nearest(28.7, 77.1, now=NOW)
+    assert (firebase.doctor_fetches, firebase.slot_fetches) == (1, 1)
+
+    index.availability.on_slot_created(
+        "s2", {"doctor_id": "d2", "date": "2026-03-02", "status": "AVAILABLE", "start_time": "10:00", "end_time": "10:30"}
+    )
+    result = index.nearest(28.6, 77.2, now=NOW)
+    assert [d["id"] for d in result["doctors"]] == ["d2", "d1"]
+
+    index.availability.on_slot_status("s2", "BOOKED")
+    result = index.nearest(28.6, 77.2, now=NOW)
+    assert [d["id"] for d in result["doctors"]] == ["d1", "d2"]
+    assert (firebase.doctor_fetches, firebase.slot_fetches) == (1, 1)
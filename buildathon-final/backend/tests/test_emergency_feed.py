@@ -0,0 +1,121 @@
+import asyncio
+import threading
+
+from app.core.dashboard_projection import DashboardProjection, LocalDashboardStore
+from app.core.emergency_feed import EmergencyFeed
+
+
+class FakeFirebase:
+    mock_mode = True
+
+    def __init__(self, emergencies):
+        self.emergencies = emergencies
+        self.scans = 0
+
+    def get_emergencies(self):
+        self.scans += 1
+        return list(self.emergencies)
+
+    def get_document(self, collection, doc_id):
+        return None
+
+
+def emergency_booking(case_id):
+    return {
+        "case_id": case_id, "profile_id": "p1", "doctor_id": "doc_1", "status": "SCHEDULED",
+        "is_emergency": True, "patient_snapshot": {"name": "Asha"}, "created_at": "2026-02-01T10:00",
+    }
+
+
+async def next_event(events):
+    return await asyncio.wait_for(events.__anext__(), timeout=2)
+
+
+def test_feed_is_seeded_once_and_pushes_write_path_changes():
+    firebase = FakeFirebase([{"id": "m1", "case_id": "c0", "created_at": "2026-01-01", "status": None}])
+    projection = DashboardProjection(firebase, LocalDashboardStore())
+    feed = EmergencyFeed(projection)
+
+    async def scenario():
+        events = feed.events()
+        event, data = await next_event(events)
+        assert event == "snapshot" and [e["id"] for e in data["emergencies"]] == ["m1"]
+
+        # Writes happen in worker threads (graph nodes, to_thread endpoints)
+        writer = threading.Thread(target=projection.on_appointment_booked, args=("a1", emergency_booking("c1")))
+        writer.start()
+        writer.join()
+        event, data = await next_event(events)
+        assert event == "upsert" and data["id"] == "a1" and data["case_id"] == "c1"
+
+        await asyncio.to_thread(projection.on_summary_saved, "c1", {"assessment": {"severity_score": 90}})
+        event, data = await next_event(events)
+        assert event == "upsert" and data["risk"] == "High"
+
+        await asyncio.to_thread(projection.on_appointment_status, "a1", "CONSULTATION_ENDED")
+        event, data = await next_event(events)
+        assert (event, data) == ("remove", {"id": "a1"})
+
+        await asyncio.to_thread(projection.on_case_status, "c0", "COMPLETED")
+        event, data = await next_event(events)
+        assert (event, data) == ("remove", {"id": "m1"})
+        await events.aclose()
+
+    asyncio.run(scenario())
+    assert firebase.scans == 1
+    assert feed.snapshot() == []
+    assert feed.stats()["subscribers"] == 0
+
+
+def test_slow_subscriber_gets_a_fresh_snapshot():
+    projection = DashboardProjection(FakeFirebase([]), LocalDashboardStore())
+    feed = EmergencyFeed(projection, queue_size=2)
+
+    async def scenario():
+        events = feed.events()
+        assert (await next_event(events))[0] == "snapshot"
+        for i in range(5):
+            projection.on_appointment_booked(f"a{i}", emergency_booking(f"c{i}"))
+        await asyncio.sleep(0.05)
+        event, data = await next_event(events)
+        assert event == "snapshot" and len(data["emergencies"]) == 5
+        await events.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_writes_from_another_worker_arrive_on_resync():
+    # Two workers: separate projections (and listeners) over one shared dashboard store
+    store = LocalDashboardStore()
+    firebase = FakeFirebase([])
+    local = DashboardProjection(firebase, store)
+    other = DashboardProjection(firebase, store)
+    feed = EmergencyFeed(local, heartbeat_seconds=0.05, resync_seconds=0.01)
+
+    async def scenario():
+        events = feed.events()
+        assert (await next_event(events)) == ("snapshot", {"emergencies": []})
+
+        await asyncio.to_thread(other.on_appointment_booked, "a1", emergency_booking("c1"))
+        event, data = await next_event(events)
+        assert event == "upsert" and data["id"] == "a1"
+
+        await asyncio.to_thread(other.on_appointment_status, "a1", "CONSULTATION_ENDED")
+        event, data = await next_event(events)
+        assert (event, data) == ("remove", {"id": "a1"})
+        await events.aclose()
+
+    asyncio.run(scenario())
+    assert local.get_emergencies() == []
+    assert feed.snapshot() == []
+
+
+def test_resync_is_off_when_disabled():
+    store = LocalDashboardStore()
+    firebase = FakeFirebase([])
+    feed = EmergencyFeed(DashboardProjection(firebase, store), resync_seconds=0)
+
+    asyncio.run(feed.ensure_fresh())
+    DashboardProjection(firebase, store).on_appointment_booked("a1", emergency_booking("c1"))
+    asyncio.run(feed.ensure_fresh())
+    assert feed.snapshot() == [] and feed.stats()["seeded"]
@@ -0,0 +1,74 @@
+from app.agent.emergency_matcher import EmergencyMatcher, EMERGENCY, BENIGN, AMBIGUOUS
+
+matcher = EmergencyMatcher()
+
+
+def verdict(user, ai=""):
+    return matcher.classify(user, ai)["verdict"]
+
+
+def test_clear_red_flags_are_deterministic():
+    assert verdict("I am having chest pain and sweating") == EMERGENCY
+    assert verdict("he is unconscious") == EMERGENCY
+    assert verdict("slurred speech since 10 minutes") == EMERGENCY
+    assert verdict("my father suddenly has slurred speech and his face is drooping") == EMERGENCY
+
+
+def test_other_red_flag_matches_go_to_the_llm():
+    # Single words and broad phrases need context: never an instant verdict, never benign
+    assert verdict("my baby had a seizure") == AMBIGUOUS
+    assert verdict("I have chest pain") == AMBIGUOUS
+    for message in [
+        "I cant speak english well",
+        "I cant see the screen clearly, font too small",
+        "I had a seizure as a kid, 10 years ago",
+        "my father had chest pain last year",
+        "fits of sneezing",
+        "I cannot drink milk, lactose intolerant",
+    ]:
+        assert verdict(message) == AMBIGUOUS, message
+
+
+def test_history_and_other_people_guard_acute_phrases():
+    assert verdict("I had the worst headache of my life 5 years ago") == AMBIGUOUS
+    assert verdict("my father had slurred speech") == AMBIGUOUS
+    assert verdict("my grandmother fell and is unconscious") == EMERGENCY
+
+
+def test_negated_red_flags_do_not_trigger():
+    assert verdict("no chest pain") != EMERGENCY
+    assert verdict("I don't have fits") != EMERGENCY
+    assert verdict("no chest pain but fever") == AMBIGUOUS
+
+
+def test_yes_to_red_flag_question():
+    assert verdict("yes", "Is he having a seizure right now?") == EMERGENCY
+    assert verdict("yes", "Do you have chest pain?") == AMBIGUOUS
+    assert verdict("yes", "Have you had chest pain before?") == AMBIGUOUS
+    assert verdict("yes", "Do you have neck stiffness?") == AMBIGUOUS
+
+
+def test_unclear_answers_to_clinical_questions_go_to_the_llm():
+    assert verdict("ok", "Do you feel confused?") == AMBIGUOUS
+    assert verdict("ok", "Assessment Complete.") == BENIGN
+
+
+def test_benign_short_circuit():
+    assert verdict("thanks") == BENIGN
+    assert verdict("2 days", "How long have you had the fever?") == BENIGN
+    assert verdict("no", "Do you have a rash?") == BENIGN
+    assert verdict("ok thank you", "Assessment Complete.") == BENIGN
+
+
+def test_ability_questions_are_never_benign():
+    assert verdict("no", "Is the child able to drink or breastfeed?") == AMBIGUOUS
+
+
+def test_unknown_language_goes_to_llm():
+    assert verdict("मुझे बुखार है") == AMBIGUOUS
+
+
+def test_rules_context_covers_all_categories():
+    assert len(matcher.rules) >= 4
+    for rule in matcher.rules:
+        assert rule["category"] in matcher.rules_context
@@ -0,0 +1,70 @@
+import asyncio
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.core.image_pipeline import AnalysisCache, prepare_image
+
+
+def photo_bytes(width=2400, height=1800, fmt="PNG"):
+    # Noise compresses badly: a worst case for the byte budget
+    pixels = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def test_prepare_image_bounds_resolution_and_size():
+    original = photo_bytes()
+    prepared = prepare_image(original, max_edge=1600, target_bytes=600 * 1024)
+    assert (prepared.width, prepared.height) == (1600, 1200)
+    assert prepared.quality in (85, 75, 65)
+    assert len(prepared.jpeg_bytes) < len(original) / 5
+    assert Image.open(io.BytesIO(prepared.jpeg_bytes)).format == "JPEG"
+    assert prepared.data_url().startswith("data:image/jpeg;base64,")
+
+
+def test_prepare_image_passes_through_undecodable_input():
+    prepared = prepare_image(b"not an image")
+    assert prepared.jpeg_bytes == b"not an image" and prepared.quality is None
+
+
+def test_duplicate_uploads_are_analyzed_once():
+    cache = AnalysisCache(max_items=8, ttl_seconds=60)
+    calls = []
+
+    async def analyze(image_bytes):
+        calls.append(image_bytes)
+        await asyncio.sleep(0.01)
+        return {"tests": [{"name": "Hemoglobin"}]}
+
+    async def main():
+        # Concurrent duplicates share the in-flight analysis, later ones hit the cache
+        first = await asyncio.gather(*[cache.get_or_compute("lab_report", b"img", analyze) for _ in range(5)])
+        again = await cache.get_or_compute("lab_report", b"img", analyze)
+        other_kind = await cache.get_or_compute("prescription", b"img", analyze)
+        return first, again, other_kind
+
+    first, again, _ = asyncio.run(main())
+    assert len(calls) == 2
+    assert all(r == {"tests": [{"name": "Hemoglobin"}]} for r in first + [again])
+    first[0]["tests"].clear()  # callers get their own copy
+    assert asyncio.run(cache.get_or_compute("lab_report", b"img", analyze))["tests"]
+    assert cache.stats()["hits"] == 2 and cache.stats()["shared"] == 4
+
+
+def test_failures_are_not_cached():
+    cache = AnalysisCache(max_items=8, ttl_seconds=60)
+    outcomes = iter([RuntimeError("vision timeout"), {"medicines": []}])
+
+    async def analyze(image_bytes):
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(cache.get_or_compute("prescription", b"img", analyze))
+    assert asyncio.run(cache.get_or_compute("prescription", b"img", analyze)) == {"medicines": []}
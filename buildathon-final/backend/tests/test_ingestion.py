@@ -0,0 +1,66 @@
+import chromadb
+
+from app.core.ingestion import (
+    MANAGEMENT, RED_FLAGS, REFERENCE, RULES_COLLECTION, SUMMARIES_COLLECTION,
+    GuidelineChunker, GuidelineIngestor,
+)
+
+PAGES = [
+    (1, "CONTENTS\n3.1 FEVER 9\n3.2 COUGH 13\n3.3 ANEMIA 20\n3.4 NAUSEA & VOMITING 28\n3.5 DIARRHEA 34"),
+    (2, "3.1 FEVER\nFever is a rise of body temperature above 100F, usually due to infection.\n"
+        "Causes:\nViral infections, malaria, dengue and typhoid are common causes of fever.\n"
+        "What can you do independently:\nGive paracetamol 500 mg and advise plenty of oral fluids and rest."),
+    (3, "When to refer:\nRefer if fever persists for more than 3 days, with neck stiffness or altered sensorium.\n"
+        "3.2 COUGH\nCough is a protective reflex that clears the airways of mucus and irritants."),
+]
+
+
+def chunk_all(pages, max_chars=1200):
+    chunker = GuidelineChunker("guide.pdf", max_chars=max_chars)
+    chunks = [c for n, text in pages for c in chunker.feed_page(n, text)]
+    return chunks + list(chunker.finish())
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.embedded = 0
+
+    def __call__(self, texts):
+        self.embedded += len(texts)
+        return [[float(len(t) % 7), 1.0, 0.5] for t in texts]
+
+
+def test_chunker_splits_by_protocol_and_section():
+    chunks = chunk_all(PAGES)
+    assert [(c.protocol, c.section) for c in chunks] == [
+        ("General Introduction", REFERENCE),  # table of contents; its lines are not headings
+        ("Fever", REFERENCE), ("Fever", MANAGEMENT), ("Fever", RED_FLAGS), ("Cough", REFERENCE),
+    ]
+    assert chunks[2].collection == RULES_COLLECTION and chunks[1].collection == SUMMARIES_COLLECTION
+    assert chunks[3].page == 3
+    assert chunks[1].document.startswith("PROTOCOL: Fever\nSECTION: REFERENCE\nCONTENT:\n")
+
+
+def test_chunker_respects_max_chars():
+    long_page = [(1, "3.1 FEVER\n" + "\n".join(f"Line {i} about fever management at home." for i in range(60)))]
+    chunks = chunk_all(long_page, max_chars=300)
+    assert len(chunks) > 5
+    assert all(len(c.text) <= 300 for c in chunks)
+    assert len({c.id for c in chunks}) == len(chunks)
+
+
+def test_ingestion_is_incremental(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    collections = {name: client.get_or_create_collection(name) for name in (RULES_COLLECTION, SUMMARIES_COLLECTION)}
+
+    embedder = FakeEmbedder()
+    report = GuidelineIngestor(collections, embedder, workers=2, batch_size=2).run(iter(PAGES), "guide.pdf")
+    assert report.embedded == report.chunks == 5
+    assert collections[RULES_COLLECTION].count() == 2
+
+    embedder = FakeEmbedder()
+    edited = PAGES[:2] + [(3, PAGES[2][1].replace("3 days", "2 days").split("3.2 COUGH")[0])]
+    report = GuidelineIngestor(collections, embedder, workers=2, batch_size=2).run(iter(edited), "guide.pdf")
+    assert embedder.embedded == 1  # only the edited red-flag chunk
+    assert report.unchanged == 3 and report.deleted == 1  # Cough chunk removed
+    assert collections[SUMMARIES_COLLECTION].count() == 2
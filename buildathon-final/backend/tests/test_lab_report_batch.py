@@ -0,0 +1,105 @@
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+from app.core import lab_report_service
+from app.core.document_pages import split_document
+from app.core.image_pipeline import AnalysisCache
+
+LAB_TEXT = "Hemoglobin 13.5 g/dL (12.0-15.5) Platelets 250 10^3/uL (150-400) WBC 7.1"
+
+
+def text_pdf(text):
+    """A one-page digital PDF with a text layer."""
+    stream = f"BT /F1 12 Tf 40 800 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out, offsets = io.BytesIO(), []
+    out.write(b"%PDF-1.4\n")
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def image_bytes(color, fmt="PNG"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), color).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def test_split_document_pages():
+    digital = split_document("report.pdf", "application/pdf", text_pdf(LAB_TEXT))
+    assert [p.mode for p in digital] == ["text_layer"] and "Hemoglobin" in digital[0].text
+
+    scanned = split_document("scan.pdf", None, image_bytes("white", fmt="PDF"))
+    assert [p.mode for p in scanned] == ["vision"] and scanned[0].image_bytes
+
+    assert [p.mode for p in split_document("page.jpg", "image/jpeg", image_bytes("red"))] == ["vision"]
+
+
+def test_batch_extracts_pages_concurrently_and_reasons_once(monkeypatch):
+    monkeypatch.setattr(lab_report_service, "analysis_cache", AnalysisCache(max_items=8, ttl_seconds=60))
+    monkeypatch.setattr(lab_report_service.settings, "LAB_REPORT_PAGE_CONCURRENCY", 2)
+    state = {"running": 0, "peak": 0, "vision": 0, "reasoning": []}
+
+    async def extract(image_bytes):
+        state["vision"] += 1
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        await asyncio.sleep(0.02)
+        state["running"] -= 1
+        return f"vision text {len(image_bytes)}"
+
+    async def structure(raw_text, page_count=1):
+        state["reasoning"].append((raw_text, page_count))
+        return {"patient_name": "A", "tests": [], "summary": "ok"}
+
+    monkeypatch.setattr(lab_report_service, "extract_lab_report_text", extract)
+    monkeypatch.setattr(lab_report_service, "structure_lab_report", structure)
+
+    files = [(f"p{i}.png", "image/png", image_bytes((i * 40, 0, 0))) for i in range(4)]
+    files.append(("report.pdf", "application/pdf", text_pdf(LAB_TEXT)))
+    report = asyncio.run(lab_report_service.analyze_lab_report_batch(files))
+
+    assert state["vision"] == 4 and state["peak"] == 2
+    assert len(state["reasoning"]) == 1 and state["reasoning"][0][1] == 5
+    assert "--- Page 5 (report.pdf) ---" in state["reasoning"][0][0]
+    assert [p["mode"] for p in report["pages"]] == ["vision"] * 4 + ["text_layer"]
+    assert report["summary"] == "ok" and report["timing"]["total_seconds"] >= 0
+
+    # Re-uploaded pages are not sent to the vision model again
+    again = asyncio.run(lab_report_service.analyze_lab_report_batch(files[:2]))
+    assert state["vision"] == 4 and all(p["cached"] for p in again["pages"])
+
+
+def test_batch_rejects_too_many_pages(monkeypatch):
+    monkeypatch.setattr(lab_report_service.settings, "LAB_REPORT_MAX_PAGES", 2)
+    files = [(f"p{i}.png", "image/png", image_bytes("red")) for i in range(3)]
+    with pytest.raises(ValueError, match="Too many pages"):
+        asyncio.run(lab_report_service.analyze_lab_report_batch(files))
+
+
+def test_oversized_pdf_is_rejected_before_pages_are_parsed(monkeypatch):
+    from pypdf import PageObject
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError("page content parsed")
+
+    monkeypatch.setattr(PageObject, "extract_text", no_parsing)
+    monkeypatch.setattr(lab_report_service.settings, "LAB_REPORT_MAX_PAGES", 1)
+    files = [("p.png", "image/png", image_bytes("red")), ("report.pdf", "application/pdf", text_pdf(LAB_TEXT))]
+    with pytest.raises(ValueError, match=r"Too many pages \(2\)"):
+        asyncio.run(lab_report_service.analyze_lab_report_batch(files))
@@ -0,0 +1,68 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.core.llm_gateway import LLMGateway, _parse_model_limits
+
+
+class FakeCompletions:
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+
+    async def create(self, model, messages, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        message = SimpleNamespace(content='```json\n{"model": "%s"}\n```' % model)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def make_gateway(**kwargs):
+    gateway = LLMGateway(api_key="test", **kwargs)
+    completions = FakeCompletions()
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    gateway._get_client = lambda: fake_client
+    return gateway, completions
+
+
+def test_parse_model_limits():
+    limits = _parse_model_limits("openai/gpt-oss-120b=4, llama-3.3-70b-versatile=8,bad")
+    assert limits == {"openai/gpt-oss-120b": 4, "llama-3.3-70b-versatile": 8}
+
+
+def test_per_model_concurrency_limit():
+    gateway, completions = make_gateway(default_concurrency=10, model_concurrency={"slow-model": 3})
+
+    async def run():
+        await asyncio.gather(*[gateway.chat("slow-model", []) for _ in range(20)])
+
+    asyncio.run(run())
+    assert completions.peak == 3
+
+
+def test_chat_json_strips_fences():
+    gateway, _ = make_gateway()
+    result = asyncio.run(gateway.chat_json("m", []))
+    assert result == {"model": "m"}
+
+
+def test_each_loop_gets_its_own_pool_closed_at_shutdown():
+    gateway = LLMGateway(api_key="test")
+
+    async def get_client():
+        return gateway._get_client(), gateway._get_client()
+
+    first, same = asyncio.run(get_client())
+    assert first is same
+    assert first.is_closed() and gateway._clients == {}  # closed when asyncio.run shut the loop down
+
+    async def get_and_close():
+        client = gateway._get_client()
+        await gateway.aclose()
+        return client
+
+    second = asyncio.run(get_and_close())
+    assert second is not first and second.is_closed()
+    assert gateway._clients == {} and gateway._closers == {}
@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.availability import AvailabilityService
+from app.core.booking_service import BookingService
+from app.core.firebase import FirebaseService
+from app.core.local_firestore import LocalFirestore, NotFound
+
+SLOT = {"doctor_id": "doc_1", "date": "2099-01-01", "start_time": "10:00", "end_time": "10:30", "status": "AVAILABLE"}
+
+
+def local_service(db=None):
+    service = FirebaseService.__new__(FirebaseService)
+    service.mock_mode, service.backend, service.db = False, "local", db or LocalFirestore()
+    return service
+
+
+def test_queries_and_writes_follow_firestore_semantics():
+    db = LocalFirestore()
+    slots = db.collection("doctor_slots")
+    _, ref = slots.add({**SLOT, "tags": ["video"]})
+    slots.document("s2").set({**SLOT, "start_time": "09:00", "status": "BOOKED"})
+    slots.document("s3").set({"doctor_id": "doc_2", "date": "2099-01-01"})
+
+    query = slots.where("doctor_id", "==", "doc_1").where("status", "==", "AVAILABLE")
+    assert [d.id for d in query.stream()] == [ref.id]
+    assert [d.id for d in slots.where("date", "==", "2099-01-01").order_by("start_time").stream()] == ["s2", ref.id]
+    assert len(slots.where("status", "in", ["BOOKED", "AVAILABLE"]).get()) == 2
+    assert [d.id for d in slots.where("tags", "array-contains", "video").stream()] == [ref.id]
+    assert len(slots.order_by("start_time", direction="DESCENDING").limit(1).get()) == 1
+
+    ref.update({"status": "BOOKED", "meta.by": "p1"})
+    ref.set({"meta": {"at": "now"}}, merge=True)
+    assert ref.get().to_dict()["meta"] == {"by": "p1", "at": "now"}
+    with pytest.raises(NotFound):
+        slots.document("missing").update({"status": "BOOKED"})
+    ref.delete()
+    assert not ref.get().exists
+
+
+def test_batches_are_atomic_and_bounded():
+    db = LocalFirestore()
+    slots = db.collection("doctor_slots")
+    batch = db.batch()
+    batch.set(slots.document("a"), SLOT)
+    batch.update(slots.document("missing"), {"status": "BOOKED"})
+    with pytest.raises(NotFound):
+        batch.commit()
+    assert slots.get() == []
+
+    batch = db.batch()
+    for i in range(500):
+        batch.set(slots.document(), SLOT)
+    with pytest.raises(ValueError):
+        batch.set(slots.document(), SLOT)
+
+
+def test_transactions_retry_on_conflict():
+    db = LocalFirestore(max_attempts=100)
+    counter = db.collection("counters").document("c")
+    counter.set({"value": 0})
+
+    @db.transactional
+    def increment(transaction):
+        value = counter.get(transaction=transaction).to_dict()["value"]
+        time.sleep(0.0005)
+        transaction.update(counter, {"value": value + 1})
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: increment(db.transaction()), range(80)))
+    assert counter.get().to_dict()["value"] == 80
+    assert db.stats()["conflicts"] > 0
+
+
+def test_one_booking_wins_across_workers():
+    firebase = local_service()
+    firebase.db.collection("doctor_slots").document("slot_1").set(SLOT)
+    # Separate services = separate workers: only the transaction protects the slot
+    services = [BookingService(firebase, AvailabilityService(firebase)) for _ in range(4)]
+    start = threading.Barrier(40)
+
+    def book(i):
+        start.wait()
+        return services[i % 4].book("slot_1", {"profile_id": f"p{i}"}, case_id=f"case_{i}", case_patch={"status": "DOCTOR_ASSIGNED"})
+
+    with ThreadPoolExecutor(max_workers=40) as pool:
+        results = list(pool.map(book, range(40)))
+
+    confirmed = [r for r in results if r["status"] == "confirmed"]
+    assert len(confirmed) == 1
+    assert len(firebase.db.collection("appointments").get()) == 1
+    assert firebase.get_document("doctor_slots", "slot_1")["appointment_id"] == confirmed[0]["appointment_doc_id"]
+
+
+def test_sqlite_storage_persists_and_latency_is_injected(tmp_path):
+    path = str(tmp_path / "firestore.sqlite3")
+    firebase = local_service(LocalFirestore(path))
+    record_id = firebase.save_record("medical_records", {"case_id": "c1", "type": "AI_SUMMARY"})
+
+    slow = LocalFirestore(path, latency_ms=20)
+    started = time.perf_counter()
+    assert local_service(slow).get_records("medical_records", case_id="c1")[0]["id"] == record_id
+    assert time.perf_counter() - started >= 0.018
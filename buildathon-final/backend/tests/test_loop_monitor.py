@@ -0,0 +1,49 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.loop_monitor import LoopLagMonitor
+from benchmarks.llm_stub_server import LatencyDistribution, create_app, parse_latencies
+
+
+def test_blocking_call_shows_up_as_lag():
+    monitor = LoopLagMonitor(interval_ms=10)
+
+    async def scenario():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)  # blocks the loop, like sync I/O inside a handler
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(scenario())
+    stats = monitor.stats()
+    assert stats["samples"] >= 3
+    assert stats["max_ms"] >= 150
+    assert not stats["running"]
+
+
+def test_latency_specs():
+    latencies = parse_latencies(["default=fixed:5", "openai/gpt-oss-120b=uniform:1:2"])
+    assert latencies["default"].spec == "fixed:5"
+    assert latencies["llama-3.3-70b-versatile"].kind == "lognormal"
+    with pytest.raises(ValueError):
+        LatencyDistribution("lognormal:900")
+
+
+def test_stub_answers_the_triage_prompts_with_json():
+    client = TestClient(create_app(parse_latencies(["default=fixed:0", "openai/gpt-oss-120b=fixed:0", "llama-3.3-70b-versatile=fixed:0"])))
+    prompt = 'You are a Clinical Fact Extractor.\nUSER ANSWERED: "fever for three days"\n'
+    body = {"model": "openai/gpt-oss-120b", "messages": [{"role": "user", "content": prompt}]}
+
+    reply = client.post("/openai/v1/chat/completions", json=body).json()
+    assert json.loads(reply["choices"][0]["message"]["content"]) == {"fever_for_three": "fever for three days"}
+
+    streamed = client.post("/openai/v1/chat/completions", json={**body, "stream": True}).text
+    chunks = [json.loads(line[6:]) for line in streamed.splitlines() if line.startswith("data: {")]
+    content = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks)
+    assert json.loads(content) == {"fever_for_three": "fever for three days"}
+    assert client.get("/stats").json()["by_kind"] == {"fact_extraction": 2}
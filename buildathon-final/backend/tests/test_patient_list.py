@@ -0,0 +1,103 @@
+from app.core.patient_list import build_patient_list, risk_from_severity
+
+
+class FakeFirebase:
+    def __init__(self, summaries):
+        self.summaries = summaries
+        self.calls = []
+
+    def get_records_in(self, collection, field, values):
+        self.calls.append((collection, field, list(values)))
+        return [s for s in self.summaries if s.get(field) in values]
+
+
+def make_appointments(n):
+    return [
+        {"id": f"apt_{i}", "profile_id": f"p{i}", "case_id": f"c{i}", "patient_name": f"Patient {i}", "status": "SCHEDULED"}
+        for i in range(n)
+    ]
+
+
+def test_summaries_are_fetched_once_for_all_patients():
+    appointments = make_appointments(300)
+    summaries = [
+        {"case_id": f"c{i}", "assessment": {"severity_score": 80 if i % 2 else 20}, "history": {"symptoms": ["fever", "cough", "rash"]}}
+        for i in range(0, 300, 3)
+    ]
+    firebase = FakeFirebase(summaries)
+    patients = build_patient_list(appointments, firebase)
+
+    assert len(firebase.calls) == 1
+    assert len(firebase.calls[0][2]) == 300
+    assert len(patients) == 300
+    assert patients[0]["risk"] == "Low" and patients[0]["condition"] == "fever, cough"
+    assert patients[3]["risk"] == "High"
+    assert patients[1]["risk"] == "Medium" and patients[1]["condition"] == "Routine Checkup"
+
+
+def test_patients_are_deduplicated_and_in_progress_is_flagged():
+    appointments = [
+        {"id": "a1", "profile_id": "p1", "case_id": "c1", "reason": "Headache", "status": "SCHEDULED"},
+        {"id": "a2", "patient_snapshot": {"id": "p1"}, "status": "APPOINTMENT_IN_PROGRESS"},
+        {"id": "a3", "patient_id": "p2"},
+        {"id": "a4"},
+    ]
+    firebase = FakeFirebase([])
+    patients = build_patient_list(appointments, firebase)
+
+    assert [p["id"] for p in patients] == ["p1", "p2"]
+    assert patients[0]["status"] == "In Progress"
+    assert patients[0]["condition"] == "Headache"
+    assert firebase.calls[0][2] == ["c1"]
+
+
+def test_known_case_risks_are_not_fetched_again():
+    appointments = make_appointments(3)
+    firebase = FakeFirebase([{"case_id": "c2", "assessment": {"severity_score": 90}}])
+    patients = build_patient_list(appointments, firebase, {"c0": ("High", "chest pain"), "c1": ("Low", None)})
+
+    assert firebase.calls == [("case_pre_doctor_summaries", "case_id", ["c2"])]
+    assert [p["risk"] for p in patients] == ["High", "Low", "High"]
+    assert patients[0]["condition"] == "chest pain"
+
+
+def test_risk_from_severity():
+    assert [risk_from_severity(s) for s in (95, 70, 69, 40, 39, "bad")] == ["High", "High", "Medium", "Medium", "Low", "Medium"]
+
+
+def test_get_records_in_chunks_in_queries():
+    from app.core.firebase import FirebaseService
+
+    class Doc:
+        def __init__(self, i):
+            self.id = f"s{i}"
+            self._data = {"case_id": f"c{i}"}
+
+        def to_dict(self):
+            return dict(self._data)
+
+    class Query:
+        def __init__(self, db):
+            self.db = db
+
+        def where(self, field, op, values):
+            assert op == "in" and len(values) <= 30
+            self.db.queries.append(list(values))
+            self.values = values
+            return self
+
+        def stream(self):
+            return [Doc(v[1:]) for v in self.values]
+
+    class DB:
+        queries = []
+
+        def collection(self, name):
+            return Query(self)
+
+    service = FirebaseService.__new__(FirebaseService)
+    service.mock_mode, service.db = False, DB()
+    records = service.get_records_in("case_pre_doctor_summaries", "case_id", [f"c{i}" for i in range(65)] + ["c0", None])
+
+    assert [len(q) for q in service.db.queries] == [30, 30, 5]
+    assert sorted(r["case_id"] for r in records) == sorted(f"c{i}" for i in range(65))
@@ -0,0 +1,86 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.agent import graph
+from app.agent.nodes import reasoning
+
+
+def fake_chat(replies, prompts):
+    async def chat(model, messages, **kwargs):
+        prompts.append(messages[0]["content"])
+        return replies.pop(0)
+    return chat
+
+
+def test_fused_follow_up_merges_facts_and_dedupes_questions(monkeypatch):
+    prompts = []
+    reply = '{"new_facts": {"rash": "Denied"}, "differential_diagnosis": ["Dengue"], "new_questions": ["Any rash?", "Any bleeding gums?"], "stop_asking": false}'
+    monkeypatch.setattr(reasoning.llm_gateway, "chat", fake_chat([reply], prompts))
+    state = {
+        "messages": [HumanMessage(content="I have fever"), AIMessage(content="Any rash?"), HumanMessage(content="No")],
+        "safety_checklist": ["Any rash?", "Have you travelled recently?"],
+        "investigated_facts": {"fever": "Present"},
+        "retrieved_protocols": [],
+    }
+    result = asyncio.run(reasoning.reasoning_node(state))
+    assert len(prompts) == 1 and "MODE: FOLLOW-UP" in prompts[0]
+    assert result["investigated_facts"] == {"fever": "Present", "rash": "Denied"}
+    assert result["safety_checklist"] == ["Have you travelled recently?", "Any bleeding gums?"]
+    assert result["triage_decision"] == "PENDING"
+
+
+def test_invalid_reply_falls_back_to_split_calls(monkeypatch):
+    prompts = []
+    replies = [
+        '{"new_facts": "fever", "stop_asking": "maybe"}',
+        '{"fever": "Present"}',
+        '{"differential_diagnosis": ["Viral fever"], "new_questions": ["Any rash?"]}',
+    ]
+    monkeypatch.setattr(reasoning.llm_gateway, "chat", fake_chat(replies, prompts))
+    state = {"messages": [HumanMessage(content="I have fever")], "retrieved_protocols": []}
+    result = asyncio.run(reasoning.reasoning_node(state))
+    assert len(prompts) == 3
+    assert result["investigated_facts"] == {"fever": "Present"}
+    assert result["safety_checklist"] == ["Any rash?"]
+
+
+def test_invalid_plan_only_reruns_the_diagnostician(monkeypatch):
+    prompts = []
+    replies = [
+        '{"new_facts": {"fever": "Present"}, "differential_diagnosis": "Viral fever"}',
+        '{"differential_diagnosis": ["Viral fever"], "new_questions": ["Any rash?"]}',
+    ]
+    monkeypatch.setattr(reasoning.llm_gateway, "chat", fake_chat(replies, prompts))
+    state = {"messages": [HumanMessage(content="I have fever")], "retrieved_protocols": []}
+    result = asyncio.run(reasoning.reasoning_node(state))
+    assert len(prompts) == 2
+    assert 'Known facts: {"fever": "Present"}' in prompts[1]  # the fused call's facts are kept
+    assert result["investigated_facts"] == {"fever": "Present"}
+    assert result["safety_checklist"] == ["Any rash?"]
+
+
+def test_invalid_facts_only_reruns_fact_extraction(monkeypatch):
+    prompts = []
+    replies = [
+        '{"new_facts": ["fever"], "differential_diagnosis": ["Viral fever"], "new_questions": ["Any rash?"]}',
+        '{"fever": "Present"}',
+    ]
+    monkeypatch.setattr(reasoning.llm_gateway, "chat", fake_chat(replies, prompts))
+    state = {"messages": [HumanMessage(content="I have fever")], "retrieved_protocols": []}
+    result = asyncio.run(reasoning.reasoning_node(state))
+    assert len(prompts) == 2
+    assert result["investigated_facts"] == {"fever": "Present"}
+    assert result["safety_checklist"] == ["Any rash?"]
+
+
+def test_graph_path_follows_reasoning_mode():
+    fused = set(graph.build_graph(reasoning_mode="fused").get_graph().nodes)
+    split = set(graph.build_graph(reasoning_mode="split").get_graph().nodes)
+    assert "reasoning" in fused and not {"fact_extraction", "diagnostician"} & fused
+    assert {"fact_extraction", "diagnostician"} <= split and "reasoning" not in split
+    assert set(graph.build_graph(reasoning_mode="bogus").get_graph().nodes) == split
+
+    # Split mode keeps Fact Extraction beside the scan, before the join
+    edges = {(e.source, e.target) for e in graph.build_graph(reasoning_mode="split").get_graph().edges}
+    assert {("context", "fact_extraction"), ("fact_extraction", "triage_join"), ("triage_join", "diagnostician")} <= edges
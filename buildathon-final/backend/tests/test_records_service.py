@@ -0,0 +1,135 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.records_service import RecordsService
+
+
+class FakeFirebase:
+    """Blocking get_records with a fixed round-trip time, like the Firestore client."""
+
+    def __init__(self, data, delay=0.05):
+        self.data = data
+        self.delay = delay
+        self.queried = []
+        self.reads = 0
+
+    def get_records(self, collection, patient_id=None, case_id=None):
+        self.queried.append(collection)
+        time.sleep(self.delay)
+        records = [dict(r) for r in self.data.get(collection, []) if r.get("patient_id") == patient_id]
+        self.reads += len(records)
+        return records
+
+    def get_records_page(self, collection, patient_id=None, case_id=None, limit=50, after=None):
+        self.queried.append(collection)
+        records = [dict(r) for r in self.data.get(collection, []) if r.get("patient_id") == patient_id and r.get("created_at")]
+        records.sort(key=lambda r: (r["created_at"], r["id"]), reverse=True)
+        records = [r for r in records if after is None or (r["created_at"], r["id"]) < tuple(after)][:limit]
+        self.reads += len(records)
+        return records
+
+
+DATA = {
+    "case_ai_patient_summaries": [
+        {"id": "s1", "patient_id": "p1", "type": "AI_SUMMARY", "created_at": "2026-01-05"},
+        {"id": "s2", "patient_id": "p1", "type": "AI_SUMMARY", "created_at": "2026-01-01"},
+    ],
+    "lab_reports": [
+        {"id": "l1", "patient_id": "p1", "type": "LAB_REPORT", "created_at": "2026-01-03"},
+        {"id": "l2", "patient_id": "p2", "type": "LAB_REPORT", "created_at": "2026-01-04"},
+    ],
+    "prescriptions": [
+        {"id": "r1", "patient_id": "p1", "type": "PRESCRIPTION", "created_at": "2026-01-04"},
+        {"id": "r2", "patient_id": "p1", "type": "PRESCRIPTION"},
+    ],
+    "case_doctor_remarks": [
+        {"id": "d1", "patient_id": "p1", "type": "DOCTOR_REMARKS", "created_at": "2026-01-02"},
+    ],
+}
+
+
+def test_collections_are_queried_concurrently_and_merged():
+    firebase = FakeFirebase(DATA)
+    service = RecordsService(firebase)
+    t0 = time.perf_counter()
+    result = asyncio.run(service.get_records("p1"))
+    elapsed = time.perf_counter() - t0
+
+    assert len(firebase.queried) == 8
+    assert elapsed < 8 * firebase.delay / 2
+    assert [r["id"] for r in result["records"]] == ["s1", "r1", "l1", "d1", "s2", "r2"]
+    assert result["next_cursor"] is None
+
+
+def test_paging_with_cursor_covers_every_record_once():
+    service = RecordsService(FakeFirebase(DATA, delay=0))
+    seen, cursor = [], None
+    while True:
+        page = asyncio.run(service.get_records("p1", limit=4, cursor=cursor))
+        seen += [r["id"] for r in page["records"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["s1", "r1", "l1", "d1", "s2", "r2"]
+
+
+def test_type_filter_skips_collections_that_cannot_match():
+    firebase = FakeFirebase(DATA, delay=0)
+    service = RecordsService(firebase)
+    result = asyncio.run(service.get_records("p1", types=["prescription", "DOCTOR_REMARKS"]))
+    assert [r["id"] for r in result["records"]] == ["r1", "d1", "r2"]
+    assert "case_ai_patient_summaries" not in firebase.queried
+
+    by_collection = asyncio.run(service.get_records("p1", types=["lab_reports"]))
+    assert [r["id"] for r in by_collection["records"]] == ["l1"]
+
+
+def test_invalid_cursor_is_rejected():
+    service = RecordsService(FakeFirebase(DATA, delay=0))
+    with pytest.raises(ValueError):
+        asyncio.run(service.get_records("p1", cursor="not-a-cursor"))
+
+
+def test_pages_read_about_limit_records_per_collection():
+    history = {"lab_reports": [
+        {"id": f"l{i:03d}", "patient_id": "p1", "type": "LAB_REPORT", "created_at": f"2025-01-01T00:{i // 60:02d}:{i % 60:02d}"}
+        for i in range(300)
+    ] + [{"id": "old", "patient_id": "p1", "type": "LAB_REPORT"}]}
+    firebase = FakeFirebase(history, delay=0)
+    service = RecordsService(firebase)
+
+    page = asyncio.run(service.get_records("p1", limit=10))
+    assert [r["id"] for r in page["records"]] == [f"l{i:03d}" for i in range(299, 289, -1)]
+    assert firebase.reads == 11
+
+    seen, cursor = [r["id"] for r in page["records"]], page["next_cursor"]
+    while cursor:
+        page = asyncio.run(service.get_records("p1", limit=50, cursor=cursor))
+        seen += [r["id"] for r in page["records"]]
+        cursor = page["next_cursor"]
+    assert len(seen) == len(set(seen)) == 301 and seen[-1] == "old"
+
+
+def test_paged_queries_on_the_local_firestore():
+    from app.core.firebase import FirebaseService
+    from app.core.local_firestore import LocalFirestore
+
+    firebase = FirebaseService.__new__(FirebaseService)
+    firebase.mock_mode, firebase.backend, firebase.db = False, "local", LocalFirestore()
+    for collection, records in DATA.items():
+        for record in records:
+            firebase.db.collection(collection).document(record["id"]).set({k: v for k, v in record.items() if k != "id"})
+    # Same created_at: the document id breaks the tie
+    firebase.db.collection("lab_reports").document("l0").set({"patient_id": "p1", "type": "LAB_REPORT", "created_at": "2026-01-03"})
+
+    service = RecordsService(firebase)
+    seen, cursor = [], None
+    while True:
+        page = asyncio.run(service.get_records("p1", limit=2, cursor=cursor))
+        seen += [r["id"] for r in page["records"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["s1", "r1", "l1", "l0", "d1", "s2", "r2"]
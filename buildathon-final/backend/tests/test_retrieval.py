@@ -0,0 +1,54 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.agent.nodes.retrieval import build_queries, rerank_hits
+
+
+def result(ids, docs, distances, protocol="Fever"):
+    return {
+        "ids": [ids],
+        "documents": [docs],
+        "metadatas": [[{"protocol": protocol, "section": "RED_FLAGS"} for _ in ids]],
+        "distances": [distances],
+    }
+
+
+def test_build_queries_uses_facts_differential_and_message():
+    state = {
+        "messages": [AIMessage(content="Do you have a rash?"), HumanMessage(content="no but my neck is stiff")],
+        "investigated_facts": {"fever": "Present", "fever_duration": "3 days", "rash": "Denied"},
+        "differential_diagnosis": ["Viral fever", "Meningitis"],
+    }
+    assert build_queries(state) == [
+        "no but my neck is stiff",
+        "Viral fever",
+        "Meningitis",
+        "fever duration 3 days",
+        "fever",
+    ]
+
+
+def test_fact_queries_stay_stable_as_facts_accumulate():
+    earlier = {"messages": [HumanMessage(content="ok")], "investigated_facts": {"fever": "yes", "cough": "Present"}}
+    later = {"messages": [HumanMessage(content="ok")], "investigated_facts": {"fever": "yes", "cough": "Present", "rash": "yes"}}
+    # The new fact adds one query; the earlier ones are unchanged, so they hit the cache
+    assert build_queries(later) == ["rash"] + build_queries(earlier)
+
+
+def test_build_queries_skips_bare_answers():
+    state = {"messages": [HumanMessage(content="yes")], "investigated_facts": {}, "differential_diagnosis": []}
+    assert build_queries(state) == []
+
+
+def test_rerank_dedupes_and_rewards_multi_query_hits():
+    merged = rerank_hits(
+        {
+            "decision_rules_v2": [
+                result(["a", "b"], ["Neck stiffness: refer", "Give ORS"], [0.40, 0.38]),
+                result(["a"], ["Neck stiffness: refer"], [0.42]),
+            ],
+            "protocol_summaries_v2": [result(["s1"], ["Neck  stiffness: refer"], [0.50])],
+        },
+        top_k=5,
+    )
+    assert [h["document"] for h in merged] == ["Neck stiffness: refer", "Give ORS"]
+    assert merged[0]["queries"] == {0, 1}
@@ -0,0 +1,123 @@
+from app.agent.emergency_matcher import emergency_matcher
+from app.agent.retrieval_cache import RetrievalCache, normalize_query
+from app.core.ingestion import write_content_versions
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+class FakeCollection:
+    name = "decision_rules_v2"
+
+    def __init__(self):
+        self.hashes = {f"guide:fever:management:{i}": f"h{i}" for i in range(10)}
+        self.queries = 0
+        self.gets = 0
+
+    def get(self, include=None):
+        self.gets += 1
+        return {"ids": list(self.hashes), "metadatas": [{"content_hash": h} for h in self.hashes.values()]}
+
+    def query(self, query_embeddings, n_results=3, **kwargs):
+        self.queries += 1
+        n = len(query_embeddings)
+        return {
+            "documents": [["doc"] * n_results for _ in range(n)],
+            "metadatas": [[{"protocol": "Fever", "section": "RED_FLAGS"}] * n_results for _ in range(n)],
+            "included": ["documents", "metadatas"],
+        }
+
+
+def test_normalize_query():
+    assert normalize_query("  I have FEVER!! ") == normalize_query("i have fever")
+
+
+def test_embeddings_are_batched_and_cached():
+    embedder = FakeEmbedder()
+    cache = RetrievalCache(embedder)
+    cache.embed(["fever", "cough", "Fever."])
+    cache.embed(["cough", "headache"])
+    assert embedder.calls == [["fever", "cough"], ["headache"]]
+    stats = cache.stats()
+    assert stats["embedding_hits"] == 1 and stats["embedding_misses"] == 3
+
+
+def test_results_are_cached_until_collection_changes(tmp_path):
+    embedder = FakeEmbedder()
+    collection = FakeCollection()
+    write_content_versions(str(tmp_path), [collection])
+    cache = RetrievalCache(embedder, version_check_seconds=0, db_path=str(tmp_path))
+
+    cache.query(collection, "I have fever")
+    cache.query(collection, "i have fever.")
+    assert collection.queries == 1
+    assert cache.stats()["result_hit_rate"] == 0.5
+
+    collection.hashes["guide:fever:red_flags:0"] = "new"  # re-ingested with a new chunk
+    write_content_versions(str(tmp_path), [collection])
+    cache.query(collection, "I have fever")
+    assert collection.queries == 2
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_version_check_reads_the_marker_not_the_collection(tmp_path):
+    collection = FakeCollection()
+    cache = RetrievalCache(FakeEmbedder(), version_check_seconds=0, db_path=str(tmp_path))
+    cache.query(collection, "I have fever")
+
+    # First ingestion while serving: the marker appears
+    write_content_versions(str(tmp_path), [collection])
+    gets = collection.gets
+    cache.query(collection, "I have fever")
+    assert collection.queries == 2
+    assert cache.stats()["invalidations"] == 1
+
+    for _ in range(5):
+        cache.query(collection, "I have fever")
+    assert collection.queries == 2
+    assert collection.gets == gets  # the hot path never scans the collection
+
+
+def test_upsert_with_unchanged_count_changes_the_version(tmp_path):
+    collection = FakeCollection()
+    before = write_content_versions(str(tmp_path), [collection])[collection.name]
+
+    # Re-ingestion upserted an edited chunk under its stable id: same count, new hash
+    collection.hashes["guide:fever:management:3"] = "edited"
+    assert write_content_versions(str(tmp_path), [collection])[collection.name] != before
+
+
+def test_clinical_content_policy():
+    for text in ["yes", "No", "3 days", "ok thank you", "about a week"]:
+        assert not emergency_matcher.has_clinical_content(text), text
+    for text in ["I have a headache", "yes and vomiting", "chest pain", "my baby is not feeding"]:
+        assert emergency_matcher.has_clinical_content(text), text
+
+
+def test_query_many_batches_misses_into_one_call():
+    embedder = FakeEmbedder()
+    collection = FakeCollection()
+    cache = RetrievalCache(embedder)
+    cache.query(collection, "fever")
+    results = cache.query_many(collection, ["Fever", "cough", "headache"], n_results=2)
+    assert collection.queries == 2
+    assert embedder.calls == [["fever"], ["cough", "headache"]]
+    assert all(r["documents"] == [["doc", "doc"]] for r in results[1:])
+
+
+def test_content_version_follows_chroma_upserts(tmp_path):
+    import chromadb
+
+    from app.core.ingestion import content_version
+
+    collection = chromadb.PersistentClient(path=str(tmp_path)).get_or_create_collection("decision_rules_v2", embedding_function=None)
+    collection.upsert(ids=["guide:fever:management:0"], embeddings=[[1.0, 0.0]], documents=["Give paracetamol"], metadatas=[{"content_hash": "a"}])
+    before = content_version(collection)
+    collection.upsert(ids=["guide:fever:management:0"], embeddings=[[0.0, 1.0]], documents=["Give ORS"], metadatas=[{"content_hash": "b"}])
+    assert collection.count() == 1 and content_version(collection) != before
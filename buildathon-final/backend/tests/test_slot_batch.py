@@ -0,0 +1,138 @@
+import time
+
+import pytest
+
+from app.core.availability import AvailabilityService
+from app.core.slot_batch import SlotBatchService, drop_overlapping, generate_slots
+
+# Mon 2026-03-02 .. Sun 2026-03-08
+WEEK = ("2026-03-02", "2026-03-08", ["Mon", "Wed"], "09:00", "12:00", "10:00", "10:30")
+
+
+class FakeFirebase:
+    mock_mode = True
+
+    def __init__(self, existing=None, fail_after=None):
+        self.existing = existing or []
+        self.batches = []
+        self.fail_after = fail_after
+
+    def get_doctor_slots(self, doctor_id, status="AVAILABLE"):
+        return [dict(s) for s in self.existing if s["doctor_id"] == doctor_id]
+
+    def create_slots(self, slots, chunk_size=450, max_parallel=4):
+        self.batches.append(len(slots))
+        created = [(f"s{i}", slot) for i, slot in enumerate(slots)]
+        if self.fail_after is None:
+            return created, []
+        return created[:self.fail_after], [{"slots": len(slots) - self.fail_after, "error": "deadline exceeded"}]
+
+
+def test_generate_slots_matches_the_schedule():
+    slots = generate_slots("doc_1", *WEEK, slot_duration=30, time_gap=0)
+    assert {s["date"] for s in slots} == {"2026-03-02", "2026-03-04"}
+    assert [s["start_time"] for s in slots if s["date"] == "2026-03-02"] == ["09:00", "09:30", "10:30", "11:00", "11:30"]
+    with pytest.raises(ValueError):
+        generate_slots("doc_1", *WEEK, slot_duration=0)
+
+
+def test_drop_overlapping_existing_slots():
+    slots = generate_slots("doc_1", *WEEK, slot_duration=30)
+    existing = [
+        {"date": "2026-03-02", "start_time": "09:00", "end_time": "09:30", "status": "BOOKED"},   # duplicate
+        {"date": "2026-03-02", "start_time": "10:45", "end_time": "11:15", "status": "AVAILABLE"},  # overlaps two
+        {"date": "2026-03-04", "start_time": "12:00", "end_time": "12:30", "status": "AVAILABLE"},  # touches only
+    ]
+    kept, skipped = drop_overlapping(slots, existing)
+    assert skipped == 3
+    assert [s["start_time"] for s in kept if s["date"] == "2026-03-02"] == ["09:30", "11:30"]
+    assert len([s for s in kept if s["date"] == "2026-03-04"]) == 5
+
+
+def test_small_schedules_are_written_inline_and_cached():
+    firebase = FakeFirebase(existing=[{"id": "x", "doctor_id": "doc_1", "date": "2026-03-02", "start_time": "09:00", "end_time": "09:30", "status": "AVAILABLE"}])
+    availability = AvailabilityService(firebase)
+    service = SlotBatchService(firebase, availability, async_threshold=100)
+
+    result = service.create("doc_1", *WEEK, slot_duration=30)
+    assert result == {"status": "success", "slots_created": 9, "slots_skipped": 1}
+    assert firebase.batches == [9]
+    assert len(availability.get_slots("doc_1")) == 10
+
+    # Running the same schedule again creates nothing
+    assert service.create("doc_1", *WEEK, slot_duration=30)["slots_created"] == 0
+
+
+def test_large_schedules_run_as_a_job():
+    firebase = FakeFirebase()
+    service = SlotBatchService(firebase, AvailabilityService(firebase), async_threshold=5)
+    result = service.create("doc_1", *WEEK, slot_duration=30)
+    assert result["status"] == "accepted" and result["slots_planned"] == 10
+
+    for _ in range(100):
+        job = service.get_job(result["job_id"])
+        if job["status"] != "running":
+            break
+        time.sleep(0.01)
+    assert job["status"] == "completed" and job["slots_created"] == 10
+    assert service.get_job("missing") is None
+
+
+def test_failed_chunks_are_reported():
+    firebase = FakeFirebase(fail_after=4)
+    availability = AvailabilityService(firebase)
+    result = SlotBatchService(firebase, availability, async_threshold=100).create("doc_1", *WEEK, slot_duration=30)
+    assert result == {"status": "partial", "slots_created": 4, "slots_skipped": 0, "slots_failed": 6, "error": "deadline exceeded"}
+    assert len(availability.get_slots("doc_1")) == 4
+
+
+def test_create_slots_uses_write_batches_under_the_limit():
+    import threading
+
+    from app.core.firebase import FirebaseService
+
+    class DocRef:
+        count = 0
+        lock = threading.Lock()
+
+        def __init__(self):
+            with DocRef.lock:
+                DocRef.count += 1
+                self.id = f"d{DocRef.count}"
+
+    class Batch:
+        def __init__(self, db):
+            self.db, self.ops = db, []
+
+        def set(self, ref, data):
+            self.ops.append((ref.id, data))
+
+        def commit(self):
+            assert len(self.ops) <= 500
+            if len(self.ops) == 100:
+                raise RuntimeError("unavailable")
+            with self.db.lock:
+                self.db.commits.append(len(self.ops))
+
+    class Collection:
+        def document(self):
+            return DocRef()
+
+    class DB:
+        def __init__(self):
+            self.commits, self.lock = [], threading.Lock()
+
+        def batch(self):
+            return Batch(self)
+
+        def collection(self, name):
+            return Collection()
+
+    service = FirebaseService.__new__(FirebaseService)
+    service.mock_mode, service.db = False, DB()
+    slots = [{"doctor_id": "doc_1", "date": "2026-03-02", "start_time": f"{i:04d}"} for i in range(1000)]
+    created, failed = service.create_slots(slots)
+
+    assert sorted(service.db.commits) == [450, 450]
+    assert len({slot_id for slot_id, _ in created}) == 900
+    assert failed == [{"slots": 100, "error": "unavailable"}]
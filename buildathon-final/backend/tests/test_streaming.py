@@ -0,0 +1,92 @@
+import asyncio
+import json
+from typing import Any, Dict, List, TypedDict
+
+from langgraph.graph import StateGraph, START, END
+
+from app.core.llm_gateway import JsonFieldStreamer
+from app.agent.nodes import strategist
+
+
+def feed_all(streamer, text, size):
+    return "".join(streamer.feed(text[i:i + size]) for i in range(0, len(text), size))
+
+
+def test_json_field_streamer_decodes_escapes_across_chunks():
+    doc = json.dumps({"triage_level": "Green", "clinical_guidelines": 'Drink "ORS"\nRest \\ sleep. बुखार', "x": [1]})
+    for size in (1, 2, 3, 7, len(doc)):
+        streamer = JsonFieldStreamer("clinical_guidelines")
+        assert feed_all(streamer, doc, size) == json.loads(doc)["clinical_guidelines"]
+        assert streamer.done
+
+
+def test_json_field_streamer_ignores_missing_field():
+    streamer = JsonFieldStreamer("translation")
+    assert feed_all(streamer, '{"other": "value"}', 4) == ""
+    assert not streamer.started
+
+
+class StrategistState(TypedDict, total=False):
+    safety_checklist: List[str]
+    messages: List[Any]
+    final_response: str
+    triage_decision: str
+    full_summary_payload: Dict[str, Any]
+    final_advice: str
+    investigated_symptoms: List[str]
+
+
+def run_strategist(monkeypatch, fake_stream):
+    """Tokens streamed by the strategist's final summary, and its final_response."""
+    monkeypatch.setattr(strategist.llm_gateway, "stream_chat", fake_stream)
+
+    builder = StateGraph(StrategistState)
+    builder.add_node("strategist", strategist.strategist_node)
+    builder.add_edge(START, "strategist")
+    builder.add_edge("strategist", END)
+    graph = builder.compile()
+
+    async def run():
+        tokens, final = [], None
+        async for mode, payload in graph.astream({"safety_checklist": [], "messages": []}, stream_mode=["updates", "custom"]):
+            if mode == "custom":
+                tokens.append(payload["text"])
+            else:
+                final = payload["strategist"]["final_response"]
+        return tokens, final
+
+    return asyncio.run(run())
+
+
+def test_strategist_streams_final_summary(monkeypatch):
+    summary = json.dumps({"triage_level": "Green", "clinical_guidelines": "Rest and fluids.",
+                          "red_flags_to_watch_out_for": ["Confusion", "Stiff neck"]})
+
+    async def fake_stream(model, messages, **kwargs):
+        for i in range(0, len(summary), 5):
+            yield summary[i:i + 5]
+
+    tokens, final = run_strategist(monkeypatch, fake_stream)
+    assert len(tokens) > 2
+    assert "".join(tokens) == final
+    assert "Rest and fluids." in final
+
+
+def test_strategist_fallback_matches_the_streamed_tokens(monkeypatch):
+    # The advice is streamed, then the JSON is cut off and does not parse
+    truncated = '{"triage_level": "Green", "clinical_guidelines": "Rest and fluids.", "red_flags_to_watch_out_for": ["Conf'
+
+    async def truncated_stream(model, messages, **kwargs):
+        for i in range(0, len(truncated), 5):
+            yield truncated[i:i + 5]
+
+    tokens, final = run_strategist(monkeypatch, truncated_stream)
+    assert "".join(tokens) == final
+    assert final.startswith(strategist.ADVICE_PREFIX + "Rest and fluids.")
+
+    async def failing_stream(model, messages, **kwargs):
+        raise RuntimeError("unavailable")
+        yield
+
+    tokens, final = run_strategist(monkeypatch, failing_stream)
+    assert "".join(tokens) == final == "Assessment Complete. Please consult a doctor."
@@ -0,0 +1,97 @@
+import asyncio
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.tracing import NOOP_SPAN, Tracer
+
+
+def test_spans_nest_across_tasks_and_threads(tmp_path):
+    log = tmp_path / "spans.jsonl"
+    tracer = Tracer(enabled=True, log_path=str(log))
+    pool = ThreadPoolExecutor(max_workers=1)
+
+    @tracer.traced("node", "retrieval")
+    def retrieval():
+        with tracer.span("chroma", "decision_rules_v2"):
+            pass
+
+    @tracer.traced("node", "fact_extraction")
+    async def fact_extraction():
+        with tracer.span("llm", "openai/gpt-oss-120b") as span:
+            span.set(prompt_tokens=120, completion_tokens=30)
+
+    async def request():
+        with tracer.span("http", "/chat"):
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(
+                fact_extraction(),
+                loop.run_in_executor(pool, contextvars.copy_context().run, retrieval),
+            )
+
+    asyncio.run(request())
+    spans = {s["name"]: s for s in map(json.loads, log.read_text().splitlines())}
+    root = spans["/chat"]
+    assert root["parent_id"] is None
+    assert {s["trace_id"] for s in spans.values()} == {root["trace_id"]}
+    assert spans["fact_extraction"]["parent_id"] == root["span_id"]
+    assert spans["retrieval"]["parent_id"] == root["span_id"]
+    assert spans["openai/gpt-oss-120b"]["parent_id"] == spans["fact_extraction"]["span_id"]
+    assert spans["decision_rules_v2"]["parent_id"] == spans["retrieval"]["span_id"]
+
+
+def test_prometheus_text():
+    tracer = Tracer(enabled=True, log_path="")
+    with tracer.span("llm", "openai/gpt-oss-120b") as span:
+        span.set(prompt_tokens=100, completion_tokens=20)
+    with pytest.raises(KeyError):
+        with tracer.span("firestore", "get_document"):
+            raise KeyError("missing")
+
+    text = tracer.render_prometheus(gauges={"docai_event_loop_lag_p99_ms": ("Lag.", 1.5)})
+    assert '# TYPE docai_span_duration_seconds histogram' in text
+    assert 'docai_span_duration_seconds_bucket{kind="llm",name="openai/gpt-oss-120b",le="+Inf"} 1' in text
+    assert 'docai_span_duration_seconds_count{kind="firestore",name="get_document"} 1' in text
+    assert 'docai_span_errors_total{kind="firestore",name="get_document"} 1' in text
+    assert 'docai_llm_tokens_total{model="openai/gpt-oss-120b",type="prompt"} 100' in text
+    assert 'docai_llm_tokens_total{model="openai/gpt-oss-120b",type="completion"} 20' in text
+    assert "docai_event_loop_lag_p99_ms 1.5" in text
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer(enabled=False, log_path="")
+
+    @tracer.traced("node")
+    async def strategist(state):
+        return {"final_response": state}
+
+    assert tracer.span("node", "x") is NOOP_SPAN
+    assert asyncio.run(strategist("ok")) == {"final_response": "ok"}
+    assert tracer.stats()["spans"] == []
+
+
+def test_request_spans_are_named_by_route_template():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.core.tracing import TracingMiddleware
+
+    tracer = Tracer(enabled=True, log_path="")
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    for i in range(3):
+        client.get(f"/items/{i}")
+    client.get("/no/such/path")
+
+    text = tracer.render_prometheus()
+    assert 'docai_span_duration_seconds_count{kind="http",name="/items/{item_id}"} 3' in text
+    assert 'docai_span_duration_seconds_count{kind="http",name="unmatched"} 1' in text
+    assert "/items/0" not in text and "/no/such/path" not in text
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from app.core.translation_memory import TranslationMemory, split_segments
+
+ADVICE = "Assessment Complete. \n\n**Advice:** {advice}\n\n**Monitor for:** Fever. \n\nYou can view your full report in the Medical Files."
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, segments, language):
+        self.calls.append(list(segments))
+        return [f"[{language}] {s}" for s in segments]
+
+
+def test_split_segments_round_trips():
+    text = "  🚨 **EMERGENCY DETECTED**\n\nBased on...\n \n\n**ACTION:** Go.\n"
+    assert "".join(s + sep for s, sep in split_segments(text)) == text
+    assert [s for s, _ in split_segments(ADVICE)][0] == "Assessment Complete."
+
+
+def test_only_unknown_segments_reach_the_model():
+    memory = TranslationMemory()
+    model = FakeModel()
+
+    first = asyncio.run(memory.translate(ADVICE.format(advice="Rest."), "Hindi", model))
+    assert len(model.calls[0]) == 4
+    assert first.startswith("[Hindi] Assessment Complete. \n\n[Hindi] **Advice:** Rest.")
+
+    # Same template, new advice: only the advice paragraph is translated
+    second = asyncio.run(memory.translate(ADVICE.format(advice="Drink fluids."), "Hindi", model))
+    assert model.calls[1] == ["**Advice:** Drink fluids."]
+    assert second.endswith("[Hindi] You can view your full report in the Medical Files.")
+
+    # Fully known text and numbers-only text need no call; other languages are separate
+    asyncio.run(memory.translate(ADVICE.format(advice="Rest."), "Hindi", model))
+    assert asyncio.run(memory.translate("120/80", "Hindi", model)) == "120/80"
+    asyncio.run(memory.translate("Assessment Complete.", "Tamil", model))
+    assert len(model.calls) == 3 and memory.stats()["stored_items"] == 6
+
+
+def test_memory_persists_and_stays_bounded(tmp_path):
+    path = str(tmp_path / "translations.sqlite3")
+    memory = TranslationMemory(path, max_items=3, prune_every=1)
+    for i in range(5):
+        memory.put(f"message {i}", "Hindi", f"sandesh {i}")
+    assert memory.stats()["stored_items"] == 3
+
+    reopened = TranslationMemory(path)
+    assert reopened.get("message 4", "Hindi") == "sandesh 4"
+    assert reopened.get("message 0", "Hindi") is None
+
+
+def test_count_mismatch_is_not_stored():
+    memory = TranslationMemory()
+
+    async def broken(segments, language):
+        return ["only one"]
+
+    with pytest.raises(ValueError):
+        asyncio.run(memory.translate("First.\n\nSecond.", "Hindi", broken))
+    assert memory.stats()["stored_items"] == 0
@@ -0,0 +1,32 @@
+from app.agent.nodes.triage_join import triage_join_node
+
+
+def test_join_commits_staged_results():
+    state = {
+        "triage_decision": "ROUTINE",
+        "investigated_facts": {"fever": "Present"},
+        "staged_facts": {"fever": "Present", "duration": "3 days"},
+        "staged_protocols": ["[PROTOCOL: Fever] [SECTION: RED_FLAGS]\n..."],
+    }
+    updates = triage_join_node(state)
+    assert updates["investigated_facts"] == {"fever": "Present", "duration": "3 days"}
+    assert updates["retrieved_protocols"] == state["staged_protocols"]
+    assert updates["staged_facts"] is None and updates["staged_protocols"] is None
+
+
+def test_join_discards_staged_results_on_emergency():
+    state = {
+        "triage_decision": "EMERGENCY",
+        "staged_facts": {"neck_stiffness": "Present"},
+        "staged_protocols": ["..."],
+    }
+    updates = triage_join_node(state)
+    assert "investigated_facts" not in updates
+    assert "retrieved_protocols" not in updates
+    assert updates["staged_facts"] is None and updates["staged_protocols"] is None
+
+
+def test_join_keeps_existing_when_branch_skipped():
+    updates = triage_join_node({"triage_decision": "ROUTINE", "staged_facts": None, "staged_protocols": None})
+    assert "investigated_facts" not in updates
+    assert "retrieved_protocols" not in updates
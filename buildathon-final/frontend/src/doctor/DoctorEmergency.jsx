@@ -55,57 +55,29 @@ const DoctorEmergency = () => {
     useEffect(() => {
         if (!doctorLocation) return; // Wait for location
 
-        const fetchEmergencies = async () => {
-            try {
-                const response = await fetch(`${import.meta.env.VITE_API_URL}/get_emergencies`);
-                if (!response.ok) throw new Error('Failed to fetch emergencies');
-                const data = await response.json();
-
-                const formatted = data.map(item => {
-                    const summary = item.data?.pre_doctor_consultation_summary || {};
-                    const profile = item.data?.patient_profile || {};
-
-                    // [NEW] Handle Appointment Data Source
-                    const isAppointment = item.source_type === 'appointment';
-                    const trigger = isAppointment ? "Emergency Appointment" : (summary.trigger_reason || "Critical Health Alert");
-
-                    // [FIX] Robust ID check
-                    const computedId = item.patient_id || item.profile_id || item.id;
-
-                    return {
-                        emergencyId: item.id,
-                        patientId: computedId, // Use robust ID
-                        caseId: item.case_id, // [FIX] Map case_id from backend
-                        originalId: item.id, // Keep track of the source doc ID (appointment ID)
-                        patientProfile: {
-                            name: profile.name || "Unknown",
-                            age: profile.age || "?",
-                            gender: profile.gender || "?"
-                        },
-                        triggerSource: isAppointment ? "Direct Booking" : "AI Triage",
-                        triggerReason: trigger,
-                        detectedAt: item.created_at || new Date().toISOString(),
-                        severityScore: summary.assessment?.severity_score || 90,
-                        severityLevel: summary.assessment?.severity || "HIGH",
-                        vitals: summary.vitals_reported || {},
-                        location: { lat: 12.9716, lng: 77.5946 }, // Default for now
-                        status: isAppointment ? (item.data?.appointment_details?.status || "PENDING") : "PENDING",
-                        sourceType: item.source_type // Pass through
-                    };
-                });
-
-                setQueue(sortQueue(formatted, doctorLocation));
-            } catch (error) {
-                console.error("Error fetching emergencies:", error);
-            } finally {
-                setLoading(false);
-            }
-        };
-
-        fetchEmergencies();
-        // Poll every 30 seconds for new emergencies
-        const interval = setInterval(fetchEmergencies, 30000);
-        return () => clearInterval(interval);
+        // Live feed: a snapshot on connect, then upsert / remove events (see /emergencies/stream)
+        const items = new Map();
+        const render = () => setQueue(sortQueue([...items.values()].map(formatEmergency), doctorLocation));
+
+        const source = new EventSource(`${import.meta.env.VITE_API_URL}/emergencies/stream`);
+        source.addEventListener('snapshot', (e) => {
+            items.clear();
+            JSON.parse(e.data).emergencies.forEach(item => items.set(item.id, item));
+            render();
+            setLoading(false);
+        });
+        source.addEventListener('upsert', (e) => {
+            const item = JSON.parse(e.data);
+            items.set(item.id, item);
+            render();
+        });
+        source.addEventListener('remove', (e) => {
+            items.delete(JSON.parse(e.data).id);
+            render();
+        });
+        // The browser reconnects on its own and the server then sends a fresh snapshot
+        source.onerror = () => console.error("Emergency stream interrupted, reconnecting...");
+        return () => source.close();
     }, [doctorLocation]);
 
 
@@ -199,6 +171,39 @@ const DoctorEmergency = () => {
 
 // --- Helper Functions ---
 
+const formatEmergency = (item) => {
+    const summary = item.data?.pre_doctor_consultation_summary || {};
+    const profile = item.data?.patient_profile || {};
+
+    // [NEW] Handle Appointment Data Source
+    const isAppointment = item.source_type === 'appointment';
+    const trigger = isAppointment ? "Emergency Appointment" : (summary.trigger_reason || "Critical Health Alert");
+
+    // [FIX] Robust ID check
+    const computedId = item.patient_id || item.profile_id || item.id;
+
+    return {
+        emergencyId: item.id,
+        patientId: computedId, // Use robust ID
+        caseId: item.case_id, // [FIX] Map case_id from backend
+        originalId: item.id, // Keep track of the source doc ID (appointment ID)
+        patientProfile: {
+            name: profile.name || "Unknown",
+            age: profile.age || "?",
+            gender: profile.gender || "?"
+        },
+        triggerSource: isAppointment ? "Direct Booking" : "AI Triage",
+        triggerReason: trigger,
+        detectedAt: item.created_at || new Date().toISOString(),
+        severityScore: summary.assessment?.severity_score || 90,
+        severityLevel: summary.assessment?.severity || "HIGH",
+        vitals: summary.vitals_reported || {},
+        location: { lat: 12.9716, lng: 77.5946 }, // Default for now
+        status: isAppointment ? (item.data?.appointment_details?.status || "PENDING") : "PENDING",
+        sourceType: item.source_type // Pass through
+    };
+};
+
 
 const getSeverityWeight = (level) => {
     switch (level) {
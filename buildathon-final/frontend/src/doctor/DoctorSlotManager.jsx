@@ -114,7 +114,13 @@ const DoctorSlotManager = () => {
 
             if (response.ok) {
                 const res = await response.json();
-                showToast(`${res.slots_created} slots generated successfully!`, 'success');
+                if (res.job_id) {
+                    showToast(`Generating ${res.slots_planned} slots in the background...`, 'success');
+                } else if (res.status === 'partial') {
+                    showToast(`${res.slots_created} slots generated, ${res.slots_failed} failed. Please try again.`, 'error');
+                } else {
+                    showToast(`${res.slots_created} slots generated successfully!`, 'success');
+                }
                 fetchSlots();
                 setShowBatch(false);
             } else {